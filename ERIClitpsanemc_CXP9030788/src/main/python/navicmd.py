@@ -0,0 +1,194 @@
+"""
+File name: navicmd.py
+Version: ${project.version}
+
+Builder for naviseccli sub commands. A command keeps the argument list that
+is passed to naviseccli without a shell, so values never need escaping, and
+behaves as the equivalent command line string for logging and comparison.
+
+The column maps give, for each field of the San API objects, the switches
+which make a listing command print the columns the field is read from. A
+caller which needs only some fields asks for only those columns.
+"""
+
+import shlex
+
+from sanapiexception import SanApiCriticalErrorException
+
+# getlun prints every column without a switch, so even a listing of the
+# LUN IDs has to ask for one column
+GETLUN_COLUMNS = {
+    'id': ('-name',),
+    'name': ('-name',),
+    'uid': ('-uid',),
+    'container': ('-rg',),
+    'type': ('-rg',),
+    'size': ('-capacity',),
+    'raid': ('-type',),
+    'controller': ('-default',),
+}
+
+LUN_LIST_COLUMNS = {
+    'id': (),
+    'name': (),
+    'container': ('-poolName',),
+    'raid': ('-rtype',),
+    'current_op': ('-opDetails',),
+    'current_op_state': ('-opDetails',),
+    'current_op_status': ('-opDetails',),
+    'percent_complete': ('-opDetails',),
+    'consumed': ('-consumedCap',),
+}
+
+STORAGEPOOL_COLUMNS = {
+    'name': (),
+    'id': (),
+    'raid': ('-rtype',),
+    'size': ('-userCap',),
+    'available': ('-availableCap',),
+    'full': ('-prcntFull',),
+    'subscribed': ('-subscribedCap',),
+}
+
+# the fields read from getlun to build a LunInfo
+LUN_FIELDS = ('id', 'name', 'uid', 'container', 'type', 'size', 'raid',
+              'controller')
+
+# the storage pool LUN fields read from lun -list, see _update_lun_object
+POOL_LUN_FIELDS = ('container', 'raid', 'current_op', 'current_op_state',
+                   'current_op_status', 'percent_complete', 'consumed')
+
+# the storage pool LUN fields which change while the LUN itself does not,
+# e.g. as a thin LUN fills or a migration runs
+POOL_LUN_STATE_FIELDS = ('current_op', 'current_op_state',
+                         'current_op_status', 'percent_complete', 'consumed')
+
+# the fields read from storagepool -list to build a StoragePoolInfo
+STORAGE_POOL_FIELDS = ('name', 'id', 'raid', 'size', 'available', 'full',
+                       'subscribed')
+
+
+class NaviCommand(str):
+    """
+    A naviseccli sub command, e.g. ``storagegroup -list -gname "sg1"``.
+    The string value is the command line as it is logged, the argv
+    attribute holds the arguments exactly as naviseccli receives them.
+    Commands are immutable, every builder method returns a new command.
+
+    Example:
+
+        .. code-block:: python
+
+            cmd = NaviCommand("storagegroup", "-addhlu").arg("-gname")\\
+                    .quoted(sg_name).arg("-hlu", hlu, "-alu", alu)
+    """
+
+    def __new__(cls, *words):
+        words = [_to_str(word) for word in words]
+        return cls._create(words, ' '.join(words))
+
+    @classmethod
+    def _create(cls, argv, text):
+        cmd = str.__new__(cls, text)
+        cmd.argv = tuple(argv)
+        return cmd
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        Creates a command from a command line string, splitting it the way
+        a shell would.
+
+        :param text: The command line, e.g. ``getlun 5``.
+        :type text: :class:`str`
+        :rtype: :class:`NaviCommand`
+        """
+        if isinstance(text, NaviCommand):
+            return text
+        text = _to_str(text)
+        return cls._create(shlex.split(text), text)
+
+    def _append(self, argv, text):
+        if not argv:
+            return self
+        if str.__len__(self):
+            text = str.__add__(self, ' ' + text)
+        return NaviCommand._create(self.argv + tuple(argv), text)
+
+    def arg(self, *values):
+        """
+        Appends plain arguments, e.g. switches and numbers.
+
+        :rtype: :class:`NaviCommand`
+        """
+        values = [_to_str(value) for value in values]
+        return self._append(values, ' '.join(values))
+
+    def quoted(self, value, quote='"'):
+        """
+        Appends a single argument which may contain spaces, shown in quotes
+        in the command line.
+
+        :param value: The argument, e.g. a LUN or storage group name.
+        :type value: :class:`str`
+        :param quote: The quote character used in the command line.
+        :type quote: :class:`str`
+        :rtype: :class:`NaviCommand`
+        """
+        value = _to_str(value)
+        return self._append([value], quote + value + quote)
+
+    def words(self, values):
+        """
+        Appends a whitespace separated list of values as separate
+        arguments, e.g. a list of disks or HLUs.
+
+        :rtype: :class:`NaviCommand`
+        """
+        return self.arg(*_to_str(values).split())
+
+    def options(self, raw):
+        """
+        Appends free-form options, e.g. array specific options supplied by
+        the caller, split the way a shell would.
+
+        :param raw: The options, None or empty for none.
+        :type raw: :class:`str`
+        :rtype: :class:`NaviCommand`
+        """
+        if not raw:
+            return self
+        raw = _to_str(raw)
+        return self._append(shlex.split(raw), raw)
+
+    def columns(self, column_map, fields):
+        """
+        Appends the switches which limit a listing to the columns holding
+        the given fields, e.g. ``getlun -name -uid``.
+
+        :param column_map: The switches of each field, e.g.
+            GETLUN_COLUMNS.
+        :type column_map: :class:`dict`
+        :param fields: The fields needed, None for every column.
+        :type fields: :class:`tuple`
+        :rtype: :class:`NaviCommand`
+        :raises SanApiCriticalErrorException: Raised if the command cannot
+            print a field.
+        """
+        if fields is None:
+            return self
+        switches = []
+        for field in fields:
+            if field not in column_map:
+                raise SanApiCriticalErrorException("%s cannot list the %s "
+                                                   "field" % (self, field), 1)
+            for switch in column_map[field]:
+                if switch not in switches:
+                    switches.append(switch)
+        return self.arg(*switches)
+
+
+def _to_str(value):
+    if isinstance(value, basestring):
+        return value
+    return str(value)
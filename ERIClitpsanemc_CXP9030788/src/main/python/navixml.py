@@ -0,0 +1,185 @@
+"""
+File name: navixml.py
+Version: ${project.version}
+
+XML backends used to parse naviseccli output. lxml is used when it is
+installed: it parses in C, accepts very large documents and finds the
+records of a response with a compiled XPath expression. Otherwise the
+standard library ElementTree is used. Both backends give the parser the
+same element API, so the objects built from the output are identical.
+"""
+
+import copy
+import threading
+import xml.etree.ElementTree as ET
+try:
+    import xml.etree.cElementTree as CET
+except ImportError:
+    CET = ET
+
+try:
+    from lxml import etree as LET
+    LXML_IMPORTED = True
+except ImportError:
+    LXML_IMPORTED = False
+
+from sanapiexception import SanApiCriticalErrorException
+
+# elements of a response which hold a name and a VALUE
+RECORD_TAGS = ('PARAMVALUE', 'PROPERTY')
+
+
+class ElementTreeBackend(object):
+    """
+    Parses naviseccli output with the standard library ElementTree,
+    using cElementTree for incremental parsing where available.
+    """
+
+    name = 'elementtree'
+
+    # class names of the trees and elements this backend creates
+    tree_classes = ('ElementTree', '_ElementInterface', 'Element')
+
+    def fromstring(self, text):
+        """
+        Parses a complete XML document.
+
+        :param text: The XML document.
+        :type text: :class:`str`
+        :returns: The root element.
+        """
+        return ET.fromstring(text)
+
+    def iterparse(self, source, events=('end',)):
+        """
+        Parses an XML document incrementally.
+
+        :param source: The XML document, e.g. a pipe.
+        :type source: :class:`file`
+        :param events: The events to report.
+        :type events: :class:`tuple`
+        :returns: An iterator of (event, element) tuples.
+        """
+        return CET.iterparse(source, events=events)
+
+    def records(self, root):
+        """
+        Returns the PARAMVALUE and PROPERTY elements below root, in
+        document order.
+
+        :param root: The root element.
+        :returns: An iterable of elements.
+        """
+        walk = getattr(root, 'iter', None) or root.getiterator
+        return [elem for elem in walk()
+                if elem is not root and elem.tag in RECORD_TAGS]
+
+    def sub_tree(self, tag, elems):
+        """
+        Creates a tree with a new root holding the given elements.
+
+        :param tag: The tag of the new root.
+        :type tag: :class:`str`
+        :param elems: The elements to put under the root.
+        :type elems: :class:`list`
+        :rtype: :class:`xml.etree.ElementTree`
+        """
+        root = ET.Element(tag)
+        for elem in elems:
+            root.append(elem)
+        return ET.ElementTree(root)
+
+    def is_element(self, elem):
+        """
+        Checks if an object is an element of this backend.
+        """
+        return ET.iselement(elem)
+
+
+class LxmlBackend(ElementTreeBackend):
+    """
+    Parses naviseccli output with lxml.
+    """
+
+    name = 'lxml'
+    tree_classes = ('_ElementTree', '_Element')
+
+    def __init__(self):
+        self._parser = LET.XMLParser(huge_tree=True)
+        self._records = LET.XPath('descendant::PARAMVALUE | '
+                                  'descendant::PROPERTY')
+
+    def fromstring(self, text):
+        return LET.fromstring(text, self._parser)
+
+    def iterparse(self, source, events=('end',)):
+        return LET.iterparse(source, events=events, huge_tree=True)
+
+    def records(self, root):
+        return self._records(root)
+
+    def sub_tree(self, tag, elems):
+        # an lxml element has a single parent, so the original tree is
+        # left intact by adding copies
+        root = LET.Element(tag)
+        for elem in elems:
+            root.append(copy.deepcopy(elem))
+        return LET.ElementTree(root)
+
+    def is_element(self, elem):
+        return isinstance(elem, LET._Element)
+
+
+_BACKENDS = {ElementTreeBackend.name: ElementTreeBackend()}
+if LXML_IMPORTED:
+    _BACKENDS[LxmlBackend.name] = LxmlBackend()
+
+_BACKEND_LOCK = threading.Lock()
+_CURRENT = [_BACKENDS.get(LxmlBackend.name) or
+            _BACKENDS[ElementTreeBackend.name]]
+
+
+def get_xml_backend():
+    """
+    Returns the backend used to parse naviseccli output, lxml if it is
+    installed.
+
+    :rtype: :class:`ElementTreeBackend`
+    """
+    return _CURRENT[0]
+
+
+def set_xml_backend(name):
+    """
+    Selects the backend used to parse naviseccli output.
+
+    :param name: The backend name, elementtree or lxml.
+    :type name: :class:`str`
+    :returns: The selected backend.
+    :rtype: :class:`ElementTreeBackend`
+    :raises SanApiCriticalErrorException: Raised if the backend is unknown
+        or not installed.
+    """
+    backend = _BACKENDS.get(str(name).strip().lower())
+    if backend is None:
+        raise SanApiCriticalErrorException("XML backend %s is not "
+                                           "available" % name, 1)
+    _BACKEND_LOCK.acquire()
+    try:
+        _CURRENT[0] = backend
+    finally:
+        _BACKEND_LOCK.release()
+    return backend
+
+
+def backend_for(elem):
+    """
+    Returns the backend which created an element, so trees built by
+    either backend can be decoded.
+
+    :param elem: An element.
+    :rtype: :class:`ElementTreeBackend`
+    """
+    if LXML_IMPORTED and _BACKENDS[LxmlBackend.name].is_element(elem):
+        return _BACKENDS[LxmlBackend.name]
+    return _BACKENDS[ElementTreeBackend.name]
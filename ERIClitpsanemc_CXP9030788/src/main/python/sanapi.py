@@ -14,7 +14,11 @@ from ConfigParser import NoOptionError
 
 from sanapicfg import SANAPICFG
 from sanapiexception import SanApiException, \
-                            SanApiCriticalErrorException
+                            SanApiCriticalErrorException, \
+                            SanApiEntityNotFoundException
+from sanapilazy import LazyResult, READ_AFTER_WRITE_EAGER, \
+                       READ_AFTER_WRITE_LAZY, READ_AFTER_WRITE_OFF, \
+                       validate_read_after_write
 
 
 def api_builder(array_type, logger=None):
@@ -161,6 +165,8 @@ class SanApi(object):
         except Exception, exce:
             raise SanApiCriticalErrorException(str(exce), 1)
 
+        self._read_after_write = READ_AFTER_WRITE_EAGER
+
     def initialise(self, sp_ips, username, password, scope,
                    getcert=True,
                    vcheck=True):
@@ -402,6 +408,40 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def create_luns(self, specs):
+        """
+        Creates several LUNs. All specs are validated before any LUN is
+        created, the LUNs are created concurrently where the array allows
+        and the new LUNs are read back in one go.
+
+        :param specs: The LUNs to create, each a dictionary of create_lun
+            parameters.
+        :type specs: :class:`list` of :class:`dict`
+        :returns: :class:`LunInfo` objects of the new LUNs, in the order of
+            specs.
+        :rtype: :class:`list` of :class:`LunInfo`
+        :raises SanApiCriticalErrorException: Raised if a spec is invalid.
+            No LUN is created.
+        :raises SanApiPartialFailureException: Raised if a LUN could not be
+            created, or a created LUN could not be read back. The other LUNs
+            are still created, and those read back are held by the
+            exception's succeeded attribute, its failed attribute holds the
+            exception of each LUN name which failed.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            create_luns([
+                {"lun_name": "spLUN1", "size": "500Gb",
+                 "container_type": "StoragePool", "container": "mypool"},
+                {"lun_name": "rgLUN1", "size": "1Gb",
+                 "container_type": "RaidGroup", "container": "6",
+                 "raid_type": "5"}])
+        """
+        raise NotImplementedError()
+
     def delete_lun(self, lun_name=None, lun_id=None,
                    array_specific_options=""):
         """
@@ -447,6 +487,42 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def delete_luns(self, lun_names=None, lun_ids=None,
+                    array_specific_options=""):
+        """
+        Deletes several LUNs, given by name or ID, found from a single read
+        of the LUNs on the array. A LUN which cannot be deleted does not
+        stop the others being deleted.
+
+        .. note::
+
+            Only storage pool LUNs can be deleted by name.
+
+        :param lun_names: Names of LUNs to delete (storage pool LUNs only).
+        :type lun_names: :class:`list` of :class:`str`
+        :param lun_ids: IDs of LUNs to delete.
+        :type lun_ids: :class:`list` of :class:`str`
+        :param array_specific_options: Optional parameters to be passed.
+        :type array_specific_options: :class:`str`
+        :returns: The outcome for each name and ID, one of deleted, not
+            found or failed, see sanapilib.LUN_DELETED, LUN_NOT_FOUND and
+            LUN_DELETE_FAILED.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if no LUN is given or
+            a LUN ID is invalid. No LUN is deleted.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            outcomes = delete_luns(lun_names=["fkruger", "jvoorhees"],
+                                   lun_ids=["23"])
+            failed = [lun for lun, outcome in outcomes.items()
+                      if outcome == sanapilib.LUN_DELETE_FAILED]
+        """
+        raise NotImplementedError()
+
     def rename_lun(self, lun_id, lun_name):
         """
         Rename a LUN. Returns a LunInfo object representing the renamed LUN.
@@ -613,6 +689,50 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def create_hosts_initiators(self, specs, arraycommpath="1",
+                                init_type="3", failovermode="4",
+                                array_specific_options=""):
+        """
+        Registers the HBAs of many hosts, as create_host_initiators does
+        for one HBA, from a single read of the port list. All specs are
+        validated and every WWN is looked up in the port list before any
+        HBA is registered. The paths are registered concurrently where the
+        array allows and the storage groups are read back in one go.
+
+        :param specs: The HBAs to register, each a dictionary with sg_name
+            and wwn and, optionally, host_name and host_ip.
+        :type specs: :class:`list` of :class:`dict`
+        :param arraycommpath: Optional, arraycommpath value, 0 or 1.
+        :type arraycommpath: :class:`str`
+        :param init_type: Optional, initiator type, default=3.
+        :type init_type: :class:`str`
+        :param failovermode: Optional, failover mode.
+        :type failovermode: :class:`str`
+        :param array_specific_options: optional parameters to be passed
+                         directly to backend storage command, default blank.
+        :type array_specific_options: :class:`str`
+        :returns: The storage groups of the specs, keyed by name.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if a spec is invalid.
+            No HBA is registered.
+        :raises SanApiOperationFailedException: Raised if a WWN is not in
+            the port list, no HBA is registered, or if a path could not be
+            registered, the other paths are still registered.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            sgs = create_hosts_initiators([
+                {"sg_name": "sg1",
+                 "wwn": "50:01:43:80:16:7D:C4:5F:50:01:43:80:16:7D:C4:5E"},
+                {"sg_name": "sg2",
+                 "wwn": "50:01:43:80:16:7D:C4:6F:50:01:43:80:16:7D:C4:6E",
+                 "host_name": "atrcxb124", "host_ip": "1.2.3.5"}])
+        """
+        raise NotImplementedError()
+
     def create_host_initiator(self, sg_name, host_name, host_ip, wwn, \
                               storage_processor, sp_port, arraycommpath="1", \
                               init_type="3", failovermode="4", \
@@ -708,6 +828,28 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def get_storage_group_inventory(self):
+        """
+        Returns all of the SAN's storage groups in one read, indexed so
+        that the storage groups which present a LUN, the storage group an
+        HBA is registered to and the HLUs in use in a storage group are
+        found without scanning every storage group.
+
+        :returns: The storage group inventory.
+        :rtype: :class:`StorageGroupInventory` object.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            inventory = vnx.get_storage_group_inventory()
+            # the storage groups which can see LUN 42
+            sgs = inventory.groups_with_alu("42")
+            sg = inventory.get_by_hba_uid(wwn)
+        """
+        raise NotImplementedError()
+
     def create_storage_group(self, sg_name):
         """
         Creates a storage group and returns a StorageGroupInfo object
@@ -779,6 +921,34 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def add_luns_to_storage_group(self, sg_name, hlu_alu_pairs):
+        """
+        Assigns several LUNs to a storage group. All pairs are validated
+        before any LUN is assigned and the storage group is read once at
+        the end.
+
+        :param sg_name: Storage group name to add the LUNs to.
+        :type sg_name: :class:`str`
+        :param hlu_alu_pairs: The host logical unit and actual logical unit
+            of each LUN.
+        :type hlu_alu_pairs: :class:`list` of :class:`tuple`
+        :returns: The storage group.
+        :rtype: :class:`StorageGroupInfo`
+        :raises SanApiCriticalErrorException: Raised if the storage group
+            name, an HLU or an ALU is invalid. No LUN is assigned.
+        :raises SanApiEntityNotFoundException: Raised if the storage group
+            or an ALU is not found.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            add_luns_to_storage_group("Storage_Group_Name",
+                                      [("0", "12"), ("1", "13")])
+        """
+        raise NotImplementedError()
+
     def remove_luns_from_storage_group(self, sg_name, hlus):
         """
         Removes LUN associations from a storage group. The hlus parameter
@@ -842,6 +1012,39 @@ class SanApi(object):
         """
         raise NotImplementedError()
 
+    def teardown_hosts(self, sg_names=None, wwns=None):
+        """
+        Removes the hosts of a cluster from the SAN: disconnects the hosts
+        of the storage groups, deregisters the HBAs and deletes the storage
+        groups. The storage groups and HBAs are read once up front and
+        those already gone are skipped. The work runs concurrently where
+        the array allows, and a failure does not stop the other removals.
+
+        :param sg_names: Optional, names of storage groups to delete.
+        :type sg_names: :class:`list` of :class:`str`
+        :param wwns: Optional, WWNs of HBAs to deregister.
+        :type wwns: :class:`list` of :class:`str`
+        :returns: The outcome for each storage group name and each WWN, one
+            of removed, not found or failed, see sanapilib.TEARDOWN_REMOVED,
+            TEARDOWN_NOT_FOUND and TEARDOWN_FAILED, keyed by
+            storage_groups and hbas.
+        :rtype: :class:`dict` of :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if nothing is given, or
+            a name or WWN is invalid. Nothing is removed.
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            outcomes = teardown_hosts(sg_names=["sg1", "sg2"],
+                wwns=["50:01:43:80:16:7D:C4:5F:50:01:43:80:16:7D:C4:5E"])
+            failed = [sg for sg, outcome
+                      in outcomes["storage_groups"].items()
+                      if outcome == sanapilib.TEARDOWN_FAILED]
+        """
+        raise NotImplementedError()
+
     def storage_group_exists(self, sg_name):
         """
         Determines if a storage group exists.
@@ -1270,3 +1473,103 @@ class SanApi(object):
 
         raise NotImplementedError
 
+
+    """ Cache API Functions """
+
+    def refresh(self, incremental=False):
+        """
+        Drops any array information cached by the API object, so the next
+        call reads it from the array again.
+
+        :param incremental: Optional, boolean to only read again the
+            information which changed, where the array supports it.
+        :type incremental: :class:`boolean`
+
+        :raises NotImplementedError: Function currently unimplemented.
+
+        Example:
+
+        .. code-block:: python
+
+            vnx.refresh()
+            luns = vnx.get_luns()
+
+        """
+        raise NotImplementedError()
+
+    def cache_stats(self):
+        """
+        Returns the statistics of the caches of array information, e.g.
+        hits, misses and the age of the cached LUN inventory.
+
+        :returns: The statistics of each cache, keyed by cache name.
+        :rtype: :class:`dict`
+        :raises NotImplementedError: Function currently unimplemented.
+        """
+        raise NotImplementedError()
+
+    """ Read After Write Functions """
+
+    def set_read_after_write(self, mode):
+        """
+        Sets what the methods which change the array return in place of
+        the changed object they read back, e.g. the storage group returned
+        by add_lun_to_storage_group.
+
+        :param mode: eager to read the object before returning it, the
+            default, lazy to return a LazyResult which reads the object
+            when it is first used, or off to return None.
+        :type mode: :class:`str`
+        :raises SanApiCriticalErrorException: Raised if the mode is unknown.
+
+        Example:
+
+        .. code-block:: python
+
+            vnx.set_read_after_write("off")
+            # no storage group read
+            vnx.add_lun_to_storage_group("sg1", "0", "12")
+        """
+        self._read_after_write = validate_read_after_write(mode)
+
+    def _written(self, reader, *args, **kwargs):
+        """
+        Returns the object read back after a change, as set by
+        set_read_after_write.
+
+        :param reader: The method reading the object, e.g.
+            get_storage_group.
+        :type reader: :class:`callable`
+        :param args: Positional arguments passed to reader.
+        :param kwargs: Keyword arguments passed to reader.
+        :returns: The object, a LazyResult or None.
+        """
+        mode = getattr(self, '_read_after_write', READ_AFTER_WRITE_EAGER)
+        if mode == READ_AFTER_WRITE_OFF:
+            return None
+        if mode == READ_AFTER_WRITE_LAZY:
+            return LazyResult(reader, *args, **kwargs)
+        return reader(*args, **kwargs)
+
+    def _storage_groups_named(self, sg_names):
+        """
+        Reads several storage groups with one read of all storage groups,
+        e.g. after a change to each of them.
+
+        :param sg_names: The storage group names.
+        :type sg_names: :class:`list` of :class:`str`
+        :returns: The storage groups keyed by name.
+        :rtype: :class:`dict`
+        :raises SanApiEntityNotFoundException: Raised if a storage group is
+            not found.
+        """
+        inventory = self.get_storage_group_inventory()
+        sgs = dict()
+        for sg_name in sg_names:
+            sg = inventory.get_by_name(sg_name)
+            if sg is None:
+                errmsg = "Storage Group %s not found: " % sg_name
+                self.logger.error(errmsg)
+                raise SanApiEntityNotFoundException(errmsg, 1)
+            sgs[sg_name] = sg
+        return sgs
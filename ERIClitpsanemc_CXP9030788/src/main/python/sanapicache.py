@@ -0,0 +1,174 @@
+"""
+File name: sanapicache.py
+Version: ${project.version}
+
+Time limited cache for information read from an array, e.g. the LUN
+inventory. A cached value is returned until its time to live has passed or
+it is invalidated by a change made through the API. A time to live of 0
+disables the cache, every read then goes to the array.
+"""
+
+import threading
+import time
+
+
+class SanApiCache(object):
+    """
+    Holds one value read from the array together with hit and miss
+    counters. Thread safe.
+    """
+
+    def __init__(self, name, ttl=0, logger=None, clock=time.time):
+        """
+        :param name: Name of the cached information, used in logs and
+            statistics.
+        :type name: :class:`str`
+        :param ttl: Seconds a value stays valid, 0 to disable the cache.
+        :type ttl: :class:`float`
+        :param logger: A logger object.
+        :type logger: :class:`logger`
+        """
+        self.name = name
+        self.logger = logger
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.configure(ttl)
+
+    def configure(self, ttl):
+        """
+        Sets the time to live, dropping the cached value.
+
+        :param ttl: Seconds a value stays valid, 0 to disable the cache.
+        :type ttl: :class:`float`
+        """
+        self.ttl = max(0.0, float(ttl))
+        self.invalidate()
+
+    @property
+    def enabled(self):
+        """
+        True if values are cached.
+        """
+        return self.ttl > 0
+
+    def _valid(self):
+        return self._loaded_at is not None and \
+            self._clock() - self._loaded_at < self.ttl
+
+    def _log(self, msg):
+        if self.logger:
+            self.logger.debug(msg)
+
+    def get(self, loader):
+        """
+        Returns the cached value, reading it with loader if there is no
+        valid value.
+
+        :param loader: Called without arguments to read the value.
+        :type loader: :class:`callable`
+        :returns: The value.
+        """
+        self._lock.acquire()
+        try:
+            if self.enabled and self._valid():
+                self.hits += 1
+                return self._value
+            self.misses += 1
+            generation = self._generation
+        finally:
+            self._lock.release()
+        return self._load(loader, generation)
+
+    def refresh(self, loader):
+        """
+        Reads the value again, whether or not the cached value is valid.
+
+        :param loader: Called without arguments to read the value.
+        :type loader: :class:`callable`
+        :returns: The value.
+        """
+        self._lock.acquire()
+        try:
+            self._drop()
+            generation = self._generation
+        finally:
+            self._lock.release()
+        return self._load(loader, generation)
+
+    def _load(self, loader, generation):
+        value = loader()
+        self._lock.acquire()
+        try:
+            self.loads += 1
+            # a change made while reading makes the value stale already
+            if self.enabled and generation == self._generation:
+                self._value = value
+                self._loaded_at = self._clock()
+                self._log("Cached %s for %s seconds" % (self.name, self.ttl))
+            return value
+        finally:
+            self._lock.release()
+
+    def update(self, func):
+        """
+        Applies a change made through the API to the cached value instead
+        of dropping it. Nothing is done if no valid value is cached.
+
+        :param func: Called with the cached value, returns the new value.
+        :type func: :class:`callable`
+        """
+        self._lock.acquire()
+        try:
+            if not (self.enabled and self._valid()):
+                return
+            self._value = func(self._value)
+            # a read started before the change must not replace the value
+            self._generation += 1
+            self._log("Updated cached %s" % self.name)
+        finally:
+            self._lock.release()
+
+    def _drop(self):
+        self._value = None
+        self._loaded_at = None
+        self._generation += 1
+
+    def invalidate(self):
+        """
+        Drops the cached value, e.g. after the array has been changed.
+        """
+        self._lock.acquire()
+        try:
+            if self._loaded_at is not None:
+                self.invalidations += 1
+                self._log("Invalidated cached %s" % self.name)
+            self._drop()
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """
+        Returns the cache statistics.
+
+        :returns: The time to live, counters and age of the cached value
+            in seconds, None if nothing is cached.
+        :rtype: :class:`dict`
+        """
+        self._lock.acquire()
+        try:
+            age = None
+            if self._loaded_at is not None:
+                age = self._clock() - self._loaded_at
+            return {'name': self.name, 'ttl': self.ttl,
+                    'enabled': self.enabled, 'hits': self.hits,
+                    'misses': self.misses, 'loads': self.loads,
+                    'invalidations': self.invalidations, 'age': age}
+        finally:
+            self._lock.release()
@@ -108,3 +108,38 @@ class SanApiMissingInformationException(SanApiException):
     :vartype SanApiException: :class:`Exception`
     """
     pass
+
+
+class SanApiTimeoutException(SanApiConnectionException):
+    """
+    This exception gets thrown by SANAPI when an operation could not
+    complete before its deadline expired.
+
+    :ivar SanApiException: The SAN API Exception object.
+    :vartype SanApiException: :class:`Exception`
+    """
+    pass
+
+
+class SanApiPartialFailureException(SanApiOperationFailedException):
+    """
+    This exception gets thrown by SANAPI when an operation on several
+    entities, e.g. create_luns, fails for some of them. What succeeded is
+    not undone.
+
+    :ivar SanApiPartialFailureException.succeeded: The entities the
+        operation succeeded for, e.g. the LunInfo objects of the LUNs
+        created.
+    :vartype SanApiPartialFailureException.succeeded: :class:`list`
+    :ivar SanApiPartialFailureException.failed: The exception raised for
+        each entity the operation failed for, keyed by name.
+    :vartype SanApiPartialFailureException.failed: :class:`dict`
+    """
+
+    def __init__(self, message, ReturnCode, succeeded=None, failed=None):
+        """
+        Constructor.
+        """
+        SanApiOperationFailedException.__init__(self, message, ReturnCode)
+        self.succeeded = succeeded or []
+        self.failed = failed or {}
@@ -0,0 +1,260 @@
+"""
+File name: sanapiexecutor.py
+Version: ${project.version}
+
+Bounded thread pool used by the San API to run independent array commands
+concurrently. One executor is shared by every API object talking to the same
+array so that the configured limit applies per array rather than per caller.
+"""
+
+import sys
+import threading
+import Queue
+
+from sanapiexception import SanApiCriticalErrorException
+
+
+class SanApiTaskResult(object):
+    """
+    Outcome of a single task run by a :class:`SanApiExecutor`. Holds either
+    the value returned by the task or the exception it raised.
+    """
+
+    def __init__(self, value=None, exc_info=None):
+        """
+        :param value: The value returned by the task.
+        :type value: :class:`object`
+        :param exc_info: The sys.exc_info() tuple if the task raised.
+        :type exc_info: :class:`tuple`
+        """
+        self._value = value
+        self._exc_info = exc_info
+
+    @property
+    def ok(self):
+        """
+        True if the task completed without raising.
+        """
+        return self._exc_info is None
+
+    @property
+    def value(self):
+        """
+        The value returned by the task, None if it raised.
+        """
+        return self._value
+
+    @property
+    def exception(self):
+        """
+        The exception raised by the task, None if it completed.
+        """
+        if self._exc_info is None:
+            return None
+        return self._exc_info[1]
+
+    def get(self):
+        """
+        Returns the task value, re-raising the task exception if it failed.
+
+        :returns: The value returned by the task.
+        :rtype: :class:`object`
+        """
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+
+class SanApiExecutor(object):
+    """
+    Runs batches of callables on at most max_workers threads at a time.
+    Results are returned in submission order. A task submitted from inside
+    a worker thread is run inline so nested batches cannot exhaust the pool.
+    """
+
+    def __init__(self, max_workers=1, logger=None):
+        """
+        :param max_workers: Maximum number of tasks run at the same time.
+        :type max_workers: :class:`int`
+        :param logger: A logger object.
+        :type logger: :class:`logger`
+        :raises SanApiCriticalErrorException: Raised if max_workers is
+            not a positive integer.
+        """
+        max_workers = _validate_max_workers(max_workers)
+        self.logger = logger
+        self._max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._local = threading.local()
+
+    @property
+    def max_workers(self):
+        """
+        Maximum number of tasks run at the same time.
+        """
+        return self._max_workers
+
+    def in_worker(self):
+        """
+        Checks if the calling thread is a worker of this executor.
+
+        :returns: True if called from a task run by this executor.
+        :rtype: :class:`boolean`
+        """
+        return getattr(self._local, 'worker', False)
+
+    def _run_task(self, task, scope=None):
+        """
+        Runs a single (func, args, kwargs) task, within scope if given, and
+        wraps the outcome.
+        """
+        func, args, kwargs = task
+        try:
+            if scope is None:
+                return SanApiTaskResult(value=func(*args, **kwargs))
+            with scope():
+                return SanApiTaskResult(value=func(*args, **kwargs))
+        except Exception:
+            return SanApiTaskResult(exc_info=sys.exc_info())
+
+    def _worker(self, tasks, pending, results, scope):
+        """
+        Worker thread body, takes task indexes from the queue until empty.
+        """
+        self._local.worker = True
+        while True:
+            try:
+                index = pending.get_nowait()
+            except Queue.Empty:
+                return
+            self._slots.acquire()
+            try:
+                results[index] = self._run_task(tasks[index], scope)
+            finally:
+                self._slots.release()
+
+    def run(self, tasks, scope=None):
+        """
+        Runs the tasks concurrently and waits for all of them to finish.
+
+        :param tasks: The tasks to run, each a callable or a tuple of
+            (callable, args) or (callable, args, kwargs).
+        :type tasks: :class:`list`
+        :param scope: Optional, returns a context manager each task is run
+            in, e.g. to carry the thread local state of the caller over to
+            the worker threads.
+        :type scope: :class:`callable`
+        :returns: One result per task, in submission order.
+        :rtype: :class:`list` of :class:`SanApiTaskResult`
+        """
+        tasks = [_normalise_task(task) for task in tasks]
+        if not tasks:
+            return []
+
+        if len(tasks) == 1 or self._max_workers == 1 or self.in_worker():
+            return [self._run_task(task, scope) for task in tasks]
+
+        pending = Queue.Queue()
+        for index in range(len(tasks)):
+            pending.put(index)
+        results = [None] * len(tasks)
+
+        num_threads = min(self._max_workers, len(tasks))
+        if self.logger:
+            self.logger.debug("Running %s tasks on %s threads" %
+                              (len(tasks), num_threads))
+        threads = []
+        for _ in range(num_threads):
+            thread = threading.Thread(target=self._worker,
+                                      args=(tasks, pending, results, scope))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def map(self, func, items, scope=None):
+        """
+        Runs func once per item concurrently.
+
+        :param func: The callable, called with a single item.
+        :type func: :class:`callable`
+        :param items: The items to pass to func.
+        :type items: :class:`list`
+        :param scope: Optional, as for :meth:`run`.
+        :type scope: :class:`callable`
+        :returns: One result per item, in the order of items.
+        :rtype: :class:`list` of :class:`SanApiTaskResult`
+        """
+        return self.run([(func, (item,)) for item in items], scope)
+
+
+def _validate_max_workers(max_workers):
+    """
+    Converts a worker count to a positive integer.
+
+    :raises SanApiCriticalErrorException: Raised if max_workers is not a
+        positive integer.
+    """
+    try:
+        max_workers = int(max_workers)
+    except (TypeError, ValueError):
+        max_workers = 0
+    if max_workers < 1:
+        raise SanApiCriticalErrorException("Invalid executor worker " \
+                                       "count, must be a positive integer", 1)
+    return max_workers
+
+
+def _normalise_task(task):
+    """
+    Converts a task to a (func, args, kwargs) tuple.
+    """
+    if callable(task):
+        return (task, (), {})
+    func = task[0]
+    args = tuple(task[1]) if len(task) > 1 else ()
+    kwargs = dict(task[2]) if len(task) > 2 else {}
+    return (func, args, kwargs)
+
+
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_array_executor(array_key, max_workers, logger=None):
+    """
+    Returns the executor shared by all API objects for an array, creating
+    it on first use. Like the other per-array registries, the array keeps
+    its first settings so that the concurrency bound holds across all of
+    its API objects; a later request with a different limit is logged and
+    runs under the existing one.
+
+    :param array_key: Identifies the array, e.g. its tuple of SP IPs.
+    :type array_key: :class:`tuple`
+    :param max_workers: Maximum number of concurrent tasks on the array.
+    :type max_workers: :class:`int`
+    :param logger: A logger object.
+    :type logger: :class:`logger`
+    :returns: The executor for the array.
+    :rtype: :class:`SanApiExecutor`
+    :raises SanApiCriticalErrorException: Raised if max_workers is not a
+        positive integer.
+    """
+    key = tuple(sorted(array_key))
+    max_workers = _validate_max_workers(max_workers)
+    _EXECUTORS_LOCK.acquire()
+    try:
+        executor = _EXECUTORS.get(key)
+        if executor is None:
+            executor = SanApiExecutor(max_workers, logger)
+            _EXECUTORS[key] = executor
+        elif executor.max_workers != max_workers:
+            if logger:
+                logger.warn("Ignoring a limit of %s concurrent tasks, "
+                            "the array already runs at most %s" %
+                            (max_workers, executor.max_workers))
+        return executor
+    finally:
+        _EXECUTORS_LOCK.release()
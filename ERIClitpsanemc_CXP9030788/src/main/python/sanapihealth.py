@@ -0,0 +1,292 @@
+"""
+File name: sanapihealth.py
+Version: ${project.version}
+
+Tracks the health of the storage processors of an array so that commands
+are sent to a responsive SP first. Each SP has a circuit breaker which opens
+after repeated connection failures. An open SP is skipped until its reset
+time has passed, after which it is half-open and a single success closes it.
+"""
+
+import threading
+import time
+
+BREAKER_CLOSED = 'closed'
+BREAKER_HALF_OPEN = 'half-open'
+BREAKER_OPEN = 'open'
+
+_STATE_RANK = {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 1, BREAKER_OPEN: 2}
+
+
+class SpHealth(object):
+    """
+    Health of a single storage processor.
+    """
+
+    def __init__(self, sp_ip):
+        self.sp_ip = sp_ip
+        self.latency = None
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.state = BREAKER_CLOSED
+        self.opened_at = None
+
+    def as_dict(self):
+        """
+        Returns the health figures as a dictionary.
+
+        :rtype: :class:`dict`
+        """
+        return {'sp_ip': self.sp_ip, 'latency': self.latency,
+                'consecutive_failures': self.consecutive_failures,
+                'successes': self.successes, 'failures': self.failures,
+                'state': self.state}
+
+
+class SpHealthRegistry(object):
+    """
+    Health of the storage processors of one array. Thread safe.
+    """
+
+    def __init__(self, failure_threshold=3, reset_time=60, alpha=0.3,
+                 slow_latency=None, logger=None, clock=time.time):
+        """
+        :param failure_threshold: Consecutive failures that open the
+            breaker of an SP.
+        :type failure_threshold: :class:`int`
+        :param reset_time: Seconds an open breaker stays open before a
+            probe is allowed.
+        :type reset_time: :class:`float`
+        :param alpha: Weight of the newest sample in the latency average.
+        :type alpha: :class:`float`
+        :param slow_latency: Average latency in seconds above which an SP
+            is tried after faster ones, None to ignore latency.
+        :type slow_latency: :class:`float`
+        :param logger: A logger object.
+        :type logger: :class:`logger`
+        """
+        self.logger = logger
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sps = {}
+        self.configure(failure_threshold, reset_time, alpha, slow_latency)
+
+    def configure(self, failure_threshold, reset_time, alpha,
+                  slow_latency=None):
+        """
+        Updates the breaker and latency settings.
+        """
+        (self.failure_threshold, self.reset_time, self.alpha,
+         self.slow_latency) = _normalise_settings(failure_threshold,
+                                                  reset_time, alpha,
+                                                  slow_latency)
+
+    def settings(self):
+        """
+        Returns the breaker and latency settings.
+
+        :returns: failure_threshold, reset_time, alpha and slow_latency.
+        :rtype: :class:`tuple`
+        """
+        return (self.failure_threshold, self.reset_time, self.alpha,
+                self.slow_latency)
+
+    def _get(self, sp_ip):
+        health = self._sps.get(sp_ip)
+        if health is None:
+            health = SpHealth(sp_ip)
+            self._sps[sp_ip] = health
+        return health
+
+    def _refresh_state(self, health):
+        if health.state == BREAKER_OPEN and \
+                self._clock() - health.opened_at >= self.reset_time:
+            health.state = BREAKER_HALF_OPEN
+            self._log("SP %s breaker half-open, allowing probe" %
+                      health.sp_ip)
+
+    def _log(self, msg, warn=False):
+        if self.logger:
+            if warn:
+                self.logger.warn(msg)
+            else:
+                self.logger.debug(msg)
+
+    def state(self, sp_ip):
+        """
+        Returns the breaker state of an SP.
+
+        :param sp_ip: The SP IP address.
+        :type sp_ip: :class:`str`
+        :returns: One of closed, half-open or open.
+        :rtype: :class:`str`
+        """
+        self._lock.acquire()
+        try:
+            health = self._get(sp_ip)
+            self._refresh_state(health)
+            return health.state
+        finally:
+            self._lock.release()
+
+    def order(self, sp_ips):
+        """
+        Returns the SPs in the order they should be tried: closed before
+        half-open, SPs without recent failures before failing ones, fast
+        before slow, otherwise in the configured order. SPs with an open
+        breaker are left out unless every SP is open.
+
+        :param sp_ips: The SP IP addresses in configured order.
+        :type sp_ips: :class:`list`
+        :returns: The SP IP addresses to try.
+        :rtype: :class:`list`
+        """
+        self._lock.acquire()
+        try:
+            ranked = []
+            for index, sp_ip in enumerate(sp_ips):
+                health = self._get(sp_ip)
+                self._refresh_state(health)
+                slow = self.slow_latency is not None and \
+                    health.latency is not None and \
+                    health.latency > self.slow_latency
+                ranked.append(((_STATE_RANK[health.state],
+                                health.consecutive_failures > 0,
+                                slow, index), sp_ip))
+            ranked.sort()
+            usable = [sp_ip for key, sp_ip in ranked
+                      if key[0] != _STATE_RANK[BREAKER_OPEN]]
+            if not usable:
+                self._log("All SP breakers are open, trying every SP")
+                return list(sp_ips)
+            return usable
+        finally:
+            self._lock.release()
+
+    def record_success(self, sp_ip, latency):
+        """
+        Records an answer from an SP, closing its breaker.
+
+        :param sp_ip: The SP IP address.
+        :type sp_ip: :class:`str`
+        :param latency: Seconds the SP took to answer.
+        :type latency: :class:`float`
+        """
+        self._lock.acquire()
+        try:
+            health = self._get(sp_ip)
+            if health.latency is None:
+                health.latency = float(latency)
+            else:
+                health.latency = self.alpha * latency + \
+                                 (1 - self.alpha) * health.latency
+            health.successes += 1
+            health.consecutive_failures = 0
+            if health.state != BREAKER_CLOSED:
+                self._log("SP %s answered, closing breaker" % sp_ip)
+            health.state = BREAKER_CLOSED
+            health.opened_at = None
+        finally:
+            self._lock.release()
+
+    def record_failure(self, sp_ip):
+        """
+        Records a connection failure, opening the breaker of the SP if it
+        was half-open or has reached the failure threshold.
+
+        :param sp_ip: The SP IP address.
+        :type sp_ip: :class:`str`
+        """
+        self._lock.acquire()
+        try:
+            health = self._get(sp_ip)
+            self._refresh_state(health)
+            health.failures += 1
+            health.consecutive_failures += 1
+            if health.state == BREAKER_HALF_OPEN or \
+                    (health.state == BREAKER_CLOSED and
+                     health.consecutive_failures >= self.failure_threshold):
+                self._log("SP %s failed %s times in a row, opening breaker "
+                          "for %s seconds" % (sp_ip,
+                                              health.consecutive_failures,
+                                              self.reset_time), warn=True)
+                health.state = BREAKER_OPEN
+                health.opened_at = self._clock()
+        finally:
+            self._lock.release()
+
+    def get_health(self, sp_ip):
+        """
+        Returns the health figures of an SP.
+
+        :param sp_ip: The SP IP address.
+        :type sp_ip: :class:`str`
+        :rtype: :class:`dict`
+        """
+        self._lock.acquire()
+        try:
+            health = self._get(sp_ip)
+            self._refresh_state(health)
+            return health.as_dict()
+        finally:
+            self._lock.release()
+
+
+def _normalise_settings(failure_threshold, reset_time, alpha, slow_latency):
+    """
+    Converts the breaker and latency settings to the values a registry
+    uses.
+    """
+    if slow_latency is not None:
+        slow_latency = float(slow_latency)
+    return (max(1, int(failure_threshold)), float(reset_time),
+            min(1.0, max(0.0, float(alpha))), slow_latency)
+
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_array_health(array_key, failure_threshold=3, reset_time=60,
+                     alpha=0.3, slow_latency=None, logger=None):
+    """
+    Returns the SP health registry shared by all API objects for an array,
+    creating it on first use. Like the other per-array registries, the
+    array keeps its first settings; a later request with different
+    settings is logged and uses the existing ones.
+
+    :param array_key: Identifies the array, e.g. its tuple of SP IPs.
+    :type array_key: :class:`tuple`
+    :returns: The registry for the array.
+    :rtype: :class:`SpHealthRegistry`
+    """
+    key = tuple(sorted(array_key))
+    _REGISTRIES_LOCK.acquire()
+    try:
+        registry = _REGISTRIES.get(key)
+        if registry is None:
+            registry = SpHealthRegistry(failure_threshold, reset_time, alpha,
+                                        slow_latency, logger)
+            _REGISTRIES[key] = registry
+        else:
+            settings = _normalise_settings(failure_threshold, reset_time,
+                                           alpha, slow_latency)
+            if registry.settings() != settings and logger:
+                logger.warn("Ignoring SP health settings %s, the array "
+                            "already uses %s" %
+                            (settings, registry.settings()))
+        return registry
+    finally:
+        _REGISTRIES_LOCK.release()
+
+
+def reset_sp_health():
+    """
+    Forgets the health of every array.
+    """
+    _REGISTRIES_LOCK.acquire()
+    try:
+        _REGISTRIES.clear()
+    finally:
+        _REGISTRIES_LOCK.release()
@@ -0,0 +1,417 @@
+"""
+File name: sanapiinventory.py
+Version: ${project.version}
+
+Indexed inventories of the LUNs, storage groups and HBA port list read
+from an array. An inventory is built once per read of the array and
+answers lookups from hash indexes instead of scanning the full list for
+every lookup: LUNs by ID, name, UID, container and owning SP, storage
+groups by name, ALU, HBA UID and HLUs in use, port list entries by HBA
+UID, server name, server IP and SP port.
+"""
+
+
+class LunInventory(object):
+    """
+    The LUNs of an array, in the order the array listed them, indexed by
+    ID, name, UID, container and current owner.
+
+    Example:
+
+        .. code-block:: python
+
+            inventory = LunInventory(luns)
+            lun = inventory.get_by_id("12")
+            rgluns = inventory.in_container("RaidGroup", "3")
+    """
+
+    def __init__(self, luns):
+        """
+        :param luns: The LUNs.
+        :type luns: :class:`list` of :class:`LunInfo`
+        """
+        self._luns = list(luns)
+        self._position = {}
+        self._by_id = {}
+        self._by_name = {}
+        self._by_uid = {}
+        self._by_container = {}
+        self._by_controller = {}
+        for position, lun in enumerate(self._luns):
+            self._position[id(lun)] = position
+            self._by_id.setdefault(lun.id, lun)
+            self._by_name.setdefault(lun.name, []).append(lun)
+            if lun.uid:
+                self._by_uid.setdefault(lun.uid.upper(), lun)
+            self._by_container.setdefault((lun.type, None), []).append(lun)
+            self._by_container.setdefault((lun.type, lun.container),
+                                          []).append(lun)
+            self._by_controller.setdefault(lun.controller, []).append(lun)
+
+    def __iter__(self):
+        return iter(self._luns)
+
+    def __len__(self):
+        return len(self._luns)
+
+    def __contains__(self, lun_id):
+        return str(lun_id) in self._by_id
+
+    def all(self):
+        """
+        Returns all LUNs, in the order the array listed them.
+
+        :rtype: :class:`list` of :class:`LunInfo`
+        """
+        return list(self._luns)
+
+    def ids(self):
+        """
+        Returns the IDs of all LUNs.
+
+        :rtype: :class:`list` of :class:`str`
+        """
+        return self._by_id.keys()
+
+    def get_by_id(self, lun_id):
+        """
+        Returns the LUN with an ID.
+
+        :param lun_id: The LUN ID.
+        :type lun_id: :class:`str`
+        :returns: The LUN, None if there is no LUN with the ID.
+        :rtype: :class:`LunInfo`
+        """
+        return self._by_id.get(str(lun_id))
+
+    def get_by_uid(self, uid):
+        """
+        Returns the LUN with a UID, ignoring case.
+
+        :param uid: The LUN UID, e.g. 60:06:01:60:...
+        :type uid: :class:`str`
+        :returns: The LUN, None if there is no LUN with the UID.
+        :rtype: :class:`LunInfo`
+        """
+        if not uid:
+            return None
+        return self._by_uid.get(uid.upper())
+
+    def find_by_name(self, name, container_type=None):
+        """
+        Returns the LUNs with a name. LUNs in different containers may
+        share a name.
+
+        :param name: The LUN name.
+        :type name: :class:`str`
+        :param container_type: Optional, only return LUNs in this type of
+            container, StoragePool or RaidGroup.
+        :type container_type: :class:`str`
+        :rtype: :class:`list` of :class:`LunInfo`
+        """
+        luns = self._by_name.get(name, [])
+        if container_type is None:
+            return list(luns)
+        return [lun for lun in luns if lun.type == container_type]
+
+    def in_container(self, container_type, container=None):
+        """
+        Returns the LUNs in a type of container.
+
+        :param container_type: The container type, StoragePool or
+            RaidGroup.
+        :type container_type: :class:`str`
+        :param container: Optional, the pool name or RAID group ID. All
+            containers of the type if not given.
+        :type container: :class:`str`
+        :rtype: :class:`list` of :class:`LunInfo`
+        """
+        return list(self._by_container.get((container_type, container), []))
+
+    def owned_by(self, controller):
+        """
+        Returns the LUNs currently owned by an SP.
+
+        :param controller: The SP, e.g. A or B.
+        :type controller: :class:`str`
+        :rtype: :class:`list` of :class:`LunInfo`
+        """
+        return list(self._by_controller.get(str(controller), []))
+
+    def get_by_ids(self, lun_ids):
+        """
+        Returns the LUNs with the given IDs, in the order the array listed
+        them. IDs without a LUN are ignored.
+
+        :param lun_ids: The LUN IDs.
+        :type lun_ids: :class:`list` of :class:`str`
+        :rtype: :class:`list` of :class:`LunInfo`
+        """
+        found = {}
+        for lun_id in lun_ids:
+            lun = self._by_id.get(str(lun_id))
+            if lun is not None:
+                found[self._position[id(lun)]] = lun
+        positions = found.keys()
+        positions.sort()
+        return [found[position] for position in positions]
+
+
+class StorageGroupInventory(object):
+    """
+    The storage groups of an array, in the order the array listed them,
+    indexed by name, by the ALUs they present and by the HBA UIDs
+    registered to them.
+
+    Example:
+
+        .. code-block:: python
+
+            inventory = StorageGroupInventory(sgs)
+            # the storage groups, and so the hosts, which can see LUN 42
+            sgs = inventory.groups_with_alu("42")
+            sg = inventory.get_by_hba_uid(wwn)
+    """
+
+    def __init__(self, sgs):
+        """
+        :param sgs: The storage groups.
+        :type sgs: :class:`list` of :class:`StorageGroupInfo`
+        """
+        self._sgs = list(sgs)
+        self._by_name = {}
+        self._by_alu = {}
+        self._by_hba_uid = {}
+        self._hlus = {}
+        for sg in self._sgs:
+            self._by_name.setdefault(sg.name, sg)
+            hlus = self._hlus.setdefault(sg.name, {})
+            for pair in sg.hlualu_list or []:
+                hlus[pair.hlu] = pair.alu
+                groups = self._by_alu.setdefault(pair.alu, [])
+                if not groups or groups[-1] is not sg:
+                    groups.append(sg)
+            for hbasp in sg.hbasp_list or []:
+                if hbasp.hbauid:
+                    self._by_hba_uid.setdefault(hbasp.hbauid, sg)
+
+    def __iter__(self):
+        return iter(self._sgs)
+
+    def __len__(self):
+        return len(self._sgs)
+
+    def __contains__(self, sg_name):
+        return sg_name in self._by_name
+
+    def all(self):
+        """
+        Returns all storage groups, in the order the array listed them.
+
+        :rtype: :class:`list` of :class:`StorageGroupInfo`
+        """
+        return list(self._sgs)
+
+    def names(self):
+        """
+        Returns the names of all storage groups.
+
+        :rtype: :class:`list` of :class:`str`
+        """
+        return self._by_name.keys()
+
+    def get_by_name(self, sg_name):
+        """
+        Returns the storage group with a name.
+
+        :param sg_name: The storage group name.
+        :type sg_name: :class:`str`
+        :returns: The storage group, None if there is no storage group
+            with the name.
+        :rtype: :class:`StorageGroupInfo`
+        """
+        return self._by_name.get(sg_name)
+
+    def groups_with_alu(self, alu):
+        """
+        Returns the storage groups which present a LUN.
+
+        :param alu: The ALU, i.e. the LUN ID.
+        :type alu: :class:`str`
+        :rtype: :class:`list` of :class:`StorageGroupInfo`
+        """
+        return list(self._by_alu.get(str(alu), []))
+
+    def get_by_hba_uid(self, hba_uid):
+        """
+        Returns the storage group an HBA is registered to. The HBA UID is
+        matched exactly as the array lists it.
+
+        :param hba_uid: The HBA UID, e.g. the WWN of the initiator.
+        :type hba_uid: :class:`str`
+        :returns: The storage group, None if the HBA is not registered.
+        :rtype: :class:`StorageGroupInfo`
+        """
+        if not hba_uid:
+            return None
+        return self._by_hba_uid.get(hba_uid)
+
+    def used_hlus(self, sg_name):
+        """
+        Returns the HLUs in use in a storage group and the ALU each one
+        presents.
+
+        :param sg_name: The storage group name.
+        :type sg_name: :class:`str`
+        :returns: The ALUs keyed by HLU, empty if there is no storage group
+            with the name.
+        :rtype: :class:`dict`
+        """
+        return dict(self._hlus.get(sg_name, {}))
+
+
+class HbaPortInventory(object):
+    """
+    The HBA port list of an array, in the order the array listed it,
+    indexed by HBA UID, server name, server IP and SP port. An HBA has an
+    entry for each SP port it is seen on.
+
+    Example:
+
+        .. code-block:: python
+
+            ports = HbaPortInventory(hbas)
+            paths = ports.find(hba_uid=wwn, storage_processor="A")
+    """
+
+    def __init__(self, hbas):
+        """
+        :param hbas: The port list entries.
+        :type hbas: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        self._hbas = list(hbas)
+        self._position = {}
+        self._by_uid = {}
+        self._by_name = {}
+        self._by_ip = {}
+        self._by_sp_port = {}
+        for position, hba in enumerate(self._hbas):
+            self._position[id(hba)] = position
+            if hba.hbauid:
+                self._by_uid.setdefault(hba.hbauid, []).append(hba)
+            if hba.hbaname is not None:
+                self._by_name.setdefault(hba.hbaname, []).append(hba)
+            if hba.hbaip is not None:
+                self._by_ip.setdefault(hba.hbaip, []).append(hba)
+            self._by_sp_port.setdefault((hba.spname, hba.spport),
+                                        []).append(hba)
+
+    def __iter__(self):
+        return iter(self._hbas)
+
+    def __len__(self):
+        return len(self._hbas)
+
+    def __contains__(self, hba_uid):
+        return bool(hba_uid) and hba_uid in self._by_uid
+
+    def all(self):
+        """
+        Returns all port list entries, in the order the array listed them.
+
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        return list(self._hbas)
+
+    def with_entry(self, hba):
+        """
+        Returns a copy of the port list with an entry set, e.g. after an
+        HBA was registered to a host on an SP port. The entry replaces the
+        one with the same HBA UID, SP and SP port, or is appended.
+
+        :param hba: The port list entry.
+        :type hba: :class:`HbaInitiatorInfo`
+        :rtype: :class:`HbaPortInventory`
+        """
+        hbas = list(self._hbas)
+        key = (hba.hbauid, hba.spname, hba.spport)
+        for position, entry in enumerate(hbas):
+            if (entry.hbauid, entry.spname, entry.spport) == key:
+                hbas[position] = hba
+                break
+        else:
+            hbas.append(hba)
+        return HbaPortInventory(hbas)
+
+    def get_by_uid(self, hba_uid):
+        """
+        Returns the entries of an HBA. The HBA UID is matched exactly as
+        the array lists it.
+
+        :param hba_uid: The HBA UID, e.g. the WWN of the initiator.
+        :type hba_uid: :class:`str`
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        if not hba_uid:
+            return []
+        return list(self._by_uid.get(hba_uid, []))
+
+    def find_by_host(self, host):
+        """
+        Returns the entries of the HBAs of a host.
+
+        :param host: The server name or IP of the host.
+        :type host: :class:`str`
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        found = {}
+        for hba in self._by_name.get(host, []) + self._by_ip.get(host, []):
+            found[self._position[id(hba)]] = hba
+        positions = found.keys()
+        positions.sort()
+        return [found[position] for position in positions]
+
+    def on_sp_port(self, storage_processor, sp_port):
+        """
+        Returns the entries seen on an SP port.
+
+        :param storage_processor: The SP name, e.g. A.
+        :type storage_processor: :class:`str`
+        :param sp_port: The SP port.
+        :type sp_port: :class:`str`
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        return list(self._by_sp_port.get((storage_processor, sp_port), []))
+
+    def find(self, hba_uid=None, host=None, storage_processor=None,
+             sp_port=None):
+        """
+        Returns the entries matching all of the given filters, in the
+        order the array listed them. The HBA UID or host lookup narrows
+        the entries before the SP and port are compared.
+
+        :param hba_uid: Optional, the HBA UID.
+        :type hba_uid: :class:`str`
+        :param host: Optional, the server name or IP.
+        :type host: :class:`str`
+        :param storage_processor: Optional, the SP name.
+        :type storage_processor: :class:`str`
+        :param sp_port: Optional, the SP port.
+        :type sp_port: :class:`str`
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        if hba_uid is not None:
+            hbas = self.get_by_uid(hba_uid)
+            if host is not None:
+                hbas = [hba for hba in hbas
+                        if host in (hba.hbaname, hba.hbaip)]
+        elif host is not None:
+            hbas = self.find_by_host(host)
+        elif storage_processor is not None and sp_port is not None:
+            return self.on_sp_port(storage_processor, sp_port)
+        else:
+            hbas = self._hbas
+        return [hba for hba in hbas
+                if (storage_processor is None or
+                    hba.spname == storage_processor) and
+                   (sp_port is None or hba.spport == sp_port)]
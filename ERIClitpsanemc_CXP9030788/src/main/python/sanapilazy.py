@@ -0,0 +1,129 @@
+"""
+File name: sanapilazy.py
+Version: ${project.version}
+
+Read-after-write modes of the San API. Most methods which change the array
+return the changed object, e.g. add_lun_to_storage_group returns the
+storage group, which costs another read of the array. A caller which does
+not use the result can turn the read off, or have it done only when the
+result is first used.
+"""
+
+import threading
+
+from sanapiexception import SanApiCriticalErrorException
+
+# read the changed object before returning it, the default
+READ_AFTER_WRITE_EAGER = 'eager'
+# return a LazyResult which reads the changed object when first used
+READ_AFTER_WRITE_LAZY = 'lazy'
+# return None instead of the changed object
+READ_AFTER_WRITE_OFF = 'off'
+
+READ_AFTER_WRITE_MODES = (READ_AFTER_WRITE_EAGER, READ_AFTER_WRITE_LAZY,
+                          READ_AFTER_WRITE_OFF)
+
+
+def validate_read_after_write(mode):
+    """
+    Checks a read-after-write mode.
+
+    :param mode: The mode, eager, lazy or off.
+    :type mode: :class:`str`
+    :returns: The mode.
+    :rtype: :class:`str`
+    :raises SanApiCriticalErrorException: Raised if the mode is unknown.
+    """
+    if mode not in READ_AFTER_WRITE_MODES:
+        raise SanApiCriticalErrorException("Invalid read after write mode "
+                        "%s, must be one of %s" %
+                        (mode, ", ".join(READ_AFTER_WRITE_MODES)), 1)
+    return mode
+
+
+class LazyResult(object):
+    """
+    Stands in for the result of a read which is only done when the result
+    is first used, e.g. when an attribute is accessed. The value read is
+    kept, so the read is done at most once. An exception raised by the
+    read is raised where the result is first used.
+
+    Example:
+
+        .. code-block:: python
+
+            sg = LazyResult(api.get_storage_group, "sg1")
+            # get_storage_group is called here
+            print sg.hlualu_list
+    """
+
+    def __init__(self, reader, *args, **kwargs):
+        """
+        :param reader: The callable doing the read.
+        :type reader: :class:`callable`
+        :param args: Positional arguments passed to reader.
+        :param kwargs: Keyword arguments passed to reader.
+        """
+        self._reader = (reader, args, kwargs)
+        self._lock = threading.Lock()
+        self._value = None
+
+    @property
+    def loaded(self):
+        """
+        True once the read has been done.
+        """
+        return self._reader is None
+
+    def resolve(self):
+        """
+        Returns the result, reading it on the first call.
+
+        :returns: The value returned by the read.
+        """
+        self._lock.acquire()
+        try:
+            if self._reader is not None:
+                reader, args, kwargs = self._reader
+                self._value = reader(*args, **kwargs)
+                self._reader = None
+            return self._value
+        finally:
+            self._lock.release()
+
+    def __getattr__(self, name):
+        # only called for attributes LazyResult does not have itself
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __str__(self):
+        return str(self.resolve())
+
+    def __repr__(self):
+        if not self.loaded:
+            return "<LazyResult of %r>" % (self._reader[0],)
+        return repr(self._value)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyResult):
+            other = other.resolve()
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __nonzero__(self):
+        return bool(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __contains__(self, item):
+        return item in self.resolve()
@@ -18,6 +18,12 @@ STORAGE_PROCESSOR_B = 'B'
 CONTAINER_RAID_GROUP = 'RaidGroup'
 CONTAINER_STORAGE_POOL = 'StoragePool'
 LUNID_AUTO = 'auto'
+LUN_DELETED = 'deleted'
+LUN_NOT_FOUND = 'not found'
+LUN_DELETE_FAILED = 'failed'
+TEARDOWN_REMOVED = 'removed'
+TEARDOWN_NOT_FOUND = 'not found'
+TEARDOWN_FAILED = 'failed'
 MIN_NAME_LEN = 2
 MAX_NAME_LEN = 255
 
@@ -1263,6 +1269,163 @@ def validate_lun_create(lun_name, size, container_type, container,
     return params
 
 
+# create_lun parameters of a LUN spec and their defaults, None if required
+LUN_SPEC_DEFAULTS = (("lun_name", None), ("size", None),
+                     ("container_type", None), ("container", None),
+                     ("storage_processor", "a"), ("raid_type", ""),
+                     ("lun_type", "thick"), ("lun_id", "auto"),
+                     ("ignore_thresholds", False),
+                     ("array_specific_options", ""))
+
+
+def validate_lun_create_specs(specs, logger):
+    """
+    Validates the LUN specs passed to create_luns, each a dictionary of
+    create_lun parameters, and returns the validate_lun_create dictionary
+    of each spec. All specs are validated before any is returned, so a
+    bad spec is found before any LUN is created.
+
+    :param specs: The LUN specs.
+    :type specs: :class:`list` of :class:`dict`
+    :param logger: A logger object.
+    :type logger: :class:`logger`
+    :returns: The validated parameters of each spec, in order.
+    :rtype: :class:`list` of :class:`dict`
+    :raises SanApiCriticalErrorException: Raised if a spec is invalid or
+        two specs name the same LUN.
+    """
+    names = set()
+    all_params = []
+    for spec in specs:
+        try:
+            unknown = set(spec.keys()) - \
+                      set([key for key, _ in LUN_SPEC_DEFAULTS])
+        except AttributeError:
+            raise_critical_ex("Invalid LUN spec: %s" % str(spec), logger)
+        if unknown:
+            raise_critical_ex("Invalid LUN spec parameters: %s"
+                    % ", ".join(sorted(unknown)), logger)
+        args = []
+        for key, default in LUN_SPEC_DEFAULTS:
+            if spec.get(key) is None and default is None:
+                raise_critical_ex("LUN spec missing %s: %s"
+                        % (key, str(spec)), logger)
+            args.append(spec.get(key, default))
+        params = validate_lun_create(*(args + [logger]))
+        if params["lun_name"] in names:
+            raise_critical_ex("Duplicate LUN name in specs: %s"
+                    % params["lun_name"], logger)
+        names.add(params["lun_name"])
+        all_params.append(params)
+    return all_params
+
+
+INITIATOR_SPEC_KEYS = ("sg_name", "wwn", "host_name", "host_ip")
+
+
+def validate_initiator_specs(specs, logger):
+    """
+    Validates the HBA specs passed to create_hosts_initiators, each a
+    dictionary with the storage group name and WWN of an HBA and,
+    optionally, the host name and IP to register it with. All specs are
+    validated before any is returned, so a bad spec is found before any
+    HBA is registered.
+
+    :param specs: The HBA specs.
+    :type specs: :class:`list` of :class:`dict`
+    :param logger: A logger object.
+    :type logger: :class:`logger`
+    :returns: The specs with every key set, in order.
+    :rtype: :class:`list` of :class:`dict`
+    :raises SanApiCriticalErrorException: Raised if a spec is invalid or
+        two specs name the same WWN.
+    """
+    wwns = set()
+    all_specs = []
+    for spec in specs:
+        try:
+            unknown = set(spec.keys()) - set(INITIATOR_SPEC_KEYS)
+        except AttributeError:
+            raise_critical_ex("Invalid HBA spec: %s" % str(spec), logger)
+        if unknown:
+            raise_critical_ex("Invalid HBA spec parameters: %s"
+                    % ", ".join(sorted(unknown)), logger)
+        params = dict()
+        for key in INITIATOR_SPEC_KEYS:
+            params[key] = spec.get(key)
+        if not params["sg_name"]:
+            raise_critical_ex("Invalid storage group name:" +
+                              str(params["sg_name"]), logger)
+        if not is_valid_wwn(params["wwn"]):
+            raise_critical_ex("Invalid HBA WWN:" + str(params["wwn"]),
+                              logger)
+        if bool(params["host_name"]) != bool(params["host_ip"]):
+            raise_critical_ex("Host name and host ip must be given "
+                              "together: %s" % str(spec), logger)
+        if params["host_ip"] and not validate_ipv4(params["host_ip"]):
+            raise_critical_ex("Invalid ip address:" +
+                              str(params["host_ip"]), logger)
+        if params["wwn"].upper() in wwns:
+            raise_critical_ex("Duplicate HBA WWN in specs: %s"
+                    % params["wwn"], logger)
+        wwns.add(params["wwn"].upper())
+        all_specs.append(params)
+    return all_specs
+
+
+def partial_failure_message(action, failed, total):
+    """
+    Returns the message of a SanApiPartialFailureException.
+
+    :param action: What failed, e.g. "LUN create".
+    :type action: :class:`str`
+    :param failed: The exception of each failed entity, keyed by name.
+    :type failed: :class:`dict`
+    :param total: The number of entities the operation was for.
+    :type total: :class:`int`
+    :rtype: :class:`str`
+    """
+    names = failed.keys()
+    names.sort()
+    return "%s failed for %s of %s: %s" % (action, len(failed), total,
+            "; ".join(["%s: %s" % (name, failed[name]) for name in names]))
+
+
+def validate_teardown_targets(sg_names, wwns, logger):
+    """
+    Validates the storage groups and HBAs passed to teardown_hosts.
+
+    :param sg_names: The storage group names.
+    :type sg_names: :class:`list` of :class:`str`
+    :param wwns: The HBA WWNs.
+    :type wwns: :class:`list` of :class:`str`
+    :param logger: A logger object.
+    :type logger: :class:`logger`
+    :returns: The storage group names and WWNs, each without duplicates,
+        in the order given.
+    :rtype: :class:`tuple` of two :class:`list`
+    :raises SanApiCriticalErrorException: Raised if nothing is given, or
+        a name or WWN is invalid.
+    """
+    all_sg_names = []
+    for sg_name in sg_names or []:
+        if not sg_name or not isinstance(sg_name, basestring):
+            raise_critical_ex("Invalid storage group name:" + str(sg_name),
+                              logger)
+        if sg_name not in all_sg_names:
+            all_sg_names.append(sg_name)
+    all_wwns = []
+    for wwn in wwns or []:
+        if not is_valid_wwn(wwn):
+            raise_critical_ex("Invalid HBA WWN:" + str(wwn), logger)
+        if wwn not in all_wwns:
+            all_wwns.append(wwn)
+    if not all_sg_names and not all_wwns:
+        raise_critical_ex("Neither storage groups nor WWNs were specified",
+                          logger)
+    return all_sg_names, all_wwns
+
+
 """Unity specific functions"""
 
 
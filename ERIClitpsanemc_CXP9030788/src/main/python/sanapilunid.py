@@ -0,0 +1,339 @@
+"""
+File name: sanapilunid.py
+Version: ${project.version}
+
+Hands out free LUN IDs for LUNs created with an automatically chosen ID.
+The IDs in use are kept in a bitmap loaded from the LUN IDs read from the
+array. An ID handed out is reserved until the LUN is created or the
+creation fails, so concurrent creators in the process never get the same
+ID. An optional reservation file, locked while it is read and written,
+extends the reservations to other processes on the host.
+"""
+
+import json
+import random
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from sanapiexception import SanApiOperationFailedException
+
+# seconds a reservation is kept if its creator never confirms or releases
+# it, e.g. because the process died
+RESERVATION_TTL = 300
+
+# a random ID is picked from this many of the lowest free IDs
+RANDOM_SPREAD = 5
+
+
+class LunIdAllocator(object):
+    """
+    Free LUN IDs of one array. Thread safe.
+
+    A reservation is confirmed once its LUN exists. A confirmed ID stays
+    reserved until LUN IDs read after the confirmation are loaded, as a
+    read started before it may not list the new LUN yet.
+
+    Example:
+
+        .. code-block:: python
+
+            allocator.load(lun_ids, started)
+            lun_id = allocator.reserve()
+            try:
+                bind(lun_id)
+            except SanApiEntityAlreadyExistsException:
+                allocator.mark_used(lun_id)
+            else:
+                allocator.confirm(lun_id)
+    """
+
+    def __init__(self, array_key, high_lun, reservation_file=None,
+                 logger=None, clock=time.time):
+        """
+        :param array_key: Identifies the array in the reservation file.
+        :type array_key: :class:`tuple`
+        :param high_lun: The LUN IDs are 0 to high_lun - 1.
+        :type high_lun: :class:`int`
+        :param reservation_file: Optional, path of the file sharing the
+            reservations with other processes.
+        :type reservation_file: :class:`str`
+        :param logger: A logger object.
+        :type logger: :class:`logger`
+        """
+        self.array_key = ','.join(sorted(array_key))
+        self.logger = logger
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._used = bytearray()
+        # lun id -> [expiry, time confirmed or None]
+        self._holds = {}
+        self.configure(high_lun, reservation_file)
+
+    def configure(self, high_lun, reservation_file=None):
+        """
+        Applies the ID range and reservation file, keeping the
+        reservations.
+        """
+        self._lock.acquire()
+        try:
+            self.high_lun = int(high_lun)
+            self.reservation_file = reservation_file or None
+            used = bytearray(max(len(self._used), (self.high_lun + 7) // 8))
+            used[:len(self._used)] = self._used
+            self._used = used
+        finally:
+            self._lock.release()
+
+    def now(self):
+        """
+        Returns the current time. Taken before the LUN IDs are read and
+        passed to load.
+        """
+        return self._clock()
+
+    def _is_used(self, lun_id):
+        if lun_id >> 3 >= len(self._used):
+            return False
+        return self._used[lun_id >> 3] & (1 << (lun_id & 7))
+
+    def _set_used(self, lun_id):
+        # IDs above high_lun are kept too, for callers with a higher limit
+        if lun_id < 0:
+            return
+        if lun_id >> 3 >= len(self._used):
+            self._used.extend(bytearray((lun_id >> 3) + 1 - len(self._used)))
+        self._used[lun_id >> 3] |= 1 << (lun_id & 7)
+
+    def _drop_stale(self, holds, started=None):
+        now = self._clock()
+        for lun_id, (expiry, confirmed) in holds.items():
+            if expiry <= now or (confirmed is not None and
+                                 started is not None and confirmed < started):
+                del holds[lun_id]
+
+    def load(self, lun_ids, started=None):
+        """
+        Replaces the IDs in use with the LUN IDs read from the array.
+
+        :param lun_ids: The LUN IDs.
+        :type lun_ids: :class:`list`
+        :param started: Optional, the time the read started, see now.
+            Confirmed reservations older than the read are dropped.
+        :type started: :class:`float`
+        """
+        used = bytearray((self.high_lun + 7) // 8)
+        self._lock.acquire()
+        try:
+            self._used = used
+            for lun_id in lun_ids:
+                self._set_used(int(lun_id))
+            self._drop_stale(self._holds, started)
+        finally:
+            self._lock.release()
+
+    def free_ids(self, count, limit=None):
+        """
+        Returns the lowest free LUN IDs which are not reserved.
+
+        :param count: The number of IDs.
+        :type count: :class:`int`
+        :param limit: Optional, the upper limit for the IDs of this call,
+            instead of high_lun. The range of the allocator is unchanged.
+        :type limit: :class:`int`
+        :rtype: :class:`list` of :class:`int`
+        """
+        self._lock.acquire()
+        try:
+            return self._free_ids(count, [self._holds], limit)
+        finally:
+            self._lock.release()
+
+    def _free_ids(self, count, held, limit=None):
+        if limit is None:
+            limit = self.high_lun
+        free = []
+        for lun_id in xrange(limit):
+            if len(free) >= count:
+                break
+            if self._is_used(lun_id):
+                continue
+            if [holds for holds in held if lun_id in holds]:
+                continue
+            free.append(lun_id)
+        return free
+
+    def reserve(self, randomise=False):
+        """
+        Reserves a free LUN ID.
+
+        :param randomise: Optional, boolean to pick one of the lowest free
+            IDs at random instead of the lowest, making collisions with
+            creators on other hosts less likely.
+        :type randomise: :class:`boolean`
+        :returns: The LUN ID.
+        :rtype: :class:`int`
+        :raises SanApiOperationFailedException: Raised if no LUN ID is
+            free.
+        """
+        self._lock.acquire()
+        try:
+            shared = self._read_file()
+            candidates = self._free_ids(randomise and RANDOM_SPREAD or 1,
+                                        [self._holds, shared])
+            if not candidates:
+                msg = "No free LUN ID available"
+                if self.logger:
+                    self.logger.error(msg)
+                raise SanApiOperationFailedException(msg, 1)
+            if randomise:
+                random.shuffle(candidates)
+            lun_id = candidates[0]
+            hold = [self._clock() + RESERVATION_TTL, None]
+            self._holds[lun_id] = hold
+            self._locked_file(lun_id, hold)
+            return lun_id
+        finally:
+            self._lock.release()
+
+    def confirm(self, lun_id):
+        """
+        Records that the LUN with a reserved ID was created.
+        """
+        self._lock.acquire()
+        try:
+            self._set_used(lun_id)
+            hold = [self._clock() + RESERVATION_TTL, self._clock()]
+            self._holds[lun_id] = hold
+            self._locked_file(lun_id, hold)
+        finally:
+            self._lock.release()
+
+    def mark_used(self, lun_id):
+        """
+        Records that a reserved ID turned out to be in use already, e.g.
+        by a LUN created on another host.
+        """
+        self._lock.acquire()
+        try:
+            self._set_used(lun_id)
+            self._holds.pop(lun_id, None)
+            self._locked_file(lun_id)
+        finally:
+            self._lock.release()
+
+    def release(self, lun_id):
+        """
+        Releases a reserved ID, e.g. after the creation failed.
+        """
+        self._lock.acquire()
+        try:
+            self._holds.pop(lun_id, None)
+            self._locked_file(lun_id)
+        finally:
+            self._lock.release()
+
+    def _read_file(self):
+        """
+        Returns the valid reservations of other processes, keyed by ID.
+        """
+        holds = {}
+        for lun_id, hold in self._locked_file().items():
+            holds[int(lun_id)] = hold
+        self._drop_stale(holds)
+        return holds
+
+    def _locked_file(self, lun_id=None, hold=None):
+        """
+        Reads the reservations of the array from the reservation file and,
+        if a LUN ID is given, sets or removes its reservation, all under
+        an exclusive lock. Problems with the file are logged and leave the
+        reservations in process only.
+
+        :returns: The reservations of the array, keyed by ID string.
+        :rtype: :class:`dict`
+        """
+        if self.reservation_file is None or fcntl is None:
+            return {}
+        try:
+            resfile = open(self.reservation_file, 'a+')
+            try:
+                fcntl.flock(resfile.fileno(), fcntl.LOCK_EX)
+                resfile.seek(0)
+                text = resfile.read()
+                reservations = text and json.loads(text) or {}
+                array_holds = reservations.setdefault(self.array_key, {})
+                if lun_id is not None:
+                    if hold is not None:
+                        array_holds[str(lun_id)] = hold
+                    else:
+                        array_holds.pop(str(lun_id), None)
+                    self._drop_stale(array_holds)
+                    resfile.seek(0)
+                    resfile.truncate()
+                    resfile.write(json.dumps(reservations))
+                    resfile.flush()
+                return array_holds
+            finally:
+                resfile.close()
+        except (IOError, OSError, ValueError), exce:
+            if self.logger:
+                self.logger.warn("Unable to use LUN ID reservation file "
+                                 "%s: %s" % (self.reservation_file, exce))
+            return {}
+
+
+_ALLOCATORS = {}
+_ALLOCATORS_LOCK = threading.Lock()
+
+
+def get_array_lun_id_allocator(array_key, high_lun, reservation_file=None,
+                               logger=None):
+    """
+    Returns the LUN ID allocator shared by all API objects for an array,
+    creating it on first use. Like the other per-array registries, the
+    array keeps its first settings; a later request with a different ID
+    range or reservation file is logged and uses the existing ones.
+
+    :param array_key: Identifies the array, e.g. its tuple of SP IPs.
+    :type array_key: :class:`tuple`
+    :param high_lun: The LUN IDs are 0 to high_lun - 1.
+    :type high_lun: :class:`int`
+    :param reservation_file: Optional, path of the file sharing the
+        reservations with other processes.
+    :type reservation_file: :class:`str`
+    :returns: The allocator for the array.
+    :rtype: :class:`LunIdAllocator`
+    """
+    key = tuple(sorted(array_key))
+    _ALLOCATORS_LOCK.acquire()
+    try:
+        allocator = _ALLOCATORS.get(key)
+        if allocator is None:
+            allocator = LunIdAllocator(key, high_lun, reservation_file,
+                                       logger)
+            _ALLOCATORS[key] = allocator
+        elif (allocator.high_lun, allocator.reservation_file) != \
+                (int(high_lun), reservation_file or None):
+            if logger:
+                logger.warn("Ignoring a LUN ID limit of %s and reservation "
+                            "file %s, the array already uses %s and %s" %
+                            (high_lun, reservation_file, allocator.high_lun,
+                             allocator.reservation_file))
+        return allocator
+    finally:
+        _ALLOCATORS_LOCK.release()
+
+
+def reset_lun_id_allocators():
+    """
+    Forgets the LUN IDs and reservations of every array.
+    """
+    _ALLOCATORS_LOCK.acquire()
+    try:
+        _ALLOCATORS.clear()
+    finally:
+        _ALLOCATORS_LOCK.release()
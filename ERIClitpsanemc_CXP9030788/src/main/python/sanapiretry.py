@@ -0,0 +1,233 @@
+"""
+File name: sanapiretry.py
+Version: ${project.version}
+
+Retry policies and deadlines for array commands. A retry policy decides
+whether a failed command is retried and how long to wait first. A deadline
+bounds the total time an operation, including nested calls, may take.
+"""
+
+import random
+import threading
+import time
+
+from sanapiexception import SanApiTimeoutException, \
+                            SanApiCriticalErrorException
+
+# naviseccli return code for connection failures
+NAVISEC_CONNECTION_FAILURE = 255
+
+
+class SanApiDeadline(object):
+    """
+    Point in time by which an operation has to complete.
+    """
+
+    def __init__(self, seconds, clock=time.time):
+        """
+        :param seconds: Time budget in seconds from now.
+        :type seconds: :class:`float`
+        """
+        self._clock = clock
+        self.expires_at = clock() + float(seconds)
+
+    def remaining(self):
+        """
+        Returns the seconds left, never negative.
+
+        :rtype: :class:`float`
+        """
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self):
+        """
+        Checks if the deadline has passed.
+
+        :rtype: :class:`boolean`
+        """
+        return self.remaining() <= 0
+
+    def clamp(self, seconds):
+        """
+        Limits a duration to the time left.
+
+        :param seconds: The duration.
+        :type seconds: :class:`float`
+        :returns: The smaller of seconds and the time left.
+        :rtype: :class:`float`
+        """
+        return min(float(seconds), self.remaining())
+
+    def check(self, operation):
+        """
+        Raises if the deadline has passed.
+
+        :param operation: Description of the operation, for the message.
+        :type operation: :class:`str`
+        :raises SanApiTimeoutException: Raised if the deadline has passed.
+        """
+        if self.expired():
+            raise SanApiTimeoutException("Deadline expired before %s "
+                                         "completed" % operation, 1)
+
+    def earliest(self, other):
+        """
+        Returns whichever of this deadline and other expires first.
+
+        :param other: Another deadline or None.
+        :type other: :class:`SanApiDeadline`
+        :rtype: :class:`SanApiDeadline`
+        """
+        if other is None or self.expires_at <= other.expires_at:
+            return self
+        return other
+
+
+class RetryPolicy(object):
+    """
+    Base retry policy. Retries connection failures up to retries times
+    without waiting.
+    """
+
+    def __init__(self, retries, retry_codes=(NAVISEC_CONNECTION_FAILURE,)):
+        """
+        :param retries: Number of attempts, including the first.
+        :type retries: :class:`int`
+        :param retry_codes: Return codes which may be retried.
+        :type retry_codes: :class:`tuple`
+        """
+        self.retries = int(retries)
+        self.retry_codes = tuple(retry_codes)
+
+    def should_retry(self, returncode):
+        """
+        Checks if a failure with the given return code may be retried.
+
+        :param returncode: The command return code.
+        :type returncode: :class:`int`
+        :rtype: :class:`boolean`
+        """
+        return returncode in self.retry_codes
+
+    def delay(self, attempt):
+        """
+        Returns the seconds to wait after a failed attempt.
+
+        :param attempt: The failed attempt, starting at 0.
+        :type attempt: :class:`int`
+        :rtype: :class:`float`
+        """
+        return 0.0
+
+
+class FixedRetryPolicy(RetryPolicy):
+    """
+    Waits the same time after every failed attempt.
+    """
+
+    def __init__(self, retries, sleep,
+                 retry_codes=(NAVISEC_CONNECTION_FAILURE,)):
+        """
+        :param sleep: Seconds to wait between attempts.
+        :type sleep: :class:`float`
+        """
+        super(FixedRetryPolicy, self).__init__(retries, retry_codes)
+        self.sleep = float(sleep)
+
+    def delay(self, attempt):
+        return self.sleep
+
+
+class ExponentialBackoffPolicy(RetryPolicy):
+    """
+    Doubles the wait after every failed attempt up to a cap. With jitter
+    the wait is a random time between zero and that value, so that callers
+    failing together do not retry together.
+    """
+
+    def __init__(self, retries, base, cap, jitter=True,
+                 retry_codes=(NAVISEC_CONNECTION_FAILURE,), rand=None):
+        """
+        :param base: Wait in seconds after the first failed attempt.
+        :type base: :class:`float`
+        :param cap: Maximum wait in seconds.
+        :type cap: :class:`float`
+        :param jitter: Randomise the wait. Default; True
+        :type jitter: :class:`boolean`
+        """
+        super(ExponentialBackoffPolicy, self).__init__(retries, retry_codes)
+        self.base = float(base)
+        self.cap = float(cap)
+        self.jitter = jitter
+        self._rand = rand or random.uniform
+
+    def delay(self, attempt):
+        backoff = min(self.cap, self.base * (2 ** attempt))
+        if self.jitter:
+            return self._rand(0, backoff)
+        return backoff
+
+
+def build_retry_policy(name, retries, sleep, cap=None):
+    """
+    Creates a retry policy by name.
+
+    :param name: Either fixed or exponential.
+    :type name: :class:`str`
+    :param retries: Number of attempts, including the first.
+    :type retries: :class:`int`
+    :param sleep: Fixed wait, or the first wait for exponential backoff.
+    :type sleep: :class:`float`
+    :param cap: Maximum wait for exponential backoff.
+    :type cap: :class:`float`
+    :returns: The retry policy.
+    :rtype: :class:`RetryPolicy`
+    :raises SanApiCriticalErrorException: Raised if the name is unknown.
+    """
+    name = str(name).strip().lower()
+    if name == 'fixed':
+        return FixedRetryPolicy(retries, sleep)
+    if name == 'exponential':
+        if cap is None:
+            cap = float(sleep) * (2 ** (int(retries) - 1))
+        return ExponentialBackoffPolicy(retries, sleep, cap)
+    raise SanApiCriticalErrorException("Unknown retry policy %s, must be "
+                                       "one of fixed, exponential" % name, 1)
+
+
+class DeadlineScope(object):
+    """
+    Thread local stack of deadlines, so that a deadline set around a
+    public API call applies to every command it runs.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def current(self):
+        """
+        Returns the deadline in force for the calling thread, or None.
+
+        :rtype: :class:`SanApiDeadline`
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return None
+
+    def push(self, deadline):
+        """
+        Makes a deadline current. A nested deadline never extends the one
+        already in force.
+        """
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        deadline = deadline.earliest(self.current())
+        self._local.stack.append(deadline)
+        return deadline
+
+    def pop(self):
+        """
+        Restores the previous deadline.
+        """
+        self._local.stack.pop()
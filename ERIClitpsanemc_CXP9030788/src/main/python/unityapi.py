@@ -6,10 +6,11 @@ from unityrest import UnityREST
 from sanapi import SanApi, get_api_version
 
 from sanapiexception import SanApiOperationFailedException, SanApiCriticalErrorException, \
-    SanApiEntityNotFoundException, SanApiCommandException
+    SanApiEntityNotFoundException, SanApiCommandException, SanApiException, SanApiPartialFailureException
 from sanapiinfo import LunInfo, StorageGroupInfo, HbaInitiatorInfo, HluAluPairInfo, SanInfo, \
     StoragePoolInfo, SnapshotInfo, SanAlert, SanHwAlert
 import sanapilib
+from sanapiinventory import StorageGroupInventory
 
 import logging
 import socket
@@ -297,7 +298,7 @@ class UnityApi(SanApi):
 
         self.logger.debug("Exiting expand_pool_lun")
 
-        return self.get_lun(lun_name=lun_name)
+        return self._written(self.get_lun, lun_name=lun_name)
 
     def create_lun(self, lun_name, size, container_type, container,
                    storage_processor="a", raid_type="", lun_type="thick",
@@ -336,36 +337,90 @@ class UnityApi(SanApi):
                                                    raid_type, lun_type, lun_id, ignore_thresholds,
                                                    array_specific_options, self.logger)
 
-        if sanapilib.normalise_storage_processor(storage_processor) == 'A':
-            sp = 0
-        else:
-            sp = 1
-
-        if lun_params["container_type"] != sanapilib.CONTAINER_STORAGE_POOL:
-            sanapilib.raise_ex("Unsupported container_type %s" % str(container_type))
-
-        if lun_params["lun_id"] != "auto":
-            sanapilib.raise_ex("Only auto allowed for lun_id")
-
-        pool_id = self.rest.get_id_for_name("pool", lun_params['container'])
-        if pool_id is None:
-            sanapilib.raise_ex("Could not find pool %s" % lun_params['container'], SanApiEntityNotFoundException)
+        self.__check_lun_params(lun_params)
+        pool_id = self.__get_pool_id(lun_params['container'])
+        unity_lun_id = self.__post_create_lun(lun_params, pool_id)
+        return self._written(self.get_lun, str(self.__unity_lun_num(unity_lun_id)))
+
+    def create_luns(self, specs):
+        """
+        Unity implementation of create_luns. Every spec and pool is checked
+        before any LUN is created and the new LUNs are read back with a
+        single request. The create requests are sent one at a time as they
+        share the REST session.
+
+        :param specs: The LUNs to create, each a dictionary of create_lun
+            parameters.
+        :type specs: :class:`list` of :class:`dict`
+        :returns: The new LUNs, in the order of specs.
+        :rtype: :class:`list` of :class:`LunInfo`
+        :raises SanApiPartialFailureException: Raised if a LUN could not be created or read back, holding the LUNs
+            which were.
+        """
+        self.logger.debug("create_luns: %s LUNs", len(specs))
+        all_params = sanapilib.validate_lun_create_specs(specs, self.logger)
+        if not all_params:
+            return []
+        for lun_params in all_params:
+            self.__check_lun_params(lun_params)
+        pool_ids = {}
+        for lun_params in all_params:
+            if lun_params['container'] not in pool_ids:
+                pool_ids[lun_params['container']] = \
+                    self.__get_pool_id(lun_params['container'])
+
+        created_params = []
+        unity_lun_ids = []
+        failed = {}
+        for lun_params in all_params:
+            try:
+                unity_lun_ids.append(self.__post_create_lun(
+                    lun_params, pool_ids[lun_params['container']]))
+                created_params.append(lun_params)
+            except SanApiException, exce:
+                self.logger.error("Failed to create LUN %s: %s" % (lun_params['lun_name'], exce))
+                failed[lun_params['lun_name']] = exce
 
-        request_data = {
-            'name': lun_name,
-            'lunParameters': {
-                'size': int(float(sanapilib.convert_size_to_mb(size))) * (1024 * 1024),
-                'pool': {'id': pool_id},
-                'isThinEnabled': True,
-                'isDataReductionEnabled': True,
-                'defaultNode': sp
-            }
-        }
+        pools = {}
+        for pool_name, pool_id in pool_ids.items():
+            pools[pool_id] = pool_name
+        if failed:
+            created = []
+            if created_params:
+                try:
+                    created = self.__read_created_luns(created_params, unity_lun_ids, pools)
+                except SanApiPartialFailureException, exce:
+                    created = exce.succeeded
+                    failed.update(exce.failed)
+                except SanApiException, exce:
+                    self.logger.error("Failed to read the LUNs created: %s" % exce)
+            raise SanApiPartialFailureException(
+                sanapilib.partial_failure_message("LUN create", failed, len(all_params)), 1, created, failed)
+        return self._written(self.__read_created_luns, all_params,
+                             unity_lun_ids, pools)
+
+    def __read_created_luns(self, all_params, unity_lun_ids, pools):
+        response = self.rest.get_type_instances(
+            'lun', self.LUN_FIELDS, [self.rest.make_id_filter(unity_lun_ids)])
+        created = {}
+        for entry in response.json()['entries']:
+            created[entry['content']['id']] = \
+                self.__make_lun_info(entry['content'], pools)
 
-        response = self.rest.create_post("/api/types/storageResource/action/createLun", request_data)
-        unity_lun_id = response.json()['content']['storageResource']['id']
-        self.logger.info("LUN " + lun_name + " successfully created with id %s" % unity_lun_id)
-        return self.get_lun(str(self.__unity_lun_num(unity_lun_id)))
+        lun_list = []
+        missing = {}
+        for lun_params, unity_lun_id in zip(all_params, unity_lun_ids):
+            if unity_lun_id not in created:
+                missing[lun_params['lun_name']] = SanApiEntityNotFoundException(
+                    "Created LUN %s not found" % lun_params['lun_name'], 1)
+            else:
+                lun_list.append(created[unity_lun_id])
+        if missing:
+            errmsg = sanapilib.partial_failure_message("LUN read back", missing, len(all_params))
+            self.logger.error(errmsg)
+            raise SanApiPartialFailureException(errmsg, 1, lun_list, missing)
+        self.logger.debug("create_luns: returning %s luns", len(lun_list))
+        return lun_list
 
     def delete_lun(self, lun_name=None, lun_id=None,
                    array_specific_options=""):
@@ -411,6 +466,72 @@ class UnityApi(SanApi):
         self.logger.debug("Leaving function delete_lun")
         return True
 
+    def delete_luns(self, lun_names=None, lun_ids=None,
+                    array_specific_options=""):
+        """
+        Unity implementation of delete_luns. The LUNs are found in one
+        listing of the LUNs and deleted one at a time as the requests share
+        the REST session.
+
+        :param lun_names: Names of LUNs to delete.
+        :type lun_names: :class:`list` of :class:`str`
+        :param lun_ids: IDs of LUNs to delete.
+        :type lun_ids: :class:`list` of :class:`str`
+        :param array_specific_options: Unused in the Unity API.
+        :type array_specific_options: :class:`str`
+        :returns: The outcome for each name and ID.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if no LUN is given or
+            a LUN ID is invalid.
+        """
+        self.logger.debug("Entered delete_luns with lun_names=%s, lun_ids=%s", lun_names, lun_ids)
+        lun_names = list(lun_names or [])
+        lun_ids = list(lun_ids or [])
+        if not lun_names and not lun_ids:
+            errmsg = "Neither lun names nor lun ids were specified"
+            self.logger.error(errmsg)
+            raise SanApiCriticalErrorException(errmsg, 1)
+        for lun_id in lun_ids:
+            if not sanapilib.is_int(lun_id):
+                errmsg = "Invalid LUN id: " + str(lun_id)
+                self.logger.error(errmsg)
+                raise SanApiCriticalErrorException(errmsg, 1)
+
+        response = self.rest.get_type_instances('lun', ['id', 'name'])
+        names = {}
+        unity_ids = set()
+        for entry in response.json()['entries']:
+            names.setdefault(entry['content']['name'], entry['content']['id'])
+            unity_ids.add(entry['content']['id'])
+
+        outcomes = {}
+        # the names and IDs given for each LUN, keyed by Unity LUN id
+        targets = {}
+        for lun_name in lun_names:
+            if lun_name in names:
+                targets.setdefault(names[lun_name], []).append(lun_name)
+            else:
+                outcomes[lun_name] = sanapilib.LUN_NOT_FOUND
+        for lun_id in lun_ids:
+            unity_lun_id = "sv_%s" % int(lun_id)
+            if unity_lun_id in unity_ids:
+                targets.setdefault(unity_lun_id, []).append(str(lun_id))
+            else:
+                outcomes[str(lun_id)] = sanapilib.LUN_NOT_FOUND
+
+        for unity_lun_id, given in targets.items():
+            try:
+                self.rest.delete_instance("storageResource", unity_lun_id)
+                outcome = sanapilib.LUN_DELETED
+            except SanApiException, exce:
+                self.logger.error("Failed to delete LUN %s: %s", unity_lun_id, exce)
+                outcome = sanapilib.LUN_DELETE_FAILED
+            for target in given:
+                outcomes[target] = outcome
+
+        self.logger.debug("Leaving function delete_luns")
+        return outcomes
+
     def rename_lun(self, lun_id, lun_name):
         """
         Rename a LUN. Returns a LunInfo object representing the renamed LUN.
@@ -570,7 +691,42 @@ class UnityApi(SanApi):
         self.logger.debug("Entered create_host_initiator: sg_name=%s, www=%s, host_name=%s, host_ip=%s",
                           sg_name, wwn, host_name, host_ip)
         self.__connect_hbas_to_host(sg_name, host_name, wwn, init_type, failovermode, arraycommpath)
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
+
+    def create_hosts_initiators(self, specs, arraycommpath="1",
+                                init_type="3", failovermode="4",
+                                array_specific_options=""):
+        """
+        Registers the HBAs of many hosts, as create_host_initiators does for one. The REST session is shared so
+        the HBAs are registered one after the other, the hosts are then read back with one get_storage_groups.
+
+        :param specs: The HBAs to register, each a dictionary with sg_name and wwn and, optionally, host_name and
+            host_ip.
+        :type specs: :class:`list` of :class:`dict`
+        :param arraycommpath: Optional, the array communication path, either 0
+            or 1. Default; "1"
+        :type arraycommpath: :class:`str`
+        :param init_type: Optional, the initiator type. Default; "3"
+        :type init_type: :class:`str`
+        :param failovermode: Optional, the failover mode, 0-4. Default; "4"
+        :type failovermode: :class:`str`
+        :param array_specific_options: Not used on Unity.
+        :type array_specific_options: :class:`str`
+        :returns: The storage groups of the specs, keyed by name.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if a spec is invalid.
+        """
+        self.logger.debug("Entered create_hosts_initiators: %s HBAs", len(specs))
+        all_specs = sanapilib.validate_initiator_specs(specs, self.logger)
+
+        sg_names = []
+        for spec in all_specs:
+            self.__connect_hbas_to_host(spec['sg_name'], spec['host_name'], spec['wwn'], init_type, failovermode,
+                                        arraycommpath)
+            if spec['sg_name'] not in sg_names:
+                sg_names.append(spec['sg_name'])
+
+        return self._written(self._storage_groups_named, sg_names)
 
     def create_host_initiator(self, sg_name, host_name, host_ip, wwn,
                               storage_processor, sp_port, arraycommpath="1",
@@ -668,6 +824,17 @@ class UnityApi(SanApi):
         if host_data is None:
             sanapilib.raise_ex("Storage Group %s not found: " % sg_name, SanApiEntityNotFoundException)
 
+        self.__remove_host_lun_access(host_data)
+        return True
+
+    def __remove_host_lun_access(self, host_data):
+        """
+        Removes the host from the host access of every LUN attached to it.
+
+        :param host_data: The host, with at least the id and hostLUNs
+            fields.
+        :type host_data: :class:`dict`
+        """
         if 'hostLUNs' in host_data and len(host_data['hostLUNs']) > 0:
             # Get id of any LUN attached to this host
             host_lun_ids = []
@@ -706,8 +873,6 @@ class UnityApi(SanApi):
                     }
                     self.rest.action("storageResource", lun_data['id'], "modifyLun", modify_data)
 
-        return True
-
     def deregister_hba_uid(self, wwn):
         """
         Deregisters HBA UID from  the SAN.
@@ -761,7 +926,8 @@ class UnityApi(SanApi):
 
     def get_storage_groups(self):
         """
-        Gets of hosts registered on the Unity, these are mapped to "Storage Groups"
+        Gets of hosts registered on the Unity, these are mapped to "Storage Groups". The hosts, initiators,
+        initiator paths and host LUNs are each read in one request, whatever the number of hosts.
 
         :returns: The list of storage group objects.
         :rtype: :class:`list` of :class:`StorageGroupInfo`
@@ -770,14 +936,26 @@ class UnityApi(SanApi):
 
         response = self.rest.get_type_instances('host', self.HOST_FIELDS)
         json = response.json()
-        sglist = []
+        host_contents = []
         for entry in json['entries']:
-            sglist.append(self.__sg_from_content(entry['content']))
+            host_contents.append(entry['content'])
+        sglist = self.__sgs_from_contents(host_contents)
 
         self.logger.debug("get_storage_groups completed ok")
         self.logger.info("get_storage_groups completed successfully")
         return sglist
 
+    def get_storage_group_inventory(self):
+        """
+        Returns all hosts, i.e. "Storage Groups", indexed by name, ALU and
+        HBA UID.
+
+        :returns: The storage group inventory.
+        :rtype: :class:`StorageGroupInventory`
+        """
+        self.logger.debug("Entered get_storage_group_inventory")
+        return StorageGroupInventory(self.get_storage_groups())
+
     def create_storage_group(self, sg_name):
         """
         Unity doesn't have a storage group so here we create the host
@@ -800,7 +978,7 @@ class UnityApi(SanApi):
         self.logger.debug("create_storage_group completed ok")
         self.logger.info("create_storage_group completed successfully")
 
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
 
     def delete_storage_group(self, sg_name):
         """
@@ -822,6 +1000,79 @@ class UnityApi(SanApi):
         self.rest.delete_instance("host", "name:%s" % sg_name)
         return True
 
+    def teardown_hosts(self, sg_names=None, wwns=None):
+        """
+        Removes the hosts of a cluster from the Unity. The hosts and the initiators are each read once up
+        front, then, one request at a time as the REST session is shared, the hosts are removed from the
+        host access of their LUNs, the initiators of the WWNs are deleted and the hosts are deleted.
+
+        :param sg_names: Optional, names of hosts, i.e. "Storage Groups", to delete.
+        :type sg_names: :class:`list` of :class:`str`
+        :param wwns: Optional, WWNs of initiators to delete.
+        :type wwns: :class:`list` of :class:`str`
+        :returns: The outcome for each storage group name and each WWN, keyed by storage_groups and hbas.
+        :rtype: :class:`dict` of :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if nothing is given, or a name or WWN is invalid.
+        """
+        self.logger.debug("Entered teardown_hosts with sg_names=%s, wwns=%s" % (sg_names, wwns))
+        sg_names, wwns = sanapilib.validate_teardown_targets(sg_names, wwns, self.logger)
+
+        hosts = {}
+        if sg_names:
+            for entry in self.rest.get_type_instances('host', self.HOST_FIELDS).json()['entries']:
+                hosts[entry['content']['name']] = entry['content']
+        initiator_ids = {}
+        if wwns:
+            response = self.rest.get_type_instances('hostInitiator', ['id', 'initiatorId']).json()
+            for entry in response['entries']:
+                initiator_ids.setdefault(entry['content']['initiatorId'], []).append(
+                    entry['content']['id'])
+
+        sg_outcomes = {}
+        for sg_name in sg_names:
+            if sg_name not in hosts:
+                sg_outcomes[sg_name] = sanapilib.TEARDOWN_NOT_FOUND
+                continue
+            try:
+                self.__remove_host_lun_access(hosts[sg_name])
+            except SanApiException, exce:
+                self.logger.error("Failed to remove LUN access of host %s: %s" % (sg_name, exce))
+                sg_outcomes[sg_name] = sanapilib.TEARDOWN_FAILED
+
+        hba_outcomes = {}
+        for wwn in wwns:
+            if wwn not in initiator_ids:
+                hba_outcomes[wwn] = sanapilib.TEARDOWN_NOT_FOUND
+                continue
+            try:
+                for initiator_id in initiator_ids[wwn]:
+                    self.rest.delete_instance('hostInitiator', initiator_id)
+                hba_outcomes[wwn] = sanapilib.TEARDOWN_REMOVED
+            except SanApiException, exce:
+                self.logger.error("Failed to delete initiator %s: %s" % (wwn, exce))
+                hba_outcomes[wwn] = sanapilib.TEARDOWN_FAILED
+
+        for sg_name in sg_names:
+            if sg_name in sg_outcomes:
+                continue
+            try:
+                self.rest.delete_instance('host', hosts[sg_name]['id'])
+                sg_outcomes[sg_name] = sanapilib.TEARDOWN_REMOVED
+            except SanApiException, exce:
+                self.logger.error("Failed to delete host %s: %s" % (sg_name, exce))
+                sg_outcomes[sg_name] = sanapilib.TEARDOWN_FAILED
+
+        outcomes = sg_outcomes.values() + hba_outcomes.values()
+        msg = "teardown_hosts removed %s hosts and %s initiators, %s failed" % (
+            sg_outcomes.values().count(sanapilib.TEARDOWN_REMOVED),
+            hba_outcomes.values().count(sanapilib.TEARDOWN_REMOVED),
+            outcomes.count(sanapilib.TEARDOWN_FAILED))
+        if sanapilib.TEARDOWN_FAILED in outcomes:
+            self.logger.warn(msg)
+        else:
+            self.logger.info(msg)
+        return {'storage_groups': sg_outcomes, 'hbas': hba_outcomes}
+
     def add_lun_to_storage_group(self, sg_name, hlu, alu):
         """
         Assigns a single hlu-alu pair to a Storage Group.
@@ -863,26 +1114,7 @@ class UnityApi(SanApi):
             raise SanApiEntityNotFoundException("Cannot lun for id %s" % alu, 1)
 
         # First modify the lun to has the host
-        host_access = []
-        if 'hostAccess' in lun_data:
-            for one_host_access in lun_data['hostAccess']:
-                if one_host_access['host']['id'] != host_id:
-                    block_host_access_param = {
-                        'host': {'id': one_host_access['host']['id']},
-                        'accessMask': one_host_access['accessMask']
-                    }
-                    host_access.append(block_host_access_param)
-        block_host_access_param = {
-            'host': {'id': host_id},
-            'accessMask': 1  # Production LUNs
-        }
-        host_access.append(block_host_access_param)
-        modify_data = {
-            'lunParameters': {
-                'hostAccess': host_access
-            }
-        }
-        self.rest.action("storageResource", unity_lun_id, "modifyLun", modify_data)
+        self.__give_host_access(lun_data, host_id)
 
         # Now update the hostLUN and set the HLU
         search_filter = [
@@ -904,9 +1136,84 @@ class UnityApi(SanApi):
         }
         self.rest.action('host', host_id, 'modifyHostLUNs', modify_host_lun_param)
 
-        sginfo = self.__sg_from_content(self.rest.get_type_instance_for_id("host", host_id, self.HOST_FIELDS))
-        self.logger.debug("add_lun_to_storage_group: returning %s", self.__info2str(sginfo))
-        return sginfo
+        return self._written(self.__read_host_sg, host_id)
+
+    def add_luns_to_storage_group(self, sg_name, hlu_alu_pairs):
+        """
+        Assigns multiple hlu-alu pairs to a Storage Group. The LUNs are
+        read in one request and all HLUs are set with a single
+        modifyHostLUNs request. Unity takes the host access of each LUN in
+        a modifyLun request of its own.
+
+        :param sg_name: The storage group name.
+        :type sg_name: :class:`str`
+        :param hlu_alu_pairs: The HLU ALU pairs.
+        :type hlu_alu_pairs: :class:`list` of :class:`tuple`
+        """
+
+        self.logger.info("Entering add_luns_to_storage_group sg_name=%s, hlu_alu_pairs=%s", sg_name, hlu_alu_pairs)
+
+        if not sg_name:
+            errmsg = "Invalid storage group name: " + str(sg_name)
+            self.logger.error(errmsg)
+            raise SanApiCriticalErrorException(errmsg, 1)
+
+        pairs = []
+        for hlu, alu in hlu_alu_pairs:
+            try:
+                errmsg = "Invalid ALU: " + str(alu)
+                alu = sanapilib.validate_int_and_make_string(alu)
+                errmsg = "Invalid HLU: " + str(hlu)
+                hlu = sanapilib.validate_int_and_make_string(hlu)
+            except SanApiOperationFailedException:
+                self.logger.error(errmsg)
+                raise SanApiCriticalErrorException(errmsg, 1)
+            pairs.append((hlu, 'sv_%s' % alu))
+
+        host_id = self.rest.get_id_for_name("host", sg_name)
+        if host_id is None:
+            raise SanApiEntityNotFoundException("Cannot get host for sg %s" % sg_name, 1)
+        if not pairs:
+            return self._written(self.__read_host_sg, host_id)
+
+        unity_lun_ids = [unity_lun_id for _, unity_lun_id in pairs]
+        lun_response = self.rest.get_type_instances("lun", self.LUN_FIELDS,
+                                                    [self.rest.make_id_filter(unity_lun_ids)]).json()
+        luns = {}
+        for entry in lun_response['entries']:
+            luns[entry['content']['id']] = entry['content']
+        for unity_lun_id in unity_lun_ids:
+            if unity_lun_id not in luns:
+                raise SanApiEntityNotFoundException("Cannot lun for id %s" % self.__unity_lun_num(unity_lun_id), 1)
+
+        for unity_lun_id in unity_lun_ids:
+            self.logger.info("Attempting to add LUN(%s) to Storage Group(%s)", unity_lun_id, sg_name)
+            self.__give_host_access(luns[unity_lun_id], host_id)
+
+        # Now set the HLUs of all the new hostLUNs at once
+        search_filter = [
+            'host.id eq "%s"' % host_id,
+            'lun.id IN ( "%s" )' % '","'.join(unity_lun_ids)
+        ]
+        search_response = self.rest.get_type_instances("hostLUN", self.HOST_LUN_FIELDS, search_filter).json()
+        host_lun_ids = {}
+        for entry in search_response['entries']:
+            host_lun_ids.setdefault(entry['content']['lun']['id'], entry['content']['id'])
+
+        modify_list = []
+        for hlu, unity_lun_id in pairs:
+            if unity_lun_id not in host_lun_ids:
+                raise SanApiEntityNotFoundException("Cannot get hostLUN for lun %s in sg %s" %
+                                                    (self.__unity_lun_num(unity_lun_id), sg_name), 1)
+            modify_list.append({
+                'hostLUN': {
+                    'id': host_lun_ids[unity_lun_id]
+                },
+                'hlu': hlu
+            })
+        self.rest.action('host', host_id, 'modifyHostLUNs', {'hostLunModifyList': modify_list})
+
+        return self._written(self.__read_host_sg, host_id)
 
     def remove_luns_from_storage_group(self, sg_name, hlus):
         """
@@ -1010,9 +1317,7 @@ class UnityApi(SanApi):
             self.logger.debug("remove_luns_from_storage_group: Removing host access from lun %s" % lun_data['name'])
             self.rest.action('storageResource', lun_data['id'], 'modifyLun', modify_data)
 
-        sginfo = self.__sg_from_content(self.rest.get_type_instance_for_id("host", host_id, self.HOST_FIELDS))
-        self.logger.debug("remove_luns_from_storage_group: returning %s", self.__info2str(sginfo))
-        return sginfo
+        return self._written(self.__read_host_sg, host_id)
 
     def storage_group_exists(self, sg_name):
         """
@@ -1195,7 +1500,7 @@ class UnityApi(SanApi):
             self.logger.debug(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
 
-        return self.get_storage_pool(sp_name)
+        return self._written(self.get_storage_pool, sp_name)
 
     def delete_storage_pool(self, sp_name):
         """
@@ -1724,12 +2029,23 @@ class UnityApi(SanApi):
 
     def __get_hba_for_initiators(self, initiator_filter):
         hbasp_list = []
+        for _, hbasp in self.__get_initiator_hbas(initiator_filter):
+            hbasp_list.append(hbasp)
+
+        self.logger.debug("__get_hba_for_initiators: returning %s HbaInitiatorInfos", len(hbasp_list))
+
+        return hbasp_list
+
+    def __get_initiator_hbas(self, initiator_filter):
+        # returns (hostInitiator id, HbaInitiatorInfo) for each initiator path, an empty filter reads all of them
+        initiator_hbas = []
 
-        self.logger.debug("__get_hba_for_initiators: filter=%s", initiator_filter)
+        self.logger.debug("__get_initiator_hbas: filter=%s", initiator_filter)
 
         initiator_response = self.rest.get_type_instances('hostInitiator', self.HOST_INITATOR_FIELDS, initiator_filter)
         path_id_list = []
         path_to_initiator = {}
+        path_to_host_initiator = {}
         path_to_is_ignored = {}
         for entry in initiator_response.json()['entries']:
             initiator_content = entry['content']
@@ -1737,6 +2053,7 @@ class UnityApi(SanApi):
                 for path in initiator_content['paths']:
                     path_id_list.append(path['id'])
                     path_to_initiator[path['id']] = initiator_content['initiatorId']
+                    path_to_host_initiator[path['id']] = initiator_content['id']
                     path_to_is_ignored[path['id']] = initiator_content['isIgnored']
 
         if len(path_id_list) > 0:
@@ -1763,18 +2080,22 @@ class UnityApi(SanApi):
                     else:
                         sp = sanapilib.STORAGE_PROCESSOR_B
                     port_num = fc_port_id_parts[-1][2:]
-                    self.logger.debug("__get_hba_for_initiators fc_port_id=%s sp=%s port_num=%s",
+                    self.logger.debug("__get_initiator_hbas fc_port_id=%s sp=%s port_num=%s",
                                       fc_port_id, sp, port_num)
                     if entry['content']['id'] in path_to_initiator:
                         hbauid = path_to_initiator[path_content['id']]
                         isignored = path_to_is_ignored[path_content['id']]
-                        self.logger.debug("__get_hba_for_initiators: adding hbasp hbauid=%s sp=%s port_num=%s "
+                        self.logger.debug("__get_initiator_hbas: adding hbasp hbauid=%s sp=%s port_num=%s "
                                           "isignored=%s", hbauid, sp, port_num, isignored)
-                        hbasp_list.append(HbaInitiatorInfo(hbauid, sp, port_num, isignored=isignored))
+                        initiator_hbas.append((path_to_host_initiator[path_content['id']],
+                                               HbaInitiatorInfo(hbauid, sp, port_num, isignored=isignored)))
 
-        self.logger.debug("__get_hba_for_initiators: returning %s HbaInitiatorInfos", len(hbasp_list))
+        return initiator_hbas
 
-        return hbasp_list
+    def __read_host_sg(self, host_id):
+        sginfo = self.__sg_from_content(self.rest.get_type_instance_for_id("host", host_id, self.HOST_FIELDS))
+        self.logger.debug("read_host_sg: returning %s", self.__info2str(sginfo))
+        return sginfo
 
     def __sg_from_content(self, host_content):
         hbasp_list = None
@@ -1806,6 +2127,43 @@ class UnityApi(SanApi):
         self.logger.debug("sg_from_content: StorageGroupInfo=%s", self.__info2str(sgi))
         return sgi
 
+    def __sgs_from_contents(self, host_contents):
+        # Same as __sg_from_content for many hosts, but reads all initiators, initiator paths and hostLUNs
+        # once and joins them to the hosts here rather than querying them host by host
+        initiator_hbas = {}
+        if [host_content for host_content in host_contents if host_content.get('fcHostInitiators')]:
+            for initiator_id, hbasp in self.__get_initiator_hbas([]):
+                initiator_hbas.setdefault(initiator_id, []).append(hbasp)
+
+        host_lun_pairs = {}
+        if [host_content for host_content in host_contents if host_content.get('hostLUNs')]:
+            host_lun_response = self.rest.get_type_instances('hostLUN', self.HOST_LUN_FIELDS)
+            for entry in host_lun_response.json()['entries']:
+                host_lun_content = entry['content']
+                alu = int(host_lun_content['lun']['id'][3:])
+                host_lun_pairs[host_lun_content['id']] = (host_lun_content['hlu'], alu)
+
+        sglist = []
+        for host_content in host_contents:
+            hbasp_list = None
+            if 'fcHostInitiators' in host_content:
+                hbasp_list = []
+                for fcHostInitiator in host_content['fcHostInitiators']:
+                    hbasp_list.extend(initiator_hbas.get(fcHostInitiator['id'], []))
+
+            hlualu_list = None
+            if 'hostLUNs' in host_content:
+                hlualu_list = []
+                for hostLUN in host_content['hostLUNs']:
+                    if hostLUN['id'] in host_lun_pairs:
+                        hlu, alu = host_lun_pairs[hostLUN['id']]
+                        hlualu_list.append(HluAluPairInfo(hlu, alu))
+
+            sglist.append(StorageGroupInfo(host_content['name'], self.DUMMY_UID, False, hbasp_list, hlualu_list))
+
+        self.logger.debug("sgs_from_contents: returning %s StorageGroupInfos", len(sglist))
+        return sglist
+
     def __connect_hbas_to_host(self, sg_name, host_name, wwn, init_type, failovermode, arraycommpath):
         # First we check if the host_name has a value, if so we make sure the description field in the host_content
         # matches
@@ -1874,6 +2232,64 @@ class UnityApi(SanApi):
 
         self.logger.info("create_host_initiator completed successfully")
 
+    @staticmethod
+    def __check_lun_params(lun_params):
+        if lun_params["container_type"] != sanapilib.CONTAINER_STORAGE_POOL:
+            sanapilib.raise_ex("Unsupported container_type %s" % str(lun_params["container_type"]))
+
+        if lun_params["lun_id"] != "auto":
+            sanapilib.raise_ex("Only auto allowed for lun_id")
+
+    def __get_pool_id(self, pool_name):
+        pool_id = self.rest.get_id_for_name("pool", pool_name)
+        if pool_id is None:
+            sanapilib.raise_ex("Could not find pool %s" % pool_name, SanApiEntityNotFoundException)
+        return pool_id
+
+    def __post_create_lun(self, lun_params, pool_id):
+        if sanapilib.normalise_storage_processor(lun_params['storage_processor']) == 'A':
+            sp = 0
+        else:
+            sp = 1
+
+        request_data = {
+            'name': lun_params['lun_name'],
+            'lunParameters': {
+                'size': int(float(sanapilib.convert_size_to_mb(lun_params['size']))) * (1024 * 1024),
+                'pool': {'id': pool_id},
+                'isThinEnabled': True,
+                'isDataReductionEnabled': True,
+                'defaultNode': sp
+            }
+        }
+
+        response = self.rest.create_post("/api/types/storageResource/action/createLun", request_data)
+        unity_lun_id = response.json()['content']['storageResource']['id']
+        self.logger.info("LUN " + lun_params['lun_name'] + " successfully created with id %s" % unity_lun_id)
+        return unity_lun_id
+
+    def __give_host_access(self, lun_data, host_id):
+        host_access = []
+        if 'hostAccess' in lun_data:
+            for one_host_access in lun_data['hostAccess']:
+                if one_host_access['host']['id'] != host_id:
+                    block_host_access_param = {
+                        'host': {'id': one_host_access['host']['id']},
+                        'accessMask': one_host_access['accessMask']
+                    }
+                    host_access.append(block_host_access_param)
+        block_host_access_param = {
+            'host': {'id': host_id},
+            'accessMask': 1  # Production LUNs
+        }
+        host_access.append(block_host_access_param)
+        modify_data = {
+            'lunParameters': {
+                'hostAccess': host_access
+            }
+        }
+        self.rest.action("storageResource", lun_data['id'], "modifyLun", modify_data)
+
     def __make_lun_info(self, lun_data, pools=None):
         lunid = int(lun_data['id'][3:])
         name = lun_data['name']
@@ -6,6 +6,7 @@ class that is vnx1 implementation of SanApi
 import re
 
 from vnxcommonapi import VnxCommonApi
+from navicmd import NaviCommand
 import sanapilib
 
 HOTSPARE_RAID_TYPE = 'HS'
@@ -32,27 +33,26 @@ class Vnx1Api (VnxCommonApi):
         if lun_name is not None:
             sanapilib.validate_string(lun_name)
 
-        # Determine the next valid LUN ID
-        lunid = self.get_next_available_lunids()[0]
-        self.logger.debug("Using LUN ID of %s" % lunid)
-
-        cmd_string = "bind hs %s -rg %s" % (lunid, rg_id)
-
-        self._navisec(cmd_string)
+        # Reserve free LUN IDs until one is bound, in case of concurrent
+        # lun create operations
+        lunid = str(self._bind_free_lun_id(
+                lambda free_lunid: NaviCommand("bind", "hs", free_lunid,
+                                               "-rg", rg_id),
+                randomise=True))
         self.logger.info(
           "bind hs worked succesfully with LUN ID %s and RG ID %s " \
               % (lunid, rg_id))
 
         if lun_name is not None:
             # Builds naviseccli command to name LUN created on Raid Group
-            cmd_string = "chglun -l " + str(lunid) + " -name " + "\"" +\
-            lun_name + "\""
+            cmd_string = NaviCommand("chglun", "-l", lunid, "-name")\
+                            .quoted(lun_name)
             self.logger.debug("Attempting to set LUN name to %s " % lun_name)
-            self._navisec(cmd_string)
+            self._navisec_lun_change(cmd_string)
             self.logger.info("LUN id %s name set to %s successfully" \
                  % (lunid, lun_name))
 
-        return self.get_lun(lun_id=lunid)
+        return self._written(self.get_lun, lun_id=lunid)
 
     def get_hs_luns(self):
         """
@@ -10,11 +10,9 @@ from vnxparser import VnxParser
 from sanapilib import is_valid_policyid, is_valid_policy_ratio,\
 validate_int_and_make_string
 from sanapiexception import SanApiCriticalErrorException
-from string import Template
+from navicmd import NaviCommand
 
-HOTSPARE_POLICY_CMD = Template("hotsparepolicy -set -o $policy -keep1unusedper"
-        " $ratio")
-HOTSPARE_LIST_CMD = "hotsparepolicy -list"
+HOTSPARE_LIST_CMD = NaviCommand("hotsparepolicy", "-list")
 
 
 class Vnx2Api (VnxCommonApi):
@@ -65,12 +63,12 @@ class Vnx2Api (VnxCommonApi):
 
         # Configure the hotspare policy using the ratio specified
 
-        cmd_string = HOTSPARE_POLICY_CMD.substitute(policy=policy,
-                ratio=ratio)
+        cmd_string = NaviCommand("hotsparepolicy", "-set", "-o", policy,
+                                 "-keep1unusedper", ratio)
 
         self._navisec(cmd_string)
         self.logger.info("configure_hs completed successfully")
-        return self.get_hs_policy(policy)
+        return self._written(self.get_hs_policy, policy)
 
     def get_hs_policy(self, policy=None, disk_type=None):
         """
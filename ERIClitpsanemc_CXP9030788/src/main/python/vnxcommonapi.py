@@ -15,6 +15,13 @@ import subprocess
 import xml.etree.ElementTree as ET
 import platform
 import random
+import shlex
+import math
+import threading
+import Queue
+import tempfile
+import copy
+from contextlib import contextmanager
 from token import EQUAL
 from symbol import raise_stmt
 
@@ -25,21 +32,42 @@ from sanapiexception import SanApiException, SanApiCommandException, \
                      SanApiCriticalErrorException, \
                      SanApiEntityAlreadyExistsException, \
                      SanApiEntityNotFoundException, \
-                     SanApiMissingInformationException
+                     SanApiMissingInformationException, \
+                     SanApiPartialFailureException, \
+                     SanApiTimeoutException
 
 from sanapiinfo import  SanApiInfo, LunInfo, StoragePoolInfo, \
                         StorageGroupInfo, HbaInitiatorInfo, \
                         HluAluPairInfo, SanInfo
 
 import sanapilib
-from sanapilib import raise_critical_ex, validate_lun_create, shell_escape
+from sanapilib import raise_critical_ex, validate_lun_create
+from navicmd import NaviCommand, GETLUN_COLUMNS, LUN_LIST_COLUMNS, \
+    STORAGEPOOL_COLUMNS, LUN_FIELDS, POOL_LUN_FIELDS, POOL_LUN_STATE_FIELDS, \
+    STORAGE_POOL_FIELDS
 
 import logging
 from vnxparser import *
 from sanapilib import normalise_container_type
+from sanapiexecutor import get_array_executor
+from sanapihealth import get_array_health
+from sanapiretry import SanApiDeadline, DeadlineScope, build_retry_policy
+from navixml import get_xml_backend
+from sanapicache import SanApiCache
+from sanapiinventory import LunInventory, StorageGroupInventory, \
+    HbaPortInventory
+from sanapilunid import get_array_lun_id_allocator
 import socket
 
 
+# read-only commands which may be run on both SPs at once
+HEDGEABLE_COMMANDS = ('getlun', 'lun -list', 'storagegroup -list',
+                      'port -list -hba', 'snap -list')
+
+# free LUN IDs tried when creating a Raid Group LUN with an automatic ID
+LUN_ID_ATTEMPTS = 5
+
+
 class VnxCommonApi(SanApi):
     """
     Implementation of SanApi interface for common vnx functionality. This is a
@@ -63,6 +91,22 @@ class VnxCommonApi(SanApi):
         self._navi_timeout = timeout
         self._navi_retries = retries
         self._navi_sleep = None
+        self._navi_max_parallel = None
+        self._executor = None
+        self._navi_hedging = False
+        self._navi_hedge_delay = None
+        self._sp_health = None
+        self._retry_policy = None
+        self._deadlines = DeadlineScope()
+        self._lun_cache = SanApiCache('LUN inventory', 0, self.logger)
+        self._sg_cache = SanApiCache('storage group inventory', 0,
+                                     self.logger)
+        self._hba_port_cache = SanApiCache('HBA port list', 0, self.logger)
+        self._lun_incremental = False
+        self._lun_baseline = None
+        self._navi_stream_parse = False
+        self._navi_projection = False
+        self._lun_id_reservation_file = None
 
         super(VnxCommonApi, self).__init__()
 
@@ -86,16 +130,13 @@ class VnxCommonApi(SanApi):
         :type  getcert: :class:`boolean`
         :param vcheck: Optional, check version of VNX. Default; True.
         :type vcheck: :class:`boolean`
-        :param esc_pwd: Optional, escape special chars in password string.
+        :param esc_pwd: Optional, ignored. naviseccli is run without a
+            shell so the password is passed unchanged.
         :type esc_pwd: :class:`boolean`
         """
         self._sp_ips = sp_ips
         self._username = username
-
-        if esc_pwd:
-            self._password = shell_escape(password)
-        else:
-            self._password = password
+        self._password = password
 
         self._scope = scope
 
@@ -138,6 +179,25 @@ class VnxCommonApi(SanApi):
 
         self._navi_retries = int(self._navi_retries)
         self._navi_sleep = int(self._navi_sleep)
+        self._navi_max_parallel = self._get_navi_max_parallel()
+        self._executor = get_array_executor(self._sp_ips,
+                                            self._navi_max_parallel,
+                                            self.logger)
+        self._read_hedging_cfg()
+        self._sp_health = self._get_sp_health_registry()
+        self._retry_policy = self._get_retry_policy()
+        # parse large LUN listings as they are read
+        self._navi_stream_parse = self._get_vnx_flag('NavisecStreamParse')
+        # ask naviseccli only for the columns which are used
+        self._navi_projection = self._get_vnx_flag('NavisecProjection')
+        self._lun_cache.configure(self._get_cache_ttl('LunCacheTTL'))
+        self._sg_cache.configure(self._get_cache_ttl('StorageGroupCacheTTL'))
+        self._hba_port_cache.configure(
+                self._get_cache_ttl('HbaPortListCacheTTL'))
+        # an expired LUN inventory reads only new and changed LUNs
+        self._lun_incremental = self._get_vnx_flag('LunCacheIncremental')
+        self._lun_baseline = None
+        self._lun_id_reservation_file = self._get_lun_id_reservation_file()
 
         self.logger.debug("Read config parameters for VnxCommonApi")
         self.logger.info("San Api Version: " + get_api_version())
@@ -160,13 +220,400 @@ class VnxCommonApi(SanApi):
         var = self._cfg.get(section, option)
         return var
 
+    def _get_navi_max_parallel(self):
+        """
+        Reads the maximum number of naviseccli commands that may run against
+        the array at the same time.
+
+        :returns: The configured limit, 1 if not set or invalid.
+        :rtype: :class:`int`
+        """
+        default = 1
+        try:
+            max_parallel = int(self._cfg.get('VNX', 'NavisecMaxParallel'))
+        except (SanApiException, ValueError):
+            self.logger.warn("Unable to determine NavisecMaxParallel " \
+                             "setting. Using default: %s" % default)
+            return default
+        if max_parallel < 1:
+            self.logger.warn("Invalid NavisecMaxParallel setting %s. " \
+                             "Using default: %s" % (max_parallel, default))
+            return default
+        return max_parallel
+
+    def _read_hedging_cfg(self):
+        """
+        Reads the optional NavisecHedging and NavisecHedgeDelay settings.
+        Hedging is disabled if either is missing or invalid.
+        """
+        self._navi_hedging = False
+        try:
+            hedging = self._cfg.get('VNX', 'NavisecHedging')
+            self._navi_hedge_delay = float(self._cfg.get('VNX',
+                                                     'NavisecHedgeDelay'))
+        except (SanApiException, ValueError):
+            self.logger.warn("Unable to determine NavisecHedging settings. "
+                             "Hedging disabled")
+            return
+        self._navi_hedging = hedging.strip().lower() == "true" and \
+                             self._navi_hedge_delay >= 0
+
+    def _get_sp_health_registry(self):
+        """
+        Returns the SP health registry of the array, configured from the
+        SpFailureThreshold, SpBreakerResetTime, SpLatencyAlpha and
+        SpSlowLatency settings.
+
+        :rtype: :class:`SpHealthRegistry`
+        """
+        settings = {'SpFailureThreshold': 3, 'SpBreakerResetTime': 60,
+                    'SpLatencyAlpha': 0.3, 'SpSlowLatency': None}
+        for option in settings.keys():
+            try:
+                settings[option] = float(self._cfg.get('VNX', option))
+            except (SanApiException, ValueError):
+                self.logger.warn("Unable to determine %s setting. Using "
+                                 "default: %s" % (option, settings[option]))
+        return get_array_health(self._sp_ips,
+                                settings['SpFailureThreshold'],
+                                settings['SpBreakerResetTime'],
+                                settings['SpLatencyAlpha'],
+                                settings['SpSlowLatency'], self.logger)
+
+    def _get_retry_policy(self):
+        """
+        Creates the retry policy for naviseccli commands from the
+        NavisecRetryPolicy and NavisecRetryBackoffCap settings, using
+        NavisecRetries and NavisecRetrySleep.
+
+        :rtype: :class:`RetryPolicy`
+        """
+        name = 'fixed'
+        cap = None
+        try:
+            name = self._cfg.get('VNX', 'NavisecRetryPolicy')
+            cap = float(self._cfg.get('VNX', 'NavisecRetryBackoffCap'))
+        except (SanApiException, ValueError):
+            self.logger.warn("Unable to determine NavisecRetryPolicy "
+                             "settings. Using policy: %s" % name)
+        return build_retry_policy(name, self._navi_retries, self._navi_sleep,
+                                  cap)
+
+    def _get_vnx_flag(self, option):
+        """
+        Reads an optional True/False setting of the VNX section, e.g.
+        NavisecStreamParse.
+
+        :param option: The setting.
+        :type option: :class:`str`
+        :returns: True if the setting is True, False if not set.
+        :rtype: :class:`boolean`
+        """
+        try:
+            value = self._cfg.get('VNX', option)
+        except SanApiException:
+            self.logger.warn("Unable to determine %s setting. Using "
+                             "default: False" % option)
+            return False
+        return value.strip().lower() == "true"
+
+    def _get_lun_id_reservation_file(self):
+        """
+        Reads the LunIdReservationFile setting, the file sharing LUN ID
+        reservations between processes on the host.
+
+        :returns: The path, None if not set.
+        :rtype: :class:`str`
+        """
+        try:
+            path = self._cfg.get('VNX', 'LunIdReservationFile').strip()
+        except SanApiException:
+            self.logger.warn("Unable to determine LunIdReservationFile "
+                             "setting. LUN IDs reserved in process only")
+            return None
+        return path or None
+
+    def _projected(self, navicmd, column_map, fields):
+        """
+        Limits a listing command to the columns holding the given fields,
+        if NavisecProjection is enabled.
+
+        :param navicmd: The listing command, e.g. getlun.
+        :type navicmd: :class:`NaviCommand`
+        :param column_map: The switches of each field, e.g.
+            GETLUN_COLUMNS.
+        :type column_map: :class:`dict`
+        :param fields: The fields the caller uses.
+        :type fields: :class:`tuple`
+        :rtype: :class:`NaviCommand`
+        """
+        if not self._navi_projection:
+            return navicmd
+        return navicmd.columns(column_map, fields)
+
+    def _get_cache_ttl(self, option):
+        """
+        Reads the time to live of a cache.
+
+        :param option: The setting, e.g. LunCacheTTL.
+        :type option: :class:`str`
+        :returns: Seconds a cached value stays valid, 0 if not set or
+            invalid, which disables the cache.
+        :rtype: :class:`float`
+        """
+        try:
+            ttl = float(self._cfg.get('VNX', option))
+        except (SanApiException, ValueError):
+            self.logger.warn("Unable to determine %s setting. Caching "
+                             "disabled" % option)
+            return 0
+        if ttl < 0:
+            self.logger.warn("Invalid %s setting %s. Caching disabled" %
+                             (option, ttl))
+            return 0
+        return ttl
+
+    def refresh(self, incremental=False):
+        """
+        Drops the cached array information and, if caching is enabled,
+        reads the LUN inventory again straight away. The storage group
+        inventory and HBA port list are read again when next used.
+
+        :param incremental: Optional, boolean to read only the LUNs that
+            are new or changed since the cached inventory was read. The
+            storage pool usage of unchanged LUNs is not read again.
+            Default; False, read every LUN.
+        :type incremental: :class:`boolean`
+
+        Example:
+
+            .. code-block:: python
+
+                vnx.refresh()
+                luns = vnx.get_luns()
+        """
+        self.logger.debug("Refreshing cached array information")
+        if self._lun_cache.enabled:
+            self._lun_cache.refresh(
+                    lambda: self._read_lun_inventory(incremental=incremental))
+        else:
+            self._lun_cache.invalidate()
+        self._sg_cache.invalidate()
+        self._hba_port_cache.invalidate()
+
+    def cache_stats(self):
+        """
+        Returns the statistics of the caches of array information.
+
+        :returns: The statistics of each cache, keyed by cache, luns,
+            storage_groups or hba_ports. See :meth:`SanApiCache.stats`.
+        :rtype: :class:`dict`
+        """
+        return {'luns': self._lun_cache.stats(),
+                'storage_groups': self._sg_cache.stats(),
+                'hba_ports': self._hba_port_cache.stats()}
+
+    def _navisec_lun_change(self, navicmd, **kwargs):
+        """
+        Runs a NaviCLI command which changes LUNs and drops the cached LUN
+        inventory, whether or not the command succeeds.
+
+        :param navicmd: The naviCLI command.
+        :type navicmd: :class:`NaviCommand`
+        :param kwargs: Keyword arguments passed to _navisec.
+        :type kwargs: :class:`dict`
+        :returns: The _navisec return value.
+        """
+        try:
+            return self._navisec(navicmd, **kwargs)
+        finally:
+            self._lun_cache.invalidate()
+
+    def _navisec_sg_change(self, navicmd, hba_change=False, **kwargs):
+        """
+        Runs a NaviCLI command which changes storage groups and drops the
+        cached storage group inventory, whether or not the command
+        succeeds.
+
+        :param navicmd: The naviCLI command.
+        :type navicmd: :class:`NaviCommand`
+        :param hba_change: Optional, boolean to also drop the cached HBA
+            port list, for commands which register or remove HBAs.
+            Default; False
+        :type hba_change: :class:`boolean`
+        :param kwargs: Keyword arguments passed to _navisec.
+        :type kwargs: :class:`dict`
+        :returns: The _navisec return value.
+        """
+        try:
+            return self._navisec(navicmd, **kwargs)
+        finally:
+            self._invalidate_sg_caches(hba_change)
+
+    def _invalidate_sg_caches(self, hba_change=False):
+        """
+        Drops the cached storage group inventory after the storage groups
+        have been changed.
+
+        :param hba_change: Optional, boolean to also drop the cached HBA
+            port list. Default; False
+        :type hba_change: :class:`boolean`
+        """
+        self._sg_cache.invalidate()
+        if hba_change:
+            self._hba_port_cache.invalidate()
+
+    @contextmanager
+    def deadline(self, seconds):
+        """
+        Limits the total time of the API calls made inside the with block,
+        including all retries and sleeps. Nested deadlines never extend the
+        one already in force.
+
+        :param seconds: The time budget in seconds.
+        :type seconds: :class:`float`
+        :raises SanApiTimeoutException: Raised by calls inside the block if
+            the budget runs out.
+
+        Example:
+
+            .. code-block:: python
+
+                with vnx.deadline(300):
+                    vnx.create_lun(...)
+                    vnx.add_lun_to_storage_group(...)
+        """
+        deadline = self._deadlines.push(SanApiDeadline(seconds))
+        try:
+            yield deadline
+        finally:
+            self._deadlines.pop()
+
+    @contextmanager
+    def _deadline_scope(self, deadline):
+        """
+        Makes an existing deadline current for nested calls. Does nothing
+        if deadline is None.
+        """
+        if deadline is None:
+            yield self._deadlines.current()
+            return
+        deadline = self._deadlines.push(deadline)
+        try:
+            yield deadline
+        finally:
+            self._deadlines.pop()
+
+    def _current_deadline(self, deadline=None):
+        """
+        Returns the earliest of the given deadline and the one in force.
+        """
+        current = self._deadlines.current()
+        if deadline is None:
+            return current
+        return deadline.earliest(current)
+
+    def _run_scoped(self, tasks):
+        """
+        Runs tasks on the array executor under the deadline in force for
+        the calling thread, which the worker threads do not see otherwise.
+
+        :param tasks: The tasks, as taken by :meth:`SanApiExecutor.run`.
+        :type tasks: :class:`list`
+        :returns: One result per task, in submission order.
+        :rtype: :class:`list` of :class:`SanApiTaskResult`
+        """
+        deadline = self._current_deadline()
+        return self._executor.run(tasks,
+                                  lambda: self._deadline_scope(deadline))
+
+    def _map_scoped(self, func, items):
+        """
+        Runs func once per item on the array executor under the deadline in
+        force for the calling thread, see :meth:`_run_scoped`.
+
+        :param func: The callable, called with a single item.
+        :type func: :class:`callable`
+        :param items: The items to pass to func.
+        :type items: :class:`list`
+        :returns: One result per item, in the order of items.
+        :rtype: :class:`list` of :class:`SanApiTaskResult`
+        """
+        return self._run_scoped([(func, (item,)) for item in items])
+
+    def _sp_label(self, navi_ip):
+        """
+        Returns the storage processor name of an SP IP address.
+        """
+        return 'Storage Processor %s' % chr(ord('A') +
+                                            list(self._sp_ips).index(navi_ip))
+
+    def _sp_order(self, sp_ip=None):
+        """
+        Returns the SP IP addresses in the order to try them, healthy SPs
+        first. A given SP is tried first unless its breaker is open.
+        """
+        sp_ips = self._sp_health.order(self._sp_ips)
+        if sp_ip in sp_ips:
+            sp_ips = [sp_ip] + [navi_ip for navi_ip in sp_ips
+                                if navi_ip != sp_ip]
+        return sp_ips
+
+    def _record_sp_result(self, navi_ip, proc, started):
+        """
+        Updates the health of an SP with the outcome of a naviseccli run.
+        Only return code 255, a connection failure, counts as a failure.
+        """
+        if proc.returncode == 255:
+            self._sp_health.record_failure(navi_ip)
+        else:
+            self._sp_health.record_success(navi_ip, time.time() - started)
+
+    def _navisec_many(self, navicmds, spread=False, **kwargs):
+        """
+        Runs several independent NaviCLI commands concurrently, bounded by
+        the NavisecMaxParallel setting for the array.
+
+        :param navicmds: The naviCLI commands.
+        :type navicmds: :class:`list`
+        :param spread: Optional, boolean to send the commands to the SPs in
+            turn, so two commands are run one on each SP. Default; False
+        :type spread: :class:`boolean`
+        :param kwargs: Keyword arguments passed to each _navisec call.
+        :type kwargs: :class:`dict`
+        :returns: One result per command in submission order, holding
+            either the _navisec return value or the exception it raised.
+        :rtype: :class:`list` of :class:`SanApiTaskResult`
+        :raises SanApiOperationFailedException: Raised if the API is not
+            initialised.
+        """
+        if self._initialised == False:
+            msg = "API is not initialised"
+            self.logger.error(msg)
+            raise SanApiOperationFailedException(msg, 1)
+
+        self.logger.debug("Running %s navisec commands, at most %s at " \
+                          "a time" % (len(navicmds),
+                                      self._executor.max_workers))
+        tasks = []
+        sp_ips = self._sp_order()
+        for index, navicmd in enumerate(navicmds):
+            task_kwargs = kwargs
+            if spread and sp_ips:
+                task_kwargs = dict(kwargs)
+                task_kwargs['sp_ip'] = sp_ips[index % len(sp_ips)]
+            tasks.append((self._navisec, (navicmd,), task_kwargs))
+        return self._run_scoped(tasks)
+
     def _navisec(self, navicmd, parse=False, cert=False, xml=True,
-                 logmsg=True, log_output=False, timeout=0):
+                 logmsg=True, log_output=False, timeout=0, hedge=None,
+                 deadline=None, sp_ip=None):
         """
         Runs the NaviCLI command, passes the command with arguments.
 
-        :param navicmd: The naviCLI command.
-        :type navicmd: :class:`str`
+        :param navicmd: The naviCLI command, a command line string is split
+            the way a shell would.
+        :type navicmd: :class:`NaviCommand` or :class:`str`
         :param parse: boolean to determine whether to parse the command to
             check if the syntax is correct. Default; True
         :type parse: :class:`boolean`
@@ -179,108 +626,435 @@ class VnxCommonApi(SanApi):
         :param logmsg: boolean determining whether to log the message.
             Default; True
         :type logmsg: :class:`boolean`
-        :returns: XML output from naviseccli in an element tree object.
-        :rtype: :class:`xml.etree.ElementTree`
+        :param hedge: Optional, boolean to run the command on both SPs,
+            starting the second after NavisecHedgeDelay seconds. Default;
+            None, hedge read-only commands if NavisecHedging is enabled.
+        :type hedge: :class:`boolean`
+        :param deadline: Optional, time by which the command, including
+            retries, has to complete. The deadline set with the deadline
+            context manager also applies.
+        :type deadline: :class:`SanApiDeadline`
+        :param sp_ip: Optional, IP address of the SP to run the command on
+            first. Default; None, healthy SPs in configured order.
+        :type sp_ip: :class:`str`
+        :returns: XML output from naviseccli, decoded from its element
+            tree.
+        :rtype: :class:`NaviResponse`
         :raises SanApiConnectionException: Raised if the command fails.
+        :raises SanApiTimeoutException: Raised if the deadline expires.
         """
         if self._initialised == False:
             msg = "API is not initialised"
             self.logger.error(msg)
             raise SanApiOperationFailedException(msg, 1)
 
+        navicmd = NaviCommand.from_string(navicmd)
         parsestr = '-parse' if parse else ''
-        completed = False
+        xmlstr = '-xml' if xml else ''
+        if timeout == 0:
+            timeout = self._navi_timeout
+        if hedge is None:
+            hedge = self._is_hedgeable(navicmd)
+        hedge = hedge and not cert
+        deadline = self._current_deadline(deadline)
+        proc = None
+        stdout = stderr = ""
 
         for count in range(0, self._navi_retries):
-            spinfo = 'Storage Processor A'
-            for navi_ip in self._sp_ips:
-                if xml:
-                    xml = '-xml'
-                else:
-                    xml = ''
-                if timeout == 0:
-                    timeout = self._navi_timeout
-                log_cmd = "%s -h %s " % (self._navi_cmd, navi_ip) + \
-                  "-User \"%s\" -Password ****** " % (self._username) + \
-                  "-timeout %s -Scope %s " % (timeout, self._scope)\
-                  + "%s %s %s" % (xml, parsestr, navicmd)
-                cmd = log_cmd.replace('******', self._password)
+            # healthy SPs first, SPs with an open breaker are skipped
+            sp_ips = self._sp_order(sp_ip)
+            if hedge and len(sp_ips) > 1:
+                proc, stdout, stderr = self._navisec_hedged(count, sp_ips,
+                                navicmd, xmlstr, parsestr,
+                                self._clamp_timeout(timeout, deadline,
+                                                    navicmd),
+                                log_output)
+                if proc is not None and proc.returncode == 0:
+                    return self._navisec_output(stdout, xml, logmsg)
+            else:
+                for navi_ip in sp_ips:
+                    cmd, log_cmd = self._navisec_cmdline(navi_ip, navicmd,
+                                    xmlstr, parsestr,
+                                    self._clamp_timeout(timeout, deadline,
+                                                        navicmd))
+                    self.logger.debug(
+                         "Attempt %s, run navisec command on %s:" % (
+                                (int(count) + 1), self._sp_label(navi_ip)))
+                    self.logger.debug(log_cmd)
+
+                    started = time.time()
+                    new_proc = self._navisec_popen(cmd)
+                    if new_proc is None:
+                        continue
+                    proc = new_proc
+
+                    if cert == False:
+                        stdout, stderr = proc.communicate()
+                        self._record_sp_result(navi_ip, proc, started)
+                        if log_output:
+                            self._log_navisec_output(stdout, stderr)
+                        if proc.returncode == 0:
+                            return self._navisec_output(stdout, xml, logmsg)
+                    else:
+                        # We are interacting with navisec to retrieve cert
+                        try:
+                            self._cert_interaction(proc)  # check return or
+                                                          # something for loop
+                                                          # behaviour
+                            self.logger.debug(
+                                        "Certificate retrieval worked ok")
+                            return
+                        except SanApiConnectionException:
+                            stdout = ""
+                            stderr = ""
+            if not self._navisec_retry_wait(count, proc, stderr, deadline,
+                                            navicmd):
+                break
 
-                self.logger.debug(
-                     "Attempt %s, run navisec command on %s:" % ((int(count)
-                                                                + 1), spinfo))
-                self.logger.debug(log_cmd)
+        self._navisec_failed(navicmd, proc, stdout, stderr)
 
-                try:
-                    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
-                                            stdout=subprocess.PIPE,
-                                            stderr=subprocess.PIPE,
-                                            shell=True)
-                except OSError, exce:
-                    errmsg = "OS error when attempting to Popen navisec:" +\
-                    " %s" % str(exce)
-                    self.logger.error(errmsg)
-                    raise SanApiCriticalErrorException(errmsg)
-                except Exception, exce:
-                    errmsg = "Error when attempting to Popen navisec:" +\
-                    " %s" % str(exce)
-                    self.logger.error(errmsg)
-                    continue  # We don't know if this is fatal exception do we?
-
-                if cert == False:
-                    stdout, stderr = proc.communicate()
-                    if log_output:
-                        self.logger.debug(stdout.replace("\n\n", "\n"))
-                        self.logger.debug(stderr.replace("\n\n", "\n"))
-                    if proc.returncode == 0:
-                        self.logger.debug("Command returned" +\
-                                          " %s" % proc.returncode)
-                        if xml:
-                            return self._etree_from_output(stdout,
-                                                           logmsg=logmsg)
-                        else:
-                            return stdout
-                else:
-                    # We are interacting with navisec to retrieve cert
-                    try:
-                        self._cert_interaction(proc)  # check return or
-                                                      # something for loop
-                                                      # behaviour
-                        self.logger.debug("Certificate retrieval worked ok")
-                        return
-                    except SanApiConnectionException:
-                        stdout = ""
-                        stderr = ""
-                spinfo = 'Storage Processor B'
-            # we should only retry in connection failures
-            if self._is_connection_failure(proc):
-                errmsg = "Command ended with unexpected code %s %s" %\
-                        (proc.returncode, stderr)
-                raise SanApiOperationFailedException(errmsg, 1)
-            self.logger.debug("Command returned %s, sleeping %s seconds" % \
-                                      (proc.returncode, self._navi_sleep))
-            time.sleep(self._navi_sleep)
+    def _navisec_retry_wait(self, count, proc, stderr, deadline, navicmd):
+        """
+        Called after a pass over the SPs failed. Sleeps for the retry
+        policy delay unless this was the last pass.
+
+        :param count: The pass number, starting at 0.
+        :type count: :class:`int`
+        :param proc: The last naviseccli process, None if none started.
+        :type proc: :class:`subprocess.Popen`
+        :returns: False if no retries are left.
+        :rtype: :class:`boolean`
+        :raises SanApiOperationFailedException: Raised if the return code
+            is not one that is retried.
+        :raises SanApiTimeoutException: Raised if the deadline expires
+            before the next pass.
+        """
+        # we should only retry in connection failures
+        if proc is not None and \
+                not self._retry_policy.should_retry(proc.returncode):
+            errmsg = "Command ended with unexpected code %s %s" %\
+                    (proc.returncode, stderr)
+            raise SanApiOperationFailedException(errmsg, 1)
+        if count == self._navi_retries - 1:
+            return False
+        returncode = proc.returncode if proc is not None else None
+        sleep = self._retry_policy.delay(count)
+        if deadline is not None and deadline.remaining() <= sleep:
+            msg = "Deadline expires before navisec command %s can " \
+                  "be retried" % navicmd
+            self.logger.error(msg)
+            raise SanApiTimeoutException(msg, 1)
+        self.logger.debug("Command returned %s, sleeping %.1f seconds" % \
+                                  (returncode, sleep))
+        time.sleep(sleep)
+        return True
+
+    def _navisec_failed(self, navicmd, proc, stdout, stderr):
+        """
+        Logs and raises the failure of a command once all retries are used.
 
+        :raises SanApiConnectionException: Always.
+        """
         # We have exited loop so navisec command has failed with connection
         # issue
-        self.logger.info("Executed %s, return code %s" % (log_cmd,
-                                                          proc.returncode))
+        returncode = proc.returncode if proc is not None else 1
+        self.logger.info("Executed %s, return code %s" % (navicmd,
+                                                          returncode))
         self.logger.error("Navisec command failed with errorcode" +\
-                          " %s " % proc.returncode)
+                          " %s " % returncode)
         self.logger.error("%s %s" % (stdout, stderr))
-        raise SanApiConnectionException(stdout + stderr, proc.returncode)
+        raise SanApiConnectionException(stdout + stderr, returncode)
+
+    def _navisec_stream(self, navicmd, delim, logmsg=True, deadline=None,
+                        sp_ip=None):
+        """
+        Runs a read-only NaviCLI command which lists many items, e.g.
+        getlun, and yields one dictionary per item while the XML output is
+        still being read. Neither the output nor its element tree is kept
+        in memory. The status of the response is checked once the output
+        has been read, so a failure is raised after the items before it.
+
+        Retries follow the same policy as _navisec as long as no item has
+        been yielded yet.
+
+        :param navicmd: The naviCLI command.
+        :type navicmd: :class:`NaviCommand` or :class:`str`
+        :param delim: The name which starts a new item in the output.
+        :type delim: :class:`str`
+        :param logmsg: boolean determining whether to log the message.
+        :type logmsg: :class:`boolean`
+        :param deadline: Optional, time by which the command, including
+            retries, has to complete.
+        :type deadline: :class:`SanApiDeadline`
+        :param sp_ip: Optional, IP address of the SP to run the command on
+            first.
+        :type sp_ip: :class:`str`
+        :returns: A generator of dictionaries, in output order.
+        :rtype: :class:`generator`
+        :raises SanApiConnectionException: Raised if the command fails or
+            its output ends part way through.
+        :raises SanApiCommandException: Raised if the output cannot be
+            parsed or reports a failure.
+        :raises SanApiTimeoutException: Raised if the deadline expires.
+        """
+        if self._initialised == False:
+            msg = "API is not initialised"
+            self.logger.error(msg)
+            raise SanApiOperationFailedException(msg, 1)
+
+        navicmd = NaviCommand.from_string(navicmd)
+        deadline = self._current_deadline(deadline)
+        proc = None
+        stderr = ""
+
+        for count in range(0, self._navi_retries):
+            for navi_ip in self._sp_order(sp_ip):
+                cmd, log_cmd = self._navisec_cmdline(navi_ip, navicmd,
+                                '-xml', '',
+                                self._clamp_timeout(self._navi_timeout,
+                                                    deadline, navicmd))
+                self.logger.debug("Attempt %s, stream navisec command on "
+                                  "%s:" % ((int(count) + 1),
+                                           self._sp_label(navi_ip)))
+                self.logger.debug(log_cmd)
+
+                # stderr goes to a file so a full pipe cannot stall the
+                # process while stdout is being parsed
+                errfile = tempfile.TemporaryFile()
+                try:
+                    started = time.time()
+                    new_proc = self._navisec_popen(cmd, stderr=errfile)
+                    if new_proc is None:
+                        continue
+                    proc = new_proc
+                    status = dict()
+                    yielded = False
+                    error = None
+                    try:
+                        try:
+                            for item in self.parser.iter_dicts(
+                                    self.parser.iter_params(proc.stdout,
+                                                            status), delim):
+                                yielded = True
+                                yield item
+                        except Exception, exce:
+                            error = exce
+                        proc.stdout.read()
+                        proc.wait()
+                    finally:
+                        # the caller stopped reading part way through
+                        if proc.returncode is None:
+                            self._kill_proc(proc)
+                    errfile.seek(0)
+                    stderr = errfile.read()
+                finally:
+                    errfile.close()
+
+                self._record_sp_result(navi_ip, proc, started)
+                if proc.returncode == 0 and error is None:
+                    self.logger.debug("Command returned 0")
+                    self._check_navi_status(status, logmsg)
+                    return
+                if yielded:
+                    errmsg = "Navisec output of %s ended unexpectedly, " \
+                             "code %s: %s %s" % (navicmd, proc.returncode,
+                                                 error, stderr)
+                    self.logger.error(errmsg)
+                    raise SanApiConnectionException(errmsg,
+                                                    proc.returncode or 1)
+                if proc.returncode == 0:
+                    errmsg = "Cannot parse XML response from naviseccli:" \
+                             " %s" % str(error)
+                    self.logger.error(errmsg)
+                    raise SanApiCommandException(errmsg, 1)
+
+            if not self._navisec_retry_wait(count, proc, stderr, deadline,
+                                            navicmd):
+                break
+
+        self._navisec_failed(navicmd, proc, "", stderr)
+
+    def _kill_proc(self, proc):
+        """
+        Stops a naviseccli process which is no longer needed.
+        """
+        try:
+            proc.kill()
+            proc.wait()
+        except OSError:
+            pass
+
+    def _clamp_timeout(self, timeout, deadline, navicmd):
+        """
+        Limits the naviseccli -timeout value to the time left before the
+        deadline.
+
+        :returns: The timeout to pass to naviseccli.
+        :raises SanApiTimeoutException: Raised if the deadline has passed.
+        """
+        if deadline is None:
+            return timeout
+        deadline.check("navisec command %s" % navicmd)
+        return max(1, int(math.ceil(deadline.clamp(timeout))))
+
+    def _navisec_cmdline(self, navi_ip, navicmd, xmlstr, parsestr, timeout):
+        """
+        Builds the naviseccli argument list for one SP.
+
+        :param navicmd: The naviCLI command.
+        :type navicmd: :class:`NaviCommand`
+        :returns: The argument list and the command line to log, with the
+            password masked.
+        :rtype: :class:`tuple`
+        """
+        log_cmd = "%s -h %s " % (self._navi_cmd, navi_ip) + \
+          "-User \"%s\" -Password ****** " % (self._username) + \
+          "-timeout %s -Scope %s " % (timeout, self._scope)\
+          + "%s %s %s" % (xmlstr, parsestr, navicmd)
+        argv = shlex.split(self._navi_cmd) + ['-h', navi_ip,
+                '-User', self._username, '-Password', self._password,
+                '-timeout', str(timeout), '-Scope', str(self._scope)]
+        argv += [opt for opt in (xmlstr, parsestr) if opt]
+        argv += list(navicmd.argv)
+        return argv, log_cmd
+
+    def _navisec_popen(self, cmd, stderr=subprocess.PIPE):
+        """
+        Starts a naviseccli process, without a shell.
+
+        :param cmd: The argument list.
+        :type cmd: :class:`list`
+        :param stderr: Where standard error goes. Default; a pipe.
+        :type stderr: :class:`file`
+        :returns: The process, None if it could not be started.
+        :rtype: :class:`subprocess.Popen`
+        :raises SanApiCriticalErrorException: Raised on an OS error.
+        """
+        try:
+            return subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE,
+                                    stderr=stderr)
+        except OSError, exce:
+            errmsg = "OS error when attempting to Popen navisec:" +\
+            " %s" % str(exce)
+            self.logger.error(errmsg)
+            raise SanApiCriticalErrorException(errmsg)
+        except Exception, exce:
+            errmsg = "Error when attempting to Popen navisec:" +\
+            " %s" % str(exce)
+            self.logger.error(errmsg)
+            return None  # We don't know if this is fatal exception do we?
+
+    def _navisec_output(self, stdout, xml, logmsg):
+        """
+        Converts the output of a successful naviseccli run.
+        """
+        self.logger.debug("Command returned 0")
+        if xml:
+            return self._etree_from_output(stdout, logmsg=logmsg)
+        return stdout
 
-    def _is_connection_failure(self, proc):
+    def _log_navisec_output(self, stdout, stderr):
+        self.logger.debug(stdout.replace("\n\n", "\n"))
+        self.logger.debug(stderr.replace("\n\n", "\n"))
+
+    def _is_hedgeable(self, navicmd):
+        """
+        Checks if a command may be hedged across both SPs, i.e. hedging is
+        enabled and the command is read-only.
+
+        :param navicmd: The naviCLI command.
+        :type navicmd: :class:`str`
+        :returns: True if the command may be hedged.
+        :rtype: :class:`boolean`
         """
-        Checks if the connection failed.
+        if not self._navi_hedging:
+            return False
+        navicmd = ' '.join(str(navicmd).split())
+        for prefix in HEDGEABLE_COMMANDS:
+            if navicmd == prefix or navicmd.startswith(prefix + ' '):
+                return True
+        return False
 
-        :param proc: The procedure code to check.
-        :type proc: :class:`int`
-        :returns: True if connection failed, else False.
-        :rtype proc: :class:`boolean`
+    def _navisec_hedged(self, count, sp_ips, navicmd, xmlstr, parsestr,
+                        timeout, log_output):
         """
+        Runs a command on the first SP and, if it has not answered within
+        NavisecHedgeDelay seconds or has failed, on the next SP as well.
+        The first successful answer wins and the other process is killed.
 
-        return proc.returncode != 255
+        :returns: The process, stdout and stderr of the winning run, or of
+            the last failed run if no SP succeeded.
+        :rtype: :class:`tuple`
+        """
+        done = Queue.Queue()
+        running = []
+        last = (None, "", "")
+
+        def communicate(proc, navi_ip, started):
+            try:
+                stdout, stderr = proc.communicate()
+            except Exception, exce:
+                stdout, stderr = "", str(exce)
+            if not getattr(proc, 'hedge_killed', False):
+                self._record_sp_result(navi_ip, proc, started)
+            done.put((proc, stdout, stderr))
+
+        for index, navi_ip in enumerate(sp_ips):
+            cmd, log_cmd = self._navisec_cmdline(navi_ip, navicmd, xmlstr,
+                                                 parsestr, timeout)
+            self.logger.debug("Attempt %s, run hedged navisec command on " \
+                         "%s:" % ((int(count) + 1), self._sp_label(navi_ip)))
+            self.logger.debug(log_cmd)
+            started = time.time()
+            proc = self._navisec_popen(cmd)
+            if proc is None:
+                continue
+            thread = threading.Thread(target=communicate,
+                                      args=(proc, navi_ip, started))
+            thread.daemon = True
+            thread.start()
+            running.append(proc)
+
+            if index == len(sp_ips) - 1:
+                break
+            # give this SP a head start before hedging on the next one
+            try:
+                result = done.get(timeout=self._navi_hedge_delay)
+            except Queue.Empty:
+                self.logger.debug("No answer from %s after %s seconds, " \
+                          "hedging" % (self._sp_label(navi_ip),
+                                       self._navi_hedge_delay))
+                continue
+            running.remove(result[0])
+            if result[0].returncode == 0:
+                return self._hedge_winner(result, running, log_output)
+            last = result
+
+        while running:
+            result = done.get()
+            running.remove(result[0])
+            if result[0].returncode == 0:
+                return self._hedge_winner(result, running, log_output)
+            last = result
+        if log_output and last[0] is not None:
+            self._log_navisec_output(last[1], last[2])
+        return last
+
+    def _hedge_winner(self, result, losers, log_output):
+        """
+        Kills the naviseccli processes that lost the race.
+        """
+        for proc in losers:
+            self.logger.debug("Killing slower hedged navisec process")
+            proc.hedge_killed = True
+            try:
+                proc.kill()
+            except OSError:
+                pass  # process has already finished
+        if log_output:
+            self._log_navisec_output(result[1], result[2])
+        return result
 
     def _etree_from_output(self, stdout, logmsg=True):
         """
@@ -290,13 +1064,13 @@ class VnxCommonApi(SanApi):
         :type stdout: :class:`str`
         :param logmsg: boolean to determine whether to log any messages.
         :type logmsg: :class:`boolean`
-        :returns: The element tree.
-        :rtype: :class:`xml.etree.ElementTree`
+        :returns: The element tree, decoded for the parser.
+        :rtype: :class:`NaviResponse`
         :raises SanApiCommandException: Raised if output could not be parsed.
         """
 
         try:
-            root = ET.fromstring(stdout)
+            root = get_xml_backend().fromstring(stdout)
         except Exception, exce:
             errmsg = "Cannot parse XML response from naviseccli:" +\
                                                         " %s" % str(exce)
@@ -304,11 +1078,22 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiCommandException(errmsg, 1)
 
-        navi_dict = dict()
-        for san_prop in root.findall('.//PROPERTY'):
-            san_property = san_prop.find('VALUE')
-            navi_dict[san_prop.attrib['NAME']] = san_property.text
+        # the status and all PARAMVALUEs are read in the same walk
+        response = NaviResponse(root)
+        self._check_navi_status(response.status, logmsg)
+        return response
+
+    def _check_navi_status(self, navi_dict, logmsg=True):
+        """
+        Checks the status properties of a naviseccli XML response.
 
+        :param navi_dict: The PROPERTY values of the response.
+        :type navi_dict: :class:`dict`
+        :param logmsg: boolean to determine whether to log any messages.
+        :type logmsg: :class:`boolean`
+        :raises SanApiCommandException: Raised if the command failed or the
+            status is missing.
+        """
         try:
             if navi_dict['success'] == 'false':
                 err = navi_dict['errorCode']
@@ -329,8 +1114,6 @@ class VnxCommonApi(SanApi):
         except KeyError:
             raise SanApiCommandException("Bad XML response from naviseccli", 1)
 
-        return root
-
     def _restore_snapshot(self, lun_id, snap_name, delete_backup_snap,
                           backup_name=None):
         """
@@ -367,11 +1150,12 @@ class VnxCommonApi(SanApi):
         else:
             backup_snapshot_name = "_".join(["restore", snap_name])
 
-        cmd_string = "snap -restore -id \"{0}\" -bakName \"{1}\" -res \"{2}\""\
-                        .format(snap_name, backup_snapshot_name, lun_id)
-        cmd_string += " -o"
+        cmd_string = NaviCommand("snap", "-restore", "-id").quoted(snap_name)\
+                        .arg("-bakName").quoted(backup_snapshot_name)\
+                        .arg("-res").quoted(lun_id)
+        cmd_string = cmd_string.arg("-o")
 
-        self._navisec(cmd_string)
+        self._navisec_lun_change(cmd_string)
 
         self.logger.info("snapshot restored with lun id:" + lun_id +
                              ", unique snapshot name:" + snap_name)
@@ -408,7 +1192,8 @@ class VnxCommonApi(SanApi):
         sanapilib.validate_string(snap_name, self.logger)
 
         try:
-            cmd_string = "snap -destroy -id \"{0}\" -o" .format(snap_name)
+            cmd_string = NaviCommand("snap", "-destroy", "-id")\
+                            .quoted(snap_name).arg("-o")
             self._navisec(cmd_string)
 
         except Exception as exce:
@@ -436,7 +1221,7 @@ class VnxCommonApi(SanApi):
         """
         self.logger.info("Checking if certificate needs to be accepted")
 
-        cmd_string = "systemtype"
+        cmd_string = NaviCommand("systemtype")
         self._navisec(cmd_string, False, True)
 
     def _cert_interaction(self, proc):
@@ -493,6 +1278,8 @@ class VnxCommonApi(SanApi):
         It  calls the _navisec function to retrieve info about the LUN
         specified with the parameters and returns a LunInfo object.
         It has two modes. To retrieve by LUN id or LUN name.
+        Only the one LUN is read from the array, unless the LUN inventory
+        cache is enabled, in which case the LUN is looked up there.
 
         .. note::
 
@@ -519,16 +1306,11 @@ class VnxCommonApi(SanApi):
             ''' GET LUN BY ID '''
             lun_id = sanapilib.validate_int_and_make_string(lun_id)
 
-            # Running _get_luns then filtering out the one LUN we're interested
-            # in so we don't need to write extra code doing the essentially
-            # the same job.
-            luns = self._get_luns()
-
-            for lun in luns:
-                if lun.id == lun_id:
-                    self.logger.info("get_lun completed successfully. " +
-                                        "Found LUN " + lun.name)
-                    return lun
+            lun = self._lookup_lun(logmsg, lun_id=lun_id)
+            if lun is not None:
+                self.logger.info("get_lun completed successfully. " +
+                                    "Found LUN " + lun.name)
+                return lun
 
             sanapilib.raise_ex("LUN not found: " + lun_id,
                                SanApiEntityNotFoundException,
@@ -536,15 +1318,11 @@ class VnxCommonApi(SanApi):
 
         elif lun_name is not None and lun_id is None:
             ''' GET LUN BY NAME '''
-            luns = self._get_luns()
-
-            # Search for LUN with matching name
-            for lun in luns:
-                if (lun.name == lun_name and
-                        lun.type == sanapilib.CONTAINER_STORAGE_POOL):
-                    self.logger.info("get_lun completed successfully. " +
-                                        "Found LUN " + lun.id)
-                    return lun
+            lun = self._lookup_lun(logmsg, lun_name=lun_name)
+            if lun is not None:
+                self.logger.info("get_lun completed successfully. " +
+                                    "Found LUN " + lun.id)
+                return lun
 
             sanapilib.raise_ex("LUN not found: %s" % lun_name,
                                SanApiEntityNotFoundException,
@@ -554,6 +1332,82 @@ class VnxCommonApi(SanApi):
             sanapilib.raise_ex("Specify lun_id OR lun_name",
                                logger=self.logger)
 
+    def _lookup_lun(self, logmsg, lun_id=None, lun_name=None):
+        """
+        Looks up a LUN by ID, or a storage pool LUN by name, in the cached
+        LUN inventory if the cache is enabled, otherwise on the array.
+
+        :returns: The LUN, None if it does not exist.
+        :rtype: :class:`LunInfo`
+        """
+        if not self._lun_cache.enabled:
+            try:
+                return self._fetch_lun(lun_id, lun_name, logmsg)
+            except SanApiEntityNotFoundException:
+                return None
+        inventory = self._get_lun_inventory()
+        if lun_id is not None:
+            lun = inventory.get_by_id(lun_id)
+        else:
+            luns = inventory.find_by_name(lun_name,
+                                          sanapilib.CONTAINER_STORAGE_POOL)
+            lun = luns and luns[0] or None
+        if lun is not None:
+            lun = self._lun_copy(lun)
+        return lun
+
+    def _fetch_lun(self, lun_id=None, lun_name=None, logmsg=True):
+        """
+        Reads a single LUN from the array with getlun and, for a storage
+        pool LUN, lun -list for the one LUN, combining their information
+        the way _read_luns does. A LUN is looked up by name with lun -list,
+        so only storage pool LUNs are found by name.
+
+        :param lun_id: The ID of the LUN.
+        :type lun_id: :class:`str`
+        :param lun_name: The name of the storage pool LUN, if no ID is
+            given.
+        :type lun_name: :class:`str`
+        :param logmsg: boolean determining whether to log navisec errors.
+        :type logmsg: :class:`boolean`
+        :returns: The LUN.
+        :rtype: :class:`LunInfo`
+        :raises SanApiEntityNotFoundException: Raised if the LUN does not
+            exist.
+        """
+        lundict = None
+        if lun_id is None:
+            cmd_string = self._projected(NaviCommand("lun", "-list", "-name")
+                                         .quoted(lun_name), LUN_LIST_COLUMNS,
+                                         ('name',) + POOL_LUN_FIELDS)
+            sp_dict = self.parser.create_dicts(
+                        self._navisec(cmd_string, logmsg=logmsg), DelimLunList)
+            for lun_id, lundict in sp_dict.items():
+                if lundict and lundict.get('Name') == lun_name:
+                    break
+            else:
+                raise SanApiEntityNotFoundException("LUN not found: %s" %
+                                                    lun_name, 1)
+
+        cmd_string = self._getlun_cmd(lun_id)
+        navi_dict = self.parser.create_dicts(
+                        self._navisec(cmd_string, logmsg=logmsg),
+                        DelimGetLun).get(lun_id)
+        if navi_dict is None:
+            raise SanApiEntityNotFoundException("LUN not found: %s" %
+                                                lun_id, 1)
+        lun = self.parser.create_lun_from_get_lun_dict(navi_dict)
+
+        # getlun shows no RAID group for a storage pool LUN, a RAID group
+        # LUN has all its information in getlun already
+        if lundict is None and lun.type == sanapilib.CONTAINER_STORAGE_POOL:
+            cmd_string = self._lun_list_cmd("-l", lun_id)
+            lundict = self.parser.create_dicts(
+                            self._navisec(cmd_string, logmsg=logmsg),
+                            DelimLunList).get(lun_id)
+        self._update_lun_object(lun, lundict)
+        return lun
+
     def lun_exists(self, lun_name):
         """
         Checks if a named LUN exists.
@@ -613,14 +1467,11 @@ class VnxCommonApi(SanApi):
                 self.logger.debug("Storage group %s has no associated LUNs"
                                      % sg_name)
                 return []
-            luns = self._get_luns()
-            sgluns = []
-            for lun in luns:
-                for hlualu in sg.hlualu_list:
-                    if lun.id == hlualu.alu:
-                        sgluns.append(lun)
+            inventory = self._get_lun_inventory()
+            sgluns = inventory.get_by_ids([hlualu.alu
+                                           for hlualu in sg.hlualu_list])
             self.logger.info("get_luns Storage Group completed ok")
-            return sgluns
+            return [self._lun_copy(lun) for lun in sgluns]
 
         if container_type is None:
             ''' GET ALL LUNS '''
@@ -630,7 +1481,7 @@ class VnxCommonApi(SanApi):
         if container_type == sanapilib.CONTAINER_STORAGE_POOL:
             ''' GET STORAGE POOL LUNS '''
             delim = DelimLunList  # "LOGICAL UNIT NUMBER "
-            cmd_string = "lun -list"
+            cmd_string = NaviCommand("lun", "-list")
             sp_etree = self._navisec(cmd_string)
             sp_dict = self.parser.create_dicts(sp_etree, delim)
             lun_list = self.parser.create_object_list(sp_dict,
@@ -649,19 +1500,14 @@ class VnxCommonApi(SanApi):
 
         elif container_type == sanapilib.CONTAINER_RAID_GROUP:
             ''' GET RAID GROUP LUNS '''
-            luns = self._get_luns()
+            inventory = self._get_lun_inventory()
 
-            rgluns = []
-            if container is None:
-                # get all raid group luns
-                rgluns = [lun for lun in luns
-                          if lun.type == sanapilib.CONTAINER_RAID_GROUP]
-            else:
+            if container is not None:
                 # we need to match on raid group id
                 container = sanapilib.validate_int_and_make_string(container)
-                rgluns = [lun for lun in luns
-                          if lun.container == container
-                          and lun.type == sanapilib.CONTAINER_RAID_GROUP]
+            rgluns = [self._lun_copy(lun) for lun in
+                      inventory.in_container(sanapilib.CONTAINER_RAID_GROUP,
+                                             container)]
             if len(rgluns) == 0:
                 self.logger.info("No Raid Group LUNs found")
 
@@ -672,7 +1518,205 @@ class VnxCommonApi(SanApi):
             sanapilib.raise_ex("Unknown container_type %" +
                                str(container_type), logger=self.logger)
 
-    def _get_luns(self, retry=3, sleep_if_fail=5):
+    def _get_luns(self, retry=3, sleep_if_fail=5, deadline=None):
+        """
+        Returns all LUNs, from the LUN inventory cache if it is enabled
+        and still valid, otherwise read from the array with _read_luns.
+        Cached LUNs are returned as copies so callers cannot change the
+        cache.
+
+        :returns: The list of LUNs.
+        :rtype: :class:`list`
+        :raises SanApiTimeoutException: Raised if the deadline expires.
+        """
+        if not self._lun_cache.enabled:
+            return self._lun_cache.get(lambda: self._read_luns(retry,
+                                                sleep_if_fail, deadline))
+        inventory = self._get_lun_inventory(retry, sleep_if_fail, deadline)
+        return [copy.copy(lun) for lun in inventory]
+
+    def _get_lun_inventory(self, retry=3, sleep_if_fail=5, deadline=None):
+        """
+        Returns the indexed LUN inventory, from the LUN inventory cache if
+        it is enabled and still valid. The LUNs of a cached inventory must
+        be passed through _lun_copy before they are returned to a caller.
+
+        :returns: The LUN inventory.
+        :rtype: :class:`LunInventory`
+        :raises SanApiTimeoutException: Raised if the deadline expires.
+        """
+        if not self._lun_cache.enabled:
+            return LunInventory(self._get_luns(retry, sleep_if_fail,
+                                               deadline))
+        return self._lun_cache.get(lambda: self._read_lun_inventory(retry,
+                                                sleep_if_fail, deadline))
+
+    def _read_lun_inventory(self, retry=3, sleep_if_fail=5, deadline=None,
+                            incremental=None):
+        """
+        Reads the LUNs from the array and indexes them. An incremental
+        read starts from the last inventory read and only reads the LUNs
+        that are new or changed, see _read_lun_changes. It reads every LUN
+        if there is no previous inventory or the incremental read fails.
+
+        :param incremental: Optional, boolean to read incrementally.
+            Default; None, the LunCacheIncremental setting.
+        :type incremental: :class:`boolean`
+        :rtype: :class:`LunInventory`
+        :raises SanApiTimeoutException: Raised if the deadline expires.
+        """
+        if incremental is None:
+            incremental = self._lun_incremental
+        inventory = None
+        if incremental and self._lun_baseline is not None:
+            with self._deadline_scope(deadline):
+                try:
+                    inventory = self._read_lun_changes(self._lun_baseline)
+                except SanApiTimeoutException:
+                    raise
+                except SanApiException, exce:
+                    self.logger.warn("Incremental LUN read failed, reading "
+                                     "all LUNs: %s" % str(exce))
+        if inventory is None:
+            inventory = LunInventory(self._read_luns(retry, sleep_if_fail,
+                                                     deadline))
+        self._lun_baseline = inventory
+        return inventory
+
+    def _read_lun_changes(self, baseline):
+        """
+        Reads the LUNs which are new or changed since an inventory was
+        read. A getlun listing of the LUN names, UIDs, capacities, RAID
+        types and default owners is compared with the inventory and only the LUNs which differ are
+        read in full. The consumed capacity and current operation of a
+        storage pool LUN change without any of those changing, so they are
+        listed for all LUNs with lun -list alongside and set on a copy of
+        every unchanged storage pool LUN. LUNs missing from the listing are
+        dropped.
+
+        :param baseline: The inventory read before.
+        :type baseline: :class:`LunInventory`
+        :returns: The new inventory, None if so many LUNs changed that
+            reading every LUN is cheaper.
+        :rtype: :class:`LunInventory`
+        """
+        results = self._navisec_many([
+                NaviCommand("getlun").columns(GETLUN_COLUMNS,
+                                              ('id', 'name', 'uid', 'size',
+                                               'raid', 'controller')),
+                NaviCommand("lun", "-list").columns(LUN_LIST_COLUMNS,
+                                                    POOL_LUN_STATE_FIELDS)],
+                spread=True)
+        etree, sp_etree = [result.get() for result in results]
+        listing = self.parser.create_dicts(etree, DelimGetLun)
+        pool_listing = self.parser.create_dicts(sp_etree, DelimLunList)
+        changed = []
+        for lun_id, navi_dict in listing.items():
+            lun = baseline.get_by_id(lun_id)
+            if lun is None or not self._lun_unchanged(lun, navi_dict) or \
+                    (lun.type == sanapilib.CONTAINER_STORAGE_POOL and
+                     not pool_listing.get(lun_id)):
+                changed.append(lun_id)
+        removed = len([lun for lun in baseline if lun.id not in listing])
+        self.logger.debug("LUN inventory: %s LUNs, %s new or changed, %s "
+                          "removed" % (len(listing), len(changed), removed))
+
+        # each changed LUN costs two small commands, a full read two large
+        # ones, so give up once more than a quarter of the LUNs changed
+        if len(changed) > max(1, len(listing) / 4):
+            self.logger.debug("Too many LUN changes for an incremental read")
+            return None
+
+        def fetch(lun_id):
+            return self._fetch_lun(lun_id=lun_id)
+
+        fetched = dict()
+        for lun_id, result in zip(changed,
+                                  self._map_scoped(fetch, changed)):
+            fetched[lun_id] = result.get()
+
+        # unchanged LUNs keep their place, new LUNs are added at the end
+        luns = []
+        for lun in baseline:
+            if lun.id in fetched:
+                luns.append(fetched.pop(lun.id))
+            elif lun.id in listing:
+                luns.append(self._lun_with_pool_state(lun,
+                                                pool_listing.get(lun.id)))
+        new_ids = fetched.keys()
+        new_ids.sort(key=int)
+        luns.extend([fetched[lun_id] for lun_id in new_ids])
+        return LunInventory(luns)
+
+    def _lun_with_pool_state(self, lun, lundict):
+        """
+        Returns a copy of an inventory LUN with the consumed capacity and
+        current operation from a lun -list listing, or the LUN itself if it
+        is not a storage pool LUN.
+
+        :param lun: The LUN read before.
+        :type lun: :class:`LunInfo`
+        :param lundict: The lun -list entry of the LUN, None if there is
+            none.
+        :type lundict: :class:`dict`
+        :rtype: :class:`LunInfo`
+        """
+        if lun.type != sanapilib.CONTAINER_STORAGE_POOL or not lundict:
+            return lun
+        lun = copy.copy(lun)
+        self._update_pool_lun_state(lun, lundict)
+        return lun
+
+    def _lun_unchanged(self, lun, navi_dict):
+        """
+        Checks if the name, UID, capacity, default owner and RAID type of a
+        LUN in a getlun listing match a LUN read before. The RAID type of a
+        storage pool LUN is that of its pool, from lun -list, so it is only
+        compared for Raid Group LUNs.
+        """
+        if (lun.name, lun.uid, lun.size) != \
+               (navi_dict.get('Name'), navi_dict.get('UID'),
+                navi_dict.get('LUN Capacity(Megabytes)')):
+            return False
+        try:
+            controller = sanapilib.normalise_storage_processor(
+                                            navi_dict.get('Default Owner'))
+        except SanApiException:
+            return False
+        if lun.controller != controller:
+            return False
+        return lun.type != sanapilib.CONTAINER_RAID_GROUP or \
+               lun.raid == sanapilib.normalise_raid_group_for_vnx(
+                                            navi_dict.get('RAID Type'))
+
+    def _get_lun_ids(self):
+        """
+        Returns the IDs of all LUNs, from the cached LUN inventory if it is
+        enabled, otherwise with a getlun listing of only the LUN IDs if
+        NavisecProjection is enabled.
+
+        :rtype: :class:`list` of :class:`str`
+        """
+        if self._lun_cache.enabled or not self._navi_projection:
+            return self._get_lun_inventory().ids()
+        cmd_string = NaviCommand("getlun").columns(GETLUN_COLUMNS, ('id',))
+        return self.parser.create_dicts(self._navisec(cmd_string),
+                                        DelimGetLun).keys()
+
+    def _lun_copy(self, lun):
+        """
+        Returns a LUN from the inventory to a caller, as a copy if the
+        inventory is cached so the caller cannot change the cache.
+
+        :param lun: The LUN.
+        :type lun: :class:`LunInfo`
+        :rtype: :class:`LunInfo`
+        """
+        if self._lun_cache.enabled:
+            return copy.copy(lun)
+        return lun
+
+    def _read_luns(self, retry=3, sleep_if_fail=5, deadline=None):
         """
         Internal method to launch the actual commands.
 
@@ -688,30 +1732,43 @@ class VnxCommonApi(SanApi):
         :type retry: :class: integer
         :param sleep_if_fail: How many seconds between each retry
         :type sleep_if_fail: :class: integer
+        :param deadline: Optional, time by which the LUNs have to be read,
+            including retries.
+        :type deadline: :class:`SanApiDeadline`
 
         :returns: The list of LUNs.
         :rtype: :class:`list`
+        :raises SanApiTimeoutException: Raised if the deadline expires.
         """
-        self.logger.debug("Entered _get_luns")
+        self.logger.debug("Entered _read_luns")
 
         lun_try = 0
         lun_obtained = False
         exception = None
-        while not lun_obtained and lun_try < retry:
-            try:
-                lun_list, sp_dict = self._navisec_get_luns()
-                for lun in lun_list:
-                    try:
-                        lundict = sp_dict.get(lun.id)
-                    except KeyError:
-                        pass
-                    else:
-                        self._update_lun_object(lun, lundict)
-            except  Exception as exception:
-                time.sleep(sleep_if_fail)
-                lun_try += 1
-            else:
-                lun_obtained = True
+        with self._deadline_scope(deadline) as deadline:
+            while not lun_obtained and lun_try < retry:
+                try:
+                    lun_list, sp_dict = self._navisec_get_luns()
+                    for lun in lun_list:
+                        try:
+                            lundict = sp_dict.get(lun.id)
+                        except KeyError:
+                            pass
+                        else:
+                            self._update_lun_object(lun, lundict)
+                except SanApiTimeoutException:
+                    raise
+                except  Exception as exception:
+                    lun_try += 1
+                    if lun_try < retry:
+                        if deadline is not None and \
+                                deadline.remaining() <= sleep_if_fail:
+                            raise SanApiTimeoutException("Deadline expires "
+                                "before LUN information can be read: %s" %
+                                str(exception), 1)
+                        time.sleep(sleep_if_fail)
+                else:
+                    lun_obtained = True
         if lun_try == retry:
             raise SanApiMissingInformationException(str(exception), 1)
         self.logger.info("_get_luns completed successfully")
@@ -735,6 +1792,18 @@ class VnxCommonApi(SanApi):
         lun.type = sanapilib.CONTAINER_STORAGE_POOL
         raid = lundict['Raid Type']
         lun.raid = sanapilib.normalise_raid_group_for_vnx(raid)
+        self._update_pool_lun_state(lun, lundict)
+
+    def _update_pool_lun_state(self, lun, lundict):
+        """
+        Sets the current operation and consumed capacity of a storage pool
+        LUN from its lun -list entry.
+
+        :param lun: a luninfo object
+        :type lun: :class: LunInfo
+        :param lundict: a lundict object that comes from the parsed xml
+        :param lundict: :class: dict
+        """
         lun.current_op = lundict['Current Operation']
         lun.current_op_state = lundict['Current Operation State']
         lun.current_op_status = lundict['Current Operation Status']
@@ -755,24 +1824,76 @@ class VnxCommonApi(SanApi):
         Runs the navisec commands necessary for the _get_luns function
         getlun and lun -list
         and return the parsed results.
+        The two commands are independent, so they run concurrently, one on
+        each SP, and a read takes as long as the slower of them.
 
         :returns: a tuple containing the lun_list and a dictionary
             with the content of the navisec commands
         """
+        if self._navi_stream_parse:
+            return self._navisec_stream_luns()
+
+        results = self._navisec_many([self._getlun_cmd(),
+                                      self._lun_list_cmd()],
+                                     spread=True)
+        etree, sp_etree = [result.get() for result in results]
+
         delim = DelimGetLun  # "LOGICAL UNIT NUMBER"
-        cmd_string = "getlun"
-        etree = self._navisec(cmd_string)
         navi_dict = self.parser.create_dicts(etree, delim)
 
         delim = DelimLunList  # "LOGICAL UNIT NUMBER "
-        cmd_string = "lun -list"
-        sp_etree = self._navisec(cmd_string)
         sp_dict = self.parser.create_dicts(sp_etree, delim)
 
         lun_list = self.parser.create_object_list(navi_dict,
                                     self.parser.create_lun_from_get_lun_dict)
         return lun_list, sp_dict
 
+    def _getlun_cmd(self, *args):
+        """
+        Returns the getlun command reading the LUN information, for all
+        LUNs or the given LUN.
+        """
+        return self._projected(NaviCommand("getlun", *args), GETLUN_COLUMNS,
+                               LUN_FIELDS)
+
+    def _lun_list_cmd(self, *args):
+        """
+        Returns the lun -list command reading the storage pool LUN
+        information, for all LUNs or the given options.
+        """
+        return self._projected(NaviCommand("lun", "-list", *args),
+                               LUN_LIST_COLUMNS, POOL_LUN_FIELDS)
+
+    def _navisec_stream_luns(self):
+        """
+        Streaming version of _navisec_get_luns, building each LUN as its
+        part of the getlun output is read.
+
+        :returns: a tuple containing the lun_list and a dictionary
+            with the content of lun -list, keyed by LUN id.
+        """
+        # one command on each SP, if there are two
+        sp_ips = self._sp_order() or [None]
+        getlun_sp, lun_list_sp = sp_ips[0], sp_ips[-1]
+
+        def read_getlun():
+            lun_list = []
+            for navi_dict in self._navisec_stream(self._getlun_cmd(),
+                                    DelimGetLun, sp_ip=getlun_sp):
+                lun_list.append(
+                        self.parser.create_lun_from_get_lun_dict(navi_dict))
+            return lun_list
+
+        def read_lun_list():
+            sp_dict = dict()
+            for navi_dict in self._navisec_stream(self._lun_list_cmd(),
+                                    DelimLunList, sp_ip=lun_list_sp):
+                sp_dict[navi_dict[DelimLunList]] = navi_dict
+            return sp_dict
+
+        results = self._run_scoped([read_getlun, read_lun_list])
+        return tuple([result.get() for result in results])
+
     def _get_pool_lun_id_from_lun_name(self, lun_name):
         """
         Fetches and returns the lun_id given the lun_name.
@@ -795,7 +1916,8 @@ class VnxCommonApi(SanApi):
                                                                 lun_name))
 
         sanapilib.validate_string(lun_name, self.logger)
-        cmd_string = "lun -list -name \"{0}\" -default".format(lun_name)
+        cmd_string = NaviCommand("lun", "-list", "-name").quoted(lun_name)\
+                        .arg("-default")
         etree = self._navisec(cmd_string)
         lun_list_dict = self.parser.create_dict(etree)
         lunId = lun_list_dict["LOGICAL UNIT NUMBER "]
@@ -824,7 +1946,8 @@ class VnxCommonApi(SanApi):
                           " lun_id={0}".format(lun_id))
 
         lun_id = sanapilib.validate_int_and_make_string(lun_id)
-        cmd_string = "lun -list -l \"{0}\" -default".format(lun_id)
+        cmd_string = NaviCommand("lun", "-list", "-l").quoted(lun_id)\
+                        .arg("-default")
         etree = self._navisec(cmd_string)
         lun_list_dict = self.parser.create_dict(etree)
         lunName = lun_list_dict["Name"]
@@ -868,7 +1991,7 @@ class VnxCommonApi(SanApi):
             lun_id = self._get_pool_lun_id_from_lun_name(lun_name)
 
         if lun_id:
-            cmd_string = "snap -list -res {0}".format(lun_id)
+            cmd_string = NaviCommand("snap", "-list", "-res", lun_id)
 
             try:
                 etree = self._navisec(cmd_string)
@@ -880,21 +2003,22 @@ class VnxCommonApi(SanApi):
                 sub_dict = snap_dict[snap_dict_key]
                 sub_dict["Lun name"] = lun_name
         else:
-            cmd_string = "snap -list"
+            cmd_string = NaviCommand("snap", "-list")
             etree = self._navisec(cmd_string)
             snap_dict = self.parser.create_dicts(etree, "Name")
 
             # get lun info
-            lun_list = self._get_luns()
-            lun_id_list = [lun.id for lun in lun_list]
-            lun_dict = dict(zip(lun_id_list, lun_list))
+            inventory = self._get_lun_inventory()
 
             # add lun name
             for snap_dict_key in snap_dict:
                 sub_dict = snap_dict[snap_dict_key]
                 try:
                     sub_dict_lun_id = sub_dict["Source LUN(s)"]
-                    sub_dict["Lun name"] = lun_dict[sub_dict_lun_id].name
+                    lun = inventory.get_by_id(sub_dict_lun_id)
+                    if lun is None:
+                        raise KeyError(sub_dict_lun_id)
+                    sub_dict["Lun name"] = lun.name
                 except KeyError, exce:
                     msg = "Failed to get snapshot info from dictionary " +\
                                 str(exce)
@@ -924,7 +2048,7 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "snap -list -id \"%s\"" % snap_name
+        cmd_string = NaviCommand("snap", "-list", "-id").quoted(snap_name)
         snapshotree = self._navisec(cmd_string)
         snapshot_dict = self.parser.create_dict(snapshotree)
         try:
@@ -950,19 +2074,20 @@ class VnxCommonApi(SanApi):
             lun, formated by validate_lun_create
         :type params: :class:`dict`
         """
-        cmd_string = "lun -create -type {vnx_lun_type} -capacity {size_num}"\
-                " -sq {size_q} -poolName \"{container}\""\
-                " -sp {storage_processor}"\
-                " -name \"{lun_name}\"".format(**params)
+        cmd_string = NaviCommand("lun", "-create",
+                                 "-type", params["vnx_lun_type"],
+                                 "-capacity", params["size_num"],
+                                 "-sq", params["size_q"], "-poolName")\
+                .quoted(params["container"])\
+                .arg("-sp", params["storage_processor"], "-name")\
+                .quoted(params["lun_name"])
         if params["lun_id"] == "auto":
-            cmd_string += " -aa 1"
+            cmd_string = cmd_string.arg("-aa", "1")
         else:
-            cmd_string += " -l " + params["lun_id"]
+            cmd_string = cmd_string.arg("-l", params["lun_id"])
         if params["ignore_thresholds"]:
-            cmd_string += " -ignoreThresholds"
-        if params["array_specific_options"]:
-            cmd_string += " " + params["array_specific_options"]
-        return cmd_string
+            cmd_string = cmd_string.arg("-ignoreThresholds")
+        return cmd_string.options(params["array_specific_options"])
 
     def _cmd_lun_raidgroup(self, params):
         """
@@ -971,45 +2096,115 @@ class VnxCommonApi(SanApi):
             lun, formated by validate_lun_create
         :type params: :class:`dict`
         """
-        cmd_string = "bind {raid_type} {lun_id} -rg {container}"\
-                " -cap {size_num} -sp {storage_processor} -sq {size_q}".\
-                format(**params)
-        if params["array_specific_options"]:
-            cmd_string += " " + params["array_specific_options"]
-        return cmd_string
-
-    def _retry_lun_creation(self, free_lunids, lun_params):
+        cmd_string = NaviCommand("bind", params["raid_type"], params["lun_id"],
+                                 "-rg", params["container"],
+                                 "-cap", params["size_num"],
+                                 "-sp", params["storage_processor"],
+                                 "-sq", params["size_q"])
+        return cmd_string.options(params["array_specific_options"])
+
+    def _bind_with_free_lun_id(self, lun_params, randomise=False,
+                               allocator=None):
         """
-        Try to create a Lun with the list of available lun ids,
-        if none of lun ids works, it will raise an
-        SanApiEntityAlreadyExistsException
+        Creates a Raid Group LUN with a free LUN ID, see
+        :meth:`_bind_free_lun_id`.
 
-        :param free_lunids: a list of free lun ids
-        :type free_lunids: :class:`list`
         :param lun_params: a dictionary containing the parameters of the new
             lun, formated by validate_lun_create
         :type lun_params: :class:`dict`
+        :param randomise: Optional, boolean to pick each ID at random from
+            the lowest free IDs.
+        :type randomise: :class:`boolean`
+        :param allocator: Optional, an allocator already loaded with the
+            LUN IDs in use, shared by several creations.
+        :type allocator: :class:`LunIdAllocator`
+        :returns: The LUN ID.
+        :rtype: :class:`int`
+        """
+        def bind_cmd(lun_id):
+            lun_params["lun_id"] = lun_id
+            return self._cmd_lun_raidgroup(lun_params)
+        return self._bind_free_lun_id(bind_cmd, randomise, allocator)
+
+    def _bind_free_lun_id(self, bind_cmd, randomise=False, allocator=None):
         """
-        for counter, free_lunid in enumerate(free_lunids):
-            lun_params["lun_id"] = free_lunid
-            cmd_string = self._cmd_lun_raidgroup(lun_params)
+        Binds a LUN with a free LUN ID. Each attempt reserves an ID with the
+        LUN ID allocator of the array, so concurrent creators never try the
+        same ID. An ID found to be in use, e.g. by a LUN created on another
+        host, is recorded and the next free ID is tried straight away.
+        Raises an SanApiEntityAlreadyExistsException if all attempts fail.
+
+        :param bind_cmd: Returns the bind command for a LUN ID.
+        :type bind_cmd: :class:`callable`
+        :param randomise: Optional, boolean to pick each ID at random from
+            the lowest free IDs.
+        :type randomise: :class:`boolean`
+        :param allocator: Optional, an allocator already loaded with the
+            LUN IDs in use, shared by several creations.
+        :type allocator: :class:`LunIdAllocator`
+        :returns: The LUN ID.
+        :rtype: :class:`int`
+        """
+        if allocator is None:
+            allocator = self._load_lun_id_allocator(self._get_high_lun())
+        for attempt in range(1, LUN_ID_ATTEMPTS + 1):
+            free_lunid = allocator.reserve(randomise)
+            cmd_string = bind_cmd(free_lunid)
             try:
-                self._navisec(cmd_string)
+                self._navisec_lun_change(cmd_string)
             except SanApiEntityAlreadyExistsException:
+                allocator.mark_used(free_lunid)
                 msg = "Lun with ID=%s already exists" % (free_lunid)
                 self.logger.warn(msg)
-                if counter < len(free_lunids):
-                    msg = "Will retry (attempt %s/%s)" % (counter,
-                            len(free_lunids))
+                if attempt < LUN_ID_ATTEMPTS:
+                    msg = "Will retry (attempt %s/%s)" % (attempt,
+                            LUN_ID_ATTEMPTS)
                     self.logger.warn(msg)
-                    time.sleep(random.randint(1, 5))
+            except:
+                allocator.release(free_lunid)
+                raise
             else:
+                allocator.confirm(free_lunid)
                 return free_lunid
-        else:
-            msg = "Failed to create LUN after %s attempts" % (
-                    len(free_lunids))
-            self.logger.error(msg)
-            raise SanApiEntityAlreadyExistsException(msg, 1)
+        msg = "Failed to create LUN after %s attempts" % (LUN_ID_ATTEMPTS)
+        self.logger.error(msg)
+        raise SanApiEntityAlreadyExistsException(msg, 1)
+
+    def _get_high_lun(self):
+        """
+        Reads the upper limit for LUN IDs from the HighLun setting.
+
+        :rtype: :class:`int`
+        :raises SanApiCriticalErrorException: Raised if the setting is
+            missing.
+        """
+        try:
+            high_lun = self._cfg.get('General', 'HighLun')
+        except:
+            errmsg = "Couldn't determine high_lun from config file"
+            self.logger.error(errmsg)
+            raise SanApiCriticalErrorException(errmsg, 1)
+        return sanapilib.validate_int_and_make_int(high_lun)
+
+    def _load_lun_id_allocator(self, high_lun):
+        """
+        Returns the LUN ID allocator of the array, loaded with the LUN IDs
+        currently in use.
+
+        :param high_lun: The upper limit for LUN IDs.
+        :type high_lun: :class:`int`
+        :rtype: :class:`LunIdAllocator`
+        """
+        allocator = get_array_lun_id_allocator(self._sp_ips, high_lun,
+                                               self._lun_id_reservation_file,
+                                               self.logger)
+        # a cached inventory may predate recently created LUNs, so only a
+        # fresh read may drop their reservations
+        started = None
+        if not self._lun_cache.enabled:
+            started = allocator.now()
+        allocator.load(self._get_lun_ids(), started)
+        return allocator
 
     def _check_randomise_lunid(self):
         """
@@ -1033,8 +2228,8 @@ class VnxCommonApi(SanApi):
         :param params: A dictionary containing the lun_id and lun_name
         :type params: :class:`dict`
         """
-        return "chglun -l " + str(params["lun_id"]) + " -name " + \
-                    "\"" + params["lun_name"] + "\""
+        return NaviCommand("chglun", "-l", params["lun_id"], "-name")\
+                    .quoted(params["lun_name"])
 
     def create_lun(self, lun_name, size, container_type, container,
                    storage_processor="a", raid_type="", lun_type="thick",
@@ -1070,36 +2265,165 @@ class VnxCommonApi(SanApi):
                 container_type, container, storage_processor,
                 raid_type, lun_type, lun_id, ignore_thresholds,
                 array_specific_options, self.logger)
+        optargs = self._create_validated_lun(lun_params)
+
+        self.logger.info("LUN " + lun_name + " successfully created.")
+        return self._written(self.get_lun, **optargs)
+
+    def _create_validated_lun(self, lun_params, allocator=None,
+                              randomise=None):
+        """
+        Runs the commands creating a LUN, naming it if it is in a Raid
+        Group.
+
+        :param lun_params: a dictionary containing the parameters of the new
+            lun, formated by validate_lun_create
+        :type lun_params: :class:`dict`
+        :param allocator: Optional, the LUN ID allocator to take an
+            automatic Raid Group LUN ID from.
+        :type allocator: :class:`LunIdAllocator`
+        :param randomise: Optional, boolean to randomise an automatic LUN
+            ID, read from the configuration if not given.
+        :type randomise: :class:`boolean`
+        :returns: The get_lun arguments finding the new LUN.
+        :rtype: :class:`dict`
+        """
         optargs = dict()
 
         if lun_params["container_type"] == sanapilib.CONTAINER_STORAGE_POOL:
             cmd_string = self._cmd_lun_storagepool(lun_params)
-            optargs["lun_name"] = lun_name
-            self._navisec(cmd_string)
+            optargs["lun_name"] = lun_params["lun_name"]
+            self._navisec_lun_change(cmd_string)
 
         elif lun_params["container_type"] == sanapilib.CONTAINER_RAID_GROUP:
             # Create LUN in a Raid Group
             # handles automatically assigned LUN ID or specific LUN ID
             if lun_params["lun_id"] == "auto":
-                randomise_lunid_list = self._check_randomise_lunid()
-                # Determine the next valid LUN IDs
-                free_lunids = self.get_next_available_lunids(
-                            randomise=randomise_lunid_list)
-                # Have retry in case concurrent lun create operation
-                lun_id = self._retry_lun_creation(free_lunids, lun_params)
+                if randomise is None:
+                    randomise = self._check_randomise_lunid()
+                # Reserve free LUN IDs until one is created, in case of
+                # concurrent lun create operations
+                self._bind_with_free_lun_id(lun_params, randomise, allocator)
             else:
                 cmd_string = self._cmd_lun_raidgroup(lun_params)
-                self._navisec(cmd_string)
+                self._navisec_lun_change(cmd_string)
 
             # Builds naviseccli command to name LUN created on Raid Group
             cmd_string = self._cmd_name_lun_raid_group(lun_params)
-            self._navisec(cmd_string)
+            self._navisec_lun_change(cmd_string)
             msg = "LUN renamed successfully"
             self.logger.debug(msg)
-            optargs["lun_id"] = str(lun_id)
+            optargs["lun_id"] = str(lun_params["lun_id"])
 
-        self.logger.info("LUN " + lun_name + " successfully created.")
-        return self.get_lun(**optargs)
+        return optargs
+
+    def create_luns(self, specs):
+        """
+        VNX implementation of create_luns. Free IDs for automatic Raid
+        Group LUN IDs are taken from a single read of the LUN IDs in use,
+        the LUNs are created concurrently within the NavisecMaxParallel
+        limit and the LUN inventory is read once at the end.
+
+        :param specs: The LUNs to create, each a dictionary of create_lun
+            parameters.
+        :type specs: :class:`list` of :class:`dict`
+        :returns: The new LUNs, in the order of specs.
+        :rtype: :class:`list` of :class:`LunInfo`
+        :raises SanApiPartialFailureException: Raised if a LUN could not
+            be created or read back, holding the LUNs which were.
+        """
+        self.logger.debug("Entered create_luns with %s LUNs" % len(specs))
+        all_params = sanapilib.validate_lun_create_specs(specs, self.logger)
+        if not all_params:
+            return []
+
+        allocator = None
+        randomise = False
+        auto_ids = [lun_params for lun_params in all_params
+                    if lun_params["container_type"] ==
+                    sanapilib.CONTAINER_RAID_GROUP and
+                    lun_params["lun_id"] == "auto"]
+        if auto_ids:
+            randomise = self._check_randomise_lunid()
+            allocator = self._load_lun_id_allocator(self._get_high_lun())
+            # the IDs asked for by the other specs are not free either
+            for lun_params in all_params:
+                if lun_params["container_type"] == \
+                        sanapilib.CONTAINER_RAID_GROUP and \
+                        lun_params["lun_id"] != "auto":
+                    allocator.mark_used(int(lun_params["lun_id"]))
+
+        def create(lun_params):
+            return self._create_validated_lun(lun_params, allocator,
+                                              randomise)
+
+        results = self._map_scoped(create, all_params)
+        created_params = []
+        created_optargs = []
+        failed = dict()
+        for lun_params, result in zip(all_params, results):
+            if result.ok:
+                created_params.append(lun_params)
+                created_optargs.append(result.value)
+            else:
+                self.logger.error("Failed to create LUN %s: %s" %
+                                  (lun_params["lun_name"], result.exception))
+                failed[lun_params["lun_name"]] = result.exception
+        if failed:
+            created = []
+            if created_params:
+                try:
+                    created = self._read_created_luns(created_params,
+                                                      created_optargs)
+                except SanApiPartialFailureException, exce:
+                    created = exce.succeeded
+                    failed.update(exce.failed)
+                except SanApiException, exce:
+                    self.logger.error("Failed to read the LUNs created: %s"
+                                      % exce)
+            raise SanApiPartialFailureException(
+                    sanapilib.partial_failure_message("LUN create", failed,
+                                                      len(all_params)),
+                    1, created, failed)
+
+        self.logger.info("%s LUNs successfully created." % len(all_params))
+        return self._written(self._read_created_luns, all_params,
+                             [result.value for result in results])
+
+    def _read_created_luns(self, all_params, all_optargs):
+        """
+        Finds LUNs just created in a single read of the LUN inventory.
+
+        :param all_params: The validated parameters of each LUN.
+        :type all_params: :class:`list` of :class:`dict`
+        :param all_optargs: The get_lun arguments finding each LUN.
+        :type all_optargs: :class:`list` of :class:`dict`
+        :returns: The LUNs, in the same order.
+        :rtype: :class:`list` of :class:`LunInfo`
+        :raises SanApiPartialFailureException: Raised if a LUN is not
+            found, holding the LUNs which were.
+        """
+        inventory = self._get_lun_inventory()
+        luns = []
+        missing = dict()
+        for lun_params, optargs in zip(all_params, all_optargs):
+            if "lun_id" in optargs:
+                lun = inventory.get_by_id(optargs["lun_id"])
+            else:
+                lun = (inventory.find_by_name(optargs["lun_name"],
+                                sanapilib.CONTAINER_STORAGE_POOL) or [None])[0]
+            if lun is None:
+                missing[lun_params["lun_name"]] = \
+                        SanApiEntityNotFoundException("Created LUN %s not "
+                                "found" % lun_params["lun_name"], 1)
+            else:
+                luns.append(self._lun_copy(lun))
+        if missing:
+            errmsg = sanapilib.partial_failure_message("LUN read back",
+                                                       missing, len(all_params))
+            self.logger.error(errmsg)
+            raise SanApiPartialFailureException(errmsg, 1, luns, missing)
+        return luns
 
     def get_next_available_lunids(self, high_lun=None,
                         req_num_free_lunids="5", randomise=True):
@@ -1107,7 +2431,8 @@ class VnxCommonApi(SanApi):
         Determines the next N available LUN IDs where N is passed as a
         parameter.
 
-        :param high_lun: Optional, the upper limit for LUN ID.
+        :param high_lun: Optional, the upper limit for LUN ID, for this
+            call only. Default; the HighLun setting.
         :type high_lun: :class:`str` or :class:`int`
         :param req_num_free_lunids: The number of free LUN IDs.
         :type req_num_free_lunids: :class:`str`
@@ -1118,15 +2443,9 @@ class VnxCommonApi(SanApi):
         :rtype: :class:`list` of :class:`int`
 
         """
-        # Sets highest valid LUN ID
-        if high_lun is None:
-            try:
-                high_lun = self._cfg.get('General', 'HighLun')
-            except:
-                errmsg = "Couldn't determine high_lun from config file"
-                self.logger.error(errmsg)
-                raise SanApiCriticalErrorException(errmsg, 1)
-        else:
+        # an upper limit given applies to this call only, the allocator
+        # shared with the LUN creations keeps the HighLun range
+        if high_lun is not None:
             high_lun = sanapilib.validate_int_and_make_int(high_lun)
 
         req_num_free_lunids = \
@@ -1138,31 +2457,15 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
 
-        # Fetches currently used LUN IDs
-        lun_list = self._get_luns()
-
-        # Creates an empty list and appends the .id attribute
-        # from each currently used LUN
-        lunidlist = []
-        for lun in lun_list:
-            lunidlist.append(int(lun.id))
-
-        # Creates a set from list of used LUN IDs
-        lunidset = set(lunidlist)
-
-        # Creates a set from list of valid LUN IDs
-        fulllunidset = set(range(0, int(high_lun)))
-
-        # Diffs the 2 lists created in previous steps
-        diff = list(fulllunidset - lunidset)
+        # Lowest free LUN IDs, skipping those reserved by LUN creations
+        # in progress
+        allocator = self._load_lun_id_allocator(self._get_high_lun())
+        diff = allocator.free_ids(req_num_free_lunids, high_lun)
         if len(diff) == 0:
             errmsg = "No free LUN ID available"
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        diff.sort()
-        if len(diff) > req_num_free_lunids:
-            diff = diff[0:req_num_free_lunids]
         if randomise:
             random.shuffle(diff)
 
@@ -1184,11 +2487,11 @@ class VnxCommonApi(SanApi):
 
         lun_id = sanapilib.validate_int_and_make_string(lun_id)
 
-        cmd_string = "chglun -l " + lun_id + " -name " + \
-            "\"" + lun_name + "\""
-        self._navisec(cmd_string)
+        cmd_string = NaviCommand("chglun", "-l", lun_id, "-name")\
+            .quoted(lun_name)
+        self._navisec_lun_change(cmd_string)
         self.logger.debug("Lun renamed")
-        return self.get_lun(lun_id=lun_id)
+        return self._written(self.get_lun, lun_id=lun_id)
 
     """STORAGE POOL METHODS"""
 
@@ -1206,6 +2509,8 @@ class VnxCommonApi(SanApi):
         self.logger.debug(
                     "Entered __create_storage_pool_info_from_cmd_response")
 
+        cmd_string = self._projected(cmd_string, STORAGEPOOL_COLUMNS,
+                                     STORAGE_POOL_FIELDS)
         sptree = self._navisec(cmd_string)
         spdict = self.parser.create_dict(sptree)
         newsp = self.parser.create_spinfo_from_dict(spdict)
@@ -1224,9 +2529,10 @@ class VnxCommonApi(SanApi):
         self.logger.debug("Entered get_storage_pool with " +\
                           "sp_name=%s and sp_id=%s" % (sp_name, sp_id))
         if sp_name is not None and sp_id is None:
-            cmd_string = "storagepool -list -name \"%s\"" % sp_name
+            cmd_string = NaviCommand("storagepool", "-list", "-name")\
+                            .quoted(sp_name)
         elif sp_id is not None and sp_name is None:
-            cmd_string = "storagepool -list -id %s" % sp_id
+            cmd_string = NaviCommand("storagepool", "-list", "-id", sp_id)
             sp_id = sanapilib.validate_int_and_make_string(sp_id)
         else:
             sanapilib.raise_ex("Must specify either 'name' or 'spid' param",
@@ -1255,12 +2561,13 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "storagegroup -create -gname \"%s\"" % sg_name
-        self._navisec(cmd_string)
+        cmd_string = NaviCommand("storagegroup", "-create", "-gname")\
+                        .quoted(sg_name)
+        self._navisec_sg_change(cmd_string)
         self.logger.debug("create_storage_group completed ok")
         self.logger.info("create_storage_group completed successfully")
 
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
 
     def get_storage_groups(self):
         """
@@ -1271,13 +2578,72 @@ class VnxCommonApi(SanApi):
         """
         self.logger.debug("Entered get_storage_groups")
 
-        cmd_string = "storagegroup -list"
-        sgtree = self._navisec(cmd_string)
-        sglist = self.parser.create_sg_list(sgtree)
+        if not self._sg_cache.enabled:
+            sglist = self._read_storage_groups()
+        else:
+            sglist = [self._sg_copy(sg) for sg in self._get_sg_inventory()]
         self.logger.debug("get_storage_groups completed ok")
         self.logger.info("get_storage_groups completed successfully")
         return sglist
 
+    def get_storage_group_inventory(self):
+        """
+        Returns all storage groups indexed by name, ALU and HBA UID, read
+        with a single storagegroup -list, or from the storage group cache
+        if StorageGroupCacheTTL is set and the cached inventory is still
+        valid.
+
+        :returns: The storage group inventory.
+        :rtype: :class:`StorageGroupInventory`
+        """
+        self.logger.debug("Entered get_storage_group_inventory")
+        inventory = self._get_sg_inventory()
+        if self._sg_cache.enabled:
+            inventory = StorageGroupInventory([self._sg_copy(sg)
+                                               for sg in inventory])
+        self.logger.debug("get_storage_group_inventory: %s storage groups"
+                          % len(inventory))
+        return inventory
+
+    def _get_sg_inventory(self):
+        """
+        Returns the storage group inventory, from the storage group cache
+        if it is enabled and still valid. The storage groups of a cached
+        inventory must be passed through _sg_copy before they are returned
+        to a caller.
+
+        :rtype: :class:`StorageGroupInventory`
+        """
+        return self._sg_cache.get(
+                lambda: StorageGroupInventory(self._read_storage_groups()))
+
+    def _read_storage_groups(self):
+        """
+        Reads all storage groups from the array.
+
+        :rtype: :class:`list` of :class:`StorageGroupInfo`
+        """
+        cmd_string = NaviCommand("storagegroup", "-list")
+        sgtree = self._navisec(cmd_string)
+        return self.parser.create_sg_list(sgtree)
+
+    def _sg_copy(self, sg):
+        """
+        Returns a storage group from the cached inventory to a caller as a
+        copy, with its own HBA and HLU lists, so the caller cannot change
+        the cache.
+
+        :param sg: The storage group.
+        :type sg: :class:`StorageGroupInfo`
+        :rtype: :class:`StorageGroupInfo`
+        """
+        sg = copy.copy(sg)
+        if sg.hbasp_list is not None:
+            sg._hbasp_list = list(sg.hbasp_list)
+        if sg.hlualu_list is not None:
+            sg._hlualu_list = list(sg.hlualu_list)
+        return sg
+
     def get_storage_group(self, sg_name, logmsg=True):
         """
         get individual storage group object
@@ -1289,9 +2655,14 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "storagegroup -list -gname \"%s\"" % sg_name
-        sgtree = self._navisec(cmd_string, logmsg=logmsg)
-        sglist = self.parser.create_sg_list(sgtree)
+        if self._sg_cache.enabled:
+            sg = self._get_sg_inventory().get_by_name(sg_name)
+            sglist = sg is not None and [self._sg_copy(sg)] or []
+        else:
+            cmd_string = NaviCommand("storagegroup", "-list", "-gname")\
+                            .quoted(sg_name)
+            sgtree = self._navisec(cmd_string, logmsg=logmsg)
+            sglist = self.parser.create_sg_list(sgtree)
         if len(sglist) == 0:
             errmsg = "Storage Group %s not found: " % sg_name
             sanapilib.raise_ex(errmsg, SanApiEntityNotFoundException,
@@ -1391,26 +2762,109 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
+        paths = []
         for hbainfo in hba_init_info_list:
-            try:
-                if host_name and host_ip:
-                    use_host_name = host_name
-                    use_host_ip = host_ip
-                else:
-                    use_host_name = hbainfo.hbaname
-                    use_host_ip = hbainfo.hbaip
-                self.create_host_initiator(sg_name, use_host_name, \
-                    use_host_ip, wwn, hbainfo.spname, \
-                    hbainfo.spport, arraycommpath, init_type, \
-                    failovermode, array_specific_options)
-            except SanApiCriticalErrorException, ex:
-                errmsg = "Failed to register WWN: " + wwn + ", SP: " \
-                     + str(hbainfo.spname) + ", SP Port: " + \
-                     str(hbainfo.spport) + ". Original Error: " + str(ex)
+            paths.append((sg_name, host_name, host_ip, wwn, hbainfo))
+        self._register_initiator_paths(paths, arraycommpath, init_type,
+                                       failovermode, array_specific_options)
+
+        return self._written(self.get_storage_group, sg_name)
+
+    def create_hosts_initiators(self, specs, arraycommpath="1",
+                                init_type="3", failovermode="4",
+                                array_specific_options=""):
+        """
+        Registers the HBAs of many hosts from a single port -list -hba.
+        Each HBA is registered using all the sp and sp ports it appears
+        with in the port list, as create_host_initiators does.
+
+        :param specs: The HBAs to register, each a dictionary with sg_name
+            and wwn and, optionally, host_name and host_ip.
+        :type specs: :class:`list` of :class:`dict`
+        :param arraycommpath: Optional, the array communication path, either 0
+            or 1. Default; "1"
+        :type arraycommpath: :class:`str`
+        :param init_type: Optional, the initiator type. Default; "3"
+        :type init_type: :class:`str`
+        :param failovermode: Optional, the failover mode, 0-4. Default; "4"
+        :type failovermode: :class:`str`
+        :param array_specific_options: Other arguments to be passed to the
+            naviseccli command.
+        :type array_specific_options: :class:`str`
+        :returns: The storage groups of the specs, keyed by name.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if a spec is invalid.
+        :raises SanApiOperationFailedException: Raised if a WWN is not in
+            the port list or a path can not be registered.
+        """
+        self.logger.debug("Entered create_hosts_initiators with %s HBAs"
+                          % len(specs))
+        all_specs = sanapilib.validate_initiator_specs(specs, self.logger)
+
+        port_list = self._get_hba_port_inventory()
+
+        paths = []
+        sg_names = []
+        for spec in all_specs:
+            hba_init_info_list = port_list.get_by_uid(spec["wwn"])
+            if not hba_init_info_list:
+                errmsg = "WWN: " + spec["wwn"] + \
+                         " does not appear in port list on VNX"
                 self.logger.error(errmsg)
                 raise SanApiOperationFailedException(errmsg, 1)
+            for hbainfo in hba_init_info_list:
+                paths.append((spec["sg_name"], spec["host_name"],
+                              spec["host_ip"], spec["wwn"], hbainfo))
+            if spec["sg_name"] not in sg_names:
+                sg_names.append(spec["sg_name"])
+
+        self._register_initiator_paths(paths, arraycommpath, init_type,
+                                       failovermode, array_specific_options)
+        self.logger.info("create_hosts_initiators registered %s paths"
+                         % len(paths))
 
-        return self.get_storage_group(sg_name)
+        return self._written(self._storage_groups_named, sg_names)
+
+    def _register_initiator_paths(self, paths, arraycommpath, init_type,
+                                  failovermode, array_specific_options):
+        """
+        Registers HBA paths with create_host_initiator, concurrently within
+        the NavisecMaxParallel limit. A path without a host name and IP is
+        registered with the server name and IP from the port list. Every
+        path is tried before a failure is raised.
+
+        :param paths: The storage group name, host name, host IP, WWN and
+            port list entry of each path.
+        :type paths: :class:`list` of :class:`tuple`
+        :raises SanApiOperationFailedException: Raised if a path can not be
+            registered because of invalid parameters.
+        """
+        def register(path):
+            sg_name, host_name, host_ip, wwn, hbainfo = path
+            if not (host_name and host_ip):
+                host_name = hbainfo.hbaname
+                host_ip = hbainfo.hbaip
+            return self.create_host_initiator(sg_name, host_name, host_ip,
+                wwn, hbainfo.spname, hbainfo.spport, arraycommpath,
+                init_type, failovermode, array_specific_options)
+
+        results = self._map_scoped(register, paths)
+        failed = [(path, result) for path, result
+                  in zip(paths, results) if not result.ok]
+        for path, result in failed:
+            self.logger.error("Failed to register WWN: %s, SP: %s, SP Port: "
+                              "%s: %s" % (path[3], path[4].spname,
+                                          path[4].spport, result.exception))
+        if failed:
+            path, result = failed[0]
+            if isinstance(result.exception, SanApiCriticalErrorException):
+                errmsg = "Failed to register WWN: " + path[3] + ", SP: " \
+                     + str(path[4].spname) + ", SP Port: " + \
+                     str(path[4].spport) + ". Original Error: " + \
+                     str(result.exception)
+                self.logger.error(errmsg)
+                raise SanApiOperationFailedException(errmsg, 1)
+            result.get()
 
     def create_host_initiator(self, sg_name, host_name, host_ip, wwn,
                               storage_processor, sp_port, arraycommpath="1",
@@ -1489,20 +2943,26 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
 
-        cmd_string = "storagegroup -setpath -o -gname " + "\"" + sg_name + \
-            "\"" + " -hbauid " + wwn + " -sp " + storage_processor + \
-            " -spport " + sp_port + " -type " + str(init_type) + \
-            " -host " + host_name + " -ip " + host_ip + " -failovermode " + \
-            str(failovermode) + " -arraycommpath " + str(arraycommpath)
+        cmd_string = NaviCommand("storagegroup", "-setpath", "-o", "-gname")\
+            .quoted(sg_name).arg("-hbauid", wwn, "-sp", storage_processor,
+            "-spport", sp_port, "-type", init_type, "-host", host_name,
+            "-ip", host_ip, "-failovermode", failovermode,
+            "-arraycommpath", arraycommpath)
 
-        if array_specific_options:
-            cmd_string += " " + array_specific_options
+        cmd_string = cmd_string.options(array_specific_options)
 
-        self._navisec(cmd_string)
+        try:
+            self._navisec_sg_change(cmd_string)
+        except Exception:
+            self._hba_port_cache.invalidate()
+            raise
         self.logger.info("create_host_initiator completed successfully")
 
-        return HbaInitiatorInfo(wwn, storage_processor, sp_port, \
-                                host_name, host_ip)
+        hbainfo = HbaInitiatorInfo(wwn, storage_processor, sp_port, \
+                                   host_name, host_ip)
+        # the cached port list is kept, now showing the path registered
+        self._hba_port_cache.update(lambda ports: ports.with_entry(hbainfo))
+        return hbainfo
 
     def add_lun_to_storage_group(self, sg_name, hlu, alu):
         """
@@ -1536,27 +2996,29 @@ class VnxCommonApi(SanApi):
                             ") to Storage Group(" + sg_name +
                             ")" + " with HLU(" + hlu + ")")
 
-        cmd_string = "storagegroup -addhlu -gname " + "\"" + sg_name + "\"" \
-         + " -hlu " + hlu + " -alu " + alu  # @IgnorePep8
-        self._navisec(cmd_string)
+        cmd_string = NaviCommand("storagegroup", "-addhlu", "-gname")\
+            .quoted(sg_name).arg("-hlu", hlu, "-alu", alu)
+        self._navisec_sg_change(cmd_string)
 
         msg = "add_lun_to_storage_group call completed successfully"
 
         self.logger.debug(msg)
         self.logger.info(msg)
 
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
 
     def add_luns_to_storage_group(self, sg_name, hlu_alu_pairs):
         """
-        Assigns single or multiple hlu-alu pairs to a Storage Group.
+        Assigns single or multiple hlu-alu pairs to a Storage Group. All
+        pairs are validated first, then the addhlu commands are run
+        concurrently within the NavisecMaxParallel limit.
 
         :param sg_name: The storage group name.
         :type sg_name: :class:`str`
         :param hlu_alu_pairs: The HLU ALU pairs.
         :type hlu_alu_pairs: :class:`list` of :class:`tuple`
         """
-        self.logger.error("Entering add_luns_to_storage_group")
+        self.logger.info("Entering add_luns_to_storage_group")
 
         if not sg_name:
             errmsg = "Invalid storage group name:" + str(sg_name)
@@ -1577,21 +3039,33 @@ class VnxCommonApi(SanApi):
                 self.logger.error(errmsg)
                 raise SanApiCriticalErrorException(errmsg, 1)
 
+        navicmds = []
+        for hlu, alu in hlu_alu_pairs:
+            hlu, alu = str(hlu), str(alu)
             self.logger.info("Attempting to add LUN(" + alu +
                                 ") to Storage Group(" + sg_name +
                                 ")" + " with HLU(" + hlu + ")")
 
-            cmd_string = "storagegroup -addhlu -gname " +\
-             "\"" + sg_name + "\"" \
-             + " -hlu " + hlu + " -alu " + alu  # @IgnorePep8
-            self._navisec(cmd_string)
+            navicmds.append(NaviCommand("storagegroup", "-addhlu", "-gname")\
+                .quoted(sg_name).arg("-hlu", hlu, "-alu", alu))
+
+        try:
+            results = self._navisec_many(navicmds)
+        finally:
+            self._sg_cache.invalidate()
+        failed = [(navicmd, result) for navicmd, result
+                  in zip(navicmds, results) if not result.ok]
+        for navicmd, result in failed:
+            self.logger.error("%s failed: %s" % (navicmd, result.exception))
+        if failed:
+            failed[0][1].get()
 
         msg = "add_luns_to_storage_group call completed successfully"
 
         self.logger.debug(msg)
         self.logger.info(msg)
 
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
 
     def remove_luns_from_storage_group(self, sg_name, hlus):
         """
@@ -1654,11 +3128,12 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = 'storagegroup -removehlu -o -gname "{0}" -hlu {1}'\
-                      .format(sg_name, hlu_list)
+        cmd_string = NaviCommand("storagegroup", "-removehlu", "-o",
+                                 "-gname").quoted(sg_name)\
+                                 .arg("-hlu").words(hlu_list)
 
         try:
-            self._navisec(cmd_string)
+            self._navisec_sg_change(cmd_string)
         except Exception as exce:
             if exce.ReturnCode == 83:
                 msg = "The Storage Group does not exist".format(sg_name)
@@ -1675,7 +3150,7 @@ class VnxCommonApi(SanApi):
         msg = "remove_luns_from_storage_group completed successfully"
         self.logger.debug(msg)
 
-        return self.get_storage_group(sg_name)
+        return self._written(self.get_storage_group, sg_name)
 
     def disconnect_host(self, sg_name, host):
         """
@@ -1697,8 +3172,18 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "storagegroup -disconnecthost -o -host {0} -gname {1}"\
-                     .format(host, sg_name)
+        try:
+            return self._disconnect_host(sg_name, host)
+        finally:
+            self._invalidate_sg_caches()
+
+    def _disconnect_host(self, sg_name, host):
+        """
+        Runs storagegroup -disconnecthost, leaving the caches to the
+        caller.
+        """
+        cmd_string = NaviCommand("storagegroup", "-disconnecthost", "-o",
+                                 "-host", host, "-gname", sg_name)
         try:
             self._navisec(cmd_string)
         except Exception as exce:
@@ -1726,7 +3211,9 @@ class VnxCommonApi(SanApi):
 
     def deregister_hba_uid(self, hba_uid):
         """
-        Deregisters HBA UID from  the SAN.
+        Deregisters HBA UID from  the SAN. If HbaPortListCacheTTL is set
+        and the cached port list is still valid, an HBA UID missing from it
+        is taken as already removed and no removeHBA is run.
 
         :param hba_uid: The HBA UID.
         :type hba_uid: :class:`str`
@@ -1736,7 +3223,23 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "port -removeHBA -o -hbauid {0}".format(hba_uid)
+        if self._hba_port_cache.enabled and \
+                hba_uid not in self._get_hba_port_inventory():
+            msg = "The HBA UID {0} does not exist".format(hba_uid)
+            self.logger.warn(msg)
+            return True
+
+        try:
+            return self._remove_hba(hba_uid)
+        finally:
+            self._invalidate_sg_caches(hba_change=True)
+
+    def _remove_hba(self, hba_uid):
+        """
+        Runs port -removeHBA, leaving the caches to the caller.
+        """
+        cmd_string = NaviCommand("port", "-removeHBA", "-o", "-hbauid",
+                                 hba_uid)
         try:
             self._navisec(cmd_string)
         except Exception as exce:
@@ -1765,7 +3268,17 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiOperationFailedException(errmsg, 1)
 
-        cmd_string = "storagegroup -destroy -o -gname {0}".format(sg_name)
+        try:
+            return self._destroy_storage_group(sg_name)
+        finally:
+            self._invalidate_sg_caches()
+
+    def _destroy_storage_group(self, sg_name):
+        """
+        Runs storagegroup -destroy, leaving the caches to the caller.
+        """
+        cmd_string = NaviCommand("storagegroup", "-destroy", "-o", "-gname",
+                                 sg_name)
 
         try:
             self._navisec(cmd_string)
@@ -1781,6 +3294,123 @@ class VnxCommonApi(SanApi):
         self.logger.info(infomsg)
         return True
 
+    def teardown_hosts(self, sg_names=None, wwns=None):
+        """
+        Removes the hosts of a cluster from the SAN. The storage groups and
+        the HBA port list are read concurrently up front. Then, each step
+        running concurrently within the NavisecMaxParallel limit:
+
+        - the hosts of the HBAs in each storage group are disconnected,
+        - the HBAs found in the port list are deregistered,
+        - the storage groups whose hosts were disconnected are deleted.
+
+        :param sg_names: Optional, names of storage groups to delete.
+        :type sg_names: :class:`list` of :class:`str`
+        :param wwns: Optional, WWNs of HBAs to deregister.
+        :type wwns: :class:`list` of :class:`str`
+        :returns: The outcome for each storage group name and each WWN,
+            keyed by storage_groups and hbas.
+        :rtype: :class:`dict` of :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if nothing is given, or
+            a name or WWN is invalid.
+        """
+        self.logger.debug("Entered teardown_hosts with sg_names=%s, wwns=%s"
+                          % (sg_names, wwns))
+        sg_names, wwns = sanapilib.validate_teardown_targets(sg_names, wwns,
+                                                             self.logger)
+
+        sg_result, port_result = self._run_scoped([
+                self._get_sg_inventory, self._get_hba_port_inventory])
+        sg_inventory = sg_result.get()
+        port_list = port_result.get()
+
+        sg_outcomes = dict()
+        sgs = []
+        for sg_name in sg_names:
+            sg = sg_inventory.get_by_name(sg_name)
+            if sg is None:
+                sg_outcomes[sg_name] = sanapilib.TEARDOWN_NOT_FOUND
+            else:
+                sgs.append(sg)
+        hba_outcomes = dict()
+        found_wwns = []
+        for wwn in wwns:
+            if wwn in port_list:
+                found_wwns.append(wwn)
+            else:
+                hba_outcomes[wwn] = sanapilib.TEARDOWN_NOT_FOUND
+
+        # the removals run without touching the caches, which are dropped
+        # once at the end instead of by every command
+        try:
+            disconnects = []
+            for sg in sgs:
+                hosts = []
+                for hbasp in sg.hbasp_list or []:
+                    for hbainfo in port_list.get_by_uid(hbasp.hbauid):
+                        if hbainfo.hbaname and hbainfo.hbaname not in hosts:
+                            hosts.append(hbainfo.hbaname)
+                for host in hosts:
+                    disconnects.append((sg.name, host))
+            failed_sgs = set()
+            for (sg_name, host), result in zip(disconnects,
+                    self._run_scoped([(self._disconnect_host, item)
+                                      for item in disconnects])):
+                if not result.ok:
+                    self.logger.error("Failed to disconnect host %s from "
+                                      "%s: %s" % (host, sg_name,
+                                                  result.exception))
+                    failed_sgs.add(sg_name)
+
+            for wwn, result in zip(found_wwns, self._map_scoped(
+                    self._remove_hba, found_wwns)):
+                hba_outcomes[wwn] = self._teardown_outcome(result, "HBA",
+                                                           wwn)
+
+            deletes = []
+            for sg in sgs:
+                if sg.name in failed_sgs:
+                    sg_outcomes[sg.name] = sanapilib.TEARDOWN_FAILED
+                else:
+                    deletes.append(sg.name)
+            for sg_name, result in zip(deletes, self._map_scoped(
+                    self._destroy_storage_group, deletes)):
+                sg_outcomes[sg_name] = self._teardown_outcome(result,
+                                                "storage group", sg_name)
+        finally:
+            self._invalidate_sg_caches(hba_change=True)
+
+        outcomes = sg_outcomes.values() + hba_outcomes.values()
+        msg = "teardown_hosts removed %s storage groups and %s HBAs, %s " \
+              "failed" % (sg_outcomes.values().count(
+                                            sanapilib.TEARDOWN_REMOVED),
+                          hba_outcomes.values().count(
+                                            sanapilib.TEARDOWN_REMOVED),
+                          outcomes.count(sanapilib.TEARDOWN_FAILED))
+        if sanapilib.TEARDOWN_FAILED in outcomes:
+            self.logger.warn(msg)
+        else:
+            self.logger.info(msg)
+        return {'storage_groups': sg_outcomes, 'hbas': hba_outcomes}
+
+    def _teardown_outcome(self, result, kind, name):
+        """
+        Returns the teardown outcome of a removal, logging a failure.
+
+        :param result: The result of the removal.
+        :type result: :class:`SanApiTaskResult`
+        :param kind: What was removed, for the log.
+        :type kind: :class:`str`
+        :param name: The name removed, for the log.
+        :type name: :class:`str`
+        :rtype: :class:`str`
+        """
+        if result.ok:
+            return sanapilib.TEARDOWN_REMOVED
+        self.logger.error("Failed to remove %s %s: %s" %
+                          (kind, name, result.exception))
+        return sanapilib.TEARDOWN_FAILED
+
     def get_hba_port_info(self, wwn=None, host=None, \
                           storage_processor=None, sp_port=None):
         """
@@ -1840,31 +3470,36 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
 
-        cmd_string = "port -list -hba"
+        hba_init_info_list = self._get_hba_port_inventory().find(
+                wwn or None, host or None, storage_processor or None,
+                sp_port or None)
 
-        #self.logger.debug("naviseccli output for port -list -hba")
-        etree = self._navisec(cmd_string)  # log_output=True)
+        self.logger.debug("get_hba_port_info completed successfully")
+        return [copy.copy(hbainfo) for hbainfo in hba_init_info_list]
 
-        hba_init_info_list = self.parser.create_hba_init_info_list(etree)
+    def _get_hba_port_inventory(self):
+        """
+        Returns the HBA port list indexed by HBA UID, server name, server
+        IP and SP port, reused from the HBA port list cache if
+        HbaPortListCacheTTL is set and the cached list is still valid.
 
-        if wwn:
-            hba_init_info_list = [hbainfo for hbainfo in hba_init_info_list \
-                                       if hbainfo.hbauid == wwn]
-        if storage_processor:
-            hba_init_info_list = [hbainfo for hbainfo in hba_init_info_list \
-                                       if hbainfo.spname == storage_processor]
+        :rtype: :class:`HbaPortInventory`
+        """
+        return self._hba_port_cache.get(
+                lambda: HbaPortInventory(self._read_hba_port_list()))
 
-        if sp_port:
-            hba_init_info_list = [hbainfo for hbainfo in hba_init_info_list \
-                                       if hbainfo.spport == sp_port]
+    def _read_hba_port_list(self):
+        """
+        Reads the HBA port list with port -list -hba.
+
+        :rtype: :class:`list` of :class:`HbaInitiatorInfo`
+        """
+        cmd_string = NaviCommand("port", "-list", "-hba")
 
-        if host:
-            hba_init_info_list = [hbainfo for hbainfo in hba_init_info_list \
-                                       if (hbainfo.hbaname == host \
-                                           or hbainfo.hbaip == host)]
+        #self.logger.debug("naviseccli output for port -list -hba")
+        etree = self._navisec(cmd_string)  # log_output=True)
 
-        self.logger.debug("get_hba_port_info completed successfully")
-        return hba_init_info_list
+        return self.parser.create_hba_init_info_list(etree)
 
     def get_san_info(self):
         """
@@ -1879,7 +3514,7 @@ class VnxCommonApi(SanApi):
 
         self.logger.info("Checking the Operating Environment (OE) "
                          "version of VNX")
-        cmd_string = "getagent -rev -model -serial"
+        cmd_string = NaviCommand("getagent", "-rev", "-model", "-serial")
         cmd_result = self._navisec(cmd_string, xml=False)
 
         # Get OE
@@ -1918,7 +3553,7 @@ class VnxCommonApi(SanApi):
         :return: None or fault error message(s)
         """
         errors = ['fractured', 'fault']
-        cmd_string = "faults -list"
+        cmd_string = NaviCommand("faults", "-list")
         try:
             output = self._navisec(cmd_string, xml=False)
         except SanApiException:
@@ -1932,8 +3567,8 @@ class VnxCommonApi(SanApi):
         return None
 
     def get_hw_san_alerts(self):
-        date_string = "date +'%m/%d/%Y'"
-        date_str = subprocess.Popen(date_string, shell=True,
+        date_string = ["date", "+%m/%d/%Y"]
+        date_str = subprocess.Popen(date_string,
                                     stdout=subprocess.PIPE,
                                     stderr=subprocess.PIPE)
         date_today , error = date_str.communicate()
@@ -1949,7 +3584,8 @@ class VnxCommonApi(SanApi):
         after_date = original_date + one_day
         before_date_str = before_date.strftime("%m/%d/%Y")
         after_date_str = after_date.strftime("%m/%d/%Y")
-        cmd_string = "getlog -date " + before_date_str + " " + after_date_str
+        cmd_string = NaviCommand("getlog", "-date", before_date_str,
+                                 after_date_str)
         try:
             output = self._navisec(cmd_string, xml=False, timeout=600)
         except SanApiException:
@@ -1986,9 +3622,9 @@ class VnxCommonApi(SanApi):
         self.logger.debug("Checking the naviseccli version")
         cmd = "%s -help" % (self._navi_cmd)
         try:
-            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+            proc = subprocess.Popen(shlex.split(cmd), stdin=subprocess.PIPE,
                                     stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, shell=True)
+                                    stderr=subprocess.PIPE)
             stdout, stderr = proc.communicate()
         except OSError:
                     errmsg = "Error occurred while running command: " + cmd
@@ -2154,11 +3790,11 @@ class VnxCommonApi(SanApi):
         if description:
             sanapilib.validate_string(description, self.logger)
 
-        cmd_string = "snap -create -res \"{0}\" -name \"{1}\""\
-            .format(lun_id, snap_name)
+        cmd_string = NaviCommand("snap", "-create", "-res").quoted(lun_id)\
+            .arg("-name").quoted(snap_name)
 
         if description:
-            cmd_string += ' -descr "{0}"'.format(description)
+            cmd_string = cmd_string.arg("-descr").quoted(description)
 
         self._navisec(cmd_string)
 
@@ -2167,7 +3803,7 @@ class VnxCommonApi(SanApi):
         self.logger.debug("Finished create_snapshot with lun id:" + lun_id +
                              " snapshot name:" + snap_name)
 
-        return self.get_snapshot(snap_name)
+        return self._written(self.get_snapshot, snap_name)
 
     def create_snapshot(self, lun_name, snap_name, description=None):
         """
@@ -2189,11 +3825,11 @@ class VnxCommonApi(SanApi):
             sanapilib.validate_string(description, self.logger)
 
         lun_id = self._get_pool_lun_id_from_lun_name(lun_name)
-        cmd_string = "snap -create -res \"{0}\" -name \"{1}\""\
-            .format(lun_id, snap_name)
+        cmd_string = NaviCommand("snap", "-create", "-res").quoted(lun_id)\
+            .arg("-name").quoted(snap_name)
 
         if description:
-            cmd_string += ' -descr "{0}"'.format(description)
+            cmd_string = cmd_string.arg("-descr").quoted(description)
 
         self._navisec(cmd_string)
 
@@ -2202,7 +3838,7 @@ class VnxCommonApi(SanApi):
         self.logger.debug("Finished create_snapshot with lun id:" + lun_id +
                              " snapshot name:" + snap_name)
 
-        return self.get_snapshot(snap_name)
+        return self._written(self.get_snapshot, snap_name)
 
     def restore_snapshot(self, lun_name, snap_name, delete_backupsnap=True,
                          backup_name=None):
@@ -2319,26 +3955,115 @@ class VnxCommonApi(SanApi):
             self.logger.error(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
 
+        self._navisec_lun_change(self._cmd_delete_lun(linfo,
+                                                      array_specific_options))
+        infomsg = "Successfully deleted LUN: "
+        infomsg += lun_name if lun_name else lun_id
+        self.logger.info(infomsg)
+        self.logger.debug("Leaving function delete_lun")
+        return True
+
+    def _cmd_delete_lun(self, linfo, array_specific_options=""):
+        """
+        Returns the cmd command deleting a LUN, lun -destroy for a storage
+        pool LUN or unbind for a Raid Group LUN.
+
+        :param linfo: The LUN.
+        :type linfo: :class:`LunInfo`
+        :param array_specific_options: Other arguments to be passed to the
+            naviseccli command.
+        :type array_specific_options: :class:`str`
+        :raises SanApiCriticalErrorException: Raised if LUN container
+            unrecognised.
+        """
         if linfo.type == "StoragePool":
             self.logger.debug("This LUN is in a storage pool " + \
                                  linfo.container)
-            cmd_string = "lun -destroy -l %s" % linfo.id
+            cmd_string = NaviCommand("lun", "-destroy", "-l", linfo.id)
         elif linfo.type == "RaidGroup":
             self.logger.debug("This LUN is in a Raid Group")
-            cmd_string = "unbind %s" % linfo.id
+            cmd_string = NaviCommand("unbind", linfo.id)
         else:
             errmsg = "Unrecognised LUN container type" + str(linfo.type)
             self.logger.error(errmsg)
             raise SanApiCriticalErrorException(errmsg, 1)
-        if array_specific_options:
-            cmd_string += " " + array_specific_options
-        cmd_string += " -o"
-        self._navisec(cmd_string)
-        infomsg = "Successfully deleted LUN: "
-        infomsg += lun_name if lun_name else lun_id
-        self.logger.info(infomsg)
-        self.logger.debug("Leaving function delete_lun")
-        return True
+        return cmd_string.options(array_specific_options).arg("-o")
+
+    def delete_luns(self, lun_names=None, lun_ids=None,
+                    array_specific_options=""):
+        """
+        VNX implementation of delete_luns. The LUNs are found in one read
+        of the LUN inventory and deleted concurrently within the
+        NavisecMaxParallel limit.
+
+        :param lun_names: Names of LUNs to delete (storage pool LUNs only).
+        :type lun_names: :class:`list` of :class:`str`
+        :param lun_ids: IDs of LUNs to delete.
+        :type lun_ids: :class:`list` of :class:`str`
+        :param array_specific_options: Other arguments to be passed to the
+            naviseccli command.
+        :type array_specific_options: :class:`str`
+        :returns: The outcome for each name and ID.
+        :rtype: :class:`dict`
+        :raises SanApiCriticalErrorException: Raised if no LUN is given or
+            a LUN ID is invalid.
+        """
+        self.logger.debug("Entered delete_luns")
+        lun_names = list(lun_names or [])
+        lun_ids = list(lun_ids or [])
+        if not lun_names and not lun_ids:
+            errmsg = "Neither lun names nor lun ids were specified"
+            self.logger.error(errmsg)
+            raise SanApiCriticalErrorException(errmsg, 1)
+        for index, lun_id in enumerate(lun_ids):
+            try:
+                lun_ids[index] = sanapilib.validate_int_and_make_string(
+                                                                    lun_id)
+            except:
+                errmsg = "Invalid LUN id: " + str(lun_id)
+                self.logger.error(errmsg)
+                raise SanApiCriticalErrorException(errmsg, 1)
+
+        inventory = self._get_lun_inventory()
+        outcomes = dict()
+        # the names and IDs given for each LUN, keyed by LUN ID
+        targets = dict()
+        for lun_name in lun_names:
+            found = inventory.find_by_name(lun_name,
+                                           sanapilib.CONTAINER_STORAGE_POOL)
+            if found:
+                targets.setdefault(found[0].id, []).append(lun_name)
+            else:
+                outcomes[lun_name] = sanapilib.LUN_NOT_FOUND
+        for lun_id in lun_ids:
+            if lun_id in inventory:
+                targets.setdefault(lun_id, []).append(lun_id)
+            else:
+                outcomes[lun_id] = sanapilib.LUN_NOT_FOUND
+
+        def delete(lun_id):
+            linfo = inventory.get_by_id(lun_id)
+            self._navisec_lun_change(self._cmd_delete_lun(linfo,
+                                                  array_specific_options))
+
+        lun_id_list = targets.keys()
+        for lun_id, result in zip(lun_id_list,
+                                  self._map_scoped(delete, lun_id_list)):
+            if result.ok:
+                outcome = sanapilib.LUN_DELETED
+            elif isinstance(result.exception, SanApiEntityNotFoundException):
+                outcome = sanapilib.LUN_NOT_FOUND
+            else:
+                outcome = sanapilib.LUN_DELETE_FAILED
+                self.logger.error("Failed to delete LUN %s: %s" %
+                                  (lun_id, result.exception))
+            for target in targets[lun_id]:
+                outcomes[target] = outcome
+
+        self.logger.info("Deleted %s of %s LUNs" % (
+                len([outcome for outcome in outcomes.values()
+                     if outcome == sanapilib.LUN_DELETED]), len(outcomes)))
+        return outcomes
 
     def create_storage_pool(self, sp_name, disks,
                             raid_type, array_specific_options=""):
@@ -2390,14 +4115,11 @@ class VnxCommonApi(SanApi):
                 self.logger.error(err_msg)
                 raise SanApiCriticalErrorException(err_msg, 1)
 
-        cmd_string = "storagepool -create -disks " + str(disks) \
-            + " -rtype " + str(raid_type) + " -name " \
-            + "'" + str(sp_name) + "'"
-
-        if array_specific_options:
-            cmd_string += " " + array_specific_options
+        cmd_string = NaviCommand("storagepool", "-create", "-disks")\
+            .words(disks).arg("-rtype", raid_type, "-name")\
+            .quoted(sp_name, "'")
 
-        cmd_string += " -o"
+        cmd_string = cmd_string.options(array_specific_options).arg("-o")
         self._navisec(cmd_string)
 
         self.logger.info("Successfully created Storage Pool(" +
@@ -2407,7 +4129,7 @@ class VnxCommonApi(SanApi):
 
         self.logger.debug("Exiting function create_storage_pool")
 
-        return self.get_storage_pool(sp_name=sp_name)
+        return self._written(self.get_storage_pool, sp_name=sp_name)
 
     def modify_storage_pool(self, sp_name, hwm_value):
         """
@@ -2429,11 +4151,12 @@ class VnxCommonApi(SanApi):
                       .format(hwm_value)
             raise SanApiCriticalErrorException(err_msg, 1)
 
-        cmd_string = "storagepool -modify -name " + "'" + str(sp_name) + "'"\
-                     " -snapPoolFullThresholdEnabled On" +\
-                     " -snapPoolFullHWM {0}" .format(hwm_value)
+        cmd_string = NaviCommand("storagepool", "-modify", "-name")\
+                     .quoted(sp_name, "'")\
+                     .arg("-snapPoolFullThresholdEnabled", "On",
+                          "-snapPoolFullHWM", hwm_value)
 
-        cmd_string += " -o"
+        cmd_string = cmd_string.arg("-o")
         self._navisec(cmd_string)
 
         self.logger.info("Successfully modified Storage Pool(" +
@@ -2488,9 +4211,10 @@ class VnxCommonApi(SanApi):
                                  "nothing.".format(lun_name, luninfo.size,
                                                    size_num))
             else:
-                cmd_string = ("lun -expand -name {0} -capacity {1} -sq {2} "
-                          .format(lun_name, size_num, str(size_q)) + " -o")
-                self._navisec(cmd_string)
+                cmd_string = NaviCommand("lun", "-expand", "-name", lun_name,
+                                         "-capacity", size_num,
+                                         "-sq", size_q, "-o")
+                self._navisec_lun_change(cmd_string)
                 self.logger.info("LUN :  \"{0}\" expanded by \"{1}{2}\" "
                              .format(lun_name, size_num, str(size_q)))
 
@@ -2500,7 +4224,7 @@ class VnxCommonApi(SanApi):
 
         self.logger.debug("Exiting expand_pool_lun")
 
-        return self.get_lun(lun_name=lun_name, logmsg=True)
+        return self._written(self.get_lun, lun_name=lun_name, logmsg=True)
 
     def is_nearly(self, actual_size, new_size):
         new_size, actual_size = int(actual_size), int(new_size)
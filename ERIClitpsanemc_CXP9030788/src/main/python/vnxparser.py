@@ -27,6 +27,8 @@ from sanapiexception import SanApiException, SanApiCommandException, \
 
 from sanapiinfo import HsPolicyInfo
 import sanapilib
+from navixml import get_xml_backend, backend_for, ElementTreeBackend, \
+                   LxmlBackend
 import socket
 import logging
 
@@ -34,6 +36,55 @@ import logging
 DelimGetLun = "LOGICAL UNIT NUMBER"
 DelimLunList = delim = "LOGICAL UNIT NUMBER "
 
+# value of a PARAMVALUE which has no VALUE element
+NO_VALUE = object()
+
+
+class NaviResponse(object):
+    """
+    A naviseccli XML response decoded with a single walk of its element
+    tree. Holds the status PROPERTY values and the name and value of every
+    PARAMVALUE in document order, which the VnxParser methods use instead
+    of searching the tree again.
+    """
+
+    def __init__(self, etree):
+        """
+        :param etree: The response, or part of it.
+        :type etree: :class:`xml.etree.ElementTree`
+        :raises SanApiOperationFailedException: Raised if etree is not an
+            element tree.
+        """
+        root = etree
+        if hasattr(etree, 'getroot'):
+            root = etree.getroot()
+        if not hasattr(root, 'iter') and not hasattr(root, 'getiterator'):
+            raise SanApiOperationFailedException("Invalid XML stream", 1)
+
+        self._etree = etree
+        self.backend = backend_for(root)
+        self.status = dict()
+        self.params = []
+        self.elements = []
+        for elem in self.backend.records(root):
+            if elem.tag == 'PARAMVALUE':
+                value = elem.find('VALUE')
+                self.params.append((elem.get('NAME'),
+                            value.text if value is not None else NO_VALUE))
+                self.elements.append(elem)
+            elif elem.tag == 'PROPERTY':
+                value = elem.find('VALUE')
+                self.status[elem.get('NAME')] = \
+                    value.text if value is not None else None
+
+    def getroot(self):
+        """
+        Returns the root element of the response.
+        """
+        if hasattr(self._etree, 'getroot'):
+            return self._etree.getroot()
+        return self._etree
+
 
 class VnxParser:
     """
@@ -50,23 +101,50 @@ class VnxParser:
         """
         self.logger = logger or logging.getLogger(socket.gethostname())
 
+    def decode(self, etree):
+        """
+        Decodes naviseccli output, unless it already has been.
+
+        :param etree: The naviseccli output.
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
+        :rtype: :class:`NaviResponse`
+        :raises SanApiOperationFailedException: Raised if etree is not an
+            element tree.
+        """
+        if isinstance(etree, NaviResponse):
+            return etree
+        return NaviResponse(etree)
+
+    def _param_values(self, response, start=0, end=None):
+        """
+        Yields the PARAMVALUE names and values of a decoded response,
+        optionally only those in the index range start to end.
+
+        :raises SanApiOperationFailedException: Raised if a PARAMVALUE has
+            no VALUE.
+        """
+        params = response.params
+        if end is None:
+            end = len(params)
+        for index in xrange(start, end):
+            name, value = params[index]
+            if value is NO_VALUE:
+                self.logger.debug("Failed to parse XML stream")
+                raise SanApiOperationFailedException("Invalid XML stream", 1)
+            yield name, value
+
     def create_dict(self, etree):
         """
         Creates a dictionary from element tree representing naviseccli output.
 
         :param etree: An element tree representing the naviseccli output.
-        :type etree: :class:`xml.etree.ElementTree`
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         """
         self.logger.debug("Entered create_dict")
 
-        navi_dict = dict()
-        try:
-            for san_param in etree.findall('.//PARAMVALUE'):
-                san_value = san_param.find('VALUE')
-                navi_dict[san_param.attrib['NAME']] = san_value.text
-        except AttributeError:
-            self.logger.debug("Failed to create dictionary from ETree")
-            raise SanApiOperationFailedException("Invalid XML stream", 1)
+        navi_dict = dict(self._param_values(self.decode(etree)))
 
         self.logger.debug("Dictionary constructed from Element Tree okay")
 
@@ -80,7 +158,8 @@ class VnxParser:
         the element tree has reached a new item.
 
         :param etree: The element tree to create the dictionaries from.
-        :type etree: :class:`xml.etree.ElementTree`
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         :param delim: The delimeter to indicate when the element tree has
             reached a new item.
         :type delim: :class:`str`
@@ -91,8 +170,8 @@ class VnxParser:
         sub_dict = dict()
         dictkey = None
         try:
-            for param in etree.findall('.//PARAMVALUE'):
-                if param.attrib['NAME'] == delim:
+            for name, value in self._param_values(self.decode(etree)):
+                if name == delim:
                     # If sub_dict already exists then we add to meta
                     # with previous sub dict before creating new sub dict
                     if sub_dict is not None and dictkey is not None:
@@ -104,15 +183,15 @@ class VnxParser:
                     # meta_dict once sub_dict has been fully populated
                     # which is when the next 'delim' is found, above.
 
-                    dictkey = param.find('VALUE').text
+                    dictkey = value
                     meta_dict[dictkey] = None
                     sub_dict = dict()
-                    sub_dict[param.attrib['NAME']] = dictkey
+                    sub_dict[name] = dictkey
 
                 else:
                     # sub dict created when delim is matched so now just add
                     # attributes to it
-                    sub_dict[param.attrib['NAME']] = param.find('VALUE').text
+                    sub_dict[name] = value
 
             # sub dict is added to meta_dict only when delimiter is found. For
             # last entry, delimiter won't be found so need to add it explicitly
@@ -133,6 +212,85 @@ class VnxParser:
                   "Dictionary of dictionaries created from ETree okay")
         return meta_dict
 
+    def iter_params(self, source, status):
+        """
+        Reads naviseccli XML output incrementally and yields the name and
+        value of each PARAMVALUE holding a value. PARAMVALUEs which only
+        wrap other PARAMVALUEs, such as CLASSIC CLI, are not yielded.
+        Elements are discarded once read so memory use does not grow with
+        the size of the output.
+
+        :param source: The XML output, e.g. the stdout pipe of naviseccli.
+        :type source: :class:`file`
+        :param status: Dictionary filled with the PROPERTY values of the
+            response, e.g. success and errorCode, as they are read.
+        :type status: :class:`dict`
+        :returns: A generator of (name, value) tuples.
+        :rtype: :class:`generator`
+        :raises SanApiOperationFailedException: Raised if a PARAMVALUE
+            has no VALUE.
+        """
+        open_elems = []
+        has_params = []
+        for event, elem in get_xml_backend().iterparse(source,
+                                              events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == 'PARAMVALUE':
+                    if has_params:
+                        has_params[-1] = True
+                    has_params.append(False)
+                open_elems.append(elem)
+                continue
+
+            open_elems.pop()
+            if elem.tag == 'PARAMVALUE':
+                if has_params.pop():
+                    continue
+                value = elem.find('VALUE')
+                if value is None:
+                    self.logger.debug("Failed to parse XML stream")
+                    raise SanApiOperationFailedException(
+                                                "Invalid XML stream", 1)
+                param = (elem.get('NAME'), value.text)
+            elif elem.tag == 'PROPERTY':
+                value = elem.find('VALUE')
+                status[elem.get('NAME')] = \
+                    value.text if value is not None else None
+                param = None
+            else:
+                continue
+
+            # drop the record from its parent so the tree stays small
+            elem.clear()
+            if open_elems:
+                open_elems[-1].remove(elem)
+            if param is not None:
+                yield param
+
+    def iter_dicts(self, params, delim):
+        """
+        Groups a stream of (name, value) tuples into one dictionary per
+        item, starting a new item at each delimiter. Values before the
+        first delimiter are ignored, as in create_dicts.
+
+        :param params: The (name, value) tuples, e.g. from iter_params.
+        :type params: :class:`generator`
+        :param delim: The name which starts a new item.
+        :type delim: :class:`str`
+        :returns: A generator of dictionaries, in output order.
+        :rtype: :class:`generator`
+        """
+        item = None
+        for name, value in params:
+            if name == delim:
+                if item is not None:
+                    yield item
+                item = {name: value}
+            elif item is not None:
+                item[name] = value
+        if item is not None:
+            yield item
+
     def create_object_list(self, meta_dict, create_object):
         """
         From a meta dictionary representing multiple SAN 'objects' we create
@@ -329,7 +487,8 @@ class VnxParser:
         From Etree, create and return a list of StorageGroupInfo objects.
 
         :param sgtree: The ETree describinf the StorageGroupInfo objects.
-        :type sgtree: :class:`xml.etree.ElementTree`
+        :type sgtree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         :returns: A list of StorageGroupInfo objects.
         :rtype: :class:`StorageGroupInfo`
         :raises SanApiOperationFailedException: Raised if sgtree not an
@@ -338,8 +497,9 @@ class VnxParser:
         self.logger.debug("Entered create_sg_list")
 
         paramclass = sgtree.__class__.__name__
-        if paramclass != "ElementTree" and paramclass \
-                != "_ElementInterface" and paramclass != "Element":
+        if paramclass not in ElementTreeBackend.tree_classes and \
+                paramclass not in LxmlBackend.tree_classes and \
+                paramclass != "NaviResponse":
 
             msg = "Parameter sgtree is not an Element Tree: %s " % paramclass
             self.logger.error(msg)
@@ -353,9 +513,7 @@ class VnxParser:
         sgdict = dict()
         sglist = []
 
-        for param in sgtree.findall('.//PARAMVALUE'):
-            key = param.attrib['NAME']
-            val = param.find('VALUE').text
+        for key, val in self._param_values(self.decode(sgtree)):
             self.logger.debug("Dealing with key %s and value %s" %
                                  (key, val))
 
@@ -472,7 +630,8 @@ class VnxParser:
         Creates a dict of dicts.
 
         :param etree: An element tree to create the dicts from.
-        :type etree: :class:`xml.etree.ElementTree`
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         :returns: The dict of dicts from the element tree.
         :rtype: :class:`dict`
         :raises SanApiOperationFailedException: Raised if the element tree
@@ -484,9 +643,9 @@ class VnxParser:
         policy_id = None
 
         try:
-            for param in etree.findall('.//PARAMVALUE'):
-                if param.attrib['NAME'] == "CLASSIC CLI":
-                    policy_data = param.find('VALUE').text
+            for name, value in self._param_values(self.decode(etree)):
+                if name == "CLASSIC CLI":
+                    policy_data = value
 
                 '''
                     Takes the XML output, parses it and
@@ -558,13 +717,53 @@ class VnxParser:
             msg = "Failed to get hot spare info from dictionary " + str(exce)
             raise SanApiOperationFailedException(msg, 1)
 
+    def group_ranges(self, params, delimiter, start=0, end=None):
+        """
+        Splits a run of decoded params on a delimiter without copying them.
+        Params before the first delimiter are left out.
+
+        :param params: The (name, value) params of a :class:`NaviResponse`.
+        :type params: :class:`list`
+        :param delimiter: The name which starts a new group.
+        :type delimiter: :class:`str`
+        :param start: Index of the first param to split.
+        :type start: :class:`int`
+        :param end: Index after the last param to split, default the end.
+        :type end: :class:`int`
+        :returns: One (start, end) index range per group, end exclusive.
+        :rtype: :class:`list` of :class:`tuple`
+        """
+        if end is None:
+            end = len(params)
+        bounds = [index for index in xrange(start, end)
+                  if params[index][0] == delimiter]
+        return zip(bounds, bounds[1:] + [end])
+
+    def create_range_dict(self, response, start, end):
+        """
+        Creates a dictionary from a range of the params of a decoded
+        response, as create_dict does for a whole response.
+
+        :param response: The decoded response.
+        :type response: :class:`NaviResponse`
+        :param start: Index of the first param.
+        :type start: :class:`int`
+        :param end: Index after the last param.
+        :type end: :class:`int`
+        :rtype: :class:`dict`
+        :raises SanApiOperationFailedException: Raised if a PARAMVALUE has
+            no VALUE.
+        """
+        return dict(self._param_values(response, start, end))
+
     def get_sub_etree_list(self, etree, delimiter):
         """
         Takes an etree and a delimiter and splits the etree on the delimiter
         to return a list of sub-etrees.
 
         :param etree: The element tree.
-        :type etree: :class:`xml.etree.ElementTree`
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         :param delimiter: The delimiter.
         :type delimiter: :class:`str`
         :returns: List of sub-etrees.
@@ -572,32 +771,12 @@ class VnxParser:
         :raises SanApiOperationFailedException: Raised if unable to parse the
             element tree.
         """
-        sub_etree_list = []
-        count = 0
-        first_delim_match = False
-        sub_root = ET.Element("sub_root0")
         try:
-
-            for param in etree.findall('.//PARAMVALUE'):
-                # skip all the cruft before we find the first matching delim
-                if param.attrib['NAME'] != delimiter and not first_delim_match:
-                    continue
-                if param.attrib['NAME'] == delimiter:
-                    first_delim_match = True
-                    if len(sub_root.getchildren()) > 0:
-                        sub_tree = ET.ElementTree(sub_root)
-                        sub_etree_list.append(sub_tree)
-                        count = count + 1
-                        # create a new root object
-                        sub_root = ET.Element("sub_root" + str(count))
-
-                sub_root.append(param)
-
-            if len(sub_root.getchildren()) > 0:
-                sub_tree = ET.ElementTree(sub_root)
-                sub_etree_list.append(sub_tree)
-
-            return sub_etree_list
+            response = self.decode(etree)
+            ranges = self.group_ranges(response.params, delimiter)
+            return [response.backend.sub_tree("sub_root" + str(count),
+                                              response.elements[start:end])
+                    for count, (start, end) in enumerate(ranges)]
 
         except AttributeError, ex:
             self.logger.error("Failed to parse Element Tree")
@@ -609,7 +788,8 @@ class VnxParser:
         HbaInitiatorInfo.
 
         :param etree: The element tree.
-        :type etree: :class:`xml.etree.ElementTree`
+        :type etree: :class:`NaviResponse` or
+            :class:`xml.etree.ElementTree`
         :returns: A list of HbaInitiatorInfo objects.
         :rtype: :class:`list` of :class:`HbaInitiatorInfo` objects.
         :raises SanApiOperationFailedException: Raised if unable recognise
@@ -618,12 +798,14 @@ class VnxParser:
             invalid WWN.
         """
 
-        hba_sub_etrees = self.get_sub_etree_list(etree, "HBA UID")
+        response = self.decode(etree)
         hba_init_info_list = []
 
-        for hba_sub_etree in hba_sub_etrees:
+        for hba_start, hba_end in self.group_ranges(response.params,
+                                                    "HBA UID"):
             try:
-                hba_dict = self.create_dict(hba_sub_etree)
+                hba_dict = self.create_range_dict(response, hba_start,
+                                                  hba_end)
                 hbauid = hba_dict['HBA UID']
                 if not sanapilib.is_valid_wwn(hbauid):
                     errmsg = "Invalid WWN ", hbauid
@@ -636,11 +818,11 @@ class VnxParser:
                 self.logger.error(msg)
                 raise SanApiOperationFailedException(msg, 1)
 
-            hba_port_sub_etrees = self.get_sub_etree_list(hba_sub_etree, \
-                                                          "    SP Name")
-            for hba_port_sub_etree in hba_port_sub_etrees:
+            for port_start, port_end in self.group_ranges(response.params,
+                                        "    SP Name", hba_start, hba_end):
                 try:
-                    hba_port_dict = self.create_dict(hba_port_sub_etree)
+                    hba_port_dict = self.create_range_dict(response,
+                                                    port_start, port_end)
                     spname = hba_port_dict['    SP Name']
                     if spname == "SP A":
                         spname = sanapilib.STORAGE_PROCESSOR_A
@@ -283,6 +283,31 @@ class Test(TestSanEMC):
             "eadapar_adding_multiple_hlu_alu_pair",
             [["0", "23"], ["1", None]])
 
+        # No pair is added if any pair is invalid
+        self.assertFalse(self.vnx._navisec.called)
+
+    def test_add_luns_to_storage_group_failure(self):
+        """
+        Test adding LUNs adds the other LUNs and raises the failure
+        """
+
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.setUpMocks('eadapar_multiple_sg_operation', True, True)
+
+        def navisec(navicmd, **kwargs):
+            if "-alu 24" in str(navicmd):
+                raise SanApiEntityAlreadyExistsException("HLU in use", 1)
+
+        self.vnx._navisec.side_effect = navisec
+        self.assertRaisesRegexp(SanApiEntityAlreadyExistsException,
+            "HLU in use", self.vnx.add_luns_to_storage_group,
+            "eadapar_multiple_sg_operation",
+            [["0", "23"], ["1", "24"], ["2", "25"]])
+        self.assertEquals(self.vnx._navisec.call_count, 3)
+        self.assertFalse(self.vnx.get_storage_group.called)
+
     def test_add_luns_to_storage_group_hlu_already_exists(self):
         """
         Test adding HLU to SG raises exception when HLU already exists in SG
@@ -338,6 +363,39 @@ class Test(TestSanEMC):
         self.vnx.add_luns_to_storage_group(name, pair)
         self.assertTrue(name in self.vnx._navisec.call_args[0][0])
 
+    def test_add_lun_to_storage_group_read_off(self):
+        """
+        Test adding LUN to SG without reading the SG back
+        """
+
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.setUpMocks(None, True, True)
+        self.vnx.set_read_after_write("off")
+
+        self.assertEqual(self.vnx.add_lun_to_storage_group("SGName", "0",
+                                                           "23"), None)
+        self.assertTrue(self.vnx._navisec.called)
+        self.assertFalse(self.vnx.get_storage_group.called)
+
+    def test_add_lun_to_storage_group_read_lazy(self):
+        """
+        Test adding LUN to SG reads the SG back when first used
+        """
+
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.setUpMocks(None, True, True)
+        self.vnx.set_read_after_write("lazy")
+
+        test_sg = self.vnx.add_lun_to_storage_group("SGName", "0", "23")
+        self.assertFalse(self.vnx.get_storage_group.called)
+        self.assertEqual(test_sg.name, self.ref_sg.name)
+        self.assertEqual(test_sg, self.ref_sg)
+        self.vnx.get_storage_group.assert_called_once_with("SGName")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,13 +4,16 @@ Created on 16 Jul 1934
 @author: esteved
 '''
 import unittest
+import shlex
 from vnxcommonapi import VnxCommonApi
 from vnx1api import Vnx1Api
 from sanapiexception import (SanApiCommandException,
-SanApiOperationFailedException)
+SanApiOperationFailedException, SanApiEntityAlreadyExistsException)
 import logging
 from testfunclib import *
 from sanapiinfo import LunInfo
+from sanapilunid import reset_lun_id_allocators
+import sanapilunid
 import mock
 
 
@@ -27,11 +30,20 @@ class Test(unittest.TestCase):
         self.timeout = "50"
         self.logger = logging.getLogger("sanapitest")
         self.logger.setLevel(logging.INFO)
+        # LUN IDs 0 to 39 are in use, random picks take the lowest free
+        self.lun_ids = [str(lun_id) for lun_id in range(40)]
+        reset_lun_id_allocators()
+        if not hasattr(self, 'shuffle'):
+            self.shuffle = mock.patch("vnxcommonapi.random.shuffle")
+            self.shuffle.start()
         self.vnxCommApiObj = Vnx1Api(self.logger)
         self.vnxCommApiObj._accept_and_store_cert = MagicMock(name="_accept_and_store_cert")
         self.vnxCommApiObj.initialise((self.spa, self.spb), self.adminuser,
                                       self.adminpasswd, self.scope, vcheck=False)
 
+    def tearDown(self):
+        self.shuffle.stop()
+
     def setUpVnx1(self):
         # Setup array object
         self.vnx = Vnx1Api(self.logger)
@@ -50,7 +62,7 @@ class Test(unittest.TestCase):
                         '2', '549407', 'RaidGroup', 'HS')
         self.vnxCommApiObj._get_luns = mock.Mock(return_value=[].append(lun))
         self.vnxCommApiObj.get_lun = MagicMock(name = 'get_lun', return_value=lun)
-        self.vnxCommApiObj.get_next_available_lunids = MagicMock(name = 'get_next_available_lunids', return_value=['40'])
+        self.vnxCommApiObj._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
         self.vnxCommApiObj._navisec = MagicMock(name = '_navisec', return_value=0)
         retLun = self.vnxCommApiObj.configure_hs('2')  
         self.assertEqual(lun, retLun, "LUNs do not match")
@@ -69,7 +81,7 @@ class Test(unittest.TestCase):
                         '2', '549407', 'RaidGroup', 'HS')
         self.vnxCommApiObj._get_luns = mock.Mock(return_value=[].append(lun))
         self.vnxCommApiObj.get_lun = MagicMock(name = 'get_lun', return_value=lun)
-        self.vnxCommApiObj.get_next_available_lunids = MagicMock(name = 'get_next_available_lunids', return_value=['40'])
+        self.vnxCommApiObj._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
         self.vnxCommApiObj._navisec = MagicMock(name = '_navisec', return_value=0)
         retLun = self.vnxCommApiObj.configure_hs('2', 'ste1')
         self.assertEqual(lun, retLun, "LUNs do not match")
@@ -90,9 +102,9 @@ class Test(unittest.TestCase):
         retcode = 0
         mock_popen = prepare_mocked_popen(outfile, errfile, retcode)
         expected_cmd = '/opt/Navisphere/bin/naviseccli -h 1.2.3.4 -User "admin" -Password shroot12 -timeout 50 -Scope global -xml  bind hs 40 -rg 20'
-        self.vnxCommApiObj.get_next_available_lunids = MagicMock(name = 'get_next_available_lunids', return_value=['40'])
+        self.vnxCommApiObj._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
         self.assertRaises(SanApiCommandException, self.vnxCommApiObj.configure_hs, '20')
-        mock_popen.assert_any_call(expected_cmd, shell=True, stderr=-1, stdout=-1, stdin=-1)
+        mock_popen.assert_any_call(shlex.split(expected_cmd), stderr=-1, stdout=-1, stdin=-1)
 
 
     def test_configurehs_with_name_invalid_rg(self):
@@ -106,9 +118,9 @@ class Test(unittest.TestCase):
         retcode = 0
         mock_popen = prepare_mocked_popen(outfile, errfile, retcode)
         expected_cmd = '/opt/Navisphere/bin/naviseccli -h 1.2.3.4 -User "admin" -Password shroot12 -timeout 50 -Scope global -xml  bind hs 40 -rg 20'
-        self.vnxCommApiObj.get_next_available_lunids = MagicMock(name = 'get_next_available_lunid', return_value=['40'])
+        self.vnxCommApiObj._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
         self.assertRaises(SanApiCommandException, self.vnxCommApiObj.configure_hs, '20', 'ste1')
-        mock_popen.assert_any_call(expected_cmd, shell=True, stderr=-1, stdout=-1, stdin=-1)
+        mock_popen.assert_any_call(shlex.split(expected_cmd), stderr=-1, stdout=-1, stdin=-1)
 
     def test_configurehs_with_name_ok(self):
         """
@@ -123,7 +135,7 @@ class Test(unittest.TestCase):
                         '2', '549407', 'RaidGroup', 'HS')
         self.vnx.get_luns = Mock(return_value=lun)
         self.vnx.get_lun = MagicMock(name = 'get_lun', return_value=lun)
-        self.vnx.get_next_available_lunids = MagicMock(name = 'get_next_available_lunids', return_value=['40'])
+        self.vnx._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
         self.vnx._navisec = MagicMock(name = '_navisec', return_value=0)
         retLun = self.vnx.configure_hs('2', 'space here')
         self.assertEqual(lun, retLun, "LUNs do not match")
@@ -131,6 +143,30 @@ class Test(unittest.TestCase):
         self.vnx._navisec.assert_any_call("bind hs 40 -rg 2")
         self.vnx._navisec.assert_any_call("chglun -l 40 -name \"space here\"")
 
+    def test_configurehs_reserves_lun_id(self):
+        """
+        configure hs reserves its LUN ID, so a concurrent create cannot
+        take it, and tries the next one if it is in use
+        """
+        print self.shortDescription()
+        self.setUpVnx1()
+        tried = []
+
+        def navisec(navicmd, **kwargs):
+            if str(navicmd).startswith("bind"):
+                tried.append(str(navicmd))
+                if len(tried) == 1:
+                    raise SanApiEntityAlreadyExistsException("in use", 1)
+
+        self.vnx._navisec = MagicMock(name = '_navisec', side_effect=navisec)
+        self.vnx._get_lun_ids = MagicMock(name = '_get_lun_ids', return_value=self.lun_ids)
+        self.vnx.get_lun = MagicMock(name = 'get_lun')
+        self.vnx.configure_hs('2')
+        self.assertEqual(tried, ["bind hs 40 -rg 2", "bind hs 41 -rg 2"])
+        self.vnx.get_lun.assert_called_once_with(lun_id="41")
+        allocator = sanapilunid._ALLOCATORS[tuple(sorted(self.vnx._sp_ips))]
+        self.assertEqual(allocator.free_ids(1), [42])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -296,7 +296,188 @@ class Test(unittest.TestCase):
         self.vnx.create_host_initiator.assert_any_call(name, 'atrcxb123', '10.45.224.252', wwn, 'B', '0', \
                                                             arraycommpath, init_type, failovermode, array_specific_opts)
 
-        
+
+    def _port_list(self):
+        wwn2 = "50:01:43:80:16:7D:C4:6F:50:01:43:80:16:7D:C4:6E"
+        return [HbaInitiatorInfo(self.validhba, "A", "0", "atrcxb123", "10.45.224.252"),
+                HbaInitiatorInfo(self.validhba, "B", "0", "atrcxb123", "10.45.224.252"),
+                HbaInitiatorInfo(wwn2, "A", "1", "atrcxb124", "10.45.224.253"),
+                HbaInitiatorInfo(wwn2, "B", "1", "atrcxb124", "10.45.224.253")]
+
+    def test_create_hosts_initiators(self):
+        """test create_hosts_initiators registers many HBAs from one port list"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        wwn2 = "50:01:43:80:16:7D:C4:6F:50:01:43:80:16:7D:C4:6E"
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+        self.vnx.create_host_initiator = MagicMock(name="create_host_initiator")
+        inventory = MagicMock(name="inventory")
+        inventory.get_by_name.side_effect = lambda sg_name: sg_name
+        self.vnx.get_storage_group_inventory = MagicMock(name="get_storage_group_inventory",
+                                                         return_value=inventory)
+
+        sgs = self.vnx.create_hosts_initiators([
+            {"sg_name": "sg1", "wwn": self.validhba},
+            {"sg_name": "sg2", "wwn": wwn2, "host_name": "node2", "host_ip": "1.2.3.6"}])
+
+        self.vnx._read_hba_port_list.assert_called_once_with()
+        self.assertEquals(self.vnx.create_host_initiator.call_count, 4)
+        self.vnx.create_host_initiator.assert_any_call('sg1', 'atrcxb123', '10.45.224.252', self.validhba,
+                                                       'B', '0', '1', '3', '4', '')
+        self.vnx.create_host_initiator.assert_any_call('sg2', 'node2', '1.2.3.6', wwn2,
+                                                       'A', '1', '1', '3', '4', '')
+        self.assertEqual(self.vnx.get_storage_group_inventory.call_count, 1)
+        self.assertEqual(sorted(sgs.items()), [("sg1", "sg1"), ("sg2", "sg2")])
+
+    def test_create_host_initiators_wwn_case(self):
+        """test a WWN is matched against the port list exactly by the single and batch calls"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+        self.vnx.create_host_initiator = MagicMock(name="create_host_initiator")
+
+        testfunclib.myassert_raises_regexp(self, SanApiOperationFailedException, "does not appear in port list",
+                                           self.vnx.create_host_initiators, "sg1", self.validhba.lower())
+        testfunclib.myassert_raises_regexp(self, SanApiOperationFailedException, "does not appear in port list",
+                                           self.vnx.create_hosts_initiators,
+                                           [{"sg_name": "sg1", "wwn": self.validhba.lower()}])
+        self.assertFalse(self.vnx.create_host_initiator.called)
+
+    def test_create_hosts_initiators_failures(self):
+        """test create_hosts_initiators checks every spec and WWN before registering"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+        self.vnx.create_host_initiator = MagicMock(name="create_host_initiator")
+
+        testfunclib.myassert_raises_regexp(self, SanApiCriticalErrorException, "Duplicate HBA WWN",
+                                           self.vnx.create_hosts_initiators,
+                                           [{"sg_name": "sg1", "wwn": self.validhba},
+                                            {"sg_name": "sg2", "wwn": self.validhba}])
+        testfunclib.myassert_raises_regexp(self, SanApiCriticalErrorException, "must be given together",
+                                           self.vnx.create_hosts_initiators,
+                                           [{"sg_name": "sg1", "wwn": self.validhba, "host_name": "node1"}])
+        testfunclib.myassert_raises_regexp(self, SanApiCriticalErrorException, "Invalid HBA spec parameters: sp",
+                                           self.vnx.create_hosts_initiators,
+                                           [{"sg_name": "sg1", "wwn": self.validhba, "sp": "A"}])
+        self.assertFalse(self.vnx._read_hba_port_list.called)
+
+        testfunclib.myassert_raises_regexp(self, SanApiOperationFailedException, "does not appear in port list",
+                                           self.vnx.create_hosts_initiators,
+                                           [{"sg_name": "sg1", "wwn": self.validhba},
+                                            {"sg_name": "sg2",
+                                             "wwn": "50:01:43:80:16:7D:C4:7F:50:01:43:80:16:7D:C4:7E"}])
+        self.assertFalse(self.vnx.create_host_initiator.called)
+
+    def test_create_host_initiators_tries_every_path(self):
+        """test create_host_initiators registers the other paths when one fails"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx.get_hba_port_info = MagicMock(name="get_hba_port_info", return_value=self._port_list()[:2])
+        self.vnx.create_host_initiator = MagicMock(name="create_host_initiator",
+                                                   side_effect=[SanApiCommandException("setpath failed", 1), None])
+        self.vnx.get_storage_group = MagicMock(name="get_storage_group")
+
+        self.assertRaises(SanApiCommandException, self.vnx.create_host_initiators, "sg1", self.validhba)
+        self.assertEquals(self.vnx.create_host_initiator.call_count, 2)
+        self.assertFalse(self.vnx.get_storage_group.called)
+
+    def test_hba_port_list_cache(self):
+        """test the port list is reused and kept up to date when an HBA is registered"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._hba_port_cache.configure(60)
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx.parser.create_hba_init_info_list = MagicMock(name="create_hba_init_info_list",
+                                                              return_value=self._port_list())
+
+        self.assertEqual(len(self.vnx.get_hba_port_info()), 4)
+        self.assertEqual(len(self.vnx.get_hba_port_info(wwn=self.validhba)), 2)
+        self.assertEqual(self.vnx._navisec.call_count, 1)
+
+        self.vnx.create_host_initiator("sg1", "node1", "1.2.3.4", self.validhba, "A", "0")
+        self.assertEqual(self.vnx.get_hba_port_info(host="node1"),
+                         [HbaInitiatorInfo(self.validhba, "A", "0", "node1", "1.2.3.4")])
+        self.assertEqual(self.vnx._navisec.call_count, 2)
+
+        self.vnx._navisec.side_effect = SanApiCommandException("setpath failed", 1)
+        self.assertRaises(SanApiCommandException, self.vnx.create_host_initiator,
+                          "sg1", "node1", "1.2.3.4", self.validhba, "B", "0")
+        self.vnx._navisec.side_effect = None
+        self.vnx.get_hba_port_info()
+        self.assertEqual(self.vnx.parser.create_hba_init_info_list.call_count, 2)
+
+    def test_create_hosts_initiators_reuses_port_list(self):
+        """test back to back create_hosts_initiators calls read the cached port list once"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._hba_port_cache.configure(60)
+        self.vnx.set_read_after_write("off")
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx.parser.create_hba_init_info_list = MagicMock(name="create_hba_init_info_list",
+                                                              return_value=self._port_list())
+        wwn2 = "50:01:43:80:16:7D:C4:6F:50:01:43:80:16:7D:C4:6E"
+
+        self.vnx.create_hosts_initiators([{"sg_name": "sg1", "wwn": self.validhba}])
+        self.vnx.create_hosts_initiators([{"sg_name": "sg2", "wwn": wwn2}])
+
+        port_lists = [c for c in self.vnx._navisec.call_args_list
+                      if str(c[0][0]).startswith("port -list -hba")]
+        self.assertEqual(len(port_lists), 1)
+        self.assertEqual(self.vnx._navisec.call_count, 5)
+
+    def test_get_hba_port_info_filters(self):
+        """test get_hba_port_info filters the port list by WWN, host, SP and port"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+
+        self.assertEqual(self.vnx.get_hba_port_info(wwn=self.validhba, storage_processor="B"),
+                         [self._port_list()[1]])
+        self.assertEqual(self.vnx.get_hba_port_info(wwn=self.validhba.lower()), [])
+        self.assertEqual(self.vnx.get_hba_port_info(host="10.45.224.253", sp_port="1"),
+                         self._port_list()[2:])
+        self.assertEqual(self.vnx.get_hba_port_info(host="atrcxb124", storage_processor="A", sp_port="1"),
+                         [self._port_list()[2]])
+        self.assertEqual(self.vnx.get_hba_port_info(host="unknown"), [])
+
+    def test_get_hba_port_info_returns_copies(self):
+        """test get_hba_port_info does not hand out the cached port list entries"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._hba_port_cache.configure(60)
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+
+        hbas = self.vnx.get_hba_port_info(wwn=self.validhba)
+        hbas[0]._hbaname = "changed"
+        self.assertEqual(self.vnx.get_hba_port_info(wwn=self.validhba),
+                         self._port_list()[:2])
+        self.assertEqual(self.vnx._read_hba_port_list.call_count, 1)
+
+    def test_deregister_hba_uid_with_cached_port_list(self):
+        """test deregister_hba_uid skips HBAs missing from the cached port list"""
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.vnx._hba_port_cache.configure(60)
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx._read_hba_port_list = MagicMock(name="_read_hba_port_list", return_value=self._port_list())
+
+        self.assertTrue(self.vnx.deregister_hba_uid("50:01:43:80:16:7D:C4:7F:50:01:43:80:16:7D:C4:7E"))
+        self.assertFalse(self.vnx._navisec.called)
+        self.assertTrue(self.vnx.deregister_hba_uid(self.validhba))
+        self.vnx._navisec.assert_called_once_with("port -removeHBA -o -hbauid " + self.validhba)
+        self.assertEqual(self.vnx._read_hba_port_list.call_count, 1)
+
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -7,13 +7,17 @@ import unittest
 from mock import patch, MagicMock
 from vnxcommonapi import VnxCommonApi
 from sanapiinfo import LunInfo
+from sanapiinventory import LunInventory
 from sanapiexception import (SanApiCriticalErrorException,
         SanApiOperationFailedException,
-        SanApiEntityAlreadyExistsException)
+        SanApiEntityAlreadyExistsException, SanApiPartialFailureException,
+        SanApiConnectionException)
 import logging
 import logging.handlers
 from sanapilib import *
 from emctest import TestSanEMC
+from sanapilunid import reset_lun_id_allocators
+import sanapilunid
 import re
 
 
@@ -49,6 +53,7 @@ class Test(TestSanEMC):
             "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11",
             "TORD2", "174080", "StoragePool", "6"),
              ]
+        reset_lun_id_allocators()
         self.setup_vnx()
 
     def setup_vnx(self):
@@ -212,6 +217,9 @@ class Test(TestSanEMC):
         #  check number of free luns returned if not enough available
         lunids = self.vnx.get_next_available_lunids(7, randomise=False)
         self.assertEqual(lunids, [1, 6])
+        # the limit is for the call only, creators keep the HighLun range
+        allocator = sanapilunid._ALLOCATORS[tuple(sorted(self.vnx._sp_ips))]
+        self.assertEqual(allocator.high_lun, 1024)
 
         # check except gets thrown if no free lun ids available
         self.replace_lunids([0, 1, 2, 3, 4])
@@ -467,6 +475,204 @@ class Test(TestSanEMC):
 
         call2 = str(self.vnx._navisec.mock_calls[1])
         self.assertTrue(name in call2)
+
+    @patch("vnxcommonapi.random.shuffle")
+    def test_create_luns(self, mock_shuffle):
+        '''Creates pool and Raid Group LUNs in one call, reading the
+        LUN IDs and the new LUNs once'''
+        print self.shortDescription()
+
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx._get_lun_ids = MagicMock(name="_get_lun_ids",
+                return_value=["0", "1", "2", "3", "4"])
+        created = [
+            LunInfo("30", "pool lun",
+                "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:30",
+                "pool1", "1024", "StoragePool", "5"),
+            LunInfo("5", "rg_lun_a",
+                "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:05",
+                "6", "1024", "RaidGroup", "5"),
+            LunInfo("6", "rg_lun_b",
+                "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:06",
+                "6", "1024", "RaidGroup", "5"),
+            LunInfo("20", "rg_lun_c",
+                "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:20",
+                "6", "1024", "RaidGroup", "5")]
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory",
+                return_value=LunInventory(created))
+
+        luns = self.vnx.create_luns([
+            {"lun_name": "pool lun", "size": "1Gb",
+             "container_type": CONTAINER_STORAGE_POOL,
+             "container": "pool1"},
+            {"lun_name": "rg_lun_a", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5"},
+            {"lun_name": "rg_lun_b", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5"},
+            {"lun_name": "rg_lun_c", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5", "lun_id": "20"}])
+
+        self.assertEqual(self.vnx._get_lun_ids.call_count, 1)
+        self.assertEqual(self.vnx._get_lun_inventory.call_count, 1)
+        binds = sorted([str(navicall[0][0]) for navicall
+                        in self.vnx._navisec.call_args_list
+                        if str(navicall[0][0]).startswith("bind")])
+        self.assertEqual(binds, ["bind r5 20 -rg 6 -cap 1 -sp a -sq gb",
+                                 "bind r5 5 -rg 6 -cap 1 -sp a -sq gb",
+                                 "bind r5 6 -rg 6 -cap 1 -sp a -sq gb"])
+        self.assertEqual(self.vnx._navisec.call_count, 7)
+        self.assertEqual(luns[0].name, "pool lun")
+        self.assertEqual(sorted([luns[1].id, luns[2].id]), ["5", "6"])
+        self.assertEqual(luns[3].id, "20")
+
+    @patch("vnxcommonapi.random.shuffle")
+    def test_create_luns_explicit_ids_not_reused(self, mock_shuffle):
+        '''create_luns never gives an automatic LUN ID that another spec
+        in the batch asked for'''
+        print self.shortDescription()
+
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx._get_lun_ids = MagicMock(name="_get_lun_ids",
+                return_value=["0", "1", "2", "3", "4"])
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory",
+                return_value=LunInventory([LunInfo(lun_id, name,
+                    "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:0" + lun_id,
+                    "6", "1024", "RaidGroup", "5") for lun_id, name in
+                    (("5", "rg_lun_a"), ("6", "rg_lun_b"), ("7", "rg_lun_c"))]))
+
+        self.vnx.create_luns([
+            {"lun_name": "rg_lun_b", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5"},
+            {"lun_name": "rg_lun_a", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5", "lun_id": "5"},
+            {"lun_name": "rg_lun_c", "size": "1Gb",
+             "container_type": CONTAINER_RAID_GROUP, "container": "6",
+             "raid_type": "5"}])
+
+        binds = sorted([str(navicall[0][0]) for navicall
+                        in self.vnx._navisec.call_args_list
+                        if str(navicall[0][0]).startswith("bind")])
+        self.assertEqual(binds, ["bind r5 5 -rg 6 -cap 1 -sp a -sq gb",
+                                 "bind r5 6 -rg 6 -cap 1 -sp a -sq gb",
+                                 "bind r5 7 -rg 6 -cap 1 -sp a -sq gb"])
+
+    def test_create_luns_invalid_spec(self):
+        '''create_luns creates nothing if any spec is invalid'''
+        print self.shortDescription()
+
+        self.vnx._navisec = MagicMock(name="_navisec")
+        good = {"lun_name": "lun1", "size": "1Gb",
+                "container_type": CONTAINER_STORAGE_POOL,
+                "container": "pool1"}
+        for bad in ({"lun_name": "lun2", "size": "1Gb",
+                     "container_type": CONTAINER_STORAGE_POOL},
+                    {"lun_name": "lun2", "size": "1Gb",
+                     "container_type": CONTAINER_STORAGE_POOL,
+                     "container": "pool1", "storage_processor": "c"},
+                    {"lun_name": "lun2", "size": "1Gb",
+                     "container_type": CONTAINER_STORAGE_POOL,
+                     "container": "pool1", "colour": "blue"},
+                    dict(good)):
+            self.assertRaises(SanApiCriticalErrorException,
+                    self.vnx.create_luns, [good, bad])
+        self.assertFalse(self.vnx._navisec.called)
+
+    def test_create_luns_failure(self):
+        '''create_luns creates the other LUNs and raises the failure with
+        the LUNs created'''
+        print self.shortDescription()
+
+        def navisec(navicmd, **kwargs):
+            if "lun2" in str(navicmd):
+                raise SanApiOperationFailedException("Oops", 1)
+
+        self.vnx._navisec = MagicMock(name="_navisec", side_effect=navisec)
+        created = [LunInfo(lun_id, name,
+                           "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:" +
+                           lun_id, "pool1", "1024", "StoragePool", "5")
+                   for lun_id, name in (("31", "lun1"), ("33", "lun3"))]
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory",
+                return_value=LunInventory(created))
+        specs = [{"lun_name": name, "size": "1Gb",
+                  "container_type": CONTAINER_STORAGE_POOL,
+                  "container": "pool1"} for name in ("lun1", "lun2", "lun3")]
+        self.assertRaisesRegexp(SanApiOperationFailedException,
+                "LUN create failed for 1 of 3: lun2: Oops",
+                self.vnx.create_luns, specs)
+        try:
+            self.vnx.create_luns(specs)
+        except SanApiPartialFailureException, exce:
+            self.assertEqual([lun.name for lun in exce.succeeded],
+                             ["lun1", "lun3"])
+            self.assertEqual(exce.failed.keys(), ["lun2"])
+        self.assertEqual(self.vnx._navisec.call_count, 6)
+        self.assertEqual(self.vnx._get_lun_inventory.call_count, 2)
+
+    def test_create_luns_read_back_failure(self):
+        '''create_luns raises a partial failure holding the LUNs found if
+        the created LUNs cannot all be read back'''
+        print self.shortDescription()
+
+        def navisec(navicmd, **kwargs):
+            if "lun2" in str(navicmd):
+                raise SanApiOperationFailedException("Oops", 1)
+
+        self.vnx._navisec = MagicMock(name="_navisec")
+        found = [LunInfo("31", "lun1",
+                         "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:31",
+                         "pool1", "1024", "StoragePool", "5")]
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory",
+                return_value=LunInventory(found))
+        specs = [{"lun_name": name, "size": "1Gb",
+                  "container_type": CONTAINER_STORAGE_POOL,
+                  "container": "pool1"} for name in ("lun1", "lun2", "lun3")]
+
+        # every LUN created, two of them not read back
+        try:
+            self.vnx.create_luns(specs)
+        except SanApiPartialFailureException, exce:
+            self.assertTrue(str(exce).startswith(
+                    "LUN read back failed for 2 of 3"))
+            self.assertEqual([lun.name for lun in exce.succeeded], ["lun1"])
+            self.assertEqual(sorted(exce.failed.keys()), ["lun2", "lun3"])
+        else:
+            self.fail("SanApiPartialFailureException not raised")
+
+        # one LUN not created, one created LUN not read back
+        self.vnx._navisec.side_effect = navisec
+        try:
+            self.vnx.create_luns(specs)
+        except SanApiPartialFailureException, exce:
+            self.assertEqual([lun.name for lun in exce.succeeded], ["lun1"])
+            self.assertEqual(sorted(exce.failed.keys()), ["lun2", "lun3"])
+        else:
+            self.fail("SanApiPartialFailureException not raised")
+
+        # the read back itself fails
+        self.vnx._get_lun_inventory.side_effect = \
+                SanApiConnectionException("No connection", 1)
+        try:
+            self.vnx.create_luns(specs)
+        except SanApiPartialFailureException, exce:
+            self.assertEqual(exce.succeeded, [])
+            self.assertEqual(exce.failed.keys(), ["lun2"])
+        else:
+            self.fail("SanApiPartialFailureException not raised")
+
+    def test_create_luns_empty(self):
+        '''create_luns without specs reads nothing'''
+        print self.shortDescription()
+
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory")
+        self.assertEqual(self.vnx.create_luns([]), [])
+        self.assertFalse(self.vnx._navisec.called)
+        self.assertFalse(self.vnx._get_lun_inventory.called)
     
 
 if __name__ == "__main__":
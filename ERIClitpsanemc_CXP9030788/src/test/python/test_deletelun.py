@@ -9,9 +9,11 @@ from mock import patch, Mock, MagicMock
 import sys
 from vnxcommonapi import VnxCommonApi
 from sanapiinfo import LunInfo
+from sanapiinventory import LunInventory
 from sanapiexception import (SanApiCriticalErrorException,
     SanApiOperationFailedException, SanApiCommandException,
-    SanApiConnectionException, SanApiException)
+    SanApiConnectionException, SanApiException,
+    SanApiEntityNotFoundException)
 import logging
 import logging.handlers
 import testfunclib
@@ -137,5 +139,57 @@ class Test(TestSanEMC):
         self.vnx.get_lun = MagicMock(name="get_lun", return_value=bad_linfo)
         self.assertRaisesRegexp(SanApiCriticalErrorException, "Unrecognised LUN container", self.vnx.delete_lun, lun_id="1")
 
+    def test_delete_luns(self):
+        """
+        test delete_luns finds the LUNs in one inventory read and reports each outcome
+        """
+
+        self.setUpCommon()
+        luns = [LunInfo("45", "pool_lun", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11",
+                        "TORD2", "174080", "StoragePool", "5"),
+                LunInfo("46", "rg_lun", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:12",
+                        "6", "174080", "RaidGroup", "5"),
+                LunInfo("47", "busy_lun", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:13",
+                        "TORD2", "174080", "StoragePool", "5"),
+                LunInfo("48", "gone_lun", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:14",
+                        "TORD2", "174080", "StoragePool", "5")]
+
+        def navisec(navicmd, **kwargs):
+            if "47" in str(navicmd):
+                raise SanApiCommandException("LUN is in a storage group", 1)
+            if "48" in str(navicmd):
+                raise SanApiEntityNotFoundException("LUN does not exist", 1)
+
+        self.vnx._navisec = MagicMock(name="_navisec", side_effect=navisec)
+        self.vnx._get_lun_inventory = MagicMock(name="_get_lun_inventory",
+                                                return_value=LunInventory(luns))
+        outcomes = self.vnx.delete_luns(lun_names=["pool_lun", "rg_lun", "busy_lun", "no_lun"],
+                                        lun_ids=["45", "46", 48, "99"])
+        self.assertEqual(sorted(outcomes.items()), sorted({"pool_lun": sanapilib.LUN_DELETED,
+                                    "rg_lun": sanapilib.LUN_NOT_FOUND,
+                                    "busy_lun": sanapilib.LUN_DELETE_FAILED,
+                                    "no_lun": sanapilib.LUN_NOT_FOUND,
+                                    "45": sanapilib.LUN_DELETED,
+                                    "46": sanapilib.LUN_DELETED,
+                                    "48": sanapilib.LUN_NOT_FOUND,
+                                    "99": sanapilib.LUN_NOT_FOUND}.items()))
+        self.assertEquals(self.vnx._get_lun_inventory.call_count, 1)
+        self.assertEquals(sorted([str(navicall[0][0]) for navicall in self.vnx._navisec.call_args_list]),
+                          ["lun -destroy -l 45 -o", "lun -destroy -l 47 -o",
+                           "lun -destroy -l 48 -o", "unbind 46 -o"])
+
+    def test_delete_luns_with_badparams(self):
+        """
+        test delete_luns deletes nothing given no LUNs or a bad LUN id
+        """
+
+        self.setUpCommon()
+        self.vnx._navisec = MagicMock(name="_navisec")
+        self.assertRaisesRegexp(SanApiCriticalErrorException, "Neither lun names nor lun ids",
+                                self.vnx.delete_luns)
+        self.assertRaisesRegexp(SanApiCriticalErrorException, "Invalid LUN id: x1",
+                                self.vnx.delete_luns, lun_ids=["1", "x1"])
+        self.assertFalse(self.vnx._navisec.called)
+
 if __name__ == "__main__":
     unittest.main()
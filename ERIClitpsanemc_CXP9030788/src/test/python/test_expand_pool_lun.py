@@ -48,7 +48,7 @@ class Test(unittest.TestCase):
                                  self.adminpasswd, self.scope, vcheck=False)
         vnxCommAPIObj.expand_pool_lun(lun_name="lun123", size="5gb")
         self.assertEquals(vnxCommAPIObj._navisec.call_count, 1)
-        command = "lun -expand -name lun123 -capacity 5 -sq gb  -o"
+        command = "lun -expand -name lun123 -capacity 5 -sq gb -o"
         vnxCommAPIObj._navisec.assert_called_once_with(command)
         vnxCommAPIObj.get_lun.assert_called_with(
             lun_name="lun123", logmsg=True)
@@ -13,6 +13,7 @@ import sanapilib
 from vnxcommonapi import VnxCommonApi
 from sanapiinfo import StorageGroupInfo
 from testfunclib import *
+from vnxparser import DelimGetLun, DelimLunList
 
 
 class Test(unittest.TestCase):
@@ -44,51 +45,92 @@ class Test(unittest.TestCase):
         self.vnx.initialise((self.spa, self.spb), self.adminuser, \
                        self.adminpasswd, self.scope, vcheck = False)
 
-    def __created_mocked_luns_in_vnxCommApiObj(self):
+    def __mock_single_lun_commands(self):
         '''
-        Private method to create a mocked list of LUNS and return it on the get_luns method
+        Private method to mock navisec with the output of the commands
+        reading a single LUN
         '''
-        self.vnxCommApiObj._accept_and_store_cert = MagicMock(name="_accept_and_store_cert")
-
-        luns = [LunInfo("28", "LITP_TORD2_bootvg_2_LUN_28", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11", 
-                "TORD2", "174080", "StoragePool", "6", "A"), \
-                LunInfo("29", "myfavlun", "69:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11", 
-                "atpool", "174080", "StoragePool", "6", "A"), \
-                LunInfo("30", "myfavlun", "61:06:01:22:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11", 
-                "13", "174080", "RaidGroup", "6", "A"), \
-                LunInfo("31", "myfavlun", "61:06:01:12:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11", 
-                "14", "174080", "RaidGroup", "6", "A"), \
-                LunInfo("32", "foolun", "13:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11", 
-                "mypool", "174080", "StoragePool", "6", "A"),\
-                ]
-        self.vnxCommApiObj._get_luns = mock.Mock(return_value=luns)
+        outputs = {
+            "getlun 212": "../data/getlun_small.xml",
+            "getlun 73": "../data/getlun_small.xml",
+            "getlun 66": "../data/non_existing_lun_getlun.xml",
+            "lun -list -l 212": "../data/lunlist.xml.cmdok",
+            'lun -list -name "xb2112_fencing_212"':
+                "../data/lunlist.xml.cmdok",
+            'lun -list -name "foobar"':
+                "../data/non_existing_lun_lunlistbyname.xml",
+            'lun -list -name "xb2257_58_OSSDG_73"':
+                "../data/non_existing_lun_lunlistbyname.xml",
+        }
+
+        def navisec(cmd, **kwargs):
+            return self.vnxCommApiObj._etree_from_output(
+                get_test_file_data(outputs[cmd]))
+        self.vnxCommApiObj._navisec = mock.Mock(side_effect=navisec)
+        self.vnxCommApiObj._navisec_get_luns = mock.Mock()
+
+    def __navisec_calls(self):
+        return [call[1][0] for call in self.vnxCommApiObj._navisec.mock_calls]
 
     ''' GET_LUN() '''
     def test_get_lun_with_existing_id(self):
-        ''' testing get_lun() with existing ID '''
+        ''' testing get_lun() with existing ID reads only that LUN '''
         print self.shortDescription() 
-        self.__created_mocked_luns_in_vnxCommApiObj()
-        lun = self.vnxCommApiObj.get_lun(lun_id="28")
-        self.assertEqual(lun.id, "28", "The lun id must be equal")
+        self.__mock_single_lun_commands()
+        lun = self.vnxCommApiObj.get_lun(lun_id="212")
+        self.assertEqual(lun.id, "212", "The lun id must be equal")
+        self.assertEqual(lun.name, "xb2112_fencing_212")
+        self.assertEqual(lun.type, sanapilib.CONTAINER_STORAGE_POOL)
+        self.assertEqual(lun.container, "NFD_Pool")
+        self.assertEqual(self.__navisec_calls(),
+                         ["getlun 212", "lun -list -l 212"])
+        self.assertFalse(self.vnxCommApiObj._navisec_get_luns.called)
+
+    def test_get_lun_with_existing_raid_group_id(self):
+        ''' testing get_lun() with the ID of a Raid Group LUN '''
+        print self.shortDescription()
+        self.__mock_single_lun_commands()
+        lun = self.vnxCommApiObj.get_lun(lun_id="73")
+        self.assertEqual(lun.name, "xb2257_58_OSSDG_73")
+        self.assertEqual(lun.type, sanapilib.CONTAINER_RAID_GROUP)
+        self.assertEqual(lun.container, "6")
+        self.assertEqual(self.__navisec_calls(), ["getlun 73"])
+
+    def test_get_lun_with_raid_group_name(self):
+        ''' testing get_lun() with the name of a Raid Group LUN, which is
+        only looked up among storage pool LUNs '''
+        print self.shortDescription()
+        self.__mock_single_lun_commands()
+        self.assertRaises(SanApiEntityNotFoundException,
+                          self.vnxCommApiObj.get_lun,
+                          lun_name="xb2257_58_OSSDG_73")
+        self.assertEqual(self.__navisec_calls(),
+                         ['lun -list -name "xb2257_58_OSSDG_73"'])
 
     def test_get_lun_with_unexisting_id(self):
         ''' testing get_lun() with non-existing ID '''
         print self.shortDescription() 
-        self.__created_mocked_luns_in_vnxCommApiObj()
+        self.__mock_single_lun_commands()
         self.assertRaises(SanApiEntityNotFoundException, self.vnxCommApiObj.get_lun, lun_id="66")
 
     def test_get_lun_with_existing_name(self):
         ''' testing get_lun() with existing name'''
         print self.shortDescription() 
-        self.__created_mocked_luns_in_vnxCommApiObj()
-        lun = self.vnxCommApiObj.get_lun(lun_name="LITP_TORD2_bootvg_2_LUN_28")
-        self.assertEqual(lun.name, "LITP_TORD2_bootvg_2_LUN_28", "Names must be equal")
+        self.__mock_single_lun_commands()
+        lun = self.vnxCommApiObj.get_lun(lun_name="xb2112_fencing_212")
+        self.assertEqual(lun.name, "xb2112_fencing_212", "Names must be equal")
+        self.assertEqual(lun.id, "212")
+        self.assertEqual(self.__navisec_calls(),
+                         ['lun -list -name "xb2112_fencing_212"',
+                          "getlun 212"])
 
     def test_get_lun_with_unexisting_name(self):
         ''' testing get_lun() with non-existing name '''
         print self.shortDescription() 
-        self.__created_mocked_luns_in_vnxCommApiObj()
+        self.__mock_single_lun_commands()
         self.assertRaises(SanApiEntityNotFoundException, self.vnxCommApiObj.get_lun, lun_name="foobar")
+        self.assertFalse(self.vnxCommApiObj.lun_exists("foobar"))
+        self.assertTrue(self.vnxCommApiObj.lun_exists("xb2112_fencing_212"))
 
     ''' GET_LUNS() '''
     def test_get_luns_in_storage_pools(self):
@@ -441,26 +483,28 @@ class Test(unittest.TestCase):
         self.vnx._navisec = MagicMock(name = '_navisec', return_value=0)
 
         # Mock called functions as we are not interested in them, only the cmd string structure
-        self.vnx.parser.create_dicts = MagicMock(name = 'create_dicts', return_value={})
-
-        luns=getLunList()
-        self.vnx.parser.create_object_list = MagicMock(name = 'create_object_list', return_value=luns)
-
         name="space here"
-        cmd_string = "lun -list"
+        self.vnx.parser.create_dicts = MagicMock(name = 'create_dicts',
+            side_effect=[{"27": {"Name": name}}, {"27": {}}])
 
-        #call('getlun')
-        #call('lun -list')
+        lun = getLunList()[8]
+        self.vnx.parser.create_lun_from_get_lun_dict = MagicMock(
+            name = 'create_lun_from_get_lun_dict', return_value=lun)
+        self.vnx._update_lun_object = MagicMock(name = '_update_lun_object')
+
+        cmd_string = 'lun -list -name "space here"'
 
         print "Verifying navisec is called with: %s" % cmd_string
         lun = self.vnx.get_lun(lun_name=name)
 
         self.assertEquals(lun.name, name)
 
-        call1=str(self.vnx._navisec.mock_calls[0]) 
-        call2=str(self.vnx._navisec.mock_calls[1])
-        self.assertEquals(call1, 'call(\'getlun\')')
-        self.assertEquals(call2, 'call(\'lun -list\')')
+        self.assertEquals(self.vnx._navisec.mock_calls[0][1][0].argv,
+                          ("lun", "-list", "-name", name))
+        self.assertEquals(self.vnx._navisec.mock_calls[0][1][0], cmd_string)
+        self.assertEquals(self.vnx._navisec.mock_calls[1][1][0], "getlun 27")
+        self.vnx._update_lun_object.assert_called_once_with(lun,
+                                                            {"Name": name})
 
 
     #@skip
@@ -523,6 +567,197 @@ class Test(unittest.TestCase):
         self.vnx.get_luns(sg_name=name)
         self.vnx._navisec.assert_called_once_with(cmd_string, logmsg=True)
 
+    def _cached_api(self):
+        self.vnxCommApiObj._lun_cache.configure(60)
+        self.vnxCommApiObj._navisec_get_luns = mock.Mock(
+                                        return_value=(getLunList(), {}))
+        return self.vnxCommApiObj
+
+    def test_lun_cache_reuses_inventory(self):
+        ''' test cached LUNs are read once and returned as copies '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        luns1 = vnx.get_luns()
+        luns2 = vnx.get_luns()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 1)
+        self.assertEqual(luns1, luns2)
+        self.assertFalse(luns1[0] is luns2[0])
+        self.assertEqual(vnx.get_lun(lun_id="48").name, "lun1")
+        self.assertEqual(vnx._navisec_get_luns.call_count, 1)
+        stats = vnx.cache_stats()['luns']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_lun_cache_lookups_return_copies(self):
+        ''' test LUNs looked up in the cached inventory are copies '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        lun = vnx.get_lun(lun_id="48")
+        lun.container = "changed"
+        self.assertNotEqual(vnx.get_lun(lun_id="48").container, "changed")
+        self.assertTrue(vnx.lun_exists("lun1"))
+        self.assertEqual(vnx._navisec_get_luns.call_count, 1)
+
+    def test_lun_cache_invalidated_by_change(self):
+        ''' test a LUN change reads the inventory again '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx._navisec = mock.Mock()
+        vnx.get_luns()
+        vnx.rename_lun("48", "lun1")
+        self.assertEqual(vnx._navisec_get_luns.call_count, 2)
+        vnx.get_luns()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 2)
+        vnx._navisec.side_effect = SanApiCommandException("failed", 1)
+        self.assertRaises(SanApiCommandException, vnx.delete_lun,
+                          lun_id="48")
+        vnx.get_luns()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 3)
+
+    def test_lun_cache_refresh(self):
+        ''' test refresh reads the inventory again '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx.get_luns()
+        vnx.refresh()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 2)
+        vnx.get_luns()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 2)
+        vnx._lun_cache.configure(0)
+        vnx.refresh()
+        vnx.get_luns()
+        self.assertEqual(vnx._navisec_get_luns.call_count, 3)
+
+    def _lun_listing(self, luns):
+        listing = {}
+        for lun in luns:
+            listing[lun.id] = {'LOGICAL UNIT NUMBER': lun.id, 'Name': lun.name,
+                               'UID': lun.uid,
+                               'LUN Capacity(Megabytes)': lun.size,
+                               'RAID Type': 'RAID' + lun.raid,
+                               'Default Owner': 'SP ' + lun.controller}
+        return listing
+
+    def _pool_listing(self, luns, consumed="0.5"):
+        listing = {}
+        for lun in luns:
+            if lun.type == sanapilib.CONTAINER_STORAGE_POOL:
+                listing[lun.id] = {'LOGICAL UNIT NUMBER ': lun.id,
+                                   'Current Operation': 'None',
+                                   'Current Operation State': 'N/A',
+                                   'Current Operation Status': 'N/A',
+                                   'Current Operation Percent Completed': '0',
+                                   'Consumed Capacity (GBs)': consumed}
+        return listing
+
+    def _listings(self, listing, pool_listing):
+        return lambda etree, delim: {DelimGetLun: listing,
+                                     DelimLunList: pool_listing}[delim]
+
+    def test_lun_cache_incremental_refresh(self):
+        ''' test an incremental refresh only reads new and changed LUNs '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx.get_luns()
+        luns = getLunList()
+        listing = self._lun_listing(luns)
+        listing['48']['Name'] = "lun1_renamed"
+        del listing['37']
+        new_lun = LunInfo("99", "new_lun",
+                          "60:06:01:60:97:D0:35:00:38:CD:C0:71:57:24:E4:99",
+                          "atpool", "1Gb", "StoragePool", "5", "A")
+        listing['99'] = self._lun_listing([new_lun])['99']
+        renamed = LunInfo("48", "lun1_renamed", luns[11].uid, "atpool",
+                          "1Gb", "StoragePool", "5", "A")
+        vnx._navisec = mock.Mock()
+        vnx.parser.create_dicts = mock.Mock(side_effect=self._listings(
+            listing, self._pool_listing(luns)))
+        vnx._fetch_lun = mock.Mock(
+            side_effect=lambda lun_id: {"48": renamed, "99": new_lun}[lun_id])
+
+        vnx.refresh(incremental=True)
+        self.assertEqual(vnx._navisec_get_luns.call_count, 1)
+        self.assertEqual(sorted([call[0][0] for call in
+                                 vnx._navisec.call_args_list]),
+                         ["getlun -name -uid -capacity -type -default",
+                          "lun -list -opDetails -consumedCap"])
+        self.assertEqual(sorted([call[2]['lun_id'] for call in
+                                 vnx._fetch_lun.mock_calls]), ["48", "99"])
+        luns = vnx.get_luns()
+        self.assertEqual(len(luns), len(listing))
+        self.assertEqual(luns[-1].id, "99")
+        self.assertEqual(vnx.get_lun(lun_id="48").name, "lun1_renamed")
+        self.assertRaises(SanApiEntityNotFoundException, vnx.get_lun,
+                          lun_id="37")
+
+    def test_lun_cache_incremental_falls_back(self):
+        ''' test an incremental read with many changes reads all LUNs '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx._lun_incremental = True
+        vnx.get_luns()
+        listing = self._lun_listing(getLunList())
+        for navi_dict in listing.values():
+            navi_dict['UID'] = None
+        vnx._navisec = mock.Mock()
+        vnx.parser.create_dicts = mock.Mock(side_effect=self._listings(
+            listing, self._pool_listing(getLunList())))
+        vnx._fetch_lun = mock.Mock()
+        vnx._lun_cache.invalidate()
+        self.assertEqual(len(vnx.get_luns()), len(getLunList()))
+        self.assertEqual(vnx._navisec.call_count, 2)
+        self.assertEqual(vnx._navisec_get_luns.call_count, 2)
+        self.assertFalse(vnx._fetch_lun.called)
+
+    def test_lun_cache_incremental_pool_state(self):
+        ''' test an incremental refresh picks up the consumed capacity of
+        otherwise unchanged storage pool LUNs '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx.get_luns()
+        luns = getLunList()
+        vnx._navisec = mock.Mock()
+        vnx.parser.create_dicts = mock.Mock(side_effect=self._listings(
+            self._lun_listing(luns), self._pool_listing(luns, "2")))
+        vnx._fetch_lun = mock.Mock()
+
+        vnx.refresh(incremental=True)
+        self.assertFalse(vnx._fetch_lun.called)
+        self.assertEqual(vnx.get_lun(lun_id="27").consumed, "2048")
+        self.assertEqual(vnx.get_lun(lun_id="37").consumed, luns[0].consumed)
+
+        # a pool LUN missing from lun -list is read in full
+        vnx._fetch_lun.return_value = luns[8]
+        vnx.parser.create_dicts = mock.Mock(side_effect=self._listings(
+            self._lun_listing(luns), {}))
+        vnx.refresh(incremental=True)
+        self.assertEqual(sorted([call[2]['lun_id'] for call in
+                                 vnx._fetch_lun.mock_calls]),
+                         sorted([lun.id for lun in luns if lun.type ==
+                                 sanapilib.CONTAINER_STORAGE_POOL]))
+
+    def test_lun_cache_incremental_owner(self):
+        ''' test an incremental refresh reads a LUN again if its default
+        owner or RAID type changed '''
+        print self.shortDescription()
+        vnx = self._cached_api()
+        vnx.get_luns()
+        luns = getLunList()
+        listing = self._lun_listing(luns)
+        listing['37']['Default Owner'] = 'SP B'
+        listing['36']['RAID Type'] = 'RAID5'
+        moved = LunInfo("37", luns[0].name, luns[0].uid, luns[0].container,
+                        luns[0].size, "RaidGroup", "1", "B")
+        vnx._navisec = mock.Mock()
+        vnx.parser.create_dicts = mock.Mock(side_effect=self._listings(
+            listing, self._pool_listing(luns)))
+        vnx._fetch_lun = mock.Mock(
+            side_effect=lambda lun_id: {"37": moved, "36": luns[1]}[lun_id])
+
+        vnx.refresh(incremental=True)
+        self.assertEqual(sorted([call[2]['lun_id'] for call in
+                                 vnx._fetch_lun.mock_calls]), ["36", "37"])
+        self.assertEqual(vnx.get_lun(lun_id="37").controller, "B")
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -4,6 +4,7 @@ Created on 14 Jul 2014
 @author: esteved
 '''
 import unittest
+import shlex
 
 from mock import patch, Mock, MagicMock
 import sys
@@ -75,7 +76,7 @@ class Test(unittest.TestCase):
         res_sgs=self.vnx.get_storage_groups()
 
         # Check the Results
-        self.mock_popen.assert_called_once_with(expected_cmd, shell=True, stderr=-1, stdout=-1, stdin=-1)
+        self.mock_popen.assert_called_once_with(shlex.split(expected_cmd), stderr=-1, stdout=-1, stdin=-1)
 
         # Validate one of the SGs in the list
         for returnedSG in res_sgs:
@@ -88,6 +89,49 @@ class Test(unittest.TestCase):
         # Check the correct number of SGs returned
         self.assertEqual(len(res_sgs), 8)
 
+    def test_get_storage_group_inventory(self):
+        """ Test the storage group inventory is read with one storagegroup -list """
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.setUpPopen('../data/list_sgs.xml')
+
+        inventory = self.vnx.get_storage_group_inventory()
+
+        self.assertEqual(self.mock_popen.call_count, 1)
+        self.assertEqual(len(inventory), 8)
+        self.assertEqual([sg.name for sg in inventory.groups_with_alu("1")],
+                         ["xb1392_stats", "atsg"])
+        sg = inventory.get_by_hba_uid(
+                    "50:01:43:80:18:70:AE:B5:50:01:43:80:18:70:AE:B4")
+        self.assertEqual(sg.name, "xb1392_stats")
+        self.assertEqual(inventory.used_hlus("atsg"), {"0": "1"})
+
+    def test_storage_group_cache(self):
+        """ Test cached storage groups are read once and dropped by a change """
+        print self.shortDescription()
+
+        self.setUpVnx()
+        self.setUpPopen('../data/list_sgs.xml')
+        self.vnx._sg_cache.configure(60)
+
+        sgs = self.vnx.get_storage_groups()
+        sg = self.vnx.get_storage_group("atsg")
+        self.assertTrue(self.vnx.storage_group_exists("eadapar"))
+        self.assertFalse(self.vnx.storage_group_exists("none"))
+        self.assertEqual(self.mock_popen.call_count, 1)
+        self.assertEqual(len(sgs), 8)
+        sg.hlualu_list.pop()
+        self.assertEqual(len(self.vnx.get_storage_group("atsg").hlualu_list),
+                         1)
+
+        self.vnx.add_lun_to_storage_group("atsg", "1", "2")
+        self.vnx.get_storage_groups()
+        # the addhlu and one new storagegroup -list
+        self.assertEqual(self.mock_popen.call_count, 3)
+        stats = self.vnx.cache_stats()['storage_groups']
+        self.assertEqual(stats['invalidations'], 1)
+
 
     """ NEGATIVE CONNECTION TESTS """
     def test_get_storage_groups_wrong_credentials(self):
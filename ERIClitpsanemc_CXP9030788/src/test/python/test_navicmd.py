@@ -0,0 +1,84 @@
+'''
+Tests for the naviseccli command builder
+'''
+import unittest
+from navicmd import NaviCommand, GETLUN_COLUMNS, LUN_LIST_COLUMNS, \
+    LUN_FIELDS, POOL_LUN_FIELDS
+from sanapiexception import SanApiCriticalErrorException
+
+
+class TestNaviCommand(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_build_command(self):
+        ''' test the command line and argument list of a built command '''
+        print self.shortDescription()
+        cmd = NaviCommand("storagegroup", "-addhlu", "-gname")\
+                .quoted("my sg").arg("-hlu", 3, "-alu", "12")
+        self.assertEqual(cmd,
+                'storagegroup -addhlu -gname "my sg" -hlu 3 -alu 12')
+        self.assertEqual(cmd.argv, ('storagegroup', '-addhlu', '-gname',
+                                    'my sg', '-hlu', '3', '-alu', '12'))
+        self.assertTrue("my sg" in cmd)
+
+    def test_commands_are_immutable(self):
+        ''' test builder methods return new commands '''
+        print self.shortDescription()
+        base = NaviCommand("lun", "-list")
+        longer = base.arg("-l", "5")
+        self.assertEqual(base.argv, ('lun', '-list'))
+        self.assertEqual(longer.argv, ('lun', '-list', '-l', '5'))
+
+    def test_quoted_single_quotes(self):
+        ''' test values can be shown in single quotes '''
+        print self.shortDescription()
+        cmd = NaviCommand("storagepool", "-create", "-disks")\
+                .words("0_1_2 0_2_3").arg("-name").quoted("Pool 1", "'")
+        self.assertEqual(cmd,
+                "storagepool -create -disks 0_1_2 0_2_3 -name 'Pool 1'")
+        self.assertEqual(cmd.argv, ('storagepool', '-create', '-disks',
+                                    '0_1_2', '0_2_3', '-name', 'Pool 1'))
+
+    def test_options(self):
+        ''' test free-form options are split like a shell would '''
+        print self.shortDescription()
+        cmd = NaviCommand("unbind", "5").options('-x "a b"').arg("-o")
+        self.assertEqual(cmd, 'unbind 5 -x "a b" -o')
+        self.assertEqual(cmd.argv, ('unbind', '5', '-x', 'a b', '-o'))
+        self.assertTrue(NaviCommand("getlun").options(None) == "getlun")
+        self.assertTrue(NaviCommand("getlun").options("") == "getlun")
+
+    def test_from_string(self):
+        ''' test a command line string is split like a shell would '''
+        print self.shortDescription()
+        cmd = NaviCommand.from_string('snap -list -id "snap 1"')
+        self.assertEqual(cmd.argv, ('snap', '-list', '-id', 'snap 1'))
+        self.assertTrue(NaviCommand.from_string(cmd) is cmd)
+
+
+    def test_columns(self):
+        ''' test a listing is limited to the columns of the fields '''
+        print self.shortDescription()
+        cmd = NaviCommand("getlun", "5").columns(GETLUN_COLUMNS,
+                                                 ('id', 'name', 'uid'))
+        self.assertEqual(cmd, 'getlun 5 -name -uid')
+        self.assertEqual(NaviCommand("getlun").columns(GETLUN_COLUMNS,
+                                                       LUN_FIELDS),
+                         'getlun -name -uid -rg -capacity -type -default')
+        self.assertEqual(NaviCommand("lun", "-list").columns(
+                            LUN_LIST_COLUMNS, POOL_LUN_FIELDS),
+                         'lun -list -poolName -rtype -opDetails -consumedCap')
+        self.assertEqual(NaviCommand("getlun").columns(GETLUN_COLUMNS, None),
+                         'getlun')
+        self.assertRaises(SanApiCriticalErrorException,
+                          NaviCommand("getlun").columns, GETLUN_COLUMNS,
+                          ('consumed',))
+
+
+if __name__ == "__main__":
+    unittest.main()
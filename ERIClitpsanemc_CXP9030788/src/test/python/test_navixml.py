@@ -0,0 +1,80 @@
+'''
+Tests for the naviseccli XML backends
+'''
+import unittest
+import xml.etree.ElementTree as ET
+from navixml import get_xml_backend, set_xml_backend, backend_for, \
+    ElementTreeBackend, LXML_IMPORTED
+from vnxparser import NaviResponse, VnxParser
+from sanapiexception import SanApiCriticalErrorException
+
+
+class TestNaviXml(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = get_xml_backend()
+        self.sgxml = '../data/list_sgs.xml'
+
+    def tearDown(self):
+        set_xml_backend(self.backend.name)
+
+    def _read(self, path):
+        data = open(path)
+        try:
+            return data.read()
+        finally:
+            data.close()
+
+    def test_default_backend(self):
+        ''' test lxml is used when it is installed '''
+        print self.shortDescription()
+        if LXML_IMPORTED:
+            self.assertEqual(get_xml_backend().name, 'lxml')
+        else:
+            self.assertEqual(get_xml_backend().name, 'elementtree')
+
+    def test_unknown_backend(self):
+        ''' test selecting an unknown backend is rejected '''
+        print self.shortDescription()
+        self.assertRaises(SanApiCriticalErrorException, set_xml_backend,
+                          "sax")
+        self.assertEqual(get_xml_backend().name, self.backend.name)
+
+    def test_elementtree_records(self):
+        ''' test the records are found in document order '''
+        print self.shortDescription()
+        backend = set_xml_backend("ElementTree")
+        root = backend.fromstring(self._read(self.sgxml))
+        expected = [elem for elem in root.getiterator()
+                    if elem.tag in ('PARAMVALUE', 'PROPERTY')]
+        self.assertEqual(list(backend.records(root)), expected)
+        self.assertTrue(backend_for(root) is backend)
+
+    def test_sub_tree_keeps_original(self):
+        ''' test a sub tree holds the elements and leaves the tree intact '''
+        print self.shortDescription()
+        backend = ElementTreeBackend()
+        root = backend.fromstring(self._read(self.sgxml))
+        params = root.findall('.//PARAMVALUE')[1:3]
+        sub_tree = backend.sub_tree("sub_root0", params)
+        self.assertEqual(sub_tree.getroot().tag, "sub_root0")
+        self.assertEqual(sub_tree.findall('.//PARAMVALUE'), params)
+        self.assertEqual(len(root.findall('.//PARAMVALUE')[1:3]), 2)
+
+    def test_backends_build_identical_objects(self):
+        ''' test both backends give the same storage groups '''
+        print self.shortDescription()
+        if not LXML_IMPORTED:
+            print "lxml is not installed, skipping"
+            return
+        parser = VnxParser()
+        text = self._read(self.sgxml)
+        lxml_sgs = parser.create_sg_list(
+            NaviResponse(set_xml_backend("lxml").fromstring(text)))
+        et_sgs = parser.create_sg_list(
+            NaviResponse(set_xml_backend("elementtree").fromstring(text)))
+        self.assertEqual(lxml_sgs, et_sgs)
+
+
+if __name__ == "__main__":
+    unittest.main()
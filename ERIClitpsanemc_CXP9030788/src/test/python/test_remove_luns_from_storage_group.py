@@ -4,6 +4,7 @@ Created on 14 Jul 2014
 @author: esteved
 '''
 import unittest
+import shlex
 
 from mock import patch, Mock, MagicMock
 import sys
@@ -169,7 +170,7 @@ class Test(unittest.TestCase):
 
         result = self.vnx.remove_luns_from_storage_group(self.sg.name, hlu)
         self.assertTrue(result)
-        self.mock_popen.assert_called_once_with(expected_cmd, shell=True, stderr=-1, stdout=-1, stdin=-1)
+        self.mock_popen.assert_called_once_with(shlex.split(expected_cmd), stderr=-1, stdout=-1, stdin=-1)
 
 
 
@@ -187,7 +188,7 @@ class Test(unittest.TestCase):
         result = self.vnx.remove_luns_from_storage_group(self.sg.name, hlu)
         self.assertTrue(result)
 
-        self.mock_popen.assert_called_once_with(expected_cmd, shell=True, stderr=-1, stdout=-1, stdin=-1)
+        self.mock_popen.assert_called_once_with(shlex.split(expected_cmd), stderr=-1, stdout=-1, stdin=-1)
 
 
  
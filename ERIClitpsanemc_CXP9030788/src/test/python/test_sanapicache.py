@@ -0,0 +1,95 @@
+'''
+Tests for the array information cache
+'''
+import unittest
+from sanapicache import SanApiCache
+from testfunclib import FakeClock
+
+
+class Loader(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+class TestSanApiCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loader = Loader()
+        self.cache = SanApiCache('luns', 30, clock=self.clock)
+
+    def test_hit_within_ttl(self):
+        ''' test a value is read once and reused within its ttl '''
+        print self.shortDescription()
+        self.assertEqual(self.cache.get(self.loader), 1)
+        self.clock.now += 29
+        self.assertEqual(self.cache.get(self.loader), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['loads']),
+                         (1, 1, 1))
+        self.assertEqual(stats['age'], 29)
+
+    def test_expired_value_is_read_again(self):
+        ''' test a value is read again once its ttl has passed '''
+        print self.shortDescription()
+        self.cache.get(self.loader)
+        self.clock.now += 30
+        self.assertEqual(self.cache.get(self.loader), 2)
+
+    def test_invalidate(self):
+        ''' test an invalidated value is read again '''
+        print self.shortDescription()
+        self.cache.get(self.loader)
+        self.cache.invalidate()
+        self.assertEqual(self.cache.stats()['age'], None)
+        self.assertEqual(self.cache.get(self.loader), 2)
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    def test_refresh(self):
+        ''' test refresh reads the value even if it is still valid '''
+        print self.shortDescription()
+        self.cache.get(self.loader)
+        self.assertEqual(self.cache.refresh(self.loader), 2)
+        self.assertEqual(self.cache.get(self.loader), 2)
+
+    def test_update(self):
+        ''' test a valid cached value is changed in place, keeping its age '''
+        print self.shortDescription()
+        self.cache.update(lambda value: value + 10)
+        self.assertEqual(self.cache.get(self.loader), 1)
+        self.clock.now += 10
+        self.cache.update(lambda value: value + 10)
+        self.assertEqual(self.cache.get(self.loader), 11)
+        self.assertEqual(self.cache.stats()['age'], 10)
+        self.clock.now += 20
+        self.assertEqual(self.cache.get(self.loader), 2)
+
+    def test_disabled(self):
+        ''' test a ttl of 0 reads the value every time '''
+        print self.shortDescription()
+        cache = SanApiCache('luns', 0, clock=self.clock)
+        self.assertFalse(cache.enabled)
+        self.assertEqual(cache.get(self.loader), 1)
+        self.assertEqual(cache.get(self.loader), 2)
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def test_change_during_read_is_not_cached(self):
+        ''' test a value read while the array changed is not kept '''
+        print self.shortDescription()
+        cache = self.cache
+
+        def racing_loader():
+            cache.invalidate()
+            return "stale"
+
+        self.assertEqual(cache.get(racing_loader), "stale")
+        self.assertEqual(cache.get(self.loader), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+'''
+Tests for the bounded command executor
+'''
+import unittest
+import threading
+import time
+from sanapiexecutor import SanApiExecutor, SanApiTaskResult, \
+    get_array_executor
+from sanapiexception import SanApiCriticalErrorException, \
+    SanApiCommandException
+from testfunclib import *
+
+
+class TestSanApiExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def tearDown(self):
+        pass
+
+    def _tracked(self, value, delay=0.05):
+        ''' task that records how many tasks run at the same time '''
+        self.lock.acquire()
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.lock.release()
+        time.sleep(delay)
+        self.lock.acquire()
+        self.running -= 1
+        self.lock.release()
+        return value
+
+    def _fail(self, msg):
+        raise SanApiCommandException(msg, 1)
+
+    def test_results_in_submission_order(self):
+        ''' test results are returned in submission order '''
+        print self.shortDescription()
+        executor = SanApiExecutor(4)
+        delays = [0.08, 0.01, 0.05, 0.0, 0.03]
+        results = executor.run([(self._tracked, (i, d))
+                                for i, d in enumerate(delays)])
+        self.assertEqual([r.get() for r in results], range(len(delays)))
+
+    def test_concurrency_is_bounded(self):
+        ''' test no more than max_workers tasks run at the same time '''
+        print self.shortDescription()
+        executor = SanApiExecutor(3)
+        executor.map(self._tracked, range(10))
+        self.assertTrue(self.peak > 1)
+        self.assertTrue(self.peak <= 3)
+
+    def test_single_worker_runs_inline(self):
+        ''' test a limit of one runs tasks serially in the caller '''
+        print self.shortDescription()
+        executor = SanApiExecutor(1)
+        caller = threading.current_thread()
+        results = executor.map(lambda x: threading.current_thread(),
+                               range(3))
+        self.assertEqual([r.get() for r in results], [caller] * 3)
+
+    def test_exceptions_are_captured(self):
+        ''' test a failing task does not stop the others '''
+        print self.shortDescription()
+        executor = SanApiExecutor(2)
+        results = executor.run([(self._tracked, (1, 0)),
+                                (self._fail, ("boom",)),
+                                (self._tracked, (3, 0))])
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        self.assertTrue(isinstance(results[1].exception,
+                                   SanApiCommandException))
+        self.assertEqual(results[2].get(), 3)
+        myassert_raises_regexp(self, SanApiCommandException, "boom",
+                               results[1].get)
+
+    def test_nested_run_does_not_deadlock(self):
+        ''' test a batch submitted from a worker runs inline '''
+        print self.shortDescription()
+        executor = SanApiExecutor(2)
+
+        def outer(i):
+            inner = executor.map(lambda x: x * 10, [i, i + 1])
+            return [r.get() for r in inner]
+
+        results = executor.map(outer, [1, 2, 3])
+        self.assertEqual([r.get() for r in results],
+                         [[10, 20], [20, 30], [30, 40]])
+
+    def test_task_forms(self):
+        ''' test tasks can be callables or (func, args[, kwargs]) tuples '''
+        print self.shortDescription()
+        executor = SanApiExecutor(2)
+        results = executor.run([lambda: 1,
+                                (lambda x: x, (2,)),
+                                (lambda x, y=0: x + y, (1,), {'y': 2})])
+        self.assertEqual([r.get() for r in results], [1, 2, 3])
+        self.assertEqual(executor.run([]), [])
+
+    def test_scope(self):
+        ''' test every task runs within the given scope '''
+        print self.shortDescription()
+        executor = SanApiExecutor(2)
+        local = threading.local()
+
+        class Scope(object):
+            def __enter__(self):
+                local.value = "in scope"
+
+            def __exit__(self, *exc_info):
+                local.value = None
+
+        results = executor.map(lambda x: getattr(local, 'value', None),
+                               range(3), Scope)
+        self.assertEqual([r.get() for r in results], ["in scope"] * 3)
+        results = executor.run([lambda: getattr(local, 'value', None)],
+                               scope=Scope)
+        self.assertEqual(results[0].get(), "in scope")
+        self.assertEqual(getattr(local, 'value', None), None)
+
+    def test_invalid_max_workers(self):
+        ''' test an invalid worker count is rejected '''
+        print self.shortDescription()
+        self.assertRaises(SanApiCriticalErrorException, SanApiExecutor, 0)
+        self.assertRaises(SanApiCriticalErrorException, SanApiExecutor,
+                          "foo")
+
+    def test_array_executor_is_shared(self):
+        ''' test API objects for the same array share one executor '''
+        print self.shortDescription()
+        exe1 = get_array_executor(("10.0.0.1", "10.0.0.2"), 4)
+        exe2 = get_array_executor(("10.0.0.2", "10.0.0.1"), 4)
+        exe3 = get_array_executor(("10.0.0.3",), 4)
+        self.assertTrue(exe1 is exe2)
+        self.assertFalse(exe1 is exe3)
+        logger = MagicMock(name="logger")
+        exe5 = get_array_executor(("10.0.0.1", "10.0.0.2"), "4 ", logger)
+        self.assertTrue(exe5 is exe1)
+        self.assertFalse(logger.warn.called)
+        self.assertRaises(SanApiCriticalErrorException, get_array_executor,
+                          ("10.0.0.1", "10.0.0.2"), "foo", logger)
+        exe4 = get_array_executor(("10.0.0.1", "10.0.0.2"), 2, logger)
+        self.assertTrue(exe4 is exe1)
+        self.assertEqual(exe4.max_workers, 4)
+        self.assertTrue(logger.warn.called)
+
+    def test_task_result(self):
+        ''' test task result accessors '''
+        print self.shortDescription()
+        result = SanApiTaskResult(value=5)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.value, 5)
+        self.assertEqual(result.exception, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
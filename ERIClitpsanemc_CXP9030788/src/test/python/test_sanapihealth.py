@@ -0,0 +1,104 @@
+'''
+Tests for the SP health registry and circuit breaker
+'''
+import unittest
+from mock import MagicMock
+from sanapihealth import SpHealthRegistry, get_array_health, \
+    reset_sp_health, BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN
+from testfunclib import FakeClock
+
+
+class TestSanApiHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.spa = "10.1.1.1"
+        self.spb = "10.1.1.2"
+        self.clock = FakeClock()
+        self.registry = SpHealthRegistry(failure_threshold=2, reset_time=30,
+                                         alpha=0.5, slow_latency=10,
+                                         clock=self.clock)
+
+    def tearDown(self):
+        reset_sp_health()
+
+    def test_default_order(self):
+        ''' test SPs are tried in configured order when all are healthy '''
+        print self.shortDescription()
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spa, self.spb])
+        self.assertEqual(self.registry.state(self.spa), BREAKER_CLOSED)
+
+    def test_failing_sp_goes_last(self):
+        ''' test an SP with recent failures is tried after a healthy one '''
+        print self.shortDescription()
+        self.registry.record_failure(self.spa)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spb, self.spa])
+        self.registry.record_success(self.spa, 1)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spa, self.spb])
+
+    def test_breaker_opens_and_skips_sp(self):
+        ''' test the breaker opens at the threshold and the SP is skipped '''
+        print self.shortDescription()
+        self.registry.record_failure(self.spa)
+        self.registry.record_failure(self.spa)
+        self.assertEqual(self.registry.state(self.spa), BREAKER_OPEN)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spb])
+
+    def test_half_open_probe(self):
+        ''' test an open breaker goes half-open after the reset time '''
+        print self.shortDescription()
+        self.registry.record_failure(self.spa)
+        self.registry.record_failure(self.spa)
+        self.clock.now += 31
+        self.assertEqual(self.registry.state(self.spa), BREAKER_HALF_OPEN)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spb, self.spa])
+        # a failed probe opens it again straight away
+        self.registry.record_failure(self.spa)
+        self.assertEqual(self.registry.state(self.spa), BREAKER_OPEN)
+        self.clock.now += 31
+        self.registry.record_success(self.spa, 2)
+        self.assertEqual(self.registry.state(self.spa), BREAKER_CLOSED)
+
+    def test_all_open_tries_every_sp(self):
+        ''' test every SP is tried if all breakers are open '''
+        print self.shortDescription()
+        for sp_ip in (self.spa, self.spb):
+            self.registry.record_failure(sp_ip)
+            self.registry.record_failure(sp_ip)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spa, self.spb])
+
+    def test_latency_average(self):
+        ''' test latency is averaged and slow SPs are tried last '''
+        print self.shortDescription()
+        self.registry.record_success(self.spa, 20)
+        self.registry.record_success(self.spa, 10)
+        self.assertEqual(self.registry.get_health(self.spa)['latency'], 15)
+        self.registry.record_success(self.spb, 1)
+        self.assertEqual(self.registry.order([self.spa, self.spb]),
+                         [self.spb, self.spa])
+
+    def test_array_registry_is_shared(self):
+        ''' test API objects for the same array share one registry '''
+        print self.shortDescription()
+        reg1 = get_array_health((self.spa, self.spb))
+        logger = MagicMock(name="logger")
+        reg2 = get_array_health((self.spb, self.spa), "3", 60.0, 0.3, None,
+                                logger)
+        self.assertTrue(reg1 is reg2)
+        self.assertFalse(logger.warn.called)
+        reg3 = get_array_health((self.spb, self.spa), failure_threshold=5,
+                                logger=logger)
+        self.assertTrue(reg1 is reg3)
+        self.assertEqual(reg1.failure_threshold, 3)
+        self.assertTrue(logger.warn.called)
+        reset_sp_health()
+        self.assertFalse(reg1 is get_array_health((self.spa, self.spb)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+'''
+Tests for the indexed LUN inventory
+'''
+import unittest
+from sanapiinfo import LunInfo, StorageGroupInfo, HbaInitiatorInfo, \
+    HluAluPairInfo
+from sanapiinventory import LunInventory, StorageGroupInventory, \
+    HbaPortInventory
+
+
+class TestLunInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.luns = [
+            LunInfo("28", "lun_a", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:11",
+                    "pool1", "1024", "StoragePool", "5", "A"),
+            LunInfo("3", "shared", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:12",
+                    "pool1", "1024", "StoragePool", "5", "B"),
+            LunInfo("30", "shared", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:13",
+                    "13", "1024", "RaidGroup", "5", "A"),
+            LunInfo("31", "lun_d", "60:06:01:60:3F:20:33:00:7E:0C:2E:EA:42:0C:E4:14",
+                    "14", "1024", "RaidGroup", "5", "B"),
+        ]
+        self.inventory = LunInventory(self.luns)
+
+    def test_get_by_id(self):
+        ''' test a LUN is found by id '''
+        print self.shortDescription()
+        self.assertTrue(self.inventory.get_by_id("30") is self.luns[2])
+        self.assertTrue(self.inventory.get_by_id(3) is self.luns[1])
+        self.assertEqual(self.inventory.get_by_id("99"), None)
+        self.assertTrue("28" in self.inventory)
+        self.assertEqual(sorted(self.inventory.ids()),
+                         ["28", "3", "30", "31"])
+
+    def test_find_by_name(self):
+        ''' test LUNs are found by name and container type '''
+        print self.shortDescription()
+        self.assertEqual(self.inventory.find_by_name("shared"),
+                         self.luns[1:3])
+        self.assertEqual(self.inventory.find_by_name("shared", "RaidGroup"),
+                         [self.luns[2]])
+        self.assertEqual(self.inventory.find_by_name("none"), [])
+
+    def test_get_by_uid(self):
+        ''' test a LUN is found by UID ignoring case '''
+        print self.shortDescription()
+        uid = "60:06:01:60:3f:20:33:00:7e:0c:2e:ea:42:0c:e4:14"
+        self.assertTrue(self.inventory.get_by_uid(uid) is self.luns[3])
+        self.assertEqual(self.inventory.get_by_uid(None), None)
+
+    def test_containers_and_owners(self):
+        ''' test LUNs are found by container and owning SP '''
+        print self.shortDescription()
+        self.assertEqual(self.inventory.in_container("RaidGroup"),
+                         self.luns[2:])
+        self.assertEqual(self.inventory.in_container("RaidGroup", "14"),
+                         [self.luns[3]])
+        self.assertEqual(self.inventory.in_container("StoragePool", "pool1"),
+                         self.luns[:2])
+        self.assertEqual(self.inventory.in_container("RaidGroup", "99"), [])
+        self.assertEqual(self.inventory.owned_by("B"),
+                         [self.luns[1], self.luns[3]])
+
+    def test_get_by_ids_keeps_listing_order(self):
+        ''' test LUNs looked up by ids keep the array order '''
+        print self.shortDescription()
+        self.assertEqual(self.inventory.get_by_ids(["31", "99", "28"]),
+                         [self.luns[0], self.luns[3]])
+        self.assertEqual(self.inventory.all(), self.luns)
+        self.assertEqual(len(self.inventory), 4)
+
+
+class TestStorageGroupInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.wwn = "50:01:43:80:12:0A:A7:89:50:01:43:80:12:0A:A7:88"
+        self.sgs = [
+            StorageGroupInfo("sg1", "C4:0C:E5:04:2F:08:E4:11:BC:CB:00:60:16:54:1D:87",
+                             True, [HbaInitiatorInfo(self.wwn, "A", "0")],
+                             [HluAluPairInfo("0", "7"), HluAluPairInfo("1", "42")]),
+            StorageGroupInfo("sg2", "C4:0C:E5:04:2F:08:E4:11:BC:CB:00:60:16:54:1D:88",
+                             True, None, [HluAluPairInfo("3", "42")]),
+            StorageGroupInfo("sg3", "C4:0C:E5:04:2F:08:E4:11:BC:CB:00:60:16:54:1D:89",
+                             True, None, None),
+        ]
+        self.inventory = StorageGroupInventory(self.sgs)
+
+    def test_get_by_name(self):
+        ''' test a storage group is found by name '''
+        print self.shortDescription()
+        self.assertTrue(self.inventory.get_by_name("sg2") is self.sgs[1])
+        self.assertEqual(self.inventory.get_by_name("none"), None)
+        self.assertTrue("sg3" in self.inventory)
+        self.assertEqual(sorted(self.inventory.names()), ["sg1", "sg2", "sg3"])
+        self.assertEqual(self.inventory.all(), self.sgs)
+
+    def test_reverse_indexes(self):
+        ''' test storage groups are found by ALU and HBA UID '''
+        print self.shortDescription()
+        self.assertEqual(self.inventory.groups_with_alu(42), self.sgs[:2])
+        self.assertEqual(self.inventory.groups_with_alu("8"), [])
+        self.assertTrue(self.inventory.get_by_hba_uid(self.wwn)
+                        is self.sgs[0])
+        self.assertEqual(self.inventory.get_by_hba_uid(self.wwn.lower()), None)
+        self.assertEqual(self.inventory.get_by_hba_uid(None), None)
+
+    def test_used_hlus(self):
+        ''' test the HLUs in use are listed per storage group '''
+        print self.shortDescription()
+        self.assertEqual(sorted(self.inventory.used_hlus("sg1").items()),
+                         [("0", "7"), ("1", "42")])
+        self.assertEqual(self.inventory.used_hlus("sg3"), {})
+        self.assertEqual(self.inventory.used_hlus("none"), {})
+
+
+class TestHbaPortInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.wwn1 = "50:01:43:80:12:0A:A7:89:50:01:43:80:12:0A:A7:88"
+        self.wwn2 = "50:01:43:80:12:0B:33:61:50:01:43:80:12:0B:33:60"
+        self.hbas = [
+            HbaInitiatorInfo(self.wwn1, "A", "0", "node1", "10.0.0.1"),
+            HbaInitiatorInfo(self.wwn2, "A", "0", "node2", "10.0.0.2"),
+            HbaInitiatorInfo(self.wwn1, "B", "1", "node1", "10.0.0.1"),
+            HbaInitiatorInfo(self.wwn2, "B", "1"),
+        ]
+        self.ports = HbaPortInventory(self.hbas)
+
+    def test_get_by_uid(self):
+        ''' test the entries of an HBA are found by exact UID '''
+        print self.shortDescription()
+        self.assertEqual(self.ports.get_by_uid(self.wwn1),
+                         [self.hbas[0], self.hbas[2]])
+        self.assertEqual(self.ports.get_by_uid(self.wwn1.lower()), [])
+        self.assertFalse(self.wwn2.lower() in self.ports)
+        self.assertTrue(self.wwn2 in self.ports)
+        self.assertFalse(None in self.ports)
+        self.assertEqual(self.ports.get_by_uid("AA:BB"), [])
+
+    def test_with_entry(self):
+        ''' test a registered path replaces its entry in a copy '''
+        print self.shortDescription()
+        registered = HbaInitiatorInfo(self.wwn2, "B", "1", "node2",
+                                      "10.0.0.2")
+        ports = self.ports.with_entry(registered)
+        self.assertEqual(ports.all(), self.hbas[:3] + [registered])
+        self.assertEqual(ports.find_by_host("node2"),
+                         [self.hbas[1], registered])
+        self.assertEqual(self.ports.all(), self.hbas)
+        added = HbaInitiatorInfo(self.wwn2, "A", "1", "node2", "10.0.0.2")
+        self.assertEqual(self.ports.with_entry(added).all(),
+                         self.hbas + [added])
+
+    def test_find_by_host_and_port(self):
+        ''' test entries are found by server name, IP and SP port '''
+        print self.shortDescription()
+        self.assertEqual(self.ports.find_by_host("node2"), [self.hbas[1]])
+        self.assertEqual(self.ports.find_by_host("10.0.0.1"),
+                         [self.hbas[0], self.hbas[2]])
+        self.assertEqual(self.ports.on_sp_port("B", "1"), self.hbas[2:])
+
+    def test_find(self):
+        ''' test entries matching several filters keep the listing order '''
+        print self.shortDescription()
+        self.assertEqual(self.ports.find(), self.hbas)
+        self.assertEqual(self.ports.find(hba_uid=self.wwn2,
+                                         storage_processor="B"),
+                         [self.hbas[3]])
+        self.assertEqual(self.ports.find(host="node1", sp_port="0"),
+                         [self.hbas[0]])
+        self.assertEqual(self.ports.find(storage_processor="A",
+                                         sp_port="0"), self.hbas[:2])
+        self.assertEqual(self.ports.find(storage_processor="B"),
+                         self.hbas[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+'''
+Tests for the read-after-write modes
+'''
+import unittest
+from mock import MagicMock
+from sanapilazy import LazyResult, validate_read_after_write
+from sanapiexception import SanApiCriticalErrorException, \
+    SanApiEntityNotFoundException
+from vnxcommonapi import VnxCommonApi
+
+
+class TestLazyResult(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = MagicMock(return_value=["lun1", "lun2"])
+        self.result = LazyResult(self.reader, "pool1", size=2)
+
+    def test_read_once_on_first_use(self):
+        ''' test the read is done once, when the result is first used '''
+        print self.shortDescription()
+        self.assertFalse(self.reader.called)
+        self.assertFalse(self.result.loaded)
+        self.assertEqual(len(self.result), 2)
+        self.assertEqual(self.result[0], "lun1")
+        self.assertTrue("lun2" in self.result)
+        self.assertEqual(list(self.result), ["lun1", "lun2"])
+        self.assertTrue(self.result.loaded)
+        self.reader.assert_called_once_with("pool1", size=2)
+
+    def test_attributes_and_equality(self):
+        ''' test attributes and comparisons use the value read '''
+        print self.shortDescription()
+        self.assertEqual(self.result.count("lun1"), 1)
+        self.assertEqual(self.result, ["lun1", "lun2"])
+        self.assertNotEqual(self.result, [])
+        self.assertEqual(self.result, LazyResult(lambda: ["lun1", "lun2"]))
+        self.assertTrue(self.result)
+        self.assertEqual(str(self.result), str(["lun1", "lun2"]))
+
+    def test_read_exception(self):
+        ''' test an exception of the read is raised when first used '''
+        print self.shortDescription()
+        reader = MagicMock(side_effect=SanApiEntityNotFoundException(
+                           "not found", 1))
+        result = LazyResult(reader)
+        self.assertRaises(SanApiEntityNotFoundException, len, result)
+
+
+class TestReadAfterWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.api = VnxCommonApi(MagicMock())
+        self.reader = MagicMock(return_value="sg")
+
+    def test_modes(self):
+        ''' test what a change returns in each mode '''
+        print self.shortDescription()
+        self.assertEqual(self.api._written(self.reader, "sg1"), "sg")
+        self.assertEqual(self.reader.call_count, 1)
+        self.api.set_read_after_write("off")
+        self.assertEqual(self.api._written(self.reader, "sg1"), None)
+        self.api.set_read_after_write("lazy")
+        result = self.api._written(self.reader, "sg1")
+        self.assertTrue(isinstance(result, LazyResult))
+        self.assertEqual(self.reader.call_count, 1)
+        self.assertEqual(result.resolve(), "sg")
+        self.assertEqual(self.reader.call_count, 2)
+
+    def test_invalid_mode(self):
+        ''' test an unknown mode is rejected '''
+        print self.shortDescription()
+        self.assertRaises(SanApiCriticalErrorException,
+                          self.api.set_read_after_write, "sometimes")
+        self.assertRaises(SanApiCriticalErrorException,
+                          validate_read_after_write, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
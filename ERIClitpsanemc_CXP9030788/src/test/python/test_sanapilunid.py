@@ -0,0 +1,166 @@
+'''
+Tests for the LUN ID allocator
+'''
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from mock import MagicMock
+from sanapilunid import LunIdAllocator, RESERVATION_TTL, \
+    get_array_lun_id_allocator, reset_lun_id_allocators
+from sanapiexception import SanApiOperationFailedException
+from testfunclib import FakeClock
+
+
+class TestLunIdAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.allocator = LunIdAllocator(("1.2.3.4", "1.2.3.5"), 10,
+                                        clock=self.clock)
+        self.allocator.load([0, 2, 3, "5"])
+
+    def test_free_ids(self):
+        ''' test the lowest unused LUN IDs are free '''
+        print self.shortDescription()
+        self.assertEqual(self.allocator.free_ids(3), [1, 4, 6])
+        self.assertEqual(self.allocator.free_ids(20), [1, 4, 6, 7, 8, 9])
+
+    def test_free_ids_with_limit(self):
+        ''' test a per call limit leaves the range of the allocator alone '''
+        print self.shortDescription()
+        self.allocator.load([0, 2, 3, 12])
+        self.assertEqual(self.allocator.free_ids(3, 4), [1])
+        self.assertEqual(self.allocator.free_ids(20, 14),
+                         [1, 4, 5, 6, 7, 8, 9, 10, 11, 13])
+        self.assertEqual(self.allocator.high_lun, 10)
+        self.assertEqual(self.allocator.free_ids(20), [1, 4, 5, 6, 7, 8, 9])
+
+    def test_reserved_ids_are_not_handed_out_again(self):
+        ''' test a reserved ID is skipped until released '''
+        print self.shortDescription()
+        self.assertEqual(self.allocator.reserve(), 1)
+        self.assertEqual(self.allocator.reserve(), 4)
+        self.assertEqual(self.allocator.free_ids(2), [6, 7])
+        self.allocator.release(1)
+        self.assertEqual(self.allocator.reserve(), 1)
+
+    def test_mark_used(self):
+        ''' test an ID found in use is not tried again '''
+        print self.shortDescription()
+        self.allocator.mark_used(self.allocator.reserve())
+        self.assertEqual(self.allocator.reserve(), 4)
+        self.allocator.release(4)
+        self.assertEqual(self.allocator.free_ids(1), [4])
+
+    def test_confirmed_ids_survive_older_reads(self):
+        ''' test a created LUN keeps its ID until a later read lists it '''
+        print self.shortDescription()
+        started = self.allocator.now()
+        self.clock.now += 1
+        self.allocator.confirm(self.allocator.reserve())
+        # a read which started before the LUN was created
+        self.allocator.load([0, 2, 3, 5], started)
+        self.assertEqual(self.allocator.free_ids(1), [4])
+        # a read which started after
+        self.clock.now += 1
+        self.allocator.load([0, 2, 3, 5], self.allocator.now())
+        self.assertEqual(self.allocator.free_ids(1), [1])
+
+    def test_reservations_expire(self):
+        ''' test a forgotten reservation expires '''
+        print self.shortDescription()
+        self.allocator.reserve()
+        self.clock.now += RESERVATION_TTL
+        self.allocator.load([0, 2, 3, 5])
+        self.assertEqual(self.allocator.free_ids(1), [1])
+
+    def test_no_free_id(self):
+        ''' test an exception is raised if no ID is free '''
+        print self.shortDescription()
+        self.allocator.load(range(10))
+        self.assertRaises(SanApiOperationFailedException,
+                          self.allocator.reserve)
+
+    def test_randomise_picks_a_low_free_id(self):
+        ''' test a random ID is one of the lowest free IDs '''
+        print self.shortDescription()
+        for _ in range(20):
+            lun_id = self.allocator.reserve(randomise=True)
+            self.assertTrue(lun_id in (1, 4, 6, 7, 8))
+            self.allocator.release(lun_id)
+
+    def test_concurrent_reservations(self):
+        ''' test concurrent creators never get the same ID '''
+        print self.shortDescription()
+        allocator = LunIdAllocator(("1.2.3.4",), 200)
+        reserved = []
+
+        def reserve():
+            for _ in range(10):
+                reserved.append(allocator.reserve())
+
+        threads = [threading.Thread(target=reserve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(reserved), range(80))
+
+
+class TestReservationFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "lunids.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_reservations_are_shared(self):
+        ''' test processes sharing a reservation file skip each others IDs '''
+        print self.shortDescription()
+        first = LunIdAllocator(("1.2.3.4",), 10, self.path)
+        second = LunIdAllocator(("1.2.3.4",), 10, self.path)
+        other_array = LunIdAllocator(("1.2.3.9",), 10, self.path)
+        self.assertEqual(first.reserve(), 0)
+        self.assertEqual(second.reserve(), 1)
+        self.assertEqual(other_array.reserve(), 0)
+        first.release(0)
+        self.assertEqual(second.reserve(), 0)
+
+    def test_unusable_file(self):
+        ''' test an unusable reservation file leaves reservations in
+        process '''
+        print self.shortDescription()
+        logger = MagicMock()
+        allocator = LunIdAllocator(("1.2.3.4",), 10, self.tmpdir, logger)
+        self.assertEqual(allocator.reserve(), 0)
+        self.assertEqual(allocator.reserve(), 1)
+        self.assertTrue(logger.warn.called)
+
+
+class TestAllocatorRegistry(unittest.TestCase):
+
+    def setUp(self):
+        reset_lun_id_allocators()
+
+    def test_shared_per_array(self):
+        ''' test API objects for the same array share the allocator '''
+        print self.shortDescription()
+        allocator = get_array_lun_id_allocator(("1.2.3.4", "1.2.3.5"), 10)
+        logger = MagicMock(name="logger")
+        self.assertTrue(allocator is get_array_lun_id_allocator(
+                        ("1.2.3.5", "1.2.3.4"), "10", None, logger))
+        self.assertFalse(logger.warn.called)
+        self.assertTrue(allocator is get_array_lun_id_allocator(
+                        ("1.2.3.5", "1.2.3.4"), 20, None, logger))
+        self.assertEqual(allocator.high_lun, 10)
+        self.assertTrue(logger.warn.called)
+        self.assertFalse(allocator is get_array_lun_id_allocator(
+                         ("1.2.3.6",), 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
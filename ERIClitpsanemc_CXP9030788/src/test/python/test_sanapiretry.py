@@ -0,0 +1,99 @@
+'''
+Tests for retry policies and deadlines
+'''
+import unittest
+import threading
+from sanapiretry import SanApiDeadline, RetryPolicy, FixedRetryPolicy, \
+    ExponentialBackoffPolicy, DeadlineScope, build_retry_policy
+from sanapiexception import SanApiTimeoutException, \
+    SanApiCriticalErrorException, SanApiConnectionException
+from testfunclib import FakeClock
+
+
+class TestSanApiRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(100.0)
+
+    def tearDown(self):
+        pass
+
+    def test_deadline(self):
+        ''' test deadline remaining time, clamping and expiry '''
+        print self.shortDescription()
+        deadline = SanApiDeadline(10, clock=self.clock)
+        self.assertEqual(deadline.remaining(), 10)
+        self.assertEqual(deadline.clamp(50), 10)
+        self.assertEqual(deadline.clamp(3), 3)
+        deadline.check("op")
+        self.clock.now += 11
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 0)
+        self.assertRaises(SanApiTimeoutException, deadline.check, "op")
+        self.assertTrue(issubclass(SanApiTimeoutException,
+                                   SanApiConnectionException))
+
+    def test_deadline_earliest(self):
+        ''' test the earlier of two deadlines is chosen '''
+        print self.shortDescription()
+        short = SanApiDeadline(5, clock=self.clock)
+        long = SanApiDeadline(50, clock=self.clock)
+        self.assertTrue(short.earliest(long) is short)
+        self.assertTrue(long.earliest(short) is short)
+        self.assertTrue(long.earliest(None) is long)
+
+    def test_fixed_policy(self):
+        ''' test fixed policy waits the same time and retries code 255 '''
+        print self.shortDescription()
+        policy = FixedRetryPolicy(3, 2)
+        self.assertEqual([policy.delay(i) for i in range(3)], [2, 2, 2])
+        self.assertTrue(policy.should_retry(255))
+        self.assertFalse(policy.should_retry(1))
+        self.assertEqual(RetryPolicy(3).delay(1), 0)
+
+    def test_exponential_policy(self):
+        ''' test exponential backoff doubles up to the cap '''
+        print self.shortDescription()
+        policy = ExponentialBackoffPolicy(6, 1, 5, jitter=False)
+        self.assertEqual([policy.delay(i) for i in range(5)],
+                         [1, 2, 4, 5, 5])
+        jittered = ExponentialBackoffPolicy(6, 1, 5,
+                                            rand=lambda low, high: high / 2)
+        self.assertEqual(jittered.delay(2), 2)
+        for i in range(20):
+            self.assertTrue(0 <= ExponentialBackoffPolicy(6, 1, 5).delay(3)
+                            <= 5)
+
+    def test_build_retry_policy(self):
+        ''' test policies are built by name '''
+        print self.shortDescription()
+        self.assertTrue(isinstance(build_retry_policy("fixed", 3, 2),
+                                   FixedRetryPolicy))
+        policy = build_retry_policy(" Exponential", 3, 2)
+        self.assertTrue(isinstance(policy, ExponentialBackoffPolicy))
+        self.assertEqual(policy.cap, 8)
+        self.assertEqual(build_retry_policy("exponential", 3, 2, 30).cap, 30)
+        self.assertRaises(SanApiCriticalErrorException, build_retry_policy,
+                          "foo", 3, 2)
+
+    def test_deadline_scope(self):
+        ''' test nested deadlines never extend the outer one '''
+        print self.shortDescription()
+        scope = DeadlineScope()
+        self.assertEqual(scope.current(), None)
+        outer = scope.push(SanApiDeadline(10, clock=self.clock))
+        inner = scope.push(SanApiDeadline(100, clock=self.clock))
+        self.assertTrue(inner is outer)
+        scope.pop()
+        self.assertTrue(scope.current() is outer)
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(scope.current()))
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [None])
+        scope.pop()
+        self.assertEqual(scope.current(), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Tests for teardown_hosts on the VNX
+'''
+import logging
+import unittest
+from mock import MagicMock
+from vnxcommonapi import VnxCommonApi
+from sanapiinfo import HbaInitiatorInfo, StorageGroupInfo
+from sanapiexception import SanApiCriticalErrorException, \
+    SanApiOperationFailedException
+
+
+class TestTeardownHosts(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("sanapitest")
+        self.logger.setLevel(logging.WARN)
+        self.vnx = VnxCommonApi(self.logger)
+        self.vnx._accept_and_store_cert = MagicMock(
+            name="_accept_and_store_cert")
+        self.vnx.initialise(("1.2.3.4", "1.2.3.5"), "admin", "shroot12",
+                            "global", vcheck=False)
+        self.wwn1 = "50:01:43:80:12:0A:A7:89:50:01:43:80:12:0A:A7:88"
+        self.wwn2 = "50:01:43:80:12:0B:33:61:50:01:43:80:12:0B:33:60"
+        self.gone_wwn = "50:01:43:80:12:0C:00:01:50:01:43:80:12:0C:00:00"
+        self.vnx._read_storage_groups = MagicMock(return_value=[
+            StorageGroupInfo("sg1",
+                "C4:0C:E5:04:2F:08:E4:11:BC:CB:00:60:16:54:1D:87", True,
+                [HbaInitiatorInfo(self.wwn1, "A", "0"),
+                 HbaInitiatorInfo(self.wwn1, "B", "1")], None),
+            StorageGroupInfo("sg2",
+                "C4:0C:E5:04:2F:08:E4:11:BC:CB:00:60:16:54:1D:88", True,
+                [HbaInitiatorInfo(self.wwn2, "A", "0")], None),
+        ])
+        self.vnx._read_hba_port_list = MagicMock(return_value=[
+            HbaInitiatorInfo(self.wwn1, "A", "0", "node1", "10.0.0.1"),
+            HbaInitiatorInfo(self.wwn1, "B", "1", "node1", "10.0.0.1"),
+            HbaInitiatorInfo(self.wwn2, "A", "0", "node2", "10.0.0.2"),
+        ])
+        self.vnx._disconnect_host = MagicMock(return_value=True)
+        self.vnx._remove_hba = MagicMock(return_value=True)
+        self.vnx._destroy_storage_group = MagicMock(return_value=True)
+
+    def test_teardown_hosts(self):
+        ''' test hosts are disconnected, HBAs deregistered and storage
+        groups deleted, skipping those already gone '''
+        print self.shortDescription()
+        result = self.vnx.teardown_hosts(["sg1", "sg2", "gone_sg"],
+                                         [self.wwn1, self.wwn2,
+                                          self.gone_wwn])
+        self.assertEqual(sorted(result['storage_groups'].items()),
+                         [("gone_sg", "not found"), ("sg1", "removed"),
+                          ("sg2", "removed")])
+        self.assertEqual(sorted(result['hbas'].items()),
+                         [(self.wwn1, "removed"), (self.wwn2, "removed"),
+                          (self.gone_wwn, "not found")])
+        self.assertEqual(self.vnx._read_storage_groups.call_count, 1)
+        self.assertEqual(self.vnx._read_hba_port_list.call_count, 1)
+        self.assertEqual(sorted([c[0] for c in
+                                self.vnx._disconnect_host.call_args_list]),
+                         [("sg1", "node1"), ("sg2", "node2")])
+        self.assertEqual(self.vnx._remove_hba.call_count, 2)
+        self.assertEqual(sorted([c[0][0] for c in
+                        self.vnx._destroy_storage_group.call_args_list]),
+                         ["sg1", "sg2"])
+
+    def test_teardown_hosts_failures(self):
+        ''' test a failed removal is reported without stopping the rest,
+        and a storage group is kept if its host was not disconnected '''
+        print self.shortDescription()
+
+        def disconnect(sg_name, host):
+            if sg_name == "sg1":
+                raise SanApiOperationFailedException("disconnect failed", 1)
+            return True
+
+        def deregister(wwn):
+            if wwn == self.wwn2:
+                raise SanApiOperationFailedException("removeHBA failed", 1)
+            return True
+
+        self.vnx._disconnect_host.side_effect = disconnect
+        self.vnx._remove_hba.side_effect = deregister
+        result = self.vnx.teardown_hosts(["sg1", "sg2"],
+                                         [self.wwn1, self.wwn2])
+        self.assertEqual(sorted(result['storage_groups'].items()),
+                         [("sg1", "failed"), ("sg2", "removed")])
+        self.assertEqual(sorted(result['hbas'].items()),
+                         [(self.wwn1, "removed"), (self.wwn2, "failed")])
+        self.vnx._destroy_storage_group.assert_called_once_with("sg2")
+
+    def test_teardown_hosts_with_caches(self):
+        ''' test the cached inventories are read once up front and dropped
+        once after the removals '''
+        print self.shortDescription()
+        self.vnx._sg_cache.configure(60)
+        self.vnx._hba_port_cache.configure(60)
+        del self.vnx._remove_hba
+        del self.vnx._destroy_storage_group
+        del self.vnx._disconnect_host
+        self.vnx._navisec = MagicMock(name="_navisec")
+        result = self.vnx.teardown_hosts(["sg1", "sg2"],
+                                         [self.wwn1, self.wwn2])
+        self.assertEqual(sorted(result['hbas'].values()),
+                         ["removed", "removed"])
+        self.assertEqual(self.vnx._navisec.call_count, 6)
+        self.assertEqual(self.vnx._read_hba_port_list.call_count, 1)
+        self.assertEqual(self.vnx._read_storage_groups.call_count, 1)
+        self.vnx.get_hba_port_info()
+        self.vnx.get_storage_groups()
+        self.assertEqual(self.vnx._read_hba_port_list.call_count, 2)
+        self.assertEqual(self.vnx._read_storage_groups.call_count, 2)
+
+    def test_teardown_hosts_invalid(self):
+        ''' test invalid or missing targets are rejected before any read '''
+        print self.shortDescription()
+        self.assertRaises(SanApiCriticalErrorException,
+                          self.vnx.teardown_hosts)
+        self.assertRaises(SanApiCriticalErrorException,
+                          self.vnx.teardown_hosts, [""])
+        self.assertRaises(SanApiCriticalErrorException,
+                          self.vnx.teardown_hosts, ["sg1"], ["notawwn"])
+        self.assertFalse(self.vnx._read_storage_groups.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from mock import MagicMock
 from sanapiinfo import StorageGroupInfo, HbaInitiatorInfo
 from sanapilib import STORAGE_PROCESSOR_A, STORAGE_PROCESSOR_B
 from unitytest import TestUnity
@@ -722,6 +723,28 @@ class TestUnityInitiator(TestUnity):
         self.assertRaises(SanApiEntityNotFoundException, self.unityapi.deregister_hba_uid,
                           wwn='FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F')
 
+    def test_create_hosts_initiators(self):
+        """Register the HBAs of several hosts and read the hosts back once
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        self.unityapi._UnityApi__connect_hbas_to_host = MagicMock(name='connect_hbas_to_host')
+        inventory = MagicMock(name='inventory')
+        inventory.get_by_name.side_effect = lambda sg_name: sg_name
+        self.unityapi.get_storage_group_inventory = MagicMock(return_value=inventory)
+
+        sgs = self.unityapi.create_hosts_initiators([
+            {'sg_name': 'test1_sg', 'wwn': 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F'},
+            {'sg_name': 'test1_sg', 'wwn': 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:10',
+             'host_name': 'node1', 'host_ip': '1.2.3.4'}])
+
+        self.assertEqual(self.unityapi._UnityApi__connect_hbas_to_host.call_count, 2)
+        self.unityapi._UnityApi__connect_hbas_to_host.assert_any_call(
+            'test1_sg', 'node1', 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:10', '3', '4', '1')
+        self.assertEqual(self.unityapi.get_storage_group_inventory.call_count, 1)
+        self.assertEqual(sgs.keys(), ['test1_sg'])
+
 
 if __name__ == "__main__":
     unittest.main()
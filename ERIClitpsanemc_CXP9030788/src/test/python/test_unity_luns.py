@@ -4,7 +4,8 @@ import unittest
 from sanapiinfo import LunInfo
 import sanapilib
 from sanapiexception import SanApiOperationFailedException, \
-                     SanApiEntityNotFoundException, SanApiCriticalErrorException
+                     SanApiEntityNotFoundException, SanApiCriticalErrorException, \
+                     SanApiPartialFailureException
 
 from unitytest import TestUnity
 
@@ -551,6 +552,206 @@ class TestUnityLuns(TestUnity):
         self.assertEqual(test_lun.name, "test_lun", "Unexpected value for lun name")
         self.assertEqual(test_lun.container, "test_pool", "Unexpected value for lun pool")
 
+    def test_create_luns(self):
+        ''' create_luns looks up each pool once and reads the LUNs back in one request '''
+        print self.shortDescription()
+
+        self.setUpUnity()
+
+        self.addRequest(
+            'GET',
+            '/api/instances/pool/name:test_pool?fields=id',
+            None,
+            200,
+            {
+                'content': {
+                    'id': 'pool_1'
+                }
+            }
+        )
+
+        for index, sp in ((1, 0), (2, 1)):
+            self.addRequest(
+                'POST',
+                '/api/types/storageResource/action/createLun',
+                {
+                    'lunParameters': {
+                        'isDataReductionEnabled': True,
+                        'isThinEnabled': True,
+                        'pool': {
+                            'id': 'pool_1'
+                        },
+                        'size': 1048576,
+                        'defaultNode': sp
+                    },
+                    'name': 'test_lun%s' % index,
+                },
+                200,
+                {
+                    'content': {
+                        'storageResource': {
+                            'id': 'sv_%s' % index
+                        }
+                    }
+                }
+            )
+
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?filter=id IN ( "sv_1","sv_2" )&fields=id,name,wwn,sizeTotal,currentNode,pool,hostAccess',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'sv_2',
+                            'currentNode': 1,
+                            'name': 'test_lun2',
+                            'sizeTotal': 1048576,
+                            'wwn': '00:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:02',
+                            'pool': {
+                                'id': 'pool_1'
+                            }
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'sv_1',
+                            'currentNode': 0,
+                            'name': 'test_lun1',
+                            'sizeTotal': 1048576,
+                            'wwn': '00:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:01',
+                            'pool': {
+                                'id': 'pool_1'
+                            }
+                        }
+                    }
+                ]
+            }
+        )
+
+        luns = self.unityapi.create_luns([
+            {'lun_name': 'test_lun1', 'size': 1,
+             'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'},
+            {'lun_name': 'test_lun2', 'size': 1,
+             'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool',
+             'storage_processor': 'b'}])
+
+        self.assertEqual([lun.name for lun in luns], ['test_lun1', 'test_lun2'])
+        self.assertEqual(luns[1].container, 'test_pool')
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+
+    def test_create_luns_failure(self):
+        ''' create_luns creates the other LUNs and raises the failure with the LUNs created '''
+        print self.shortDescription()
+
+        self.setUpUnity()
+
+        self.addRequest('GET', '/api/instances/pool/name:test_pool?fields=id', None, 200,
+                        {'content': {'id': 'pool_1'}})
+        for index, status in ((1, 409), (2, 200)):
+            self.addRequest(
+                'POST',
+                '/api/types/storageResource/action/createLun',
+                {
+                    'lunParameters': {
+                        'isDataReductionEnabled': True,
+                        'isThinEnabled': True,
+                        'pool': {'id': 'pool_1'},
+                        'size': 1048576,
+                        'defaultNode': 0
+                    },
+                    'name': 'test_lun%s' % index,
+                },
+                status,
+                {'content': {'storageResource': {'id': 'sv_%s' % index}}}
+            )
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?filter=id IN ( "sv_2" )&fields=id,name,wwn,sizeTotal,currentNode,pool,hostAccess',
+            None,
+            200,
+            {'entries': [{'content': {'id': 'sv_2', 'currentNode': 0, 'name': 'test_lun2', 'sizeTotal': 1048576,
+                                      'wwn': '00:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:02',
+                                      'pool': {'id': 'pool_1'}}}]}
+        )
+
+        try:
+            self.unityapi.create_luns([
+                {'lun_name': 'test_lun1', 'size': 1,
+                 'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'},
+                {'lun_name': 'test_lun2', 'size': 1,
+                 'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'}])
+        except SanApiPartialFailureException, exce:
+            self.assertEqual([lun.name for lun in exce.succeeded], ['test_lun2'])
+            self.assertEqual(exce.failed.keys(), ['test_lun1'])
+        else:
+            self.fail("SanApiPartialFailureException not raised")
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+        self.assertEqual(self.unityapi.create_luns([]), [])
+
+    def test_create_luns_read_back_failure(self):
+        ''' create_luns raises a partial failure holding the LUNs found if a created LUN is not read back '''
+        print self.shortDescription()
+
+        self.setUpUnity()
+
+        self.addRequest('GET', '/api/instances/pool/name:test_pool?fields=id', None, 200,
+                        {'content': {'id': 'pool_1'}})
+        for index in (1, 2):
+            self.addRequest(
+                'POST',
+                '/api/types/storageResource/action/createLun',
+                {
+                    'lunParameters': {
+                        'isDataReductionEnabled': True,
+                        'isThinEnabled': True,
+                        'pool': {'id': 'pool_1'},
+                        'size': 1048576,
+                        'defaultNode': 0
+                    },
+                    'name': 'test_lun%s' % index,
+                },
+                200,
+                {'content': {'storageResource': {'id': 'sv_%s' % index}}}
+            )
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?filter=id IN ( "sv_1","sv_2" )&fields=id,name,wwn,sizeTotal,currentNode,pool,hostAccess',
+            None,
+            200,
+            {'entries': [{'content': {'id': 'sv_2', 'currentNode': 0, 'name': 'test_lun2', 'sizeTotal': 1048576,
+                                      'wwn': '00:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:02',
+                                      'pool': {'id': 'pool_1'}}}]}
+        )
+
+        try:
+            self.unityapi.create_luns([
+                {'lun_name': 'test_lun1', 'size': 1,
+                 'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'},
+                {'lun_name': 'test_lun2', 'size': 1,
+                 'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'}])
+        except SanApiPartialFailureException, exce:
+            self.assertEqual([lun.name for lun in exce.succeeded], ['test_lun2'])
+            self.assertEqual(exce.failed.keys(), ['test_lun1'])
+            self.assertTrue(isinstance(exce.failed['test_lun1'], SanApiEntityNotFoundException))
+        else:
+            self.fail("SanApiPartialFailureException not raised")
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+
+    def test_create_luns_invalid_container_type(self):
+        ''' create_luns creates nothing if any spec is for a RAID Group '''
+        print self.shortDescription()
+        self.setUpUnity()
+
+        self.assertRaises(SanApiOperationFailedException, self.unityapi.create_luns,
+                          [{'lun_name': 'test_lun1', 'size': '1',
+                            'container_type': sanapilib.CONTAINER_STORAGE_POOL, 'container': 'test_pool'},
+                           {'lun_name': 'test_lun2', 'size': '1',
+                            'container_type': sanapilib.CONTAINER_RAID_GROUP, 'container': 'test1_rg',
+                            'raid_type': '5'}])
+
     def test_create_lun_invalid_container_type(self):
         ''' create_lun specifying RAID Group container  '''
         print self.shortDescription()
@@ -620,6 +821,39 @@ class TestUnityLuns(TestUnity):
 
         self.unityapi.delete_lun("test_lun")
 
+    def test_delete_luns(self):
+        ''' delete_luns finds the LUNs in one listing and reports each outcome '''
+        print self.shortDescription()
+
+        self.setUpUnity()
+
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?fields=id,name',
+            None,
+            200,
+            {
+                'entries': [
+                    {'content': {'id': 'sv_1', 'name': 'test_lun1'}},
+                    {'content': {'id': 'sv_2', 'name': 'test_lun2'}}
+                ]
+            }
+        )
+        self.addRequest(
+            'DELETE',
+            '/api/instances/storageResource/sv_1',
+            None,
+            204,
+            None
+        )
+
+        outcomes = self.unityapi.delete_luns(["test_lun1", "test_lun3"], ["1", "5"])
+        self.assertEqual(sorted(outcomes.items()), sorted({"test_lun1": sanapilib.LUN_DELETED,
+                                    "1": sanapilib.LUN_DELETED,
+                                    "test_lun3": sanapilib.LUN_NOT_FOUND,
+                                    "5": sanapilib.LUN_NOT_FOUND}.items()))
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+
     def test_delete_lun_by_id(self):
         print self.shortDescription()
 
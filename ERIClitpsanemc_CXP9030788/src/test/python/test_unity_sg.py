@@ -1,4 +1,5 @@
 import unittest
+from mock import MagicMock
 from sanapiinfo import StorageGroupInfo, HluAluPairInfo, HbaInitiatorInfo
 from sanapiexception import SanApiEntityNotFoundException, SanApiCriticalErrorException, SanApiOperationFailedException
 from sanapilib import STORAGE_PROCESSOR_A, STORAGE_PROCESSOR_B
@@ -237,7 +238,7 @@ class TestUnitySG(TestUnity):
 
         self.addRequest(
             'GET',
-            '/api/types/hostInitiator/instances?filter=id IN ( "HostInitiator_1","HostInitiator_2" )&fields=id,initiatorId,paths,isIgnored',
+            '/api/types/hostInitiator/instances?fields=id,initiatorId,paths,isIgnored',
             None,
             200,
             {
@@ -278,7 +279,7 @@ class TestUnitySG(TestUnity):
 
         self.addRequest(
             'GET',
-            '/api/types/hostInitiatorPath/instances?filter=id IN ( "HostInitiator_1_00:00:00:01_0","HostInitiator_1_00:00:00:02_0","HostInitiator_2_00:00:00:01_0","HostInitiator_2_00:00:00:02_0" )&fields=id,fcPort',
+            '/api/types/hostInitiatorPath/instances?fields=id,fcPort',
             None,
             200,
             {
@@ -321,7 +322,7 @@ class TestUnitySG(TestUnity):
 
         self.addRequest(
             'GET',
-            '/api/types/hostLUN/instances?filter=id IN ( "Host_1_sv_1_prod" )&fields=id,lun,hlu,type,host',
+            '/api/types/hostLUN/instances?fields=id,lun,hlu,type,host',
             None,
             200,
             {
@@ -363,6 +364,147 @@ class TestUnitySG(TestUnity):
                 test_hbasp = test_sg.hbasp_list[index]
                 self.assertEqual(expected_hbasp, test_hbasp, "Unexpected value hbasp %s, expected %s actutal %s" % (index, expected_hbasp, test_hbasp))
 
+    def test_get_storage_groups_many_hosts(self):
+        """Get the StorageGroupInfo for many hosts with one request per object type
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        self.addRequest(
+            'GET',
+            '/api/types/host/instances?fields=id,name,fcHostInitiators,hostLUNs',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'Host_1',
+                            'name': 'test1_sg',
+                            'fcHostInitiators': [{'id': 'HostInitiator_1'}],
+                            'hostLUNs': [{'id': 'Host_1_sv_1_prod'}]
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_2',
+                            'name': 'test2_sg',
+                            'fcHostInitiators': [{'id': 'HostInitiator_2'}],
+                            'hostLUNs': [{'id': 'Host_2_sv_1_prod'}, {'id': 'Host_2_sv_2_prod'}]
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_3',
+                            'name': 'test3_sg'
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostInitiator/instances?fields=id,initiatorId,paths,isIgnored',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'HostInitiator_1',
+                            'initiatorId': 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F',
+                            'isIgnored': False,
+                            'paths': [{'id': 'HostInitiator_1_00:00:00:01_0'}]
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'HostInitiator_2',
+                            'initiatorId': 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:10',
+                            'isIgnored': True,
+                            'paths': [{'id': 'HostInitiator_2_00:00:00:01_0'}]
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostInitiatorPath/instances?fields=id,fcPort',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'HostInitiator_1_00:00:00:01_0',
+                            'fcPort': {'id': 'spa_iom_0_fc0'}
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'HostInitiator_2_00:00:00:01_0',
+                            'fcPort': {'id': 'spb_fc4'}
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostLUN/instances?fields=id,lun,hlu,type,host',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_1_prod',
+                            'type': 1,
+                            'hlu': 0,
+                            'host': {'id': 'Host_1'},
+                            'lun': {'id': 'sv_1'}
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_2_sv_1_prod',
+                            'type': 1,
+                            'hlu': 1,
+                            'host': {'id': 'Host_2'},
+                            'lun': {'id': 'sv_1'}
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_2_sv_2_prod',
+                            'type': 1,
+                            'hlu': 0,
+                            'host': {'id': 'Host_2'},
+                            'lun': {'id': 'sv_2'}
+                        }
+                    }
+                ]
+            }
+        )
+
+        test_sg_list = self.unityapi.get_storage_groups()
+        self.assertEqual(len(TestUnity.requests_expected), 0, "Unexpected number of requests")
+        self.assertEqual([sg.name for sg in test_sg_list], ['test1_sg', 'test2_sg', 'test3_sg'])
+
+        self.assertEqual(test_sg_list[0].hlualu_list, [HluAluPairInfo('0', '1')])
+        self.assertEqual(test_sg_list[0].hbasp_list,
+                         [HbaInitiatorInfo("FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F", STORAGE_PROCESSOR_A, 0)])
+        self.assertEqual(test_sg_list[1].hlualu_list, [HluAluPairInfo('0', '2'), HluAluPairInfo('1', '1')])
+        self.assertEqual(test_sg_list[1].hbasp_list,
+                         [HbaInitiatorInfo("FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:10", STORAGE_PROCESSOR_B, 4,
+                                           isignored=True)])
+        self.assertEqual(test_sg_list[2].hlualu_list, None)
+        self.assertEqual(test_sg_list[2].hbasp_list, None)
+
     def test_create_storage_group(self):
         """Create a host with a name matching the storage group name
         """
@@ -607,6 +749,293 @@ class TestUnitySG(TestUnity):
         self.assertIsInstance(test_sg, StorageGroupInfo)
         self.assertEqual(test_sg.hlualu_list, [HluAluPairInfo('0', '1')], "Unexpected value in hlualu_list")
 
+    def test_add_luns_to_storage_group(self):
+        """Add two LUNs to a storage group reading the LUNs and setting the HLUs once
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        self.addRequest(
+            'GET',
+            '/api/instances/host/name:test1_sg?fields=id',
+            None,
+            200,
+            {
+                'content': {
+                    'id': 'Host_1'
+                }
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?filter=id IN ( "sv_1","sv_2" )&fields=id,name,wwn,sizeTotal,currentNode,pool,hostAccess',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'sv_1',
+                            'hostAccess': [
+                                {
+                                    'accessMask': 1,
+                                    'host': {
+                                        'id': 'Host_2'
+                                    }
+                                }
+                            ]
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'sv_2'
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.addRequest(
+            'POST',
+            '/api/instances/storageResource/sv_1/action/modifyLun',
+            {
+                'lunParameters': {
+                    'hostAccess': [
+                        {
+                            'host': {
+                                'id': 'Host_2'
+                            },
+                            'accessMask': 1
+                        },
+                        {
+                            'host': {
+                                'id': 'Host_1'
+                            },
+                            'accessMask': 1
+                        }
+                    ]
+                }
+            },
+            204,
+            None
+        )
+
+        self.addRequest(
+            'POST',
+            '/api/instances/storageResource/sv_2/action/modifyLun',
+            {
+                'lunParameters': {
+                    'hostAccess': [
+                        {
+                            'host': {
+                                'id': 'Host_1'
+                            },
+                            'accessMask': 1
+                        }
+                    ]
+                }
+            },
+            204,
+            None
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostLUN/instances?filter=host.id eq "Host_1" and lun.id IN ( "sv_1","sv_2" )&fields=id,lun,hlu,type,host',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_2_prod',
+                            'lun': {
+                                'id': 'sv_2'
+                            }
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_1_prod',
+                            'lun': {
+                                'id': 'sv_1'
+                            }
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.addRequest(
+            'POST',
+            '/api/instances/host/Host_1/action/modifyHostLUNs',
+            {
+                'hostLunModifyList': [
+                    {
+                        'hlu': '0',
+                        'hostLUN': {
+                            'id': 'Host_1_sv_1_prod'
+                        }
+                    },
+                    {
+                        'hlu': '1',
+                        'hostLUN': {
+                            'id': 'Host_1_sv_2_prod'
+                        }
+                    }
+                ]
+            },
+            204,
+            None
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/instances/host/Host_1?fields=id,name,fcHostInitiators,hostLUNs',
+            None,
+            200,
+            {
+                'content': {
+                    'id': 'Host_1',
+                    'name': 'test1_sg',
+                    'hostLUNs': [
+                        {
+                            'id': 'Host_1_sv_1_prod'
+                        },
+                        {
+                            'id': 'Host_1_sv_2_prod'
+                        }
+                    ]
+                }
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostLUN/instances?filter=id IN ( "Host_1_sv_1_prod","Host_1_sv_2_prod" )&fields=id,lun,hlu,type,host',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_1_prod',
+                            'hlu': 0,
+                            'lun': {
+                                'id': 'sv_1'
+                            }
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_2_prod',
+                            'hlu': 1,
+                            'lun': {
+                                'id': 'sv_2'
+                            }
+                        }
+                    }
+                ]
+            }
+        )
+
+        test_sg = self.unityapi.add_luns_to_storage_group('test1_sg', [("0", "1"), ("1", "2")])
+
+        self.assertIsInstance(test_sg, StorageGroupInfo)
+        self.assertEqual(test_sg.hlualu_list, [HluAluPairInfo('0', '1'), HluAluPairInfo('1', '2')],
+                         "Unexpected value in hlualu_list")
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+
+    def test_add_luns_to_storage_group_missing_host_lun(self):
+        """add_luns_to_storage_group raises not found and sets no HLU if a LUN has no hostLUN
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        self.addRequest(
+            'GET',
+            '/api/instances/host/name:test1_sg?fields=id',
+            None,
+            200,
+            {
+                'content': {
+                    'id': 'Host_1'
+                }
+            }
+        )
+
+        self.addRequest(
+            'GET',
+            '/api/types/lun/instances?filter=id IN ( "sv_1","sv_2" )&fields=id,name,wwn,sizeTotal,currentNode,pool,hostAccess',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'sv_1'
+                        }
+                    },
+                    {
+                        'content': {
+                            'id': 'sv_2'
+                        }
+                    }
+                ]
+            }
+        )
+
+        for unity_lun_id in ('sv_1', 'sv_2'):
+            self.addRequest(
+                'POST',
+                '/api/instances/storageResource/%s/action/modifyLun' % unity_lun_id,
+                {
+                    'lunParameters': {
+                        'hostAccess': [
+                            {
+                                'host': {
+                                    'id': 'Host_1'
+                                },
+                                'accessMask': 1
+                            }
+                        ]
+                    }
+                },
+                204,
+                None
+            )
+
+        self.addRequest(
+            'GET',
+            '/api/types/hostLUN/instances?filter=host.id eq "Host_1" and lun.id IN ( "sv_1","sv_2" )&fields=id,lun,hlu,type,host',
+            None,
+            200,
+            {
+                'entries': [
+                    {
+                        'content': {
+                            'id': 'Host_1_sv_1_prod',
+                            'lun': {
+                                'id': 'sv_1'
+                            }
+                        }
+                    }
+                ]
+            }
+        )
+
+        self.assertRaises(SanApiEntityNotFoundException, self.unityapi.add_luns_to_storage_group,
+                          'test1_sg', [("0", "1"), ("1", "2")])
+        self.assertEqual(len(TestUnity.requests_expected), 0)
+
+    def test_add_luns_to_storage_group_invalid_alu(self):
+        """ add_luns_to_storage_group with an invalid alu sends no request"""
+        print self.shortDescription()
+        self.setUpUnity()
+        self.assertRaises(SanApiCriticalErrorException, self.unityapi.add_luns_to_storage_group,
+                          'test1_sg', [("0", "1"), ("1", "x")])
+
     def test_add_lun_to_storage_group_invalid_sg(self):
         """ add_lun_to_storage_group_with invalid sg name"""
         print self.shortDescription()
@@ -1185,6 +1614,74 @@ class TestUnitySG(TestUnity):
             }
         )
 
+    def test_get_storage_group_inventory(self):
+        """Get the storage group inventory built from one host listing
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        sg = StorageGroupInfo('test1_sg', '12:34:56:78:90:12:34:56:78:90:12:34:56:78:90:12',
+                              False, None, [HluAluPairInfo('0', '1')])
+        self.unityapi.get_storage_groups = MagicMock(return_value=[sg])
+
+        inventory = self.unityapi.get_storage_group_inventory()
+        self.assertEqual(self.unityapi.get_storage_groups.call_count, 1)
+        self.assertTrue(inventory.get_by_name('test1_sg') is sg)
+        self.assertEqual(inventory.groups_with_alu('1'), [sg])
+
+
+    def test_teardown_hosts(self):
+        """Tear down hosts reading the hosts and initiators once, skipping those already gone
+        """
+        print self.shortDescription()
+        self.setUpUnity()
+
+        wwn = 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F'
+        gone_wwn = 'FF:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:00'
+        self.addRequest(
+            'GET',
+            '/api/types/host/instances?fields=id,name,fcHostInitiators,hostLUNs',
+            None,
+            200,
+            {
+                'entries': [
+                    {'content': {'id': 'Host_1', 'name': 'test1_sg', 'fcHostInitiators': [], 'hostLUNs': []}},
+                    {'content': {'id': 'Host_2', 'name': 'test2_sg', 'fcHostInitiators': []}}
+                ]
+            }
+        )
+        self.addRequest(
+            'GET',
+            '/api/types/hostInitiator/instances?fields=id,initiatorId',
+            None,
+            200,
+            {
+                'entries': [
+                    {'content': {'id': 'HostInitiator_1', 'initiatorId': wwn}}
+                ]
+            }
+        )
+        self.addRequest('DELETE', '/api/instances/hostInitiator/HostInitiator_1', None, 204, None)
+        self.addRequest('DELETE', '/api/instances/host/Host_1', None, 204, None)
+        self.addRequest('DELETE', '/api/instances/host/Host_2', None, 409,
+                        {'error': {'messages': [{'en-US': 'Host is in use'}]}})
+
+        self.unityapi.logger = MagicMock(name="logger")
+        result = self.unityapi.teardown_hosts(['test1_sg', 'test2_sg', 'gone_sg'], [wwn, gone_wwn])
+        self.unityapi.logger.warn.assert_called_once_with(
+            "teardown_hosts removed 1 hosts and 1 initiators, 1 failed")
+        self.assertEqual(sorted(result['storage_groups'].items()),
+                         [('gone_sg', 'not found'), ('test1_sg', 'removed'), ('test2_sg', 'failed')])
+        self.assertEqual(sorted(result['hbas'].items()),
+                         [(gone_wwn, 'not found'), (wwn, 'removed')])
+        self.assertEqual(TestUnity.requests_expected, [])
+
+    def test_teardown_hosts_nothing_given(self):
+        """teardown_hosts without storage groups or WWNs"""
+        print self.shortDescription()
+        self.setUpUnity()
+        self.assertRaises(SanApiCriticalErrorException, self.unityapi.teardown_hosts)
+        self.assertRaises(SanApiCriticalErrorException, self.unityapi.teardown_hosts, None, ['notawwn'])
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,6 +4,7 @@ Created on 27 Jun 2014
 @author: edavmax
 '''
 import unittest
+import shlex
 from sanapi import api_builder, SanApi, get_api_version
 from mock import patch, Mock
 from vnxcommonapi import VnxCommonApi
@@ -24,11 +25,58 @@ import glob
 from testfunclib import *
 import datetime
 import subprocess
+import threading
+import StringIO
+from sanapihealth import reset_sp_health
+from navicmd import NaviCommand
+from sanapiretry import FixedRetryPolicy, SanApiDeadline
+from sanapiexception import SanApiTimeoutException
+
+
+class HangingProc(object):
+    ''' Popen stand-in that does not answer until killed '''
+
+    def __init__(self):
+        self.returncode = None
+        self.killed = False
+        self._event = threading.Event()
+
+    def communicate(self):
+        self._event.wait(10)
+        self.returncode = -9
+        return ["", "killed"]
+
+    def kill(self):
+        self.killed = True
+        self._event.set()
+
+
+class StreamProc(object):
+    ''' Popen stand-in whose stdout is read from a file '''
+
+    def __init__(self, path=None, returncode=0, text=None):
+        if text is not None:
+            self.stdout = StringIO.StringIO(text)
+        else:
+            self.stdout = open(path)
+        self.returncode = None
+        self.killed = False
+        self._returncode = returncode
+
+    def wait(self):
+        self.stdout.close()
+        self.returncode = self._returncode
+        return self.returncode
+
+    def kill(self):
+        self.killed = True
+        self._returncode = -9
 
 
 class Test(unittest.TestCase):
 
     def setUp(self):
+        reset_sp_health()
         # create a VnxCommonApi object
         self.ref_navicmd = "/opt/Navisphere/bin/naviseccli"
         self.spa = "1.2.3.4"
@@ -125,9 +173,381 @@ class Test(unittest.TestCase):
             " -xml  " + navi_subcmd
 
         vnxCommAPIObj._navisec(navi_subcmd)
-        mock_popen.assert_called_with(expected_cmd, shell=True,
+        mock_popen.assert_called_with(shlex.split(expected_cmd),
                                       stderr=-1, stdout=-1, stdin=-1)
 
+    def test_navisec_many(self):
+        ''' test navisec_many runs each command and keeps submission order '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        self.assertEqual(vnxCommAPIObj._navi_max_parallel, 4)
+
+        def fake_navisec(navicmd, **kwargs):
+            if navicmd == "getlun 2":
+                raise SanApiCommandException("failed " + navicmd, 1)
+            return navicmd.upper()
+
+        vnxCommAPIObj._navisec = mock.Mock(side_effect=fake_navisec)
+        cmds = ["getlun 1", "getlun 2", "getlun 3"]
+        results = vnxCommAPIObj._navisec_many(cmds, xml=False)
+        self.assertEqual(results[0].get(), "GETLUN 1")
+        myassert_raises_regexp(self, SanApiCommandException,
+                               "failed getlun 2", results[1].get)
+        self.assertEqual(results[2].get(), "GETLUN 3")
+        for cmd in cmds:
+            vnxCommAPIObj._navisec.assert_any_call(cmd, xml=False)
+
+    def test_navisec_many_not_initialised(self):
+        ''' test navisec_many raises if the api is not initialised '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        self.assertRaises(SanApiException, vnxCommAPIObj._navisec_many,
+                          ["getlun 1"])
+
+    def _opt_arg(self, call, option):
+        ''' returns the value of a naviseccli option in a Popen call '''
+        argv = call[0][0]
+        return argv[argv.index(option) + 1]
+
+    def _sp_arg(self, call):
+        return self._opt_arg(call, '-h')
+
+    def _hedging_api(self):
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        vnxCommAPIObj._navi_hedging = True
+        vnxCommAPIObj._navi_hedge_delay = 0.05
+        return vnxCommAPIObj
+
+    def test_navisec_hedged_slow_spa(self):
+        ''' test a hedged read returns SP B answer and kills SP A '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._hedging_api()
+        outdata = get_test_file_data(self.cmdokxml1)
+        slow = HangingProc()
+        fast = Mock()
+        fast.communicate.return_value = [outdata, ""]
+        fast.returncode = 0
+
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.side_effect = [slow, fast]
+            root = vnxCommAPIObj._navisec("getlun -uid")
+        self.assertEqual(root.getroot().tag, ET.fromstring(outdata).tag)
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertTrue(self.spb in mock_popen.call_args[0][0])
+        self.assertTrue(slow.killed)
+
+    def test_navisec_hedged_spa_fails_fast(self):
+        ''' test a hedged read moves to SP B at once if SP A fails '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._hedging_api()
+        vnxCommAPIObj._navi_hedge_delay = 30
+        outdata = get_test_file_data(self.cmdokxml1)
+        failed = Mock()
+        failed.communicate.return_value = ["", "error"]
+        failed.returncode = 255
+        good = Mock()
+        good.communicate.return_value = [outdata, ""]
+        good.returncode = 0
+
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.side_effect = [failed, good]
+            start = time.time()
+            vnxCommAPIObj._navisec("lun -list")
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertFalse(good.kill.called)
+
+    def test_navisec_not_hedged_for_writes(self):
+        ''' test only read-only commands are hedged '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._hedging_api()
+        self.assertTrue(vnxCommAPIObj._is_hedgeable("getlun 5"))
+        self.assertTrue(vnxCommAPIObj._is_hedgeable("storagegroup  -list"))
+        self.assertTrue(vnxCommAPIObj._is_hedgeable("port -list -hba"))
+        self.assertFalse(vnxCommAPIObj._is_hedgeable("lun -create -l 5"))
+        self.assertFalse(vnxCommAPIObj._is_hedgeable(
+                                   "storagegroup -addhlu -gname sg1"))
+        self.assertFalse(vnxCommAPIObj._is_hedgeable("getlunx"))
+        vnxCommAPIObj._navi_hedging = False
+        self.assertFalse(vnxCommAPIObj._is_hedgeable("getlun 5"))
+
+    def test_navisec_prefers_healthy_sp(self):
+        ''' test commands go to SP B first once SP A has failed '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        outdata = get_test_file_data(self.cmdokxml1)
+        down = Mock()
+        down.communicate.return_value = ["", "connection refused"]
+        down.returncode = 255
+        good = Mock()
+        good.communicate.return_value = [outdata, ""]
+        good.returncode = 0
+
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.side_effect = [down, good]
+            vnxCommAPIObj._navisec("getlun 5")
+            self.assertEqual(self._sp_arg(mock_popen.call_args_list[0]),
+                             self.spa)
+            mock_popen.reset_mock()
+            mock_popen.side_effect = [good]
+            vnxCommAPIObj._navisec("getlun 5")
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertEqual(self._sp_arg(mock_popen.call_args), self.spb)
+
+    def test_navisec_skips_tripped_sp(self):
+        ''' test an SP with an open breaker is not tried '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        for _ in range(3):
+            vnxCommAPIObj._sp_health.record_failure(self.spb)
+        self.assertEqual(vnxCommAPIObj._sp_health.state(self.spb), 'open')
+        down = Mock()
+        down.communicate.return_value = ["", "connection refused"]
+        down.returncode = 255
+        vnxCommAPIObj._retry_policy = FixedRetryPolicy(3, 0)
+
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.return_value = down
+            self.assertRaises(SanApiConnectionException,
+                              vnxCommAPIObj._navisec, "getlun 5")
+        for call in mock_popen.call_args_list:
+            self.assertNotEqual(self._sp_arg(call), self.spb)
+
+    def test_navisec_deadline_clamps_timeout(self):
+        ''' test the naviseccli timeout is limited by the deadline '''
+        print self.shortDescription()
+        mock_popen = prepare_mocked_popen(self.cmdokxml1, None, 0)
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        with vnxCommAPIObj.deadline(10):
+            vnxCommAPIObj._navisec("getlun 5")
+        self.assertEqual(self._opt_arg(mock_popen.call_args, '-timeout'),
+                         '10')
+        vnxCommAPIObj._navisec("getlun 5", deadline=SanApiDeadline(3.5))
+        self.assertEqual(self._opt_arg(mock_popen.call_args, '-timeout'),
+                         '4')
+        vnxCommAPIObj._navisec("getlun 5")
+        self.assertEqual(self._opt_arg(mock_popen.call_args, '-timeout'),
+                         '50')
+
+    def test_navisec_deadline_stops_retries(self):
+        ''' test retries stop when the deadline leaves no time to sleep '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        vnxCommAPIObj._retry_policy = FixedRetryPolicy(3, 30)
+        down = Mock()
+        down.communicate.return_value = ["", "connection refused"]
+        down.returncode = 255
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.return_value = down
+            start = time.time()
+            with vnxCommAPIObj.deadline(5):
+                self.assertRaises(SanApiTimeoutException,
+                                  vnxCommAPIObj._navisec, "getlun 5")
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(mock_popen.call_count, 2)
+
+    def _streaming_api(self):
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        vnxCommAPIObj._navi_stream_parse = True
+        vnxCommAPIObj._retry_policy = FixedRetryPolicy(3, 0)
+        return vnxCommAPIObj
+
+    def test_navisec_stream_get_luns(self):
+        ''' test getlun and lun -list are parsed as they are read '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._streaming_api()
+        outputs = {"getlun": "../data/getlun.xml.cmdok",
+                   "-list": "../data/lunlist.xml.cmdok"}
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.side_effect = \
+                lambda cmd, **kwargs: StreamProc(outputs[cmd[-1]])
+            lun_list, sp_dict = vnxCommAPIObj._navisec_get_luns()
+        self.assertEqual(len(lun_list), 214)
+        self.assertEqual(len(sp_dict), 34)
+        self.assertTrue('Pool Name' in sp_dict['208'])
+        sps = dict()
+        for call in mock_popen.call_args_list:
+            self.assertNotEqual(call[1]['stderr'], subprocess.PIPE)
+            sps[call[0][0][-1]] = self._sp_arg(call)
+        self.assertEqual(sps, {"getlun": self.spa, "-list": self.spb})
+
+    def test_navisec_get_luns_concurrent(self):
+        ''' test getlun and lun -list run at the same time on both SPs '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        running = threading.Event()
+        outputs = {"getlun": get_test_file_data("../data/getlun_small.xml"),
+                   "lun -list": get_test_file_data("../data/lunlist.xml.cmdok")}
+        calls = dict()
+        deadlines = []
+
+        def fake_navisec(navicmd, **kwargs):
+            calls[navicmd] = kwargs['sp_ip']
+            deadlines.append(vnxCommAPIObj._current_deadline())
+            # getlun only finishes once lun -list has started
+            if navicmd == "getlun":
+                running.wait(5)
+            else:
+                running.set()
+            return vnxCommAPIObj._etree_from_output(outputs[navicmd])
+
+        vnxCommAPIObj._navisec = mock.Mock(side_effect=fake_navisec)
+        with vnxCommAPIObj.deadline(60):
+            lun_list, sp_dict = vnxCommAPIObj._navisec_get_luns()
+        self.assertTrue(running.isSet())
+        self.assertEqual(calls, {"getlun": self.spa, "lun -list": self.spb})
+        self.assertEqual(len(deadlines), 2)
+        self.assertFalse(None in deadlines)
+        self.assertEqual(len(lun_list), 8)
+        self.assertTrue('212' in sp_dict)
+
+    def test_navisec_projection(self):
+        ''' test listings ask only for the columns which are used '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        self.assertFalse(vnxCommAPIObj._navi_projection)
+        vnxCommAPIObj._navi_projection = True
+        outputs = {"getlun": get_test_file_data("../data/getlun_small.xml"),
+                   "lun": get_test_file_data("../data/lunlist.xml.cmdok")}
+        calls = []
+
+        def fake_navisec(navicmd, **kwargs):
+            calls.append(navicmd)
+            return vnxCommAPIObj._etree_from_output(outputs[navicmd.argv[0]])
+
+        vnxCommAPIObj._navisec = mock.Mock(side_effect=fake_navisec)
+        lun_list, sp_dict = vnxCommAPIObj._navisec_get_luns()
+        self.assertEqual(len(lun_list), 8)
+        self.assertEqual(sorted(calls),
+            ["getlun -name -uid -rg -capacity -type -default",
+             "lun -list -poolName -rtype -opDetails -consumedCap"])
+
+        free = vnxCommAPIObj.get_next_available_lunids(high_lun=80,
+                                req_num_free_lunids=80, randomise=False)
+        self.assertEqual(calls[-1], "getlun -name")
+        self.assertFalse(73 in free or 19 in free)
+        self.assertTrue(72 in free)
+
+        outputs["storagepool"] = get_test_file_data(
+                            "../data/storage_pool_getbyname_ok_response.xml")
+        vnxCommAPIObj.get_storage_pool(sp_name="pool1")
+        self.assertEqual(calls[-1].argv[:4],
+                         ("storagepool", "-list", "-name", "pool1"))
+        self.assertEqual(calls[-1].argv[4:], ("-rtype", "-userCap",
+                         "-availableCap", "-prcntFull", "-subscribedCap"))
+
+    def test_navisec_stream_failed_status(self):
+        ''' test a failure status in streamed output is raised '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._streaming_api()
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.return_value = StreamProc(self.cmdnokxml1)
+            self.assertRaises(SanApiCommandException, list,
+                vnxCommAPIObj._navisec_stream("getlun", "LOGICAL UNIT NUMBER"))
+        self.assertEqual(mock_popen.call_count, 1)
+
+    def test_navisec_stream_connection_failure(self):
+        ''' test streaming moves to the next SP on a connection failure '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._streaming_api()
+        down = StreamProc(returncode=255, text="Security file not found")
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.side_effect = [down,
+                                      StreamProc("../data/lunlist.xml.cmdok")]
+            items = list(vnxCommAPIObj._navisec_stream("lun -list",
+                                                   "LOGICAL UNIT NUMBER "))
+        self.assertEqual(len(items), 34)
+        self.assertEqual(self._sp_arg(mock_popen.call_args), self.spb)
+        self.assertEqual(
+            vnxCommAPIObj._sp_health.get_health(self.spa)['failures'], 1)
+
+    def test_navisec_stream_stopped_early(self):
+        ''' test the process is killed if the caller stops reading '''
+        print self.shortDescription()
+        vnxCommAPIObj = self._streaming_api()
+        proc = StreamProc("../data/getlun.xml.cmdok")
+        proc.wait = Mock(return_value=-9)
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            mock_popen.return_value = proc
+            stream = vnxCommAPIObj._navisec_stream("getlun",
+                                                   "LOGICAL UNIT NUMBER")
+            stream.next()
+            stream.close()
+        self.assertTrue(proc.killed)
+
+    def test_navisec_expired_deadline(self):
+        ''' test no command is run once the deadline has passed '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        with patch('vnxcommonapi.subprocess.Popen') as mock_popen:
+            self.assertRaises(SanApiTimeoutException,
+                              vnxCommAPIObj._navisec, "getlun 5",
+                              deadline=SanApiDeadline(0))
+        self.assertFalse(mock_popen.called)
+
+    def test_get_luns_deadline(self):
+        ''' test _get_luns does not sleep past its deadline '''
+        print self.shortDescription()
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 self.adminpasswd, self.scope,
+                                 getcert=False, vcheck=False)
+        vnxCommAPIObj._navisec_get_luns = Mock(
+                    side_effect=SanApiConnectionException("down", 255))
+        start = time.time()
+        self.assertRaises(SanApiTimeoutException, vnxCommAPIObj._get_luns,
+                          3, 5, SanApiDeadline(2))
+        self.assertTrue(time.time() - start < 2)
+        self.assertEqual(vnxCommAPIObj._navisec_get_luns.call_count, 1)
+
+    def test_navisec_runs_without_shell(self):
+        ''' test names with shell characters reach naviseccli unchanged '''
+        print self.shortDescription()
+        mock_popen = prepare_mocked_popen(self.cmdokxml1, None, 0)
+        vnxCommAPIObj = VnxCommonApi(self.logger)
+        vnxCommAPIObj.initialise((self.spa, self.spb), self.adminuser,
+                                 "pa$$ 'w0rd", self.scope,
+                                 getcert=False, vcheck=False, esc_pwd=True)
+        navi_subcmd = NaviCommand("storagegroup", "-list", "-gname")\
+                        .quoted("sg $(1); x")
+        vnxCommAPIObj._navisec(navi_subcmd)
+        argv = mock_popen.call_args[0][0]
+        self.assertFalse('shell' in mock_popen.call_args[1])
+        self.assertEqual(argv[-4:], ['storagegroup', '-list', '-gname',
+                                     'sg $(1); x'])
+        self.assertEqual(self._opt_arg(mock_popen.call_args, '-Password'),
+                         "pa$$ 'w0rd")
+
     def test_navicmdfailedwithconnerr(self):
         ''' test navicmd raises SanApiConnectionException when connection fails'''
         print self.shortDescription()
@@ -14,6 +14,7 @@ from sanapiexception import *
 import logging
 import logging.handlers
 import xml.etree.ElementTree as ET
+import StringIO
 from vnxparser import *
 
 
@@ -246,6 +247,81 @@ class Test(unittest.TestCase):
         self.assertEqual(item.uid, '60:06:01:60:6F:D0:2E:00:E8:D2:3F:04:00:9B:E3:11', "tested object attribute not correct")
         #TODO: more validation once raid code is fixed, compare objects
 
+    def test_navi_response_decodes_once(self):
+        """ test NaviResponse holds the status and params in order """
+        print self.shortDescription()
+        et = ET.parse('../data/list_sgs.xml')
+        response = NaviResponse(et)
+        params = et.findall('.//PARAMVALUE')
+        self.assertEqual([name for name, value in response.params],
+                         [param.attrib['NAME'] for param in params])
+        self.assertEqual(response.elements, params)
+        self.assertEqual(response.status['success'], 'true')
+        self.assertTrue(response.getroot() is et.getroot())
+        self.assertRaises(SanApiOperationFailedException, NaviResponse,
+                          "String")
+
+    def test_parser_methods_accept_navi_response(self):
+        """ test the parser gives the same results for a NaviResponse """
+        print self.shortDescription()
+        parser = VnxParser()
+        et = ET.parse('../data/list_sgs.xml')
+        response = parser.decode(et)
+        self.assertTrue(parser.decode(response) is response)
+        self.assertEqual(parser.create_sg_list(response),
+                         parser.create_sg_list(et))
+        et = ET.parse(self.luncmdokxml1)
+        response = parser.decode(et)
+        self.assertEqual(parser.create_dicts(response, DelimLunList),
+                         parser.create_dicts(et, DelimLunList))
+        self.assertEqual(len(parser.get_sub_etree_list(response,
+                                                       DelimLunList)), 34)
+
+    def test_iter_dicts_from_getlun_matches_create_dicts(self):
+        """ test streamed getlun records match create_dicts """
+        print self.shortDescription()
+        parser = VnxParser()
+        delim = "LOGICAL UNIT NUMBER"
+        meta_dict = parser.create_dicts(ET.parse('../data/getlun.xml.cmdok'),
+                                        delim)
+        status = {}
+        source = open('../data/getlun.xml.cmdok')
+        try:
+            items = list(parser.iter_dicts(parser.iter_params(source, status),
+                                           delim))
+        finally:
+            source.close()
+
+        self.assertEqual(len(items), 214)
+        for item in items:
+            expected = meta_dict[item[delim]]
+            self.assertEqual(item, expected)
+        self.assertEqual(status['success'], 'true')
+        self.assertEqual(status['errorCode'], '0')
+
+    def test_iter_params_skips_wrapper_and_reads_status(self):
+        """ test iter_params skips CLASSIC CLI and fills the status """
+        print self.shortDescription()
+        parser = VnxParser()
+        status = {}
+        source = open('../data/lunlist.xml.cmdok')
+        try:
+            params = list(parser.iter_params(source, status))
+        finally:
+            source.close()
+        names = [name for name, value in params]
+        self.assertFalse("CLASSIC CLI" in names)
+        self.assertEqual(names.count("LOGICAL UNIT NUMBER "), 34)
+        self.assertEqual(status['success'], 'true')
+
+    def test_iter_params_invalid_stream(self):
+        """ test iter_params raises on a PARAMVALUE without VALUE """
+        print self.shortDescription()
+        parser = VnxParser()
+        source = StringIO.StringIO('<CIM><PARAMVALUE NAME="x"/></CIM>')
+        self.assertRaises(SanApiOperationFailedException, list,
+                          parser.iter_params(source, {}))
+
     ''' todo fixme '''
     @skip
     def test_create_dicts_bad_delim(self):
@@ -666,6 +742,32 @@ class Test(unittest.TestCase):
         self.assertEquals(len(hba_info_list), 158)
         
     #@skip   
+    def test_group_ranges(self):
+        """ test params are split into index ranges on a delimiter """
+        print self.shortDescription()
+        parser = VnxParser()
+        params = [("x", "0"), ("HBA UID", "1"), ("SP Name", "A"),
+                  ("SP Name", "B"), ("HBA UID", "2"), ("SP Name", "A")]
+        self.assertEqual(parser.group_ranges(params, "HBA UID"),
+                         [(1, 4), (4, 6)])
+        self.assertEqual(parser.group_ranges(params, "SP Name", 1, 4),
+                         [(2, 3), (3, 4)])
+        self.assertEqual(parser.group_ranges(params, "WWN"), [])
+
+    def test_create_hba_init_info_list_matches_sub_etrees(self):
+        """ test HBA ranges match the sub etrees they replace """
+        print self.shortDescription()
+        parser = VnxParser()
+        response = parser.decode(ET.parse(self.hbacmdokxml1))
+        ranges = parser.group_ranges(response.params, "HBA UID")
+        sub_etrees = parser.get_sub_etree_list(response, "HBA UID")
+        self.assertEqual(len(ranges), len(sub_etrees))
+        for (start, end), sub_etree in zip(ranges, sub_etrees):
+            self.assertEqual(parser.create_range_dict(response, start, end),
+                             parser.create_dict(sub_etree))
+        self.assertEqual(len(parser.create_hba_init_info_list(response)),
+                         158)
+
     def test_create_hba_init_info_list_bad_xml(self):
         ''' test behaviour of create_hba_init_info_list when xml with invalid wwn is passed '''
         print self.shortDescription() 
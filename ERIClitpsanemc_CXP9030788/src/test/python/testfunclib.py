@@ -76,6 +76,17 @@ class MockProc():
 
 
 
+class FakeClock(object):
+    # Use this class as the clock of the objects which take one, e.g.
+    # SanApiCache or LunIdAllocator, and move time on by setting now.
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 # -----------------------------------------------------
 # DECORATORS
 